@@ -19,13 +19,15 @@ from models import db
 from routes import register_routes
 
 
-def create_app(config_class=Config):
+def create_app(config_class=Config, start_job_pool=True):
     """
     Create and configure the Flask application.
 
     Args:
         config_class: Configuration class to use (default: Config).
                       Pass TestConfig for testing with SQLite in-memory.
+        start_job_pool: Start the in-process job pool (JOB_WORKERS).
+                        worker.py passes False and runs its own.
 
     Returns:
         Configured Flask app instance.
@@ -61,6 +63,23 @@ def create_app(config_class=Config):
         _auto_migrate(app)
         _patch_amy_bot_prompt(app)
 
+    # Record/replay Grok + enrichment HTTP traffic when HTTP_CASSETTE_MODE is set
+    from services.cassette_service import init_cassette
+    init_cassette(app)
+
+    # Open a keep-alive connection to xAI before the first pipeline call
+    from services.grok_service import warm_grok_client
+    warm_grok_client(app)
+
+    # Start this worker's job pool so jobs left by a recycled worker resume
+    if (
+        start_job_pool
+        and app.config.get("PIPELINE_EXECUTOR") == "queue"
+        and not app.config.get("TESTING")
+    ):
+        from services.job_queue import get_job_pool
+        get_job_pool(app)
+
     app.logger.info("[OK] Mimic API initialized")
     return app
 
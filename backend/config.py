@@ -8,7 +8,9 @@ The postgres:// → postgresql:// fix handles Render's connection string
 format, which uses the older 'postgres://' prefix that SQLAlchemy 1.4+
 no longer accepts.
 """
+import json
 import os
+import tempfile
 
 
 class Config:
@@ -33,8 +35,180 @@ class Config:
     # xAI Grok API
     GROK_API_KEY = os.environ.get("GROK_API_KEY") or ""
     GROK_API_URL = os.environ.get("GROK_API_URL") or "https://api.x.ai/v1/chat/completions"
+    # Responses API (Source List x_search) — point both URLs at
+    # tools/mock_xai_server.py to run the pipeline offline
+    GROK_RESPONSES_API_URL = os.environ.get("GROK_RESPONSES_API_URL") or "https://api.x.ai/v1/responses"
     GROK_MODEL = os.environ.get("GROK_MODEL") or "grok-3-fast"
+    # Per-step model routing (services/model_router.py). A Prompt's own
+    # model wins over these. Fallbacks are comma-separated, fastest last;
+    # with an SLO, each non-final model gets one attempt capped at SLO ms.
+    GROK_STEP_MODELS = {
+        "source-list": os.environ.get("GROK_MODEL_SOURCE_LIST") or "grok-4-1-fast-non-reasoning",
+        "refinement": os.environ.get("GROK_MODEL_REFINEMENT") or GROK_MODEL,
+        "amy-bot": os.environ.get("GROK_MODEL_AMY_BOT") or GROK_MODEL,
+    }
+    GROK_STEP_FALLBACK_MODELS = {
+        step: [m.strip() for m in (os.environ.get(var) or "").split(",") if m.strip()]
+        for step, var in (
+            ("source-list", "GROK_FALLBACK_MODELS_SOURCE_LIST"),
+            ("refinement", "GROK_FALLBACK_MODELS_REFINEMENT"),
+            ("amy-bot", "GROK_FALLBACK_MODELS_AMY_BOT"),
+        )
+    }
+    GROK_STEP_SLO_MS = {
+        "source-list": int(os.environ.get("GROK_SLO_MS_SOURCE_LIST") or "0"),
+        "refinement": int(os.environ.get("GROK_SLO_MS_REFINEMENT") or "0"),
+        "amy-bot": int(os.environ.get("GROK_SLO_MS_AMY_BOT") or "0"),
+    }
+    # Per-attempt timeout for calls without a pipeline deadline
+    # (PIPELINE_DEADLINE_SECONDS below)
     GROK_TIMEOUT_SECONDS = int(os.environ.get("GROK_TIMEOUT_SECONDS") or "60")
+    # Keep-alive pool per gunicorn worker — cover every concurrent pipeline
+    # thread in one worker so each can hold an idle socket to api.x.ai
+    GROK_POOL_MAXSIZE = int(os.environ.get("GROK_POOL_MAXSIZE") or "32")
+    GROK_WARM_ON_STARTUP = (os.environ.get("GROK_WARM_ON_STARTUP") or "true").lower() == "true"
+    # Retries for transient Grok failures (429, 5xx, timeouts, empty output)
+    GROK_RETRY_MAX_ATTEMPTS = int(os.environ.get("GROK_RETRY_MAX_ATTEMPTS") or "3")
+    GROK_RETRY_BASE_DELAY_MS = int(os.environ.get("GROK_RETRY_BASE_DELAY_MS") or "1000")
+    GROK_RETRY_MAX_DELAY_MS = int(os.environ.get("GROK_RETRY_MAX_DELAY_MS") or "30000")
+    # Shared xAI rate limiter — all gunicorn workers and pipeline workers on
+    # the host coordinate through one lock-guarded state file (token bucket
+    # + AIMD concurrency). Host-local: other machines or containers each
+    # get their own budget, so run workers on the web host only
+    GROK_RATE_LIMIT_ENABLED = (os.environ.get("GROK_RATE_LIMIT_ENABLED") or "true").lower() == "true"
+    GROK_RATE_LIMIT_STATE_PATH = os.environ.get("GROK_RATE_LIMIT_STATE_PATH") or os.path.join(
+        tempfile.gettempdir(), "mimic_xai_limiter.json"
+    )
+    GROK_RATE_LIMIT_PER_SECOND = float(os.environ.get("GROK_RATE_LIMIT_PER_SECOND") or "5")
+    GROK_RATE_LIMIT_BURST = int(os.environ.get("GROK_RATE_LIMIT_BURST") or "10")
+    GROK_RATE_LIMIT_WAIT_SECONDS = int(os.environ.get("GROK_RATE_LIMIT_WAIT_SECONDS") or "120")
+    GROK_CONCURRENCY_MIN = int(os.environ.get("GROK_CONCURRENCY_MIN") or "2")
+    GROK_CONCURRENCY_MAX = int(os.environ.get("GROK_CONCURRENCY_MAX") or "32")
+    GROK_CONCURRENCY_INITIAL = int(os.environ.get("GROK_CONCURRENCY_INITIAL") or "8")
+    # Grok response cache (opt-in) for refinement + Amy Bot re-runs
+    GROK_CACHE_ENABLED = (os.environ.get("GROK_CACHE_ENABLED") or "false").lower() == "true"
+    GROK_CACHE_TTL_SECONDS = int(os.environ.get("GROK_CACHE_TTL_SECONDS") or str(7 * 24 * 3600))
+    GROK_CACHE_MAX_BYTES = int(os.environ.get("GROK_CACHE_MAX_BYTES") or str(50 * 1024 * 1024))
+    # Prompt assembly for refinement + Amy Bot: "combined" sends prompt text
+    # and story material as one user message; "split" sends the prompt
+    # library text as a stable system message so xAI can reuse its cached
+    # prefix across stories
+    GROK_PROMPT_ASSEMBLY = os.environ.get("GROK_PROMPT_ASSEMBLY") or "combined"
+    # USD per million tokens by model, for the admin usage report. Reasoning
+    # tokens bill at the output rate. Override with GROK_PRICING_JSON, e.g.
+    # '{"grok-3-fast": {"input": 5, "cached_input": 1.25, "output": 25}}'
+    GROK_PRICING = json.loads(os.environ.get("GROK_PRICING_JSON") or "null") or {
+        "grok-3-fast": {"input": 5.00, "cached_input": 1.25, "output": 25.00},
+        "grok-4-1-fast-non-reasoning": {"input": 0.20, "cached_input": 0.05, "output": 0.50},
+    }
+    # Hedged requests (opt-in): send one backup copy of a refinement/Amy Bot
+    # call that is slower than this percentile of recent runs of its step.
+    # MAX_RATIO caps hedges at that fraction of calls (BURST at once).
+    GROK_HEDGE_ENABLED = (os.environ.get("GROK_HEDGE_ENABLED") or "false").lower() == "true"
+    GROK_HEDGE_PERCENTILE = float(os.environ.get("GROK_HEDGE_PERCENTILE") or "95")
+    GROK_HEDGE_MIN_DELAY_MS = int(os.environ.get("GROK_HEDGE_MIN_DELAY_MS") or "2000")
+    GROK_HEDGE_MIN_SAMPLES = int(os.environ.get("GROK_HEDGE_MIN_SAMPLES") or "20")
+    GROK_HEDGE_HISTORY = int(os.environ.get("GROK_HEDGE_HISTORY") or "200")
+    GROK_HEDGE_MAX_RATIO = float(os.environ.get("GROK_HEDGE_MAX_RATIO") or "0.1")
+    GROK_HEDGE_BURST = int(os.environ.get("GROK_HEDGE_BURST") or "3")
+    # Streaming chat completions — partial output is written to the running
+    # PipelineRun at most once per flush interval so status polls can show it
+    GROK_STREAMING_ENABLED = (os.environ.get("GROK_STREAMING_ENABLED") or "false").lower() == "true"
+    GROK_STREAM_FLUSH_MS = int(os.environ.get("GROK_STREAM_FLUSH_MS") or "1000")
+    # Asyncio client — max in-flight Grok calls on one worker's event loop
+    GROK_ASYNC_MAX_CONCURRENCY = int(os.environ.get("GROK_ASYNC_MAX_CONCURRENCY") or "200")
+
+    # HTTP cassettes (services/cassette_service.py): "record" captures Grok +
+    # URL enrichment traffic to HTTP_CASSETTE_PATH, "replay" serves it back
+    # at the recorded timing / SPEED (0 = instantly) for offline benchmarks
+    HTTP_CASSETTE_MODE = os.environ.get("HTTP_CASSETTE_MODE") or "off"
+    HTTP_CASSETTE_PATH = os.environ.get("HTTP_CASSETTE_PATH") or "cassettes/http.jsonl.gz"
+    HTTP_CASSETTE_SPEED = float(os.environ.get("HTTP_CASSETTE_SPEED") or "1")
+
+    # Background pipeline execution: "queue" (durable jobs table, see
+    # services/job_queue.py), "thread" (one thread per run) or "async"
+    PIPELINE_EXECUTOR = os.environ.get("PIPELINE_EXECUTOR") or "queue"
+    # Job queue: worker threads per web process (0 = the web tier only
+    # enqueues; run `python -m worker` instead), lock lease (heartbeated while a
+    # job runs), runs per job incl. reclaims after a dead worker, and how
+    # long shutdown waits for in-flight jobs (keep below gunicorn's
+    # graceful_timeout)
+    JOB_WORKERS = int(os.environ.get("JOB_WORKERS") or "4")
+    JOB_VISIBILITY_TIMEOUT_SECONDS = int(os.environ.get("JOB_VISIBILITY_TIMEOUT_SECONDS") or "300")
+    JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS") or "2")
+    JOB_POLL_INTERVAL_SECONDS = float(os.environ.get("JOB_POLL_INTERVAL_SECONDS") or "2")
+    JOB_DRAIN_SECONDS = int(os.environ.get("JOB_DRAIN_SECONDS") or "25")
+    # Max concurrent jobs per type in one pool (0 = only bounded by the
+    # pool size). "pipeline" jobs run refinement + Amy Bot back to back.
+    JOB_TYPE_CONCURRENCY = {
+        "source-list": int(os.environ.get("JOB_CONCURRENCY_SOURCE_LIST") or "0"),
+        "pipeline": int(os.environ.get("JOB_CONCURRENCY_PIPELINE") or "0"),
+    }
+    # Fair share (see services/job_queue.py): max running jobs one agency /
+    # one user holds across both lanes (0 = no cap), worker threads kept
+    # free of bulk (batch) jobs, and agency weights as "Agency A=2,Agency B=1"
+    # (unlisted agencies weigh 1; a weight-2 agency gets twice the workers)
+    JOB_AGENCY_CONCURRENCY = int(os.environ.get("JOB_AGENCY_CONCURRENCY") or "0")
+    JOB_USER_CONCURRENCY = int(os.environ.get("JOB_USER_CONCURRENCY") or "0")
+    JOB_INTERACTIVE_RESERVED_WORKERS = int(os.environ.get("JOB_INTERACTIVE_RESERVED_WORKERS") or "1")
+    JOB_AGENCY_WEIGHTS = {
+        name.strip(): float(weight)
+        for name, _, weight in (
+            pair.rpartition("=") for pair in (os.environ.get("JOB_AGENCY_WEIGHTS") or "").split(",")
+        )
+        if name.strip() and weight.strip()
+    }
+    # Server-side batches (POST /api/pipeline/batch/...): max items per
+    # request and how many of one batch's runs may be in flight at once
+    BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE") or "200")
+    BATCH_MAX_CONCURRENCY = int(os.environ.get("BATCH_MAX_CONCURRENCY") or "8")
+    # Pushed status (GET /api/pipeline/events, GET /status?wait=...): streams
+    # sleep until a watched story changes (Postgres LISTEN/NOTIFY across
+    # processes; elsewhere they re-check the DB every POLL seconds), send a
+    # keep-alive comment every HEARTBEAT seconds and close after MAX seconds
+    # (clients reconnect with Last-Event-ID). Long polls wait at most
+    # STATUS_LONG_POLL_MAX_SECONDS.
+    PIPELINE_EVENTS_POLL_SECONDS = float(os.environ.get("PIPELINE_EVENTS_POLL_SECONDS") or "2")
+    PIPELINE_EVENTS_HEARTBEAT_SECONDS = float(os.environ.get("PIPELINE_EVENTS_HEARTBEAT_SECONDS") or "15")
+    PIPELINE_EVENTS_MAX_SECONDS = float(os.environ.get("PIPELINE_EVENTS_MAX_SECONDS") or "300")
+    STATUS_LONG_POLL_MAX_SECONDS = float(os.environ.get("STATUS_LONG_POLL_MAX_SECONDS") or "25")
+    # Stale-run reaper (services/run_reaper.py, on every job pool): runs
+    # "running" with no write for PIPELINE_RUN_STALE_SECONDS and no job
+    # owning them are resumed from their last completed step (at most
+    # PIPELINE_RESUME_MAX_ATTEMPTS times per story) or failed. Checked
+    # every PIPELINE_REAPER_INTERVAL_SECONDS (0 = off).
+    PIPELINE_RUN_STALE_SECONDS = int(os.environ.get("PIPELINE_RUN_STALE_SECONDS") or "900")
+    PIPELINE_REAPER_INTERVAL_SECONDS = float(os.environ.get("PIPELINE_REAPER_INTERVAL_SECONDS") or "60")
+    PIPELINE_RESUME_MAX_ATTEMPTS = int(os.environ.get("PIPELINE_RESUME_MAX_ATTEMPTS") or "2")
+    # Idempotency-Key on POST /source-list and /run (services/idempotency.py):
+    # how long a key replays its first response, and how often each job
+    # pool deletes expired keys (0 = never)
+    IDEMPOTENCY_KEY_TTL_HOURS = int(os.environ.get("IDEMPOTENCY_KEY_TTL_HOURS") or "24")
+    IDEMPOTENCY_PURGE_INTERVAL_SECONDS = float(os.environ.get("IDEMPOTENCY_PURGE_INTERVAL_SECONDS") or "3600")
+    # End-to-end pipeline deadline (services/stage_engine.py), split across
+    # stages by share: a Source List launch gets source-list + enrichment, a
+    # /run launch refinement + amy-bot, and a stage may use what earlier
+    # stages left. Grok attempts time out at their stage's deadline (0 = off:
+    # a flat GROK_TIMEOUT_SECONDS per attempt). Override the shares (all
+    # four) with PIPELINE_STEP_SHARES_JSON, e.g.
+    # '{"source-list": 0.3, "enrichment": 0.1, "refinement": 0.4, "amy-bot": 0.2}'
+    PIPELINE_DEADLINE_SECONDS = int(os.environ.get("PIPELINE_DEADLINE_SECONDS") or "600")
+    PIPELINE_STEP_SHARES = json.loads(os.environ.get("PIPELINE_STEP_SHARES_JSON") or "null") or {
+        "source-list": 0.35,
+        "enrichment": 0.15,
+        "refinement": 0.3,
+        "amy-bot": 0.2,
+    }
+    # Stage engine: stories each stage runs at once per process (unset/0 =
+    # no limit beyond the workers running them) and attempts per Grok call
+    # in a stage (unset = GROK_RETRY_MAX_ATTEMPTS), e.g.
+    # PIPELINE_STAGE_CONCURRENCY_JSON='{"source-list": 4, "refinement": 8}'
+    PIPELINE_STAGE_CONCURRENCY = json.loads(
+        os.environ.get("PIPELINE_STAGE_CONCURRENCY_JSON") or "null"
+    ) or {}
+    PIPELINE_STAGE_MAX_ATTEMPTS = json.loads(
+        os.environ.get("PIPELINE_STAGE_MAX_ATTEMPTS_JSON") or "null"
+    ) or {}
 
     # Google OAuth
     GOOGLE_CLIENT_ID = os.environ.get("GOOGLE_CLIENT_ID") or ""
@@ -56,3 +230,9 @@ class TestConfig(Config):
     GROK_API_KEY = "test-grok-key"
     GROK_API_URL = "https://api.x.ai/v1/chat/completions"
     GROK_TIMEOUT_SECONDS = 5
+    GROK_WARM_ON_STARTUP = False
+    HTTP_CASSETTE_MODE = "off"
+    JOB_WORKERS = 0  # Tests run queued jobs synchronously with run_next_job
+    GROK_RETRY_BASE_DELAY_MS = 0  # Retry instantly in tests
+    GROK_RETRY_MAX_DELAY_MS = 0
+    GROK_RATE_LIMIT_ENABLED = False  # Tests build their own limiter on tmp_path
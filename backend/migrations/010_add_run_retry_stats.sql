@@ -0,0 +1,5 @@
+-- Record Grok retry accounting on each pipeline run.
+-- attempts = HTTP attempts made (1 = no retry); backoff_ms = total time
+-- spent sleeping between attempts.
+ALTER TABLE pipeline_runs ADD COLUMN IF NOT EXISTS attempts INTEGER;
+ALTER TABLE pipeline_runs ADD COLUMN IF NOT EXISTS backoff_ms INTEGER;
@@ -0,0 +1,21 @@
+-- Content-addressed cache of Grok chat responses (opt-in, GROK_CACHE_ENABLED).
+-- cache_key = SHA-256 of model, messages, temperature, prompt id/updated_at.
+CREATE TABLE IF NOT EXISTS grok_response_cache (
+    id SERIAL PRIMARY KEY,
+    cache_key VARCHAR(64) UNIQUE NOT NULL,
+    model VARCHAR(100),
+    step_type VARCHAR(50),
+    prompt_id INTEGER REFERENCES prompts(id),
+    response_text TEXT NOT NULL,
+    size_bytes INTEGER NOT NULL DEFAULT 0,
+    hit_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT NOW(),
+    last_used_at TIMESTAMP DEFAULT NOW(),
+    expires_at TIMESTAMP NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_grok_cache_expires ON grok_response_cache(expires_at);
+CREATE INDEX IF NOT EXISTS idx_grok_cache_last_used ON grok_response_cache(last_used_at);
+
+-- Mark runs that were answered from the cache
+ALTER TABLE pipeline_runs ADD COLUMN IF NOT EXISTS cache_hit BOOLEAN DEFAULT FALSE;
@@ -0,0 +1,4 @@
+-- Prompt tokens xAI served from its prompt prefix cache, per pipeline run.
+-- Read from usage.prompt_tokens_details.cached_tokens (chat completions)
+-- or usage.input_tokens_details.cached_tokens (Responses API).
+ALTER TABLE pipeline_runs ADD COLUMN IF NOT EXISTS cached_tokens INTEGER;
@@ -0,0 +1,7 @@
+-- Token usage and model per pipeline run, from the xAI usage block.
+-- Feeds GET /api/admin/grok/usage (tokens/sec and cost rollups).
+ALTER TABLE pipeline_runs ADD COLUMN IF NOT EXISTS model VARCHAR(100);
+ALTER TABLE pipeline_runs ADD COLUMN IF NOT EXISTS prompt_tokens INTEGER;
+ALTER TABLE pipeline_runs ADD COLUMN IF NOT EXISTS completion_tokens INTEGER;
+ALTER TABLE pipeline_runs ADD COLUMN IF NOT EXISTS reasoning_tokens INTEGER;
+CREATE INDEX IF NOT EXISTS idx_pipeline_runs_started_at ON pipeline_runs (started_at);
@@ -0,0 +1,2 @@
+-- True when a hedge (backup) request was sent for a slow Grok call.
+ALTER TABLE pipeline_runs ADD COLUMN IF NOT EXISTS hedged BOOLEAN DEFAULT FALSE;
@@ -0,0 +1,2 @@
+-- Optional per-prompt Grok model override (NULL = the step's default).
+ALTER TABLE prompts ADD COLUMN IF NOT EXISTS model VARCHAR(100);
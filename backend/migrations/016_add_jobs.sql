@@ -0,0 +1,22 @@
+-- Durable job queue for background pipeline work (services/job_queue.py).
+-- Workers claim with SELECT ... FOR UPDATE SKIP LOCKED and hold a job
+-- until locked_until; an expired lock means the worker died.
+CREATE TABLE IF NOT EXISTS jobs (
+    id SERIAL PRIMARY KEY,
+    job_type VARCHAR(50) NOT NULL,
+    payload TEXT NOT NULL DEFAULT '{}',
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+    story_id INTEGER REFERENCES stories(id),
+    created_by VARCHAR(255),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 1,
+    run_after TIMESTAMP NOT NULL DEFAULT NOW(),
+    locked_by VARCHAR(100),
+    locked_until TIMESTAMP,
+    last_error TEXT,
+    enqueued_at TIMESTAMP DEFAULT NOW(),
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs(status, run_after);
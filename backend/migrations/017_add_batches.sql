@@ -0,0 +1,17 @@
+-- Server-side batches (POST /api/pipeline/batch/source-list).
+-- Stories and jobs point at their batch; the job queue caps how many
+-- of a batch's jobs run at once (batches.max_concurrency).
+CREATE TABLE IF NOT EXISTS batches (
+    id SERIAL PRIMARY KEY,
+    batch_type VARCHAR(50) NOT NULL,
+    total INTEGER NOT NULL DEFAULT 0,
+    max_concurrency INTEGER,
+    created_by VARCHAR(255),
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+ALTER TABLE stories ADD COLUMN IF NOT EXISTS batch_id INTEGER REFERENCES batches(id);
+CREATE INDEX IF NOT EXISTS idx_stories_batch_id ON stories(batch_id);
+
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS batch_id INTEGER REFERENCES batches(id);
+CREATE INDEX IF NOT EXISTS idx_jobs_batch_id ON jobs(batch_id, status);
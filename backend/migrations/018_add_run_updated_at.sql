@@ -0,0 +1,5 @@
+-- Last change to a pipeline run (status, streamed output, retries).
+-- GET /api/pipeline/status?since=... returns only rows changed after
+-- the client's cursor.
+ALTER TABLE pipeline_runs ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP;
+UPDATE pipeline_runs SET updated_at = COALESCE(completed_at, started_at) WHERE updated_at IS NULL;
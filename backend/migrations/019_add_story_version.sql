@@ -0,0 +1,3 @@
+-- Bumped on every write to a story or its pipeline runs; the status
+-- endpoint answers If-None-Match with 304 while it is unchanged.
+ALTER TABLE stories ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 0;
@@ -0,0 +1,17 @@
+-- Idempotency keys for POST /api/pipeline/source-list and /run.
+-- A repeated Idempotency-Key (same user + endpoint) replays the stored
+-- response instead of creating another Story and Grok call.
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    id SERIAL PRIMARY KEY,
+    key VARCHAR(255) NOT NULL,
+    endpoint VARCHAR(100) NOT NULL,
+    created_by VARCHAR(255) NOT NULL,
+    request_hash VARCHAR(64) NOT NULL,
+    story_id INTEGER REFERENCES stories(id),
+    response_status INTEGER NOT NULL,
+    response_body TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT NOW(),
+    CONSTRAINT uq_idempotency_keys UNIQUE (created_by, endpoint, key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created_at ON idempotency_keys(created_at);
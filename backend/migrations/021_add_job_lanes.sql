@@ -0,0 +1,6 @@
+-- Fair-share scheduling: jobs carry their lane ("interactive" single runs
+-- are claimed ahead of "bulk" batches) and the agency of their Source
+-- List prompt, for per-agency caps and weighted ordering.
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS agency VARCHAR(255);
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS lane VARCHAR(20) NOT NULL DEFAULT 'interactive';
+CREATE INDEX IF NOT EXISTS idx_jobs_fair_share ON jobs(status, lane, agency);
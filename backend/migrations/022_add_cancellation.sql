@@ -0,0 +1,5 @@
+-- Cancellation: DELETE /api/pipeline/run/<story_id> and the batch cancel
+-- stamp the story (and batch); workers stop at their next checkpoint.
+-- Jobs and pipeline runs use the new "cancelled" status.
+ALTER TABLE stories ADD COLUMN IF NOT EXISTS cancelled_at TIMESTAMP;
+ALTER TABLE batches ADD COLUMN IF NOT EXISTS cancelled_at TIMESTAMP;
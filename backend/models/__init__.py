@@ -15,3 +15,7 @@ from models.prompt import Prompt  # noqa: E402, F401
 from models.story import Story  # noqa: E402, F401
 from models.pipeline_run import PipelineRun  # noqa: E402, F401
 from models.user_agency import UserAgency  # noqa: E402, F401
+from models.grok_cache_entry import GrokCacheEntry  # noqa: E402, F401
+from models.batch import Batch  # noqa: E402, F401
+from models.job import Job  # noqa: E402, F401
+from models.idempotency_key import IdempotencyKey  # noqa: E402, F401
@@ -0,0 +1,42 @@
+"""
+Batch model — a group of pipeline runs started by one request.
+
+POST /api/pipeline/batch/source-list creates one Batch plus a Story,
+PipelineRun and Job per prompt in a single transaction. Stories and jobs
+point back at the batch (batch_id) so progress is one aggregate query,
+and the job queue can cap how many of a batch's jobs run at once.
+"""
+from datetime import datetime, timezone
+
+from models import db
+
+
+class Batch(db.Model):
+    """A batch of stories run together."""
+
+    __tablename__ = "batches"
+
+    id = db.Column(db.Integer, primary_key=True)
+    batch_type = db.Column(db.String(50), nullable=False)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    max_concurrency = db.Column(db.Integer)
+    created_by = db.Column(db.String(255))
+    created_at = db.Column(
+        db.DateTime, default=lambda: datetime.now(timezone.utc)
+    )
+    cancelled_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        """Serialize batch for API responses."""
+        return {
+            "id": self.id,
+            "batch_type": self.batch_type,
+            "total": self.total,
+            "max_concurrency": self.max_concurrency,
+            "created_by": self.created_by,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "cancelled_at": self.cancelled_at.isoformat() if self.cancelled_at else None,
+        }
+
+    def __repr__(self):
+        return f"<Batch {self.id} {self.batch_type} ({self.total})>"
@@ -0,0 +1,51 @@
+"""
+GrokCacheEntry model — content-addressed cache of Grok chat responses.
+
+One row per distinct request. cache_key is a SHA-256 over the model,
+messages, temperature and the prompt's id/updated_at, so editing a prompt
+naturally invalidates its entries. Rows expire after a TTL and the oldest
+(least recently used) rows are evicted when the table exceeds its size cap.
+"""
+from datetime import datetime, timezone
+
+from models import db
+
+
+class GrokCacheEntry(db.Model):
+    """A cached Grok response for one refinement or Amy Bot request."""
+
+    __tablename__ = "grok_response_cache"
+
+    id = db.Column(db.Integer, primary_key=True)
+    cache_key = db.Column(db.String(64), unique=True, nullable=False, index=True)
+    model = db.Column(db.String(100))
+    step_type = db.Column(db.String(50))
+    prompt_id = db.Column(db.Integer, db.ForeignKey("prompts.id"))
+    response_text = db.Column(db.Text, nullable=False)
+    size_bytes = db.Column(db.Integer, nullable=False, default=0)
+    hit_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(
+        db.DateTime, default=lambda: datetime.now(timezone.utc)
+    )
+    last_used_at = db.Column(
+        db.DateTime, default=lambda: datetime.now(timezone.utc)
+    )
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    def to_dict(self):
+        """Serialize cache entry (without the response body) for API responses."""
+        return {
+            "id": self.id,
+            "cache_key": self.cache_key,
+            "model": self.model,
+            "step_type": self.step_type,
+            "prompt_id": self.prompt_id,
+            "size_bytes": self.size_bytes,
+            "hit_count": self.hit_count,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "last_used_at": self.last_used_at.isoformat() if self.last_used_at else None,
+            "expires_at": self.expires_at.isoformat() if self.expires_at else None,
+        }
+
+    def __repr__(self):
+        return f"<GrokCacheEntry {self.cache_key[:12]} ({self.step_type})>"
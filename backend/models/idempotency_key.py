@@ -0,0 +1,35 @@
+"""
+IdempotencyKey model — the stored response of a keyed pipeline launch.
+
+POST /source-list and /run with an Idempotency-Key header store their
+response here, in the same transaction as the rows they create. A repeat
+of the key by the same user on the same endpoint replays the response
+instead of starting another run (services/idempotency.py).
+"""
+from datetime import datetime, timezone
+
+from models import db
+
+
+class IdempotencyKey(db.Model):
+    """One client-chosen key and the response it produced."""
+
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        db.UniqueConstraint("created_by", "endpoint", "key", name="uq_idempotency_keys"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(255), nullable=False)
+    endpoint = db.Column(db.String(100), nullable=False)
+    created_by = db.Column(db.String(255), nullable=False)
+    request_hash = db.Column(db.String(64), nullable=False)
+    story_id = db.Column(db.Integer, db.ForeignKey("stories.id"))
+    response_status = db.Column(db.Integer, nullable=False)
+    response_body = db.Column(db.Text, nullable=False)
+    created_at = db.Column(
+        db.DateTime, default=lambda: datetime.now(timezone.utc), index=True
+    )
+
+    def __repr__(self):
+        return f"<IdempotencyKey {self.endpoint} {self.key!r} story={self.story_id}>"
@@ -0,0 +1,83 @@
+"""
+Job model — durable background work queue (services/job_queue.py).
+
+One row per enqueued /source-list or /run request. Workers claim rows
+with a lock and a visibility deadline (locked_until); a worker that dies
+mid-job stops heartbeating, the deadline passes, and another worker
+reclaims the job until max_attempts is used up. run_after is when the
+job (last) became claimable; a claim moves it to the lapsed lock's
+deadline for a reclaimed job, so queue waits exclude the lost attempt.
+
+Status: queued → running → completed | failed, or cancelled from
+queued or running (services/run_control.py)
+
+Lane: "interactive" (single runs an editor is waiting on) is claimed
+ahead of "bulk" (batches, automatic resumes). agency (from the Source
+List prompt) and created_by drive fair-share ordering and caps.
+"""
+import json
+from datetime import datetime, timezone
+
+from models import db
+
+
+class Job(db.Model):
+    """A queued unit of pipeline work."""
+
+    __tablename__ = "jobs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_type = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default="{}")
+    status = db.Column(db.String(20), nullable=False, default="queued")
+    story_id = db.Column(db.Integer, db.ForeignKey("stories.id"))
+    batch_id = db.Column(db.Integer, db.ForeignKey("batches.id"))
+    created_by = db.Column(db.String(255))
+    agency = db.Column(db.String(255))
+    lane = db.Column(db.String(20), nullable=False, default="interactive")
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=1)
+    run_after = db.Column(
+        db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc)
+    )
+    locked_by = db.Column(db.String(100))
+    locked_until = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    enqueued_at = db.Column(
+        db.DateTime, default=lambda: datetime.now(timezone.utc)
+    )
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index("idx_jobs_claim", "status", "run_after"),
+        db.Index("idx_jobs_batch_id", "batch_id", "status"),
+        db.Index("idx_jobs_fair_share", "status", "lane", "agency"),
+    )
+
+    @property
+    def payload_dict(self):
+        return json.loads(self.payload or "{}")
+
+    def to_dict(self):
+        """Serialize job (without the payload) for API responses."""
+        return {
+            "id": self.id,
+            "job_type": self.job_type,
+            "status": self.status,
+            "story_id": self.story_id,
+            "batch_id": self.batch_id,
+            "created_by": self.created_by,
+            "agency": self.agency,
+            "lane": self.lane,
+            "attempts": self.attempts,
+            "max_attempts": self.max_attempts,
+            "locked_by": self.locked_by,
+            "last_error": self.last_error,
+            "enqueued_at": self.enqueued_at.isoformat() if self.enqueued_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+    def __repr__(self):
+        return f"<Job {self.id} {self.job_type} ({self.status})>"
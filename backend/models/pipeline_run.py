@@ -4,9 +4,15 @@ PipelineRun model — Audit log for every Grok API call.
 One row per API call in the pipeline. Tracks:
   - Which story and prompt were involved
   - The step type (source-list, refinement, amy-bot)
-  - Status (pending, running, completed, failed)
+  - Status (pending, running, completed, failed, cancelled)
   - Input/output text and timing
   - Error messages if the call failed
+  - Retry accounting (attempts, total backoff) for transient Grok failures
+  - Whether the output came from the Grok response cache
+  - Whether a hedge (backup) request was sent for a slow call
+  - Model and token usage: prompt, completion, cached (served from xAI's
+    prefix cache) and reasoning tokens
+  - When the row last changed, for incremental status polls
 """
 from datetime import datetime, timezone
 
@@ -27,10 +33,24 @@ class PipelineRun(db.Model):
     output_text = db.Column(db.Text)
     error_message = db.Column(db.Text)
     duration_ms = db.Column(db.Integer)
+    attempts = db.Column(db.Integer)
+    backoff_ms = db.Column(db.Integer)
+    cache_hit = db.Column(db.Boolean, default=False)
+    hedged = db.Column(db.Boolean, default=False)
+    model = db.Column(db.String(100))
+    prompt_tokens = db.Column(db.Integer)
+    completion_tokens = db.Column(db.Integer)
+    cached_tokens = db.Column(db.Integer)
+    reasoning_tokens = db.Column(db.Integer)
     started_at = db.Column(
         db.DateTime, default=lambda: datetime.now(timezone.utc)
     )
     completed_at = db.Column(db.DateTime)
+    updated_at = db.Column(
+        db.DateTime,
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
 
     def to_dict(self):
         """Serialize pipeline run to dictionary for API responses."""
@@ -44,6 +64,15 @@ class PipelineRun(db.Model):
             "output_text": self.output_text,
             "error_message": self.error_message,
             "duration_ms": self.duration_ms,
+            "attempts": self.attempts,
+            "backoff_ms": self.backoff_ms,
+            "cache_hit": self.cache_hit,
+            "hedged": self.hedged,
+            "model": self.model,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_tokens": self.cached_tokens,
+            "reasoning_tokens": self.reasoning_tokens,
             "started_at": self.started_at.isoformat() if self.started_at else None,
             "completed_at": self.completed_at.isoformat() if self.completed_at else None,
         }
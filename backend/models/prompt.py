@@ -8,6 +8,8 @@ Three prompt_type values:
 
 Source List prompts carry routing metadata (nullable columns).
 PAPA/PSST/Amy Bot prompts only use the common fields.
+
+model (optional, any type) overrides the step's default Grok model.
 """
 from datetime import datetime, timezone
 
@@ -27,6 +29,7 @@ class Prompt(db.Model):
     prompt_text = db.Column(db.Text, nullable=False)
     description = db.Column(db.Text)
     is_active = db.Column(db.Boolean, default=True)
+    model = db.Column(db.String(100))
     created_by = db.Column(db.String(255))
     updated_by = db.Column(db.String(255))
     created_at = db.Column(
@@ -71,6 +74,7 @@ class Prompt(db.Model):
             "prompt_text": self.prompt_text,
             "description": self.description,
             "is_active": self.is_active,
+            "model": self.model,
             "agency": self.agency,
             "created_by": self.created_by,
             "updated_by": self.updated_by,
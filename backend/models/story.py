@@ -61,6 +61,16 @@ class Story(db.Model):
     cms_push_date = db.Column(db.DateTime)
     cms_response = db.Column(db.Text)
 
+    # Bumped on every write to the story or one of its runs
+    # (services/run_events.py); the status endpoint's ETag
+    version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
+    # Batch this story was started in (POST /api/pipeline/batch/...)
+    batch_id = db.Column(db.Integer, db.ForeignKey("batches.id"), index=True)
+
+    # Set by a cancel (services/run_control.py); cleared when it is launched again
+    cancelled_at = db.Column(db.DateTime)
+
     # Audit
     created_by = db.Column(db.String(255))
     created_at = db.Column(
@@ -100,6 +110,8 @@ class Story(db.Model):
             "pushed_to_cms": self.pushed_to_cms,
             "cms_push_date": self.cms_push_date.isoformat() if self.cms_push_date else None,
             "cms_response": self.cms_response,
+            "batch_id": self.batch_id,
+            "cancelled_at": self.cancelled_at.isoformat() if self.cancelled_at else None,
             "created_by": self.created_by,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
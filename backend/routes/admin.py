@@ -7,18 +7,29 @@ PUT    /api/admin/users/:id/role     — change a user's role (admin/user)
 PUT    /api/admin/users/:id/agencies — set a user's agency/opportunity access
 POST   /api/admin/users/invite       — pre-invite a user by email
 GET    /api/admin/agencies           — list distinct agencies from prompts
+GET    /api/admin/grok/stats         — Grok client stats (pool, rate limiter, cache, hedging, cassette)
+GET    /api/admin/grok/usage         — token usage, tokens/sec and cost rollups
+GET    /api/admin/jobs/stats         — job queue depth, wait times, worker pool and stage occupancy
 
 All endpoints require @admin_required.
 """
 import logging
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 
 from models import db
 from models.user import User
 from models.prompt import Prompt
 from models.user_agency import UserAgency
 from decorators.admin_required import admin_required
+from services.cassette_service import get_cassette_stats
+from services.grok_service import get_pool_stats
+from services.grok_cache_service import get_cache_stats
+from services.hedge_service import get_hedge_stats
+from services.job_queue import get_queue_stats
+from services.rate_limiter import get_rate_limiter
+from services.stage_engine import get_stage_stats
+from services.usage_service import get_usage_report
 
 logger = logging.getLogger(__name__)
 
@@ -189,3 +200,71 @@ def list_agencies():
         for ag, opps in sorted(grouped.items())
     ]
     return jsonify(result)
+
+
+@admin_bp.route("/grok/stats", methods=["GET"])
+@admin_required
+def grok_stats():
+    """Grok client stats.
+
+    Returns: {
+      "pool": { pool_maxsize, requests, hits, misses, hit_rate },   (this worker)
+      "rate_limiter": { concurrency_limit, in_flight, queue_depth, ... } or null,
+      "cache": { enabled, hits, misses, hit_rate, entries, total_bytes, ... },
+      "hedging": { enabled, calls, hedges, hedge_wins, over_budget, ... },  (this worker)
+      "cassette": { mode, path, entries, recorded, exact_hits, ... } or null
+    }
+    The rate limiter block is shared by every worker on the host.
+    """
+    limiter = get_rate_limiter(current_app.config)
+    return jsonify({
+        "pool": get_pool_stats(),
+        "rate_limiter": limiter.snapshot() if limiter else None,
+        "cache": get_cache_stats(),
+        "hedging": get_hedge_stats(),
+        "cassette": get_cassette_stats(),
+    })
+
+
+@admin_bp.route("/grok/usage", methods=["GET"])
+@admin_required
+def grok_usage():
+    """Token usage and cost per group over the last N days.
+
+    Query params:
+      by   — step_type (default), prompt, opportunity, or day
+      days — look-back window (default 7, max 365)
+
+    Returns: { group_by, days, since, rows: [{ <group keys>, runs,
+      prompt_tokens, completion_tokens, cached_tokens, reasoning_tokens,
+      tokens_per_second, avg_duration_ms, cached_ratio, cost_usd, models }] }
+    """
+    group_by = request.args.get("by", "step_type")
+    try:
+        days = int(request.args.get("days", 7))
+    except ValueError:
+        return jsonify({"error": "days must be an integer"}), 400
+    days = max(1, min(days, 365))
+
+    try:
+        return jsonify(get_usage_report(group_by=group_by, days=days))
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+
+@admin_bp.route("/jobs/stats", methods=["GET"])
+@admin_required
+def job_stats():
+    """Job queue and pipeline stage metrics.
+
+    Returns: {
+      "counts": { queued, running, completed, failed },
+      "depth": runnable jobs now (queued + expired locks),
+      "oldest_queued_age_ms": int or null,
+      "wait_ms": { window_minutes, samples, avg, p95 },   (claimable → claim)
+      "pool": { workers, busy, draining } or null,         (this worker)
+      "stages": { <stage>: { concurrency, active, waiting,
+                             completed, failed, avg_ms } }   (this process)
+    }
+    """
+    return jsonify({**get_queue_stats(), "stages": get_stage_stats()})
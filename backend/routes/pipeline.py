@@ -1,24 +1,73 @@
 """
 Pipeline routes — Source List runner and full pipeline execution.
 
-Uses background threads to avoid Render's 30-second proxy timeout.
-POST returns immediately with a story_id, GET polls for the result.
+Uses background work to avoid Render's 30-second proxy timeout.
+POST returns immediately with a story_id, GET polls for the result
+(GET /status?ids=... or ?batch_id=... polls many stories at once, and
+GET /events pushes their changes as Server-Sent Events).
+POST /batch/source-list and POST /batch/run start many Source List or
+full pipeline runs in one request and GET /batch/<id> reports their
+aggregate progress. POST /resume/<id> restarts a stopped pipeline from
+its first incomplete step; services/run_reaper.py does the same for
+runs a lost worker left "running". DELETE /run/<id> and DELETE
+/batch/<id> cancel queued and in-flight work (services/run_control.py).
+
+POST /source-list and /run take an Idempotency-Key header
+(services/idempotency.py). An identical launch that is already in
+flight is joined rather than started again ("coalesced": true in the
+response).
+
+PIPELINE_EXECUTOR picks how that work runs: "queue" (a durable Job row
+claimed by a bounded worker pool — services/job_queue.py), "thread" (one
+thread per run) or "async" (coroutines on the shared GrokAsyncExecutor
+loop).
 """
+import functools
+import json
 import logging
 import threading
 import time
-from datetime import datetime, timezone
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 
-from flask import Blueprint, request, jsonify, g, current_app
+from flask import Blueprint, request, jsonify, g, current_app, stream_with_context
+from sqlalchemy import literal, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import defer, load_only
 
 from models import db
+from models.batch import Batch
+from models.job import Job
 from models.prompt import Prompt
 from models.story import Story
 from models.pipeline_run import PipelineRun
 from decorators.login_required import login_required
-from services.grok_service import call_grok_with_search, GrokAPIError
-from services.pipeline_service import run_pipeline
-from services.url_enrichment_service import enrich_urls
+from services.grok_service import GrokAPIError
+from services.grok_async_service import get_async_executor
+from services.pipeline_service import (
+    find_amy_bot_prompt,
+    resume_pipeline,
+    resume_pipeline_async,
+    resume_step,
+    run_pipeline,
+    run_pipeline_async,
+    run_source_list_async,
+)
+from services import idempotency, pipeline_service, run_events, run_reaper
+from services.job_queue import (
+    enqueue,
+    notify_pool,
+    register_job_handler,
+    register_periodic_task,
+    story_agencies,
+)
+from services.run_control import (
+    PipelineCancelled,
+    cancel_batch,
+    cancel_stories,
+    interrupt_local,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -26,43 +75,26 @@ pipeline_bp = Blueprint("pipeline", __name__)
 
 
 def _run_source_list_background(app, story_id, prompt_text, context_str, prompt_id):
-    """Run Grok API call in a background thread with its own app context."""
-    with app.app_context():
-        story = db.session.get(Story, story_id)
-        run = PipelineRun.query.filter_by(story_id=story_id, step_type="source-list").first()
+    """
+    Run the Source List stages (Grok x_search, URL enrichment) with their own app context.
 
-        start_ms = int(time.time() * 1000)
+    See pipeline_service.run_source_list(); this wrapper logs the outcome
+    and marks the run failed on an unexpected error.
+    """
+    with app.app_context():
         try:
-            output = call_grok_with_search(prompt_text, context=context_str)
-            duration_ms = int(time.time() * 1000) - start_ms
-
-            story.source_list_output = output
+            pipeline_service.run_source_list(story_id, prompt_text, context_str, prompt_id)
 
-            # Enrich any URLs found in the output (best-effort)
-            try:
-                enrichments = enrich_urls(output)
-                if enrichments:
-                    story.url_enrichments = enrichments
-            except Exception as enrich_exc:
-                logger.warning("[--] URL enrichment failed: %s", enrich_exc)
-
-            run.output_text = output
-            run.status = "completed"
-            run.duration_ms = duration_ms
-            run.completed_at = datetime.now(timezone.utc)
-            db.session.commit()
-            logger.info("[OK] Source List run completed (story_id=%d)", story_id)
+        except PipelineCancelled:
+            db.session.rollback()
+            logger.info("[--] Source List run cancelled; result discarded (story_id=%d)", story_id)
 
         except GrokAPIError as exc:
-            duration_ms = int(time.time() * 1000) - start_ms
-            run.status = "failed"
-            run.error_message = str(exc)
-            run.duration_ms = duration_ms
-            run.completed_at = datetime.now(timezone.utc)
-            db.session.commit()
             logger.error("[ERR] Source List run failed: %s", exc)
 
         except Exception as exc:
+            db.session.rollback()
+            run = PipelineRun.query.filter_by(story_id=story_id, step_type="source-list").first()
             run.status = "failed"
             run.error_message = str(exc)
             run.completed_at = datetime.now(timezone.utc)
@@ -70,29 +102,77 @@ def _run_source_list_background(app, story_id, prompt_text, context_str, prompt_
             logger.error("[ERR] Source List run unexpected error: %s", exc)
 
 
-@pipeline_bp.route("/source-list", methods=["POST"])
-@login_required
-def run_source_list():
+def _launch(job_type, target, kwargs, async_fn, async_args):
     """
-    Start a Source List prompt run (async).
+    Commit the pending Story/PipelineRun rows and start their background work.
 
-    Body: { "prompt_id": int }
-    Returns immediately: { story_id, status: "running" }
-    Poll GET /api/pipeline/status/<story_id> for the result.
+    "queue" inserts a Job in the same transaction; "async" submits
+    async_fn(*async_args) to the event loop; "thread" runs
+    target(app, **kwargs) on a new thread.
     """
-    body = request.get_json(silent=True) or {}
-    prompt_id = body.get("prompt_id")
+    app = current_app._get_current_object()
+    executor = app.config.get("PIPELINE_EXECUTOR")
+    if executor == "queue":
+        enqueue(job_type, kwargs, story_id=kwargs["story_id"], created_by=g.current_user.email)
+        return
 
-    if not prompt_id:
-        return jsonify({"error": "prompt_id is required"}), 400
+    db.session.commit()
+    if executor == "async":
+        get_async_executor(app).submit(async_fn, *async_args)
+    else:
+        thread = threading.Thread(target=target, args=(app,), kwargs=kwargs)
+        thread.start()
 
-    prompt = db.session.get(Prompt, prompt_id)
-    if not prompt:
-        return jsonify({"error": "Prompt not found"}), 404
 
-    if prompt.prompt_type != "source-list":
-        return jsonify({"error": "Prompt is not a source-list type"}), 400
+# Routing snapshot copied from the prompt onto each Source List story
+_ROUTING_FIELDS = ("opportunity", "state", "publications", "topic_summary", "context")
+
+
+def _in_flight_story(filters, step_types):
+    """
+    Newest story matching filters with one of step_types running (and not
+    stalled), or None. An identical launch joins it instead of paying for
+    another Grok call.
+    """
+    running = (
+        select(PipelineRun.id)
+        .where(
+            PipelineRun.story_id == Story.id,
+            PipelineRun.step_type.in_(step_types),
+            PipelineRun.status == "running",
+            PipelineRun.updated_at >= run_reaper.stale_cutoff(),
+        )
+        .exists()
+    )
+    return (
+        db.session.query(Story.id).filter(*filters, running)
+        .order_by(Story.id.desc()).limit(1).scalar()
+    )
+
+
+def _start_once(keyed, body, launch):
+    """
+    Commit a launch together with its idempotency key and return the 202.
 
+    launch() commits (and starts the work). If a concurrent request with
+    the same key committed first, this one rolls back and returns that
+    request's stored response.
+    """
+    if keyed:
+        idempotency.remember(keyed, body, 202, story_id=body["story_id"])
+    try:
+        launch()
+    except IntegrityError:
+        db.session.rollback()
+        replayed = idempotency.replay(keyed) if keyed else None
+        if replayed is None:
+            raise
+        return replayed
+    return jsonify(body), 202
+
+
+def _source_list_context(prompt):
+    """Context for a Source List call: routing metadata, today's date, link rules."""
     # Build context from routing metadata
     context_parts = []
     if prompt.opportunity:
@@ -118,10 +198,12 @@ def run_source_list():
         "if the prompt says 'last 24-48 hours' or 'last 7 days', do NOT "
         "include older posts. Use today's date above to calculate recency."
     )
-    context_str = "\n".join(context_parts)
+    return "\n".join(context_parts)
 
-    # Create Story record with routing snapshot
-    story = Story(
+
+def _source_list_story(prompt, batch_id=None):
+    """New Story for a Source List run, with the prompt's routing snapshot."""
+    return Story(
         source_list_prompt_id=prompt.id,
         source_list_input=prompt.prompt_text,
         opportunity=prompt.opportunity,
@@ -129,43 +211,339 @@ def run_source_list():
         publications=prompt.publications,
         topic_summary=prompt.topic_summary,
         context=prompt.context,
+        batch_id=batch_id,
         created_by=g.current_user.email,
     )
-    db.session.add(story)
-    db.session.flush()
 
-    # Create PipelineRun audit record
-    run = PipelineRun(
+
+def _source_list_run(story, prompt):
+    """Placeholder "running" PipelineRun for a Source List story."""
+    return PipelineRun(
         story_id=story.id,
         prompt_id=prompt.id,
         step_type="source-list",
         status="running",
         input_text=prompt.prompt_text,
     )
-    db.session.add(run)
-    db.session.commit()
 
-    # Launch background thread
+
+@pipeline_bp.route("/source-list", methods=["POST"])
+@login_required
+def run_source_list():
+    """
+    Start a Source List prompt run (async).
+
+    Body: { "prompt_id": int }
+    Header: Idempotency-Key (optional) — repeats replay the first response.
+    Returns immediately: { story_id, status: "running", coalesced }
+    coalesced is true when the same unchanged prompt was already running;
+    story_id is then that run's story.
+    Poll GET /api/pipeline/status/<story_id> for the result.
+    """
+    body = request.get_json(silent=True) or {}
+    keyed, replayed = idempotency.begin(request, "source-list", g.current_user.email, body)
+    if replayed is not None:
+        return replayed
+    prompt_id = body.get("prompt_id")
+
+    if not prompt_id:
+        return jsonify({"error": "prompt_id is required"}), 400
+
+    prompt = db.session.get(Prompt, prompt_id)
+    if not prompt:
+        return jsonify({"error": "Prompt not found"}), 404
+
+    if prompt.prompt_type != "source-list":
+        return jsonify({"error": "Prompt is not a source-list type"}), 400
+
+    idempotency.lock(idempotency.fingerprint("source-list", prompt.id))
+    in_flight = _in_flight_story(
+        [Story.source_list_prompt_id == prompt.id,
+         Story.source_list_input == prompt.prompt_text,
+         *(getattr(Story, name) == getattr(prompt, name) for name in _ROUTING_FIELDS)],
+        ("source-list",),
+    )
+    if in_flight is not None:
+        logger.info("[--] Source List prompt %d already running; joined story_id=%d",
+                    prompt.id, in_flight)
+        return _start_once(
+            keyed, {"story_id": in_flight, "status": "running", "coalesced": True},
+            db.session.commit,
+        )
+
+    context_str = _source_list_context(prompt)
+
+    # Create Story record with routing snapshot
+    story = _source_list_story(prompt)
+    db.session.add(story)
+    db.session.flush()
+
+    # Create PipelineRun audit record
+    db.session.add(_source_list_run(story, prompt))
+
+    return _start_once(
+        keyed, {"story_id": story.id, "status": "running", "coalesced": False},
+        functools.partial(
+            _launch,
+            "source-list", _run_source_list_background,
+            {"story_id": story.id, "prompt_text": prompt.prompt_text,
+             "context_str": context_str, "prompt_id": prompt.id},
+            run_source_list_async, (story.id, prompt.prompt_text, context_str),
+        ),
+    )
+
+
+def _run_batch_background(app, target, items, max_concurrency):
+    """Run target(app, **kwargs) for every item, max_concurrency at a time."""
+    with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="batch") as pool:
+        for kwargs in items:
+            pool.submit(target, app, **kwargs)
+
+
+def _launch_batch(batch, job_type, target, items):
+    """
+    Commit a batch's pending rows and start its work.
+
+    "queue" inserts one Job per item in the same transaction (the queue
+    enforces batch.max_concurrency); otherwise one coordinator thread
+    runs the items on a bounded thread pool.
+    """
     app = current_app._get_current_object()
+    if app.config.get("PIPELINE_EXECUTOR") == "queue":
+        agencies = story_agencies([kwargs["story_id"] for kwargs in items])
+        for kwargs in items:
+            enqueue(job_type, kwargs, story_id=kwargs["story_id"],
+                    created_by=batch.created_by, batch_id=batch.id, commit=False,
+                    agency=agencies.get(kwargs["story_id"], ""))
+        db.session.commit()
+        notify_pool()
+        return
+
+    db.session.commit()
     thread = threading.Thread(
-        target=_run_source_list_background,
-        args=(app, story.id, prompt.prompt_text, context_str, prompt.id),
+        target=_run_batch_background,
+        args=(app, target, items, batch.max_concurrency),
     )
     thread.start()
 
-    return jsonify({"story_id": story.id, "status": "running"}), 202
+
+def _batch_prompt_ids(body):
+    """Validated, de-duplicated prompt_ids from a batch body, or an error string."""
+    prompt_ids = body.get("prompt_ids")
+    if not isinstance(prompt_ids, list) or not prompt_ids:
+        return None, "prompt_ids must be a non-empty list"
+    if not all(isinstance(pid, int) and not isinstance(pid, bool) for pid in prompt_ids):
+        return None, "prompt_ids must be integers"
+    prompt_ids = list(dict.fromkeys(prompt_ids))
+    max_size = current_app.config.get("BATCH_MAX_SIZE") or 200
+    if len(prompt_ids) > max_size:
+        return None, f"At most {max_size} prompts per batch"
+    return prompt_ids, None
+
+
+@pipeline_bp.route("/batch/source-list", methods=["POST"])
+@login_required
+def run_source_list_batch():
+    """
+    Start Source List runs for many prompts in one request.
+
+    Body: { "prompt_ids": [int, ...] }
+    Creates the Batch and every Story/PipelineRun in one transaction and
+    fans the runs out server-side, at most BATCH_MAX_CONCURRENCY at once.
+    Returns immediately: { batch_id, total, items: [{ prompt_id, story_id }],
+                           status: "running" }
+    Poll GET /api/pipeline/batch/<batch_id> for aggregate progress.
+    """
+    body = request.get_json(silent=True) or {}
+    prompt_ids, error = _batch_prompt_ids(body)
+    if error:
+        return jsonify({"error": error}), 400
+
+    prompts = {p.id: p for p in Prompt.query.filter(Prompt.id.in_(prompt_ids)).all()}
+    missing = [pid for pid in prompt_ids if pid not in prompts]
+    if missing:
+        return jsonify({"error": "Prompt not found", "prompt_ids": missing}), 404
+    wrong_type = [pid for pid in prompt_ids if prompts[pid].prompt_type != "source-list"]
+    if wrong_type:
+        return jsonify({"error": "Prompt is not a source-list type", "prompt_ids": wrong_type}), 400
+
+    batch = Batch(
+        batch_type="source-list",
+        total=len(prompt_ids),
+        max_concurrency=current_app.config.get("BATCH_MAX_CONCURRENCY") or 8,
+        created_by=g.current_user.email,
+    )
+    db.session.add(batch)
+    db.session.flush()
+
+    stories = [_source_list_story(prompts[pid], batch.id) for pid in prompt_ids]
+    db.session.add_all(stories)
+    db.session.flush()
+    db.session.add_all([
+        _source_list_run(story, prompts[pid]) for pid, story in zip(prompt_ids, stories)
+    ])
+
+    items = [
+        {"story_id": story.id, "prompt_text": prompts[pid].prompt_text,
+         "context_str": _source_list_context(prompts[pid]), "prompt_id": pid}
+        for pid, story in zip(prompt_ids, stories)
+    ]
+    _launch_batch(batch, "source-list", _run_source_list_background, items)
+
+    return jsonify({
+        "batch_id": batch.id,
+        "total": batch.total,
+        "items": [{"prompt_id": pid, "story_id": story.id}
+                  for pid, story in zip(prompt_ids, stories)],
+        "status": "running",
+    }), 202
+
+
+# PipelineRun step types reported per batch type
+_BATCH_STEPS = {
+    "source-list": ("source-list",),
+    "pipeline": ("refinement", "amy-bot"),
+}
+
+
+def _batch_item_status(runs, job_status):
+    """Aggregate status for one batch story from its runs and job."""
+    status = _overall_status(runs) if runs else "running"
+    if status == "running" and job_status in ("queued", "cancelled"):
+        status = job_status
+    return status
+
+
+@pipeline_bp.route("/batch/<int:batch_id>", methods=["GET"])
+@login_required
+def get_batch_status(batch_id):
+    """
+    Aggregate progress for a batch.
+
+    Returns: { batch_id, batch_type, total, status, counts: { queued,
+      running, completed, failed, cancelled }, items: [{ story_id,
+      prompt_id, status, error_message, duration_ms }] }
+    Pipeline batch items also carry current_step, validation_decision
+    and is_valid.
+    status is "running" until every item is completed, failed or
+    cancelled, then "cancelled" if the batch was cancelled, else
+    "completed".
+    """
+    batch = db.session.get(Batch, batch_id)
+    if not batch:
+        return jsonify({"error": "Batch not found"}), 404
+
+    is_pipeline = batch.batch_type == "pipeline"
+    stories = (
+        db.session.query(
+            Story.id, Story.source_list_prompt_id, Story.refinement_prompt_id,
+            Story.validation_decision, Story.is_valid,
+        )
+        .filter(Story.batch_id == batch_id)
+        .order_by(Story.id)
+        .all()
+    )
+    story_ids = [row[0] for row in stories]
+
+    runs_by_story = {}
+    if story_ids:
+        runs = (
+            db.session.query(
+                PipelineRun.story_id, PipelineRun.step_type, PipelineRun.status,
+                PipelineRun.error_message, PipelineRun.duration_ms,
+            )
+            .filter(PipelineRun.story_id.in_(story_ids),
+                    PipelineRun.step_type.in_(_BATCH_STEPS.get(batch.batch_type, ())))
+            .order_by(PipelineRun.id)
+            .all()
+        )
+        for run in runs:
+            runs_by_story.setdefault(run.story_id, []).append(run)
+    job_status = dict(
+        db.session.query(Job.story_id, Job.status).filter(Job.batch_id == batch_id).all()
+    )
+
+    counts = {"queued": 0, "running": 0, "completed": 0, "failed": 0, "cancelled": 0}
+    items = []
+    for story_id, source_prompt_id, refinement_prompt_id, decision, is_valid in stories:
+        runs = runs_by_story.get(story_id, [])
+        status = _batch_item_status(runs, job_status.get(story_id))
+        counts[status] = counts.get(status, 0) + 1
+        failed = [r for r in runs if r.status == "failed"]
+        item = {
+            "story_id": story_id,
+            "prompt_id": refinement_prompt_id if is_pipeline else source_prompt_id,
+            "status": status,
+            "error_message": failed[-1].error_message if failed else None,
+            "duration_ms": sum(r.duration_ms or 0 for r in runs) if runs else None,
+        }
+        if is_pipeline:
+            item.update({
+                "current_step": runs[-1].step_type if runs else None,
+                "validation_decision": decision,
+                "is_valid": is_valid,
+            })
+        items.append(item)
+
+    done = counts["completed"] + counts["failed"] + counts["cancelled"]
+    if done < len(items):
+        status = "running"
+    else:
+        status = "cancelled" if batch.cancelled_at else "completed"
+    return jsonify({
+        "batch_id": batch.id,
+        "batch_type": batch.batch_type,
+        "total": batch.total,
+        "status": status,
+        "counts": counts,
+        "items": items,
+    })
+
+
+@pipeline_bp.route("/batch/<int:batch_id>", methods=["DELETE"])
+@login_required
+def cancel_pipeline_batch(batch_id):
+    """
+    Cancel every queued and in-flight item of a batch.
+
+    Items already completed or failed are left as they are.
+    Returns: { batch_id, status: "cancelled", runs, jobs } — how many
+    runs and jobs were cancelled. 409 if nothing was left to cancel.
+    """
+    batch = db.session.get(Batch, batch_id)
+    if not batch:
+        return jsonify({"error": "Batch not found"}), 404
+
+    cancelled = cancel_batch(batch, g.current_user.email)
+    if not (cancelled["runs"] or cancelled["jobs"]):
+        db.session.rollback()
+        return jsonify({"error": "Nothing to cancel"}), 409
+    db.session.commit()
+    interrupt_local(
+        [sid for (sid,) in db.session.query(Story.id).filter(Story.batch_id == batch_id)]
+    )
+    return jsonify({"batch_id": batch_id, "status": "cancelled", **cancelled})
 
 
-def _run_pipeline_background(app, story_id, selected_story, refinement_prompt_id, user_email):
+def _run_pipeline_background(app, story_id, selected_story, refinement_prompt_id, user_email,
+                             bypass_cache=False, amy_prompt_id=None):
     """Run full pipeline in a background thread."""
     with app.app_context():
         try:
+            # A reclaimed job (worker lost mid-run) skips the steps it already
+            # completed; a fresh run starts at its placeholder, so none are
             run_pipeline(
                 story_id=story_id,
                 selected_story=selected_story,
                 refinement_prompt_id=refinement_prompt_id,
                 user_email=user_email,
+                bypass_cache=bypass_cache,
+                amy_prompt_id=amy_prompt_id,
+                resume=True,
             )
+        except PipelineCancelled:
+            db.session.rollback()
+            logger.info("[--] Pipeline run cancelled (story_id=%s)", story_id)
         except Exception as exc:
             logger.error("[ERR] Pipeline run failed: %s", exc)
             # Commit any flushed failure statuses from _run_grok_step
@@ -175,20 +553,52 @@ def _run_pipeline_background(app, story_id, selected_story, refinement_prompt_id
                 db.session.rollback()
 
 
+def _resume_pipeline_background(app, story_id, user_email=None):
+    """Resume a story's pipeline from its first incomplete step."""
+    with app.app_context():
+        try:
+            resume_pipeline(story_id, user_email=user_email)
+        except PipelineCancelled:
+            db.session.rollback()
+            logger.info("[--] Pipeline resume cancelled (story_id=%s)", story_id)
+        except Exception as exc:
+            logger.error("[ERR] Pipeline resume failed (story_id=%s): %s", story_id, exc)
+            try:
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+
+
+register_job_handler("source-list", _run_source_list_background)
+register_job_handler("pipeline", _run_pipeline_background)
+register_job_handler(run_reaper.RESUME_JOB_TYPE, _resume_pipeline_background)
+register_periodic_task(run_reaper.reap_stale_runs, "PIPELINE_REAPER_INTERVAL_SECONDS")
+register_periodic_task(idempotency.purge_expired, "IDEMPOTENCY_PURGE_INTERVAL_SECONDS")
+
+
 @pipeline_bp.route("/run", methods=["POST"])
 @login_required
 def run_full_pipeline():
     """
     Start full pipeline (async): refinement → Amy Bot → CMS/kill.
 
-    Body: { "story_id": int, "selected_story": str, "refinement_prompt_id": int }
-    Returns immediately: { story_id, status: "running" }
+    Body: { "story_id": int, "selected_story": str, "refinement_prompt_id": int,
+            "bypass_cache": bool (optional — skip the Grok response cache) }
+    Header: Idempotency-Key (optional) — repeats replay the first response.
+    Returns immediately: { story_id, status: "running", coalesced }
+    coalesced is true when the same selection from the same Source List
+    prompt was already being refined with the same prompt; story_id is
+    then the story running it.
     Poll GET /api/pipeline/status/<story_id> for the result.
     """
     body = request.get_json(silent=True) or {}
+    keyed, replayed = idempotency.begin(request, "run", g.current_user.email, body)
+    if replayed is not None:
+        return replayed
     story_id = body.get("story_id")
     selected_story = body.get("selected_story") or ""
     refinement_prompt_id = body.get("refinement_prompt_id")
+    bypass_cache = bool(body.get("bypass_cache"))
 
     if not story_id or not selected_story or not refinement_prompt_id:
         return jsonify({"error": "story_id, selected_story, and refinement_prompt_id are required"}), 400
@@ -197,6 +607,33 @@ def run_full_pipeline():
     if not story:
         return jsonify({"error": "Story not found"}), 404
 
+    # Same selection from the same Source List prompt (or this story), same
+    # routing and refinement prompt: join the run already in flight
+    source = story.source_list_prompt_id
+    idempotency.lock(idempotency.fingerprint(
+        "run", source or f"story-{story.id}", idempotency.fingerprint(selected_story),
+        refinement_prompt_id,
+    ))
+    in_flight = _in_flight_story(
+        [Story.source_list_prompt_id == source if source else Story.id == story.id,
+         Story.selected_story == selected_story,
+         Story.refinement_prompt_id == refinement_prompt_id,
+         *(getattr(Story, name) == getattr(story, name) for name in _ROUTING_FIELDS)],
+        ("refinement", "amy-bot"),
+    )
+    if in_flight is not None:
+        logger.info("[--] Pipeline already running for this selection; joined story_id=%d",
+                    in_flight)
+        return _start_once(
+            keyed, {"story_id": in_flight, "status": "running", "coalesced": True},
+            db.session.commit,
+        )
+
+    # Stamped now so a run lost before it starts can still be resumed
+    story.selected_story = selected_story
+    story.refinement_prompt_id = refinement_prompt_id
+    story.cancelled_at = None
+
     # Create a placeholder "running" refinement run so the status endpoint
     # knows the pipeline is in progress before the background thread starts
     placeholder_run = PipelineRun(
@@ -207,17 +644,289 @@ def run_full_pipeline():
         input_text="(pipeline starting...)",
     )
     db.session.add(placeholder_run)
+
+    return _start_once(
+        keyed, {"story_id": story_id, "status": "running", "coalesced": False},
+        functools.partial(
+            _launch,
+            "pipeline", _run_pipeline_background,
+            {"story_id": story_id, "selected_story": selected_story,
+             "refinement_prompt_id": refinement_prompt_id,
+             "user_email": g.current_user.email, "bypass_cache": bypass_cache},
+            # resume=True as _run_pipeline_background: checkpoints are
+            # honoured whichever PIPELINE_EXECUTOR runs the launch
+            functools.partial(run_pipeline_async, resume=True),
+            (story_id, selected_story, refinement_prompt_id, g.current_user.email, bypass_cache),
+        ),
+    )
+
+
+@pipeline_bp.route("/resume/<int:story_id>", methods=["POST"])
+@login_required
+def resume_full_pipeline(story_id):
+    """
+    Resume a story's pipeline from its first incomplete step (async).
+
+    Uses the selection and prompts of the story's last run; refinement and
+    Amy Bot runs that already completed for them are not repeated. A stale
+    "running" step (its worker was lost) is taken over.
+    Returns immediately: { story_id, step, status: "running" }, where step
+    is "refinement", "amy-bot" or "decision"; { step: null, status:
+    "completed" } if nothing was left to do.
+    409 while a step is still making progress; 400 if the story never ran
+    the pipeline.
+    """
+    story = db.session.get(Story, story_id)
+    if not story:
+        return jsonify({"error": "Story not found"}), 404
+
+    running = PipelineRun.query.filter_by(story_id=story_id, status="running").all()
+    if run_reaper.story_owned_by_job(story_id) or not all(map(run_reaper.is_stale, running)):
+        return jsonify({"error": "Pipeline is still running"}), 409
+
+    try:
+        step = resume_step(story_id)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    if step is None:
+        db.session.rollback()
+        return jsonify({"story_id": story_id, "step": None, "status": "completed"})
+
+    now = datetime.now(timezone.utc)
+    story.cancelled_at = None
+    for run in running:
+        run.updated_at = now
+    if step != "decision" and not any(run.step_type == step for run in running):
+        # Placeholder so the status endpoint reports the resume at once
+        db.session.add(PipelineRun(
+            story_id=story_id,
+            prompt_id=story.refinement_prompt_id if step == "refinement" else story.amy_bot_prompt_id,
+            step_type=step,
+            status="running",
+            input_text="(pipeline resuming...)",
+        ))
+
+    _launch(
+        run_reaper.RESUME_JOB_TYPE, _resume_pipeline_background,
+        {"story_id": story_id, "user_email": g.current_user.email},
+        resume_pipeline_async,
+        (story_id, g.current_user.email),
+    )
+
+    return jsonify({"story_id": story_id, "step": step, "status": "running"}), 202
+
+
+@pipeline_bp.route("/run/<int:story_id>", methods=["DELETE"])
+@login_required
+def cancel_pipeline(story_id):
+    """
+    Cancel a story's queued or in-flight Source List or pipeline run.
+
+    Work in flight stops at its next checkpoint and nothing more is
+    written or pushed to the CMS; POST /resume/<id> picks it up again.
+    Returns: { story_id, status: "cancelled", runs, jobs } — how many
+    runs and jobs were cancelled. 409 if nothing was running.
+    """
+    story = db.session.get(Story, story_id)
+    if not story:
+        return jsonify({"error": "Story not found"}), 404
+
+    cancelled = cancel_stories([story_id], g.current_user.email)
+    if not (cancelled["runs"] or cancelled["jobs"]):
+        db.session.rollback()
+        return jsonify({"error": "Nothing to cancel"}), 409
     db.session.commit()
+    interrupt_local([story_id])
+    return jsonify({"story_id": story_id, "status": "cancelled", **cancelled})
 
-    # Launch background thread
-    app = current_app._get_current_object()
-    thread = threading.Thread(
-        target=_run_pipeline_background,
-        args=(app, story_id, selected_story, refinement_prompt_id, g.current_user.email),
+
+def _batch_pipeline_items(body):
+    """Validated pipeline items from a batch body, or an error string."""
+    items = body.get("items")
+    if not isinstance(items, list) or not items:
+        return None, "items must be a non-empty list"
+    max_size = current_app.config.get("BATCH_MAX_SIZE") or 200
+    if len(items) > max_size:
+        return None, f"At most {max_size} items per batch"
+    for item in items:
+        if not isinstance(item, dict) or not (
+            item.get("story_id") and item.get("selected_story") and item.get("refinement_prompt_id")
+        ):
+            return None, "Each item needs story_id, selected_story, and refinement_prompt_id"
+    return items, None
+
+
+def _pipeline_batch_story(source, batch_id):
+    """
+    Copy of a Source List story for one batch pipeline item.
+
+    Several selections from the same Source List run would otherwise
+    overwrite each other's refinement and Amy Bot results.
+    """
+    return Story(
+        source_list_prompt_id=source.source_list_prompt_id,
+        source_list_input=source.source_list_input,
+        source_list_output=source.source_list_output,
+        url_enrichments=source.url_enrichments,
+        opportunity=source.opportunity,
+        state=source.state,
+        publications=source.publications,
+        topic_summary=source.topic_summary,
+        context=source.context,
+        batch_id=batch_id,
+        created_by=g.current_user.email,
     )
-    thread.start()
 
-    return jsonify({"story_id": story_id, "status": "running"}), 202
+
+@pipeline_bp.route("/batch/run", methods=["POST"])
+@login_required
+def run_pipeline_batch():
+    """
+    Start refinement → Amy Bot → CMS/kill for many selections in one request.
+
+    Body: { "items": [{ "story_id": int, "selected_story": str,
+                        "refinement_prompt_id": int }, ...],
+            "bypass_cache": bool (optional) }
+    Each item runs on its own Story (a copy of the Source List story), so
+    items may share a story_id. The Amy Bot prompt is looked up once for
+    the whole batch, and items run at most BATCH_MAX_CONCURRENCY at once —
+    one story's refinement overlaps another's Amy Bot review.
+    Returns immediately: { batch_id, total, items: [{ source_story_id,
+                           story_id, refinement_prompt_id }], status: "running" }
+    Poll GET /api/pipeline/batch/<batch_id> for aggregate progress.
+    """
+    body = request.get_json(silent=True) or {}
+    items, error = _batch_pipeline_items(body)
+    if error:
+        return jsonify({"error": error}), 400
+    bypass_cache = bool(body.get("bypass_cache"))
+
+    source_ids = list(dict.fromkeys(item["story_id"] for item in items))
+    sources = {s.id: s for s in Story.query.filter(Story.id.in_(source_ids)).all()}
+    missing = [sid for sid in source_ids if sid not in sources]
+    if missing:
+        return jsonify({"error": "Story not found", "story_ids": missing}), 404
+
+    prompt_ids = list(dict.fromkeys(item["refinement_prompt_id"] for item in items))
+    prompts = {p.id: p for p in Prompt.query.filter(Prompt.id.in_(prompt_ids)).all()}
+    bad = [pid for pid in prompt_ids if pid not in prompts or prompts[pid].prompt_type != "papa"]
+    if bad:
+        return jsonify({"error": "Refinement prompt not found or not a papa type",
+                        "prompt_ids": bad}), 400
+
+    amy_prompt = find_amy_bot_prompt()
+    if not amy_prompt:
+        return jsonify({"error": "No active Amy Bot prompt found"}), 400
+
+    batch = Batch(
+        batch_type="pipeline",
+        total=len(items),
+        max_concurrency=current_app.config.get("BATCH_MAX_CONCURRENCY") or 8,
+        created_by=g.current_user.email,
+    )
+    db.session.add(batch)
+    db.session.flush()
+
+    stories = [_pipeline_batch_story(sources[item["story_id"]], batch.id) for item in items]
+    for item, story in zip(items, stories):
+        story.selected_story = item["selected_story"]
+        story.refinement_prompt_id = item["refinement_prompt_id"]
+        story.amy_bot_prompt_id = amy_prompt.id
+    db.session.add_all(stories)
+    db.session.flush()
+    # Placeholder "running" refinement runs, as POST /run creates
+    db.session.add_all([
+        PipelineRun(
+            story_id=story.id,
+            prompt_id=item["refinement_prompt_id"],
+            step_type="refinement",
+            status="running",
+            input_text="(pipeline starting...)",
+        )
+        for item, story in zip(items, stories)
+    ])
+
+    jobs = [
+        {"story_id": story.id, "selected_story": item["selected_story"],
+         "refinement_prompt_id": item["refinement_prompt_id"],
+         "user_email": g.current_user.email, "bypass_cache": bypass_cache,
+         "amy_prompt_id": amy_prompt.id}
+        for item, story in zip(items, stories)
+    ]
+    _launch_batch(batch, "pipeline", _run_pipeline_background, jobs)
+
+    return jsonify({
+        "batch_id": batch.id,
+        "total": batch.total,
+        "items": [
+            {"source_story_id": item["story_id"], "story_id": story.id,
+             "refinement_prompt_id": item["refinement_prompt_id"]}
+            for item, story in zip(items, stories)
+        ],
+        "status": "running",
+    }), 202
+
+
+def _overall_status(runs):
+    """
+    Overall pipeline status from a story's runs (anything with step_type
+    and status, in id order).
+
+    Only the latest run of each step counts, so an attempt that failed or
+    stalled and was then resumed or re-run does not pin the story.
+    """
+    latest = {run.step_type: run.status for run in runs}
+    statuses = set(latest.values())
+    if "running" in statuses:
+        return "running"
+    if "cancelled" in statuses:
+        return "cancelled"
+    if "failed" in statuses:
+        return "failed"
+    return "completed"
+
+
+# Story fields reported by the status endpoints (same-named attributes)
+_STORY_STATUS_FIELDS = (
+    "source_list_output", "url_enrichments", "selected_story", "refinement_output",
+    "amy_bot_output", "validation_decision", "is_valid", "pushed_to_cms",
+    "opportunity", "state", "publications",
+)
+
+# Everything GET /status/<id>?fields= may select (story_id is always sent)
+_STATUS_FIELDS = ("status", "version", "runs") + _STORY_STATUS_FIELDS
+
+
+def _story_status_fields(story, names=_STORY_STATUS_FIELDS):
+    """Story fields reported by the status endpoints."""
+    return {name: getattr(story, name) for name in names}
+
+
+def _run_status(run):
+    """One pipeline run as reported by the status endpoints."""
+    return {
+        "step_type": run.step_type,
+        "status": run.status,
+        "error_message": run.error_message,
+        "duration_ms": run.duration_ms,
+        "attempts": run.attempts,
+        "cache_hit": run.cache_hit,
+        "cached_tokens": run.cached_tokens,
+        "model": run.model,
+        # Streamed text so far (GROK_STREAMING_ENABLED) while running
+        "partial_output": run.output_text if run.status == "running" else None,
+    }
+
+
+def _status_fields(value):
+    """Fields selected by ?fields=a,b (all when absent), or an error string."""
+    if not value:
+        return _STATUS_FIELDS, None
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in names if name not in _STATUS_FIELDS]
+    if unknown:
+        return None, f"Unknown fields: {', '.join(unknown)}"
+    return tuple(name for name in _STATUS_FIELDS if name in names), None
 
 
 @pipeline_bp.route("/status/<int:story_id>", methods=["GET"])
@@ -227,43 +936,291 @@ def get_pipeline_status(story_id):
     Poll for pipeline status.
 
     Returns the story with its current state and pipeline runs.
+    fields=status,validation_decision,... limits the payload to those
+    keys (plus story_id) and loads only what they need.
+
+    The ETag is the story's version (bumped on every write to the story
+    or its runs) and the field selection, so If-None-Match polls of an
+    unchanged story get a bodyless 304 after a one-column lookup.
     """
-    story = db.session.get(Story, story_id)
-    if not story:
-        return jsonify({"error": "Story not found"}), 404
+    fields, error = _status_fields(request.args.get("fields"))
+    if error:
+        return jsonify({"error": error}), 400
 
-    runs = PipelineRun.query.filter_by(story_id=story_id).order_by(PipelineRun.id).all()
+    version = db.session.query(Story.version).filter(Story.id == story_id).scalar()
+    if version is None:
+        return jsonify({"error": "Story not found"}), 404
 
-    # Determine overall status from runs
-    statuses = [r.status for r in runs]
-    if "running" in statuses:
-        overall = "running"
-    elif "failed" in statuses:
-        overall = "failed"
+    etag = f"{story_id}-{version}"
+    if fields != _STATUS_FIELDS:
+        etag += f"-{zlib.crc32(','.join(fields).encode()):08x}"
+    if request.if_none_match.contains_weak(etag):
+        resp = current_app.response_class(status=304)
     else:
-        overall = "completed"
+        resp = jsonify(_project_status(story_id, version, fields))
+    resp.set_etag(etag, weak=True)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
 
-    return jsonify({
-        "story_id": story.id,
-        "status": overall,
-        "source_list_output": story.source_list_output,
-        "url_enrichments": story.url_enrichments,
-        "selected_story": story.selected_story,
-        "refinement_output": story.refinement_output,
-        "amy_bot_output": story.amy_bot_output,
-        "validation_decision": story.validation_decision,
-        "is_valid": story.is_valid,
-        "pushed_to_cms": story.pushed_to_cms,
-        "opportunity": story.opportunity,
-        "state": story.state,
-        "publications": story.publications,
-        "runs": [
-            {
-                "step_type": r.step_type,
-                "status": r.status,
-                "error_message": r.error_message,
-                "duration_ms": r.duration_ms,
-            }
-            for r in runs
-        ],
-    })
+
+def _project_status(story_id, version, fields):
+    """The GET /status/<id> body limited to fields."""
+    body = {"story_id": story_id}
+    story_names = [name for name in fields if name in _STORY_STATUS_FIELDS]
+    if story_names:
+        story = (
+            db.session.query(Story)
+            .options(load_only(*(getattr(Story, name) for name in story_names)))
+            .filter(Story.id == story_id)
+            .one()
+        )
+    if "runs" in fields:
+        runs = (
+            PipelineRun.query.options(defer(PipelineRun.input_text))
+            .filter_by(story_id=story_id).order_by(PipelineRun.id).all()
+        )
+    elif "status" in fields:
+        runs = (
+            db.session.query(PipelineRun.step_type, PipelineRun.status)
+            .filter(PipelineRun.story_id == story_id)
+            .order_by(PipelineRun.id)
+            .all()
+        )
+
+    if "status" in fields:
+        body["status"] = _overall_status(runs)
+    if "version" in fields:
+        body["version"] = version
+    if story_names:
+        body.update(_story_status_fields(story, story_names))
+    if "runs" in fields:
+        body["runs"] = [_run_status(r) for r in runs]
+    return body
+
+
+# Cursors are taken this far back so a write committed by a worker whose
+# clock runs slightly behind is not skipped; repeats are harmless
+_CURSOR_OVERLAP = timedelta(seconds=2)
+
+
+def _status_story_ids(args):
+    """Story ids from ?ids=1,2,3 or ?batch_id=N, or an error string."""
+    batch_id = args.get("batch_id", type=int)
+    if batch_id is not None:
+        return [sid for (sid,) in db.session.query(Story.id)
+                .filter(Story.batch_id == batch_id).order_by(Story.id)], None
+    try:
+        ids = [int(part) for part in (args.get("ids") or "").split(",") if part.strip()]
+    except ValueError:
+        return None, "ids must be comma-separated integers"
+    if not ids:
+        return None, "ids or batch_id is required"
+    max_size = current_app.config.get("BATCH_MAX_SIZE") or 200
+    if len(ids) > max_size:
+        return None, f"At most {max_size} ids per request"
+    return list(dict.fromkeys(ids)), None
+
+
+def _parse_cursor(value):
+    """Datetime for a cursor string from a previous response (ValueError if bad)."""
+    try:
+        return datetime.fromtimestamp(int(value) / 1000, timezone.utc)
+    except (OverflowError, OSError) as exc:
+        raise ValueError(str(exc)) from exc
+
+
+def _status_changes(story_ids, since):
+    """
+    (cursor, changed story entries, overall status per story with runs).
+
+    Two queries regardless of len(story_ids); see get_pipeline_statuses.
+    """
+    cursor = str(int((datetime.now(timezone.utc) - _CURSOR_OVERLAP).timestamp() * 1000))
+    if not story_ids:
+        return cursor, [], {}
+
+    def changed(column):
+        if since is None:
+            return literal(True)
+        return or_(column.is_(None), column > since)
+
+    stories = (
+        db.session.query(Story, changed(Story.updated_at))
+        .filter(Story.id.in_(story_ids))
+        .order_by(Story.id)
+        .all()
+    )
+    runs_by_story = {}
+    runs = (
+        db.session.query(PipelineRun, changed(PipelineRun.updated_at))
+        .options(defer(PipelineRun.input_text))
+        .filter(PipelineRun.story_id.in_(story_ids))
+        .order_by(PipelineRun.id)
+        .all()
+    )
+    for run, run_changed in runs:
+        runs_by_story.setdefault(run.story_id, []).append((run, run_changed))
+
+    results = []
+    statuses = {}
+    for story, story_changed in stories:
+        story_runs = runs_by_story.get(story.id, [])
+        status = _overall_status([run for run, _ in story_runs])
+        if story_runs:
+            statuses[story.id] = status
+        changed_runs = [{"id": run.id, **_run_status(run)}
+                        for run, run_changed in story_runs if run_changed]
+        if not story_changed and not changed_runs:
+            continue
+        entry = {"story_id": story.id, "status": status}
+        if story_changed:
+            entry.update(_story_status_fields(story))
+        entry["runs"] = changed_runs
+        results.append(entry)
+
+    return cursor, results, statuses
+
+
+def _has_live_jobs(story_ids):
+    """True if any of the stories has a queued or running Job."""
+    return db.session.query(
+        select(Job.id)
+        .where(Job.story_id.in_(story_ids), Job.status.in_(("queued", "running")))
+        .exists()
+    ).scalar()
+
+
+def _wait_for_change(app, story_ids, seen, timeout):
+    """
+    Sleep (holding no DB connection) until a watched story may have changed.
+
+    Returns False only when nothing changed before timeout. Without a
+    cross-process listener, returns True every PIPELINE_EVENTS_POLL_SECONDS
+    so the caller re-checks the database.
+    """
+    db.session.close()
+    if run_events.listening(app):
+        return run_events.wait_for_change(app, story_ids, seen, timeout)
+    poll = app.config.get("PIPELINE_EVENTS_POLL_SECONDS") or 2
+    run_events.wait_for_change(app, story_ids, seen, min(timeout, poll))
+    return True
+
+
+@pipeline_bp.route("/status", methods=["GET"])
+@login_required
+def get_pipeline_statuses():
+    """
+    Poll many stories at once with a fixed number of queries.
+
+    Query: ids=1,2,3 or batch_id=N, and optionally since=<cursor> from
+    the previous response.
+    Returns: { cursor, stories: [{ story_id, status, ...story fields,
+      runs: [{ id, ...run fields }] }] }
+    With since, a story is listed only if it or one of its runs changed
+    after the cursor; its story fields are included only if the story
+    row changed, and runs lists only changed runs (merge by run id).
+    status is always the current overall status.
+
+    Long poll: with since and wait=<seconds> (at most
+    STATUS_LONG_POLL_MAX_SECONDS), an empty answer is held until
+    something changes or wait runs out.
+    """
+    story_ids, error = _status_story_ids(request.args)
+    if error:
+        return jsonify({"error": error}), 400
+
+    since = None
+    if request.args.get("since"):
+        try:
+            since = _parse_cursor(request.args["since"])
+        except ValueError:
+            return jsonify({"error": "since must be a cursor from a previous response"}), 400
+
+    app = current_app._get_current_object()
+    wait = min(request.args.get("wait", 0, type=float),
+               app.config.get("STATUS_LONG_POLL_MAX_SECONDS") or 25)
+    deadline = time.monotonic() + wait
+
+    seen = run_events.current_version()
+    cursor, results, _ = _status_changes(story_ids, since)
+    while since is not None and story_ids and not results:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not _wait_for_change(app, story_ids, seen, remaining):
+            break
+        seen = run_events.current_version()
+        cursor, results, _ = _status_changes(story_ids, since)
+
+    return jsonify({"cursor": cursor, "stories": results})
+
+
+def _sse(event_name, data, event_id=None):
+    """One Server-Sent Events frame."""
+    frame = f"event: {event_name}\n"
+    if event_id is not None:
+        frame += f"id: {event_id}\n"
+    return frame + f"data: {json.dumps(data)}\n\n"
+
+
+@pipeline_bp.route("/events", methods=["GET"])
+@login_required
+def stream_pipeline_events():
+    """
+    Server-Sent Events stream of status changes.
+
+    Query: ids=1,2,3 or batch_id=N; resume with a Last-Event-ID header
+    (or since=<cursor>).
+    Events:
+      status — { cursor, stories } in the GET /status?since= format,
+               sent whenever a watched story or run changes (the first
+               one carries everything)
+      done   — { cursor } once every watched story has runs and none is
+               running or has a queued or running Job (a launch or
+               resume still to come); the stream then ends
+    A ": keep-alive" comment is sent every PIPELINE_EVENTS_HEARTBEAT_SECONDS
+    and the stream ends after PIPELINE_EVENTS_MAX_SECONDS; reconnect with
+    the last event id to continue.
+    """
+    story_ids, error = _status_story_ids(request.args)
+    if error:
+        return jsonify({"error": error}), 400
+    since = None
+    last_id = request.headers.get("Last-Event-ID") or request.args.get("since")
+    if last_id:
+        try:
+            since = _parse_cursor(last_id)
+        except ValueError:
+            return jsonify({"error": "Last-Event-ID must be a cursor from a previous event"}), 400
+
+    app = current_app._get_current_object()
+    heartbeat = app.config.get("PIPELINE_EVENTS_HEARTBEAT_SECONDS") or 15
+    end_at = time.monotonic() + (app.config.get("PIPELINE_EVENTS_MAX_SECONDS") or 300)
+
+    def generate():
+        nonlocal since
+        first = True
+        while True:
+            seen = run_events.current_version()
+            cursor, results, statuses = _status_changes(story_ids, since)
+            since = _parse_cursor(cursor)
+            if results or first:
+                yield _sse("status", {"cursor": cursor, "stories": results}, cursor)
+            first = False
+            if (story_ids and len(statuses) == len(story_ids)
+                    and "running" not in statuses.values()
+                    and not _has_live_jobs(story_ids)):
+                yield _sse("done", {"cursor": cursor}, cursor)
+                return
+            # Sleep until something changes, with keep-alives while idle
+            while True:
+                remaining = end_at - time.monotonic()
+                if remaining <= 0:
+                    return
+                if _wait_for_change(app, story_ids, seen, min(heartbeat, remaining)):
+                    break
+                yield ": keep-alive\n\n"
+
+    return current_app.response_class(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -130,7 +130,7 @@ def create_prompt():
     """
     Create a new prompt (admin only).
 
-    Body: { prompt_type, name, prompt_text, description?,
+    Body: { prompt_type, name, prompt_text, description?, model?,
             issuer?, opportunity?, state?, publications?,
             topic_summary?, context?, pitches_per_week? }
     """
@@ -149,6 +149,7 @@ def create_prompt():
         name=name,
         prompt_text=prompt_text,
         description=body.get("description") or "",
+        model=body.get("model") or None,
         agency=body.get("agency") or "",
         is_active=True,
         created_by=g.current_user.email,
@@ -197,6 +198,8 @@ def update_prompt(prompt_id):
         prompt.is_active = body["is_active"]
     if "agency" in body:
         prompt.agency = body["agency"]
+    if "model" in body:
+        prompt.model = body["model"] or None
 
     # Update routing metadata for source-list prompts
     if prompt.prompt_type == "source-list":
@@ -3,9 +3,15 @@ Services package — business logic layer.
 
 Future services:
   - auth_service: Google OAuth token verification, domain check
+  - cassette_service: Record/replay Grok + URL enrichment HTTP traffic
   - grok_service: xAI Grok API client (call_grok)
+  - grok_async_service: asyncio Grok client + bounded event-loop executor
+  - job_queue: Durable jobs table + bounded worker pool for background runs
+  - hedge_service: Hedged (backup) Grok requests for slow calls
+  - model_router: Per-step/per-prompt Grok model + fallback chain
   - pipeline_service: Source List → PAPA/PSST → Amy Bot → CMS/Kill
   - validation_service: Parse Amy Bot APPROVE/REJECT decisions
   - story_service: Story CRUD and filtering
+  - usage_service: Token usage, tokens/sec and cost rollups per PipelineRun
   - cms_service: Lumen CMS API integration (stub until API provided)
 """
@@ -0,0 +1,331 @@
+"""
+HTTP cassettes — record real Grok and URL-enrichment traffic, replay it later.
+
+HTTP_CASSETTE_MODE:
+  - "off" (default): normal network traffic
+  - "record": every exchange made through the Grok session, the async
+    Grok client and URL enrichment is appended to HTTP_CASSETTE_PATH
+  - "replay": those exchanges are served from the cassette instead of
+    the network, after the recorded duration / HTTP_CASSETTE_SPEED
+    (0 = instantly)
+
+Replaying production-shaped traffic lets run_pipeline, the Source List
+background job and enrich_urls be benchmarked with the network removed,
+so what is left is our own overhead (DB, parsing, serialization).
+
+The cassette is JSON Lines, gzipped when the path ends in .gz. Each line
+holds the method, URL, a SHA-256 of the request body, the response
+status, Content-Type / Retry-After, the body text and elapsed_ms.
+Request bodies and headers (the API key) are never written.
+
+Replay matching: exact (method, URL, body hash) first, in recorded
+order; then any recording of the same method + URL, round robin, so a
+benchmark with fresh story text still gets realistic responses. A
+request with no match fails like a connection error.
+
+Streamed chat completions are recorded whole and replayed as one body
+after the recorded duration. Record with a single worker — lines from
+several processes may interleave in a gzipped cassette.
+"""
+import asyncio
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+import httpx
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+logger = logging.getLogger(__name__)
+
+MODES = ("off", "record", "replay")
+
+# Response headers worth keeping; everything else is dropped
+_KEPT_HEADERS = ("content-type", "retry-after")
+
+_cassette = None
+
+
+def body_hash(body):
+    """SHA-256 hex digest of a request body (str, bytes or None)."""
+    if body is None:
+        body = b""
+    elif isinstance(body, str):
+        body = body.encode("utf-8")
+    return hashlib.sha256(body).hexdigest()
+
+
+def _open(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class Cassette:
+    """One cassette file in record or replay mode; thread-safe."""
+
+    def __init__(self, path, mode, speed=1.0):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Cassette mode must be record or replay, got {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self._lock = threading.Lock()
+        self._stats = {"recorded": 0, "exact_hits": 0, "fallback_hits": 0, "misses": 0}
+        self._exact = defaultdict(list)
+        self._by_url = defaultdict(list)
+        self._cursors = defaultdict(int)
+        self._file = None
+        self.entries = 0
+
+        if mode == "replay":
+            self._load()
+
+    def _load(self):
+        with _open(self.path, "r") as fh:
+            for line in fh:
+                line = line.strip()
+                if not line:
+                    continue
+                entry = json.loads(line)
+                self._exact[(entry["method"], entry["url"], entry["body_sha"])].append(entry)
+                self._by_url[(entry["method"], entry["url"])].append(entry)
+                self.entries += 1
+        logger.info("[OK] Loaded %d cassette entries from %s", self.entries, self.path)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # ---- Record ----
+
+    def record(self, method, url, body, status, headers, text, elapsed_ms):
+        entry = {
+            "method": method,
+            "url": url,
+            "body_sha": body_hash(body),
+            "status": status,
+            "headers": {
+                key: headers[key] for key in _KEPT_HEADERS if headers.get(key) is not None
+            },
+            "body": text,
+            "elapsed_ms": elapsed_ms,
+        }
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            if self._file is None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self._file = _open(self.path, "a")
+            self._file.write(line + "\n")
+            self._file.flush()
+            self._stats["recorded"] += 1
+            self.entries += 1
+
+    # ---- Replay ----
+
+    def lookup(self, method, url, body):
+        """The recorded entry for a request, or None."""
+        exact_key = (method, url, body_hash(body))
+        url_key = (method, url)
+        with self._lock:
+            for key, pool, stat in (
+                (exact_key, self._exact, "exact_hits"),
+                (url_key, self._by_url, "fallback_hits"),
+            ):
+                entries = pool.get(key)
+                if entries:
+                    index = self._cursors[key] % len(entries)
+                    self._cursors[key] += 1
+                    self._stats[stat] += 1
+                    return entries[index]
+            self._stats["misses"] += 1
+        return None
+
+    def replay_delay(self, entry):
+        """Seconds to wait before serving entry."""
+        if not self.speed:
+            return 0.0
+        return (entry.get("elapsed_ms") or 0) / 1000 / self.speed
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._stats)
+        counters.update({"mode": self.mode, "path": self.path, "entries": self.entries,
+                         "speed": self.speed})
+        return counters
+
+
+def init_cassette(app):
+    """Open the cassette named by the app config (called from create_app)."""
+    global _cassette
+    mode = (app.config.get("HTTP_CASSETTE_MODE") or "off").lower()
+    if _cassette is not None:
+        _cassette.close()
+        _cassette = None
+    if mode == "off":
+        return None
+    if mode not in MODES:
+        raise ValueError(f"HTTP_CASSETTE_MODE must be one of: {', '.join(MODES)}")
+
+    _cassette = Cassette(
+        app.config.get("HTTP_CASSETTE_PATH") or "cassettes/http.jsonl.gz",
+        mode,
+        speed=float(app.config.get("HTTP_CASSETTE_SPEED", 1)),
+    )
+    logger.info("[OK] HTTP cassette %s mode: %s", mode, _cassette.path)
+    return _cassette
+
+
+def get_cassette():
+    """The active Cassette, or None when HTTP_CASSETTE_MODE is off."""
+    return _cassette
+
+
+def get_cassette_stats():
+    """Cassette counters for the admin stats endpoint, or None when off."""
+    return _cassette.stats() if _cassette is not None else None
+
+
+# ---- requests ----
+
+class CassetteAdapter(BaseAdapter):
+    """requests adapter that records through, or replays instead of, an inner adapter."""
+
+    def __init__(self, cassette, inner):
+        super().__init__()
+        self.cassette = cassette
+        self.inner = inner
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        if self.cassette.mode == "replay":
+            return self._replay(request)
+
+        start = time.monotonic()
+        resp = self.inner.send(
+            request, stream=stream, timeout=timeout, verify=verify, cert=cert, proxies=proxies
+        )
+        text = resp.text  # Reads a streamed body to the end
+        self.cassette.record(
+            request.method, request.url, request.body, resp.status_code, resp.headers, text,
+            int((time.monotonic() - start) * 1000),
+        )
+        return resp
+
+    def _replay(self, request):
+        entry = self.cassette.lookup(request.method, request.url, request.body)
+        if entry is None:
+            raise requests.ConnectionError(
+                f"No cassette entry for {request.method} {request.url}", request=request
+            )
+        time.sleep(self.cassette.replay_delay(entry))
+
+        content = entry["body"].encode("utf-8")
+        resp = requests.Response()
+        resp.status_code = entry["status"]
+        resp.headers = CaseInsensitiveDict(entry["headers"])
+        resp.encoding = "utf-8"
+        resp.url = request.url
+        resp.request = request
+        resp.raw = io.BytesIO(content)
+        resp._content = content
+        resp._content_consumed = True
+        return resp
+
+    def close(self):
+        self.inner.close()
+
+
+def wrap_adapter(adapter):
+    """Wrap a requests adapter in the active cassette, if any."""
+    if _cassette is None:
+        return adapter
+    return CassetteAdapter(_cassette, adapter)
+
+
+_enrichment_session = None
+_enrichment_cassette = None
+
+
+def get_cassette_session():
+    """
+    A requests.Session routed through the active cassette, or None when off.
+
+    Used by URL enrichment, which otherwise calls requests.get directly.
+    """
+    global _enrichment_session, _enrichment_cassette
+    cassette = _cassette
+    if cassette is None:
+        return None
+    with cassette._lock:
+        if _enrichment_session is None or _enrichment_cassette is not cassette:
+            session = requests.Session()
+            adapter = CassetteAdapter(cassette, requests.adapters.HTTPAdapter())
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _enrichment_session = session
+            _enrichment_cassette = cassette
+        return _enrichment_session
+
+
+# ---- httpx (AsyncGrokClient) ----
+
+class CassetteAsyncTransport(httpx.AsyncBaseTransport):
+    """httpx transport that records through, or replays instead of, an inner transport."""
+
+    def __init__(self, cassette, inner):
+        self.cassette = cassette
+        self.inner = inner
+
+    async def handle_async_request(self, request):
+        method, url, body = request.method, str(request.url), request.content
+        if self.cassette.mode == "replay":
+            entry = self.cassette.lookup(method, url, body)
+            if entry is None:
+                raise httpx.ConnectError(f"No cassette entry for {method} {url}", request=request)
+            await asyncio.sleep(self.cassette.replay_delay(entry))
+            return httpx.Response(
+                entry["status"], headers=entry["headers"],
+                content=entry["body"].encode("utf-8"), request=request,
+            )
+
+        start = time.monotonic()
+        resp = await self.inner.handle_async_request(request)
+        content = await resp.aread()
+        await resp.aclose()
+        # content is already decoded, so drop the encoding/framing headers
+        headers = {
+            key: value for key, value in resp.headers.items()
+            if key.lower() not in ("content-encoding", "content-length", "transfer-encoding")
+        }
+        replayable = httpx.Response(
+            resp.status_code, headers=headers, content=content, request=request
+        )
+        self.cassette.record(
+            method, url, body, resp.status_code, replayable.headers, replayable.text,
+            int((time.monotonic() - start) * 1000),
+        )
+        return replayable
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+
+def wrap_async_transport(transport, limits=None):
+    """
+    Wrap an httpx transport (or a default one) in the active cassette.
+
+    Returns transport unchanged when cassettes are off.
+    """
+    if _cassette is None:
+        return transport
+    inner = transport or httpx.AsyncHTTPTransport(limits=limits or httpx.Limits())
+    return CassetteAsyncTransport(_cassette, inner)
@@ -0,0 +1,336 @@
+"""
+Async Grok service — asyncio twin of grok_service for high fan-out runs.
+
+The threaded pipeline holds one OS thread per in-flight Grok call. This
+module lets one event loop hold hundreds of calls instead:
+
+  - AsyncGrokClient: httpx.AsyncClient (keep-alive pool) behind an
+    asyncio.Semaphore that caps concurrent requests to xAI
+  - GrokAsyncExecutor: one background event loop thread per process;
+    sync code (routes, jobs) submits pipeline coroutines to it and gets a
+    concurrent.futures.Future back
+
+Request payloads and response parsing are shared with grok_service, so
+both clients raise the same GrokAPIError for the same failures.
+"""
+import asyncio
+import inspect
+import logging
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+from flask import current_app
+
+from services.grok_service import (
+    RESPONSES_API_URL,
+    GrokAPIError,
+    RetryPolicy,
+    build_chat_payload,
+    build_headers,
+    attempt_timeout,
+    build_search_payload,
+    check_chat_status,
+    check_search_status,
+    note_model,
+    parse_chat_content,
+    parse_search_content,
+    parse_stream_line,
+    xai_slot_async,
+)
+from services.cassette_service import wrap_async_transport
+from services.hedge_service import run_hedged_async
+from services.rate_limiter import get_rate_limiter
+from services.run_control import PipelineCancelled
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncGrokClient:
+    """Bounded-concurrency asyncio client for chat completions + x_search."""
+
+    def __init__(self, config, max_concurrency=None, transport=None):
+        """
+        Args:
+            config: Flask config mapping (read once — coroutines never
+                    need an app context to call Grok).
+            max_concurrency: Max in-flight requests (default
+                             GROK_ASYNC_MAX_CONCURRENCY).
+            transport: Optional httpx transport (tests use MockTransport).
+        """
+        self.api_key = config.get("GROK_API_KEY") or ""
+        self.api_url = config.get("GROK_API_URL") or ""
+        self.responses_url = config.get("GROK_RESPONSES_API_URL") or RESPONSES_API_URL
+        self.model = config.get("GROK_MODEL") or "grok-3-fast"
+        self.timeout = config.get("GROK_TIMEOUT_SECONDS") or 60
+        self.max_concurrency = (
+            max_concurrency or config.get("GROK_ASYNC_MAX_CONCURRENCY") or 200
+        )
+        self.retry_policy = RetryPolicy.from_config(config)
+        self.rate_limiter = get_rate_limiter(config)
+        self.in_flight = 0
+        self.waiting = 0
+
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        limits = httpx.Limits(
+            max_connections=self.max_concurrency,
+            max_keepalive_connections=self.max_concurrency,
+        )
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=limits,
+            transport=wrap_async_transport(transport, limits),
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        """Close pooled connections."""
+        await self._client.aclose()
+
+    def stats(self):
+        """Current concurrency snapshot."""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+        }
+
+    async def call_grok(self, prompt_text, context="", call_stats=None, hedge_after_ms=None,
+                        model=None, timeout=None, max_attempts=None, deadline=None):
+        """Async call_grok — chat completions, returns the assistant text."""
+        model = model or self.model
+        payload = build_chat_payload(prompt_text, context, model)
+        note_model(call_stats, model)
+
+        async def send():
+            async with xai_slot_async(self.rate_limiter, attempt_timeout(None, deadline, "Grok API")):
+                send_timeout = attempt_timeout(timeout, deadline, "Grok API")
+                start_ms = int(time.time() * 1000)
+                resp = await self._post(self.api_url, payload, "Grok API", send_timeout)
+                duration_ms = int(time.time() * 1000) - start_ms
+
+                check_chat_status(resp)
+                usage = {}
+                content = parse_chat_content(resp, usage)
+
+            logger.info(
+                "[OK] Grok API async call completed in %dms (model=%s)",
+                duration_ms, model,
+            )
+            return content, usage
+
+        async def attempt():
+            content, usage = await run_hedged_async(send, hedge_after_ms, "Grok API", call_stats)
+            if call_stats is not None:
+                call_stats.update(usage)
+            return content
+
+        return await self._policy(max_attempts).run_async(attempt, "Grok API", call_stats, deadline)
+
+    async def call_grok_with_search(self, prompt_text, context="", call_stats=None,
+                                    model=None, timeout=None, max_attempts=None, deadline=None):
+        """Async call_grok_with_search — Responses API with x_search."""
+        payload = build_search_payload(prompt_text, context, model)
+        note_model(call_stats, payload["model"])
+
+        async def send():
+            label = "Grok Responses API"
+            async with xai_slot_async(self.rate_limiter, attempt_timeout(None, deadline, label)):
+                send_timeout = attempt_timeout(timeout, deadline, label)
+                start_ms = int(time.time() * 1000)
+                resp = await self._post(self.responses_url, payload, label, send_timeout)
+                duration_ms = int(time.time() * 1000) - start_ms
+
+                check_search_status(resp)
+                content = parse_search_content(resp, call_stats)
+
+            logger.info(
+                "[OK] Grok Responses API async call completed in %dms (model=%s, with x_search)",
+                duration_ms, payload["model"],
+            )
+            return content
+
+        return await self._policy(max_attempts).run_async(
+            send, "Grok Responses API", call_stats, deadline
+        )
+
+    async def call_grok_stream(self, prompt_text, context="", on_delta=None, call_stats=None,
+                               model=None, timeout=None, max_attempts=None, deadline=None):
+        """
+        Async call_grok_stream — stream=true chat completion, on_delta(text_so_far).
+
+        on_delta may be a coroutine function; it is awaited before the next line is read.
+        """
+        model = model or self.model
+        payload = build_chat_payload(prompt_text, context, model)
+        note_model(call_stats, model)
+        payload["stream"] = True
+        payload["stream_options"] = {"include_usage": True}
+
+        async def send():
+            async with xai_slot_async(self.rate_limiter, attempt_timeout(None, deadline, "Grok API")):
+                send_timeout = attempt_timeout(timeout, deadline, "Grok API")
+                start_ms = int(time.time() * 1000)
+                parts = []
+                async with self._bounded("Grok API", send_timeout):
+                    async with self._client.stream(
+                        "POST", self.api_url, json=payload,
+                        headers=build_headers(self.api_key),
+                        timeout=send_timeout or self.timeout,
+                    ) as resp:
+                        if resp.status_code != 200:
+                            await resp.aread()
+                            check_chat_status(resp)
+                        async for line in resp.aiter_lines():
+                            delta = parse_stream_line(line, call_stats)
+                            if delta:
+                                parts.append(delta)
+                                if on_delta:
+                                    written = on_delta("".join(parts))
+                                    if inspect.isawaitable(written):
+                                        await written
+                duration_ms = int(time.time() * 1000) - start_ms
+
+            content = "".join(parts)
+            if not content:
+                logger.error("[ERR] Grok API stream returned no content")
+                raise GrokAPIError(
+                    "Malformed response from Grok API (empty stream)", retryable=True
+                )
+
+            logger.info(
+                "[OK] Grok API async stream completed in %dms (model=%s)",
+                duration_ms, model,
+            )
+            return content
+
+        return await self._policy(max_attempts).run_async(send, "Grok API", call_stats, deadline)
+
+    def _policy(self, max_attempts):
+        """The client's RetryPolicy, or a copy with a per-call attempt limit."""
+        if not max_attempts:
+            return self.retry_policy
+        return RetryPolicy(
+            max_attempts, self.retry_policy.base_delay, self.retry_policy.max_delay
+        )
+
+    async def _post(self, url, payload, label, timeout=None):
+        """POST under the semaphore, mapping transport errors to GrokAPIError."""
+        async with self._bounded(label, timeout):
+            return await self._client.post(
+                url, json=payload, headers=build_headers(self.api_key),
+                timeout=timeout or self.timeout,
+            )
+
+    @asynccontextmanager
+    async def _bounded(self, label, timeout=None):
+        """Hold a semaphore slot, mapping transport errors to GrokAPIError."""
+        if not self.api_key:
+            raise GrokAPIError("GROK_API_KEY is not configured")
+
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.in_flight += 1
+        try:
+            yield
+        except httpx.TimeoutException:
+            logger.error("[ERR] %s timeout after %.1fs", label, timeout or self.timeout)
+            raise GrokAPIError("Grok API request timed out", status_code=408)
+        except httpx.TransportError:
+            logger.error("[ERR] %s connection failed", label)
+            raise GrokAPIError("Could not connect to Grok API", status_code=503)
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+
+class GrokAsyncExecutor:
+    """
+    Runs pipeline coroutines on a single background event loop thread.
+
+    submit() is safe to call from any thread. Each job runs inside its own
+    app context (and therefore its own SQLAlchemy session), and receives
+    the shared AsyncGrokClient as its first argument.
+    """
+
+    def __init__(self, app, max_concurrency=None, transport=None):
+        self.app = app
+        self.client = None
+        self._max_concurrency = max_concurrency
+        self._transport = transport
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run_loop, name="grok-async", daemon=True
+        )
+        self._thread.start()
+        self._ready.wait()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self.client = AsyncGrokClient(
+            self.app.config,
+            max_concurrency=self._max_concurrency,
+            transport=self._transport,
+        )
+        self._ready.set()
+        self._loop.run_forever()
+
+    def submit(self, coro_fn, *args, **kwargs):
+        """
+        Schedule coro_fn(client, *args, **kwargs) on the event loop.
+
+        Returns:
+            concurrent.futures.Future with the coroutine's result.
+        """
+        async def _job():
+            with self.app.app_context():
+                try:
+                    return await coro_fn(self.client, *args, **kwargs)
+                except PipelineCancelled:
+                    logger.info("[--] Async pipeline job cancelled")
+                    return None
+                except Exception as exc:
+                    logger.error("[ERR] Async pipeline job failed: %s", exc)
+                    raise
+
+        return asyncio.run_coroutine_threadsafe(_job(), self._loop)
+
+    def shutdown(self, timeout=10):
+        """Close the client and stop the loop thread."""
+        if not self._loop.is_running():
+            return
+        future = asyncio.run_coroutine_threadsafe(self.client.aclose(), self._loop)
+        try:
+            future.result(timeout=timeout)
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=timeout)
+
+
+_executor_lock = threading.Lock()
+_executor = None
+_executor_pid = None
+
+
+def get_async_executor(app=None):
+    """Return this process's GrokAsyncExecutor, starting it on first use."""
+    global _executor, _executor_pid
+
+    app = app or current_app._get_current_object()
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = GrokAsyncExecutor(app)
+            _executor_pid = os.getpid()
+        return _executor
@@ -0,0 +1,181 @@
+"""
+Grok response cache — opt-in, database-backed, content-addressed.
+
+Re-running the same selected story through the same PAPA/PSST and Amy Bot
+prompts sends byte-identical requests. With GROK_CACHE_ENABLED on, those
+requests are answered from the grok_response_cache table instead.
+
+  - Key: SHA-256 of model, messages, temperature, prompt id + updated_at
+  - TTL: GROK_CACHE_TTL_SECONDS per entry
+  - Size cap: GROK_CACHE_MAX_BYTES — least recently used rows go first
+  - Bypass: callers pass bypass=True to skip the read (the fresh response
+    still replaces the cached one)
+
+Only chat completion steps are cached. Source List runs use live X search
+and must never be served stale.
+"""
+import hashlib
+import json
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from models import db
+from models.grok_cache_entry import GrokCacheEntry
+from services.grok_service import build_chat_payload
+
+logger = logging.getLogger(__name__)
+
+# Per-process counters — the admin stats endpoint adds table totals
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "bypasses": 0, "stores": 0, "evictions": 0}
+
+
+def _bump(key, n=1):
+    with _stats_lock:
+        _stats[key] += n
+
+
+def is_enabled():
+    """True when GROK_CACHE_ENABLED is on."""
+    return bool(current_app.config.get("GROK_CACHE_ENABLED"))
+
+
+def chat_cache_key(prompt_text, prompt, context="", model=None):
+    """
+    Hash everything that determines a chat completion's answer.
+
+    Args:
+        prompt_text: Full user message sent to Grok.
+        prompt: Prompt instance the input was built from.
+        context: System context, if any.
+        model: Model name (default GROK_MODEL).
+    """
+    model = model or current_app.config.get("GROK_MODEL") or "grok-3-fast"
+    payload = build_chat_payload(prompt_text, context, model)
+    material = {
+        "model": payload["model"],
+        "messages": payload["messages"],
+        "temperature": payload["temperature"],
+        "prompt_id": prompt.id if prompt else None,
+        "prompt_updated_at": (
+            prompt.updated_at.isoformat() if prompt and prompt.updated_at else None
+        ),
+    }
+    encoded = json.dumps(material, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def lookup(cache_key, bypass=False):
+    """
+    Return the cached response for cache_key, or None.
+
+    Expired rows are treated as misses. A hit bumps hit_count and
+    last_used_at (flushed with the caller's transaction).
+    """
+    if bypass:
+        _bump("bypasses")
+        return None
+
+    now = datetime.now(timezone.utc)
+    entry = GrokCacheEntry.query.filter(
+        GrokCacheEntry.cache_key == cache_key,
+        GrokCacheEntry.expires_at > now,
+    ).first()
+    if entry is None:
+        _bump("misses")
+        return None
+
+    entry.hit_count = (entry.hit_count or 0) + 1
+    entry.last_used_at = now
+    _bump("hits")
+    logger.info("[OK] Grok cache hit (%s)", cache_key[:12])
+    return entry.response_text
+
+
+def store(cache_key, response_text, prompt=None, step_type=None, model=None):
+    """
+    Insert or refresh the entry for cache_key, then enforce TTL + size cap.
+
+    Runs in a savepoint so a concurrent insert of the same key by another
+    worker never breaks the caller's transaction.
+    """
+    ttl = current_app.config.get("GROK_CACHE_TTL_SECONDS") or 0
+    now = datetime.now(timezone.utc)
+    size = len(response_text.encode("utf-8"))
+
+    try:
+        with db.session.begin_nested():
+            entry = GrokCacheEntry.query.filter_by(cache_key=cache_key).first()
+            if entry is None:
+                entry = GrokCacheEntry(cache_key=cache_key, hit_count=0)
+                db.session.add(entry)
+            entry.model = model or current_app.config.get("GROK_MODEL")
+            entry.step_type = step_type
+            entry.prompt_id = prompt.id if prompt else None
+            entry.response_text = response_text
+            entry.size_bytes = size
+            entry.created_at = now
+            entry.last_used_at = now
+            entry.expires_at = now + timedelta(seconds=ttl)
+    except IntegrityError:
+        logger.info("[--] Grok cache entry %s stored by another worker", cache_key[:12])
+        return
+
+    _bump("stores")
+    evict()
+
+
+def evict():
+    """Delete expired rows, then least-recently-used rows over the size cap."""
+    now = datetime.now(timezone.utc)
+    expired = GrokCacheEntry.query.filter(GrokCacheEntry.expires_at <= now).delete(
+        synchronize_session=False
+    )
+
+    max_bytes = current_app.config.get("GROK_CACHE_MAX_BYTES") or 0
+    over_cap = 0
+    total = db.session.query(db.func.coalesce(db.func.sum(GrokCacheEntry.size_bytes), 0)).scalar()
+    if max_bytes and total > max_bytes:
+        rows = (
+            db.session.query(GrokCacheEntry.id, GrokCacheEntry.size_bytes)
+            .order_by(GrokCacheEntry.last_used_at.asc())
+            .all()
+        )
+        doomed = []
+        for row_id, row_size in rows:
+            if total <= max_bytes:
+                break
+            doomed.append(row_id)
+            total -= row_size or 0
+        if doomed:
+            over_cap = GrokCacheEntry.query.filter(GrokCacheEntry.id.in_(doomed)).delete(
+                synchronize_session=False
+            )
+
+    if expired or over_cap:
+        _bump("evictions", expired + over_cap)
+        logger.info("[OK] Grok cache evicted %d expired, %d over size cap", expired, over_cap)
+
+
+def get_cache_stats():
+    """Hit/miss counters for this process plus table totals."""
+    with _stats_lock:
+        counters = dict(_stats)
+    lookups = counters["hits"] + counters["misses"]
+    entries, total_bytes = db.session.query(
+        db.func.count(GrokCacheEntry.id),
+        db.func.coalesce(db.func.sum(GrokCacheEntry.size_bytes), 0),
+    ).one()
+    counters.update({
+        "enabled": is_enabled(),
+        "hit_rate": round(counters["hits"] / lookups, 3) if lookups else None,
+        "entries": entries,
+        "total_bytes": int(total_bytes),
+        "max_bytes": current_app.config.get("GROK_CACHE_MAX_BYTES"),
+        "ttl_seconds": current_app.config.get("GROK_CACHE_TTL_SECONDS"),
+    })
+    return counters
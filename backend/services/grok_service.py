@@ -1,48 +1,544 @@
 """
 Grok API service — calls xAI's chat completions and responses endpoints.
 
-Two calling modes:
+Calling modes:
   - call_grok(): Standard chat completions (refinement, Amy Bot)
+  - call_grok_stream(): Chat completions with stream=true; reports the
+    growing text to a callback as token deltas arrive
   - call_grok_with_search(): Responses API with live X search (source list)
 
+All calls share one process-wide requests.Session with a keep-alive
+connection pool, so repeated calls reuse the TCP/TLS connection to
+api.x.ai instead of paying a fresh handshake each time.
+
 Wraps the xAI Grok API with error handling for:
   - Missing API key
   - HTTP errors (rate limits, server errors)
   - Timeouts
   - Malformed responses
 
+Every attempt first takes a slot from the shared xAI rate limiter
+(services/rate_limiter.py) so all gunicorn workers stay under one
+token-bucket rate and one adaptive concurrency limit.
+
+Transient failures (429, 5xx, timeouts, connection errors, a Responses
+API reply with no text output, and an empty stream) are retried by RetryPolicy with
+exponential backoff + full jitter, honoring Retry-After. Anything else
+fails immediately. Pass call_stats={} to learn how many attempts and how
+much backoff a call used.
+
+call_grok() can also hedge: pass hedge_after_ms to race one backup
+request against a slow attempt (services/hedge_service.py).
+
+Every call takes an optional deadline (services/stage_engine.Deadline):
+each attempt's timeout is then the time left before it, no retry starts
+after it, and a call made once it has passed fails with a 504
+GrokAPIError that is not retried.
+
+Every call also takes an optional closer (RequestCloser): closing it from
+another thread shuts down the call's sockets, so a cancelled launch stops
+waiting on xAI at once instead of at its deadline.
+
 Returns the assistant's message content as a string.
 """
+import asyncio
+import json
 import logging
+import os
+import random
+import socket
+import threading
 import time
+from contextlib import asynccontextmanager, contextmanager
 from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit
 
 import requests
 from flask import current_app
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from services.cassette_service import get_cassette, wrap_adapter
+from services.hedge_service import run_hedged
+from services.rate_limiter import (
+    NEUTRAL,
+    SUCCESS,
+    THROTTLED,
+    RateLimiterTimeout,
+    get_rate_limiter,
+)
 
 logger = logging.getLogger(__name__)
 
+# Default for GROK_RESPONSES_API_URL
 RESPONSES_API_URL = "https://api.x.ai/v1/responses"
+# Default Source List model — must support the x_search tool
+SEARCH_MODEL = "grok-4-1-fast-non-reasoning"
+
+# ---- Pooled keep-alive session ----
+# Counters: "requests" = connections checked out of the pool,
+# "misses" = new TCP/TLS handshakes. Hits are requests that reused a socket.
+_pool_lock = threading.Lock()
+_pool_counters = {"requests": 0, "misses": 0}
+_session = None
+_session_pid = None
+_session_pool_size = None
+_session_cassette = None
+
+
+def _count(key):
+    with _pool_lock:
+        _pool_counters[key] += 1
+
+
+class _CountingHTTPConnection(HTTPConnection):
+    def connect(self):
+        _count("misses")
+        super().connect()
+        _watched(self)  # Closed between checkout and connect
+
+
+class _CountingHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        _count("misses")
+        super().connect()
+        _watched(self)
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CountingHTTPConnection
+
+    def _get_conn(self, timeout=None):
+        _count("requests")
+        return _watched(super()._get_conn(timeout=timeout))
+
+    def _put_conn(self, conn):
+        _unwatched(conn)
+        super()._put_conn(conn)
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CountingHTTPSConnection
+
+    def _get_conn(self, timeout=None):
+        _count("requests")
+        return _watched(super()._get_conn(timeout=timeout))
+
+    def _put_conn(self, conn):
+        _unwatched(conn)
+        super()._put_conn(conn)
+
+
+class _PooledAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools count handshakes vs reuses."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool,
+        }
+
+
+def get_grok_session():
+    """
+    Return the process-wide pooled session used for every Grok call.
+
+    requests.Session is safe to share across the pipeline's background
+    threads for sending requests. The pool is sized from GROK_POOL_MAXSIZE
+    so every concurrent call in this worker can keep its own idle socket.
+    The session is rebuilt after a fork so gunicorn workers never share
+    sockets with the master process. With HTTP_CASSETTE_MODE on, the
+    adapter is wrapped to record or replay (services/cassette_service.py).
+    """
+    global _session, _session_pid, _session_pool_size, _session_cassette
+
+    pool_size = current_app.config.get("GROK_POOL_MAXSIZE") or 32
+    cassette = get_cassette()
+    with _pool_lock:
+        if (
+            _session is None
+            or _session_pid != os.getpid()
+            or _session_pool_size != pool_size
+            or _session_cassette is not cassette
+        ):
+            session = requests.Session()
+            adapter = wrap_adapter(_PooledAdapter(
+                pool_connections=4,
+                pool_maxsize=pool_size,
+            ))
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+            _session_pid = os.getpid()
+            _session_pool_size = pool_size
+            _session_cassette = cassette
+        return _session
+
+
+def get_pool_stats():
+    """Return connection pool counters for the admin stats endpoint."""
+    with _pool_lock:
+        total = _pool_counters["requests"]
+        misses = min(_pool_counters["misses"], total)
+        return {
+            "pool_maxsize": _session_pool_size,
+            "requests": total,
+            "hits": total - misses,
+            "misses": misses,
+            "hit_rate": round((total - misses) / total, 3) if total else None,
+        }
+
+
+def warm_grok_client(app):
+    """
+    Open a keep-alive connection to the Grok API host in the background.
+
+    Called once at startup so the first refinement or source-list call does
+    not pay the TLS handshake. Best-effort: failures are logged and ignored.
+    """
+    if app.config.get("TESTING") or not app.config.get("GROK_API_KEY"):
+        return
+    if not app.config.get("GROK_WARM_ON_STARTUP"):
+        return
+
+    parts = urlsplit(app.config.get("GROK_API_URL") or "")
+    if not parts.scheme or not parts.netloc:
+        return
+    origin = f"{parts.scheme}://{parts.netloc}/"
+
+    def _warm():
+        with app.app_context():
+            try:
+                get_grok_session().head(origin, timeout=5)
+                logger.info("[OK] Grok connection pool warmed (%s)", origin)
+            except requests.RequestException as exc:
+                logger.warning("[--] Grok connection warm-up failed: %s", exc)
+
+    threading.Thread(target=_warm, daemon=True).start()
+
+
+# ---- Closing in-flight requests ----
+# A send made inside _closing(closer) registers the pooled connection it
+# checks out with the closer (per thread, so hedged sends on pool threads
+# register theirs too); closer.close() shuts those sockets down, which
+# makes the blocked read fail at once.
+_watch_local = threading.local()
+
+
+class RequestCloser:
+    """
+    Aborts the Grok requests of one launch from another thread.
+
+    Pass it as closer= to call_grok(), call_grok_stream() or
+    call_grok_with_search(). After close(), a request in flight fails and
+    any later attempt is refused, both with a GrokAPIError (499) that is
+    not retried.
+    """
+
+    def __init__(self):
+        self.closed = False
+        self._lock = threading.Lock()
+        self._conns = set()
+
+    def close(self):
+        """Shut down every connection in use and refuse new requests."""
+        with self._lock:
+            self.closed = True
+            conns = list(self._conns)
+        for conn in conns:
+            _shutdown(conn)
+
+    def _add(self, conn):
+        with self._lock:
+            self._conns.add(conn)
+            closed = self.closed
+        if closed:
+            _shutdown(conn)
+
+    def _discard(self, conn):
+        with self._lock:
+            self._conns.discard(conn)
+
+
+def _shutdown(conn):
+    sock = getattr(conn, "sock", None)
+    if sock is None:
+        return  # Not connected yet; connect() checks the closer again
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass  # Already closed
+
+
+def _watched(conn):
+    closer = getattr(_watch_local, "closer", None)
+    if closer is not None and conn is not None:
+        closer._add(conn)
+    return conn
+
+
+def _unwatched(conn):
+    closer = getattr(_watch_local, "closer", None)
+    if closer is not None and conn is not None:
+        closer._discard(conn)
+
+
+@contextmanager
+def _closing(closer, label):
+    """Let closer abort the requests this thread sends inside the block."""
+    if closer is None:
+        yield
+        return
+    if closer.closed:
+        raise _closed_error(label)
+    _watch_local.closer = closer
+    try:
+        yield
+    except Exception as exc:
+        if closer.closed:
+            raise _closed_error(label) from exc
+        raise
+    finally:
+        _watch_local.closer = None
+
+
+def _closed_error(label):
+    logger.info("[--] %s request closed (launch cancelled)", label)
+    return GrokAPIError(f"{label} request was cancelled", status_code=499, retryable=False)
 
 
 class GrokAPIError(Exception):
     """Raised when the Grok API returns an error or is unreachable."""
 
-    def __init__(self, message, status_code=None):
+    def __init__(self, message, status_code=None, retry_after=None, retryable=None):
         super().__init__(message)
         self.status_code = status_code
+        self.retry_after = retry_after
+        self._retryable = retryable
+
+    @property
+    def retryable(self):
+        """True for transient failures that are safe to send again."""
+        if self._retryable is not None:
+            return self._retryable
+        return self.status_code in RETRYABLE_STATUS_CODES
+
+
+# 408 is our own mapping for client-side timeouts
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class RetryPolicy:
+    """
+    Retry schedule for Grok calls.
+
+    Delay before retry n (1-based) is uniform in [0, base * 2**(n-1)],
+    capped at max_delay ("full jitter"). A server Retry-After replaces the
+    jittered delay, still capped at max_delay.
+    """
+
+    def __init__(self, max_attempts=3, base_delay=1.0, max_delay=30.0):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @classmethod
+    def from_config(cls, config, max_attempts=None):
+        """Build a policy from GROK_RETRY_* settings (max_attempts overrides)."""
+        return cls(
+            max_attempts=max_attempts or config.get("GROK_RETRY_MAX_ATTEMPTS") or 1,
+            base_delay=(config.get("GROK_RETRY_BASE_DELAY_MS") or 0) / 1000,
+            max_delay=(config.get("GROK_RETRY_MAX_DELAY_MS") or 0) / 1000,
+        )
 
+    def delay_for(self, attempt, retry_after=None):
+        """Seconds to wait after failed attempt number `attempt`."""
+        if retry_after is not None:
+            delay = retry_after
+        else:
+            delay = random.uniform(0, self.base_delay * (2 ** (attempt - 1)))
+        return max(0.0, min(delay, self.max_delay))
+
+    def should_retry(self, exc, attempt):
+        """Retry only retryable errors, and only while attempts remain."""
+        return exc.retryable and attempt < self.max_attempts
+
+    def run(self, send, label, call_stats=None, deadline=None):
+        """
+        Call send() until it succeeds or the policy gives up.
+
+        Args:
+            send: Zero-arg callable making one attempt.
+            label: API name for log lines.
+            call_stats: Optional dict, filled with attempts and backoff_ms.
+            deadline: Optional Deadline; no retry starts after it.
+        """
+        backoff_ms = 0
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result = send()
+            except GrokAPIError as exc:
+                if not self.should_retry(exc, attempt):
+                    _record_attempts(call_stats, attempt, backoff_ms)
+                    raise
+                delay = self.delay_for(attempt, exc.retry_after)
+                if _past(deadline, delay):
+                    # The retry could not finish in time: give up now
+                    _record_attempts(call_stats, attempt, backoff_ms)
+                    raise
+                logger.warning(
+                    "[--] %s attempt %d/%d failed (%s); retrying in %.1fs",
+                    label, attempt, self.max_attempts, exc, delay,
+                )
+                time.sleep(delay)
+                backoff_ms += int(delay * 1000)
+                continue
+            _record_attempts(call_stats, attempt, backoff_ms)
+            return result
+
+    async def run_async(self, send, label, call_stats=None, deadline=None):
+        """Async run() — send is a zero-arg coroutine function."""
+        backoff_ms = 0
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result = await send()
+            except GrokAPIError as exc:
+                if not self.should_retry(exc, attempt):
+                    _record_attempts(call_stats, attempt, backoff_ms)
+                    raise
+                delay = self.delay_for(attempt, exc.retry_after)
+                if _past(deadline, delay):
+                    # The retry could not finish in time: give up now
+                    _record_attempts(call_stats, attempt, backoff_ms)
+                    raise
+                logger.warning(
+                    "[--] %s attempt %d/%d failed (%s); retrying in %.1fs",
+                    label, attempt, self.max_attempts, exc, delay,
+                )
+                await asyncio.sleep(delay)
+                backoff_ms += int(delay * 1000)
+                continue
+            _record_attempts(call_stats, attempt, backoff_ms)
+            return result
+
+
+def _past(deadline, delay=0):
+    """True if deadline (None = none) passes within delay seconds."""
+    return deadline is not None and deadline.remaining() <= delay
+
+
+def attempt_timeout(timeout, deadline, label):
+    """
+    Timeout for the next attempt: timeout, capped at the deadline.
 
-def call_grok(prompt_text, context=""):
+    Returns None (the limiter's default wait) when both are None. Raises
+    GrokAPIError (504, not retried) once the deadline has passed.
+    """
+    if deadline is None:
+        return timeout
+    remaining = deadline.remaining()
+    if remaining <= 0:
+        logger.error("[ERR] %s deadline exceeded", label)
+        raise GrokAPIError(f"{label} deadline exceeded", status_code=504, retryable=False)
+    return min(timeout, remaining) if timeout else remaining
+
+
+def _record_attempts(call_stats, attempts, backoff_ms):
+    if call_stats is not None:
+        call_stats["attempts"] = attempts
+        call_stats["backoff_ms"] = backoff_ms
+
+
+@contextmanager
+def xai_slot(limiter, timeout=None):
+    """Hold a shared rate-limiter slot for one attempt (no-op if disabled).
+
+    timeout caps the wait for a slot (default GROK_RATE_LIMIT_WAIT_SECONDS).
+    Only a block that completes (a 200 response) counts as a success that
+    grows concurrency; a GrokAPIError with status 429 raised inside it is
+    reported as throttled so the limiter can cut concurrency, and any other
+    failure releases the slot without moving the limit.
+    """
+    if limiter is None:
+        yield
+        return
+    try:
+        lease = limiter.acquire(timeout)
+    except RateLimiterTimeout as exc:
+        logger.error("[ERR] %s", exc)
+        raise GrokAPIError(str(exc), status_code=429, retryable=False)
+    try:
+        yield
+    except BaseException as exc:
+        lease.release(_slot_outcome(exc))
+        raise
+    lease.release(SUCCESS)
+
+
+@asynccontextmanager
+async def xai_slot_async(limiter, timeout=None):
+    """xai_slot() for the asyncio client; the limiter's file I/O runs on a thread."""
+    if limiter is None:
+        yield
+        return
+    try:
+        lease = await limiter.acquire_async(timeout)
+    except RateLimiterTimeout as exc:
+        logger.error("[ERR] %s", exc)
+        raise GrokAPIError(str(exc), status_code=429, retryable=False)
+    try:
+        yield
+    except BaseException as exc:
+        await lease.release_async(_slot_outcome(exc))
+        raise
+    await lease.release_async(SUCCESS)
+
+
+def _slot_outcome(exc):
+    """AIMD outcome for an attempt that raised exc: THROTTLED on a 429, else NEUTRAL."""
+    if isinstance(exc, GrokAPIError) and exc.status_code == 429:
+        return THROTTLED
+    return NEUTRAL
+
+
+def parse_retry_after(resp):
+    """Seconds from a numeric Retry-After header, or None."""
+    try:
+        value = resp.headers.get("Retry-After")
+        return max(0.0, float(value)) if value is not None else None
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def call_grok(prompt_text, context="", call_stats=None, hedge_after_ms=None,
+              model=None, timeout=None, max_attempts=None, deadline=None, closer=None):
     """
     Send a prompt to the xAI Grok API and return the response text.
 
     Builds a chat message with an optional system context and the user
     prompt. Uses the model, API URL, and timeout from app config.
+    Transient failures are retried per RetryPolicy.
 
     Args:
         prompt_text: The user-facing prompt to send to Grok.
         context: Optional system-level context (routing metadata, etc.).
+        call_stats: Optional dict, filled with attempts, backoff_ms, model
+                    and token usage (see record_usage()), and hedged=True
+                    if a hedge request was sent.
+        hedge_after_ms: Send one backup request if an attempt has not
+                        answered by then (see hedge_service). None = off.
+        model: Model to call (default GROK_MODEL; see model_router).
+        timeout: Per-request timeout in seconds (default GROK_TIMEOUT_SECONDS,
+                 or the time left before deadline).
+        max_attempts: Override GROK_RETRY_MAX_ATTEMPTS for this call.
+        deadline: Optional Deadline for the whole call, retries included.
+        closer: Optional RequestCloser that can abort the call.
 
     Returns:
         str: The assistant's response text.
@@ -52,85 +548,181 @@ def call_grok(prompt_text, context=""):
     """
     api_key = current_app.config.get("GROK_API_KEY") or ""
     api_url = current_app.config.get("GROK_API_URL") or ""
-    model = current_app.config.get("GROK_MODEL") or "grok-3-fast"
-    timeout = current_app.config.get("GROK_TIMEOUT_SECONDS") or 60
+    model = model or current_app.config.get("GROK_MODEL") or "grok-3-fast"
+    if deadline is None:
+        # With a deadline, each attempt gets the time left instead
+        timeout = timeout or current_app.config.get("GROK_TIMEOUT_SECONDS") or 60
 
     if not api_key:
         raise GrokAPIError("GROK_API_KEY is not configured")
 
-    # Build messages array — system context is optional
-    messages = []
-    if context:
-        messages.append({"role": "system", "content": context})
-    messages.append({"role": "user", "content": prompt_text})
-
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-    }
+    payload = build_chat_payload(prompt_text, context, model)
+    note_model(call_stats, model)
+    limiter = get_rate_limiter(current_app.config)
+    # Resolved here: a hedged send() runs on a thread without an app context
+    session = get_grok_session()
+
+    def send():
+        with (
+            _closing(closer, "Grok API"),
+            xai_slot(limiter, attempt_timeout(None, deadline, "Grok API")),
+        ):
+            send_timeout = attempt_timeout(timeout, deadline, "Grok API")
+            start_ms = int(time.time() * 1000)
+
+            try:
+                resp = session.post(
+                    api_url,
+                    json=payload,
+                    headers=build_headers(api_key),
+                    timeout=send_timeout,
+                )
+            except requests.Timeout:
+                logger.error("[ERR] Grok API timeout after %.1fs", send_timeout)
+                raise GrokAPIError("Grok API request timed out", status_code=408)
+            except requests.ConnectionError:
+                logger.error("[ERR] Grok API connection failed")
+                raise GrokAPIError("Could not connect to Grok API", status_code=503)
+
+            duration_ms = int(time.time() * 1000) - start_ms
+
+            check_chat_status(resp)
+            # Usage goes to a per-send dict so a losing hedge cannot
+            # overwrite the winner's numbers
+            usage = {}
+            content = parse_chat_content(resp, usage)
+
+        logger.info(
+            "[OK] Grok API call completed in %dms (model=%s)", duration_ms, model
+        )
+        return content, usage
 
-    payload = {
-        "model": model,
-        "messages": messages,
-        "temperature": 0.7,
-    }
+    def attempt():
+        content, usage = run_hedged(send, hedge_after_ms, "Grok API", call_stats)
+        if call_stats is not None:
+            call_stats.update(usage)
+        return content
 
-    start_ms = int(time.time() * 1000)
+    policy = RetryPolicy.from_config(current_app.config, max_attempts)
+    return policy.run(attempt, "Grok API", call_stats, deadline)
 
-    try:
-        resp = requests.post(
-            api_url,
-            json=payload,
-            headers=headers,
-            timeout=timeout,
-        )
-    except requests.Timeout:
-        logger.error("[ERR] Grok API timeout after %ds", timeout)
-        raise GrokAPIError("Grok API request timed out", status_code=408)
-    except requests.ConnectionError:
-        logger.error("[ERR] Grok API connection failed")
-        raise GrokAPIError("Could not connect to Grok API", status_code=503)
 
-    duration_ms = int(time.time() * 1000) - start_ms
+def call_grok_stream(prompt_text, context="", on_delta=None, call_stats=None,
+                     model=None, timeout=None, max_attempts=None, deadline=None,
+                     closer=None):
+    """
+    Stream a chat completion, reporting partial text as it arrives.
 
-    # Handle HTTP errors
-    if resp.status_code == 429:
-        logger.error("[ERR] Grok API rate limited")
-        raise GrokAPIError("Grok API rate limit exceeded", status_code=429)
+    Same request as call_grok() with "stream": true. The server sends
+    Server-Sent Events ("data: {json}" lines, ending with "data: [DONE]");
+    each chunk's choices[0].delta.content is appended to the result.
 
-    if resp.status_code != 200:
-        logger.error(
-            "[ERR] Grok API HTTP %d: %s", resp.status_code, resp.text[:200]
-        )
-        raise GrokAPIError(
-            f"Grok API returned HTTP {resp.status_code}",
-            status_code=resp.status_code,
-        )
+    Args:
+        prompt_text: The user-facing prompt to send to Grok.
+        context: Optional system-level context.
+        on_delta: Optional callable(text_so_far), called after each delta.
+                  A retried attempt starts again from an empty string.
+        call_stats: Optional dict, filled with attempts, backoff_ms, model
+                    and token usage.
+        model, timeout, max_attempts, deadline, closer: As for
+                    call_grok(). The timeout applies to the connect and
+                    to each read of the stream.
 
-    # Parse response — extract assistant message content
-    try:
-        data = resp.json()
-        content = data["choices"][0]["message"]["content"]
-    except (KeyError, IndexError, ValueError) as exc:
-        logger.error("[ERR] Grok API malformed response: %s", exc)
-        raise GrokAPIError("Malformed response from Grok API")
+    Returns:
+        str: The full assistant response text.
 
-    logger.info(
-        "[OK] Grok API call completed in %dms (model=%s)", duration_ms, model
-    )
-    return content
+    Raises:
+        GrokAPIError: On missing key, HTTP error, timeout, or bad stream.
+    """
+    api_key = current_app.config.get("GROK_API_KEY") or ""
+    api_url = current_app.config.get("GROK_API_URL") or ""
+    model = model or current_app.config.get("GROK_MODEL") or "grok-3-fast"
+    if deadline is None:
+        # With a deadline, each attempt gets the time left instead
+        timeout = timeout or current_app.config.get("GROK_TIMEOUT_SECONDS") or 60
 
+    if not api_key:
+        raise GrokAPIError("GROK_API_KEY is not configured")
 
-def call_grok_with_search(prompt_text, context=""):
+    payload = build_chat_payload(prompt_text, context, model)
+    payload["stream"] = True
+    payload["stream_options"] = {"include_usage": True}
+    note_model(call_stats, model)
+    limiter = get_rate_limiter(current_app.config)
+
+    def send():
+        with (
+            _closing(closer, "Grok API"),
+            xai_slot(limiter, attempt_timeout(None, deadline, "Grok API")),
+        ):
+            send_timeout = attempt_timeout(timeout, deadline, "Grok API")
+            start_ms = int(time.time() * 1000)
+
+            try:
+                resp = get_grok_session().post(
+                    api_url,
+                    json=payload,
+                    headers=build_headers(api_key),
+                    timeout=send_timeout,
+                    stream=True,
+                )
+            except requests.Timeout:
+                logger.error("[ERR] Grok API timeout after %.1fs", send_timeout)
+                raise GrokAPIError("Grok API request timed out", status_code=408)
+            except requests.ConnectionError:
+                logger.error("[ERR] Grok API connection failed")
+                raise GrokAPIError("Could not connect to Grok API", status_code=503)
+
+            try:
+                check_chat_status(resp)
+                parts = []
+                try:
+                    for line in resp.iter_lines(decode_unicode=True):
+                        delta = parse_stream_line(line, call_stats)
+                        if delta:
+                            parts.append(delta)
+                            if on_delta:
+                                on_delta("".join(parts))
+                except requests.RequestException as exc:
+                    logger.error("[ERR] Grok API stream interrupted: %s", exc)
+                    raise GrokAPIError("Grok API stream interrupted", status_code=503)
+            finally:
+                resp.close()
+
+            content = "".join(parts)
+            if not content:
+                logger.error("[ERR] Grok API stream returned no content")
+                raise GrokAPIError(
+                    "Malformed response from Grok API (empty stream)", retryable=True
+                )
+
+            duration_ms = int(time.time() * 1000) - start_ms
+            logger.info(
+                "[OK] Grok API stream completed in %dms (model=%s)", duration_ms, model
+            )
+            return content
+
+    policy = RetryPolicy.from_config(current_app.config, max_attempts)
+    return policy.run(send, "Grok API", call_stats, deadline)
+
+
+def call_grok_with_search(prompt_text, context="", call_stats=None,
+                          model=None, timeout=None, max_attempts=None, deadline=None,
+                          closer=None):
     """
     Send a prompt to the xAI Responses API with live X search enabled.
 
     Uses the Responses API (not chat completions) with the x_search tool
     so Grok searches real, live X/Twitter data instead of hallucinating.
+    Transient failures are retried per RetryPolicy.
 
     Args:
         prompt_text: The user-facing prompt to send to Grok.
         context: Optional system-level context (routing metadata, etc.).
+        call_stats: Optional dict, filled with attempts, backoff_ms, model
+                    and token usage.
+        model: Model to call (default SEARCH_MODEL — must support x_search).
+        timeout, max_attempts, deadline, closer: As for call_grok().
 
     Returns:
         str: The assistant's response text.
@@ -139,12 +731,86 @@ def call_grok_with_search(prompt_text, context=""):
         GrokAPIError: On missing key, HTTP error, timeout, or bad response.
     """
     api_key = current_app.config.get("GROK_API_KEY") or ""
-    timeout = current_app.config.get("GROK_TIMEOUT_SECONDS") or 60
+    api_url = current_app.config.get("GROK_RESPONSES_API_URL") or RESPONSES_API_URL
+    if deadline is None:
+        # With a deadline, each attempt gets the time left instead
+        timeout = timeout or current_app.config.get("GROK_TIMEOUT_SECONDS") or 60
 
     if not api_key:
         raise GrokAPIError("GROK_API_KEY is not configured")
 
-    # Build input — Responses API only supports "user" role in input,
+    payload = build_search_payload(prompt_text, context, model)
+    note_model(call_stats, payload["model"])
+    limiter = get_rate_limiter(current_app.config)
+
+    def send():
+        with (
+            _closing(closer, "Grok Responses API"),
+            xai_slot(limiter, attempt_timeout(None, deadline, "Grok Responses API")),
+        ):
+            send_timeout = attempt_timeout(timeout, deadline, "Grok Responses API")
+            start_ms = int(time.time() * 1000)
+
+            try:
+                resp = get_grok_session().post(
+                    api_url,
+                    json=payload,
+                    headers=build_headers(api_key),
+                    timeout=send_timeout,
+                )
+            except requests.Timeout:
+                logger.error("[ERR] Grok Responses API timeout after %.1fs", send_timeout)
+                raise GrokAPIError("Grok API request timed out", status_code=408)
+            except requests.ConnectionError:
+                logger.error("[ERR] Grok Responses API connection failed")
+                raise GrokAPIError("Could not connect to Grok API", status_code=503)
+
+            duration_ms = int(time.time() * 1000) - start_ms
+
+            check_search_status(resp)
+            content = parse_search_content(resp, call_stats)
+
+        logger.info(
+            "[OK] Grok Responses API call completed in %dms (model=%s, with x_search)",
+            duration_ms, payload["model"],
+        )
+        return content
+
+    policy = RetryPolicy.from_config(current_app.config, max_attempts)
+    return policy.run(send, "Grok Responses API", call_stats, deadline)
+
+
+# ---- Request building / response parsing ----
+# Shared by the sync calls above and the asyncio client in
+# grok_async_service. Response objects only need status_code, text
+# and json(), which requests and httpx both provide.
+
+
+def build_headers(api_key):
+    """Authorization + JSON headers for every xAI request."""
+    return {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+    }
+
+
+def build_chat_payload(prompt_text, context, model):
+    """Chat completions payload — system context is optional."""
+    messages = []
+    if context:
+        messages.append({"role": "system", "content": context})
+    messages.append({"role": "user", "content": prompt_text})
+
+    return {
+        "model": model,
+        "messages": messages,
+        "temperature": 0.7,
+    }
+
+
+def build_search_payload(prompt_text, context, model=None):
+    """Responses API payload with the x_search tool over the last 7 days."""
+    # Responses API only supports "user" role in input,
     # so prepend context to the user message
     if context:
         full_prompt = f"{context}\n\n{prompt_text}"
@@ -158,13 +824,8 @@ def call_grok_with_search(prompt_text, context=""):
     from_date = (today - timedelta(days=7)).strftime("%Y-%m-%d")
     to_date = today.strftime("%Y-%m-%d")
 
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-    }
-
-    payload = {
-        "model": "grok-4-1-fast-non-reasoning",
+    return {
+        "model": model or SEARCH_MODEL,
         "input": input_messages,
         "tools": [
             {
@@ -175,27 +836,37 @@ def call_grok_with_search(prompt_text, context=""):
         ],
     }
 
-    start_ms = int(time.time() * 1000)
 
-    try:
-        resp = requests.post(
-            RESPONSES_API_URL,
-            json=payload,
-            headers=headers,
-            timeout=timeout,
+def check_chat_status(resp):
+    """Raise GrokAPIError for a non-200 chat completions response."""
+    if resp.status_code == 429:
+        logger.error("[ERR] Grok API rate limited")
+        raise GrokAPIError(
+            "Grok API rate limit exceeded",
+            status_code=429,
+            retry_after=parse_retry_after(resp),
+        )
+
+    if resp.status_code != 200:
+        logger.error(
+            "[ERR] Grok API HTTP %d: %s", resp.status_code, resp.text[:200]
+        )
+        raise GrokAPIError(
+            f"Grok API returned HTTP {resp.status_code}",
+            status_code=resp.status_code,
+            retry_after=parse_retry_after(resp),
         )
-    except requests.Timeout:
-        logger.error("[ERR] Grok Responses API timeout after %ds", timeout)
-        raise GrokAPIError("Grok API request timed out", status_code=408)
-    except requests.ConnectionError:
-        logger.error("[ERR] Grok Responses API connection failed")
-        raise GrokAPIError("Could not connect to Grok API", status_code=503)
 
-    duration_ms = int(time.time() * 1000) - start_ms
 
+def check_search_status(resp):
+    """Raise GrokAPIError for a non-200 Responses API response."""
     if resp.status_code == 429:
         logger.error("[ERR] Grok Responses API rate limited")
-        raise GrokAPIError("Grok API rate limit exceeded", status_code=429)
+        raise GrokAPIError(
+            "Grok API rate limit exceeded",
+            status_code=429,
+            retry_after=parse_retry_after(resp),
+        )
 
     if resp.status_code != 200:
         logger.error(
@@ -204,9 +875,80 @@ def call_grok_with_search(prompt_text, context=""):
         raise GrokAPIError(
             f"Grok API returned HTTP {resp.status_code}",
             status_code=resp.status_code,
+            retry_after=parse_retry_after(resp),
         )
 
-    # Parse Responses API output — find the assistant's text output
+
+def parse_chat_content(resp, call_stats=None):
+    """Extract the assistant message content from a chat completion."""
+    try:
+        data = resp.json()
+        content = data["choices"][0]["message"]["content"]
+    except (KeyError, IndexError, ValueError) as exc:
+        logger.error("[ERR] Grok API malformed response: %s", exc)
+        raise GrokAPIError("Malformed response from Grok API")
+    record_usage(call_stats, data)
+    return content
+
+
+def note_model(call_stats, model):
+    """Record the requested model; record_usage() replaces it with the served one."""
+    if call_stats is not None:
+        call_stats["model"] = model
+
+
+def record_usage(call_stats, data):
+    """
+    Copy the model and usage block of a response body into call_stats.
+
+    Reads chat completions (prompt/completion_tokens) and Responses API
+    (input/output_tokens) shapes. cached_tokens is the part of the prompt
+    the provider served from its prefix cache; reasoning_tokens is the
+    part of the completion spent on hidden reasoning.
+    """
+    if call_stats is None or not isinstance(data, dict):
+        return
+    if isinstance(data.get("model"), str):
+        call_stats["model"] = data["model"]
+    usage = data.get("usage")
+    if not isinstance(usage, dict):
+        return
+    prompt_details = usage.get("prompt_tokens_details") or usage.get("input_tokens_details") or {}
+    completion_details = (
+        usage.get("completion_tokens_details") or usage.get("output_tokens_details") or {}
+    )
+    call_stats["prompt_tokens"] = usage.get("prompt_tokens", usage.get("input_tokens"))
+    call_stats["completion_tokens"] = usage.get("completion_tokens", usage.get("output_tokens"))
+    call_stats["cached_tokens"] = prompt_details.get("cached_tokens") or 0
+    call_stats["reasoning_tokens"] = completion_details.get("reasoning_tokens") or 0
+
+
+def parse_stream_line(line, call_stats=None):
+    """
+    Return the text delta carried by one SSE line, or "" if none.
+
+    Blank lines, comments, non-data fields, role-only chunks and the final
+    "[DONE]" marker all yield "". Undecodable JSON is skipped. The usage
+    chunk sent last (stream_options.include_usage) goes to call_stats.
+    """
+    if not line or not line.startswith("data:"):
+        return ""
+    data = line[len("data:"):].strip()
+    if not data or data == "[DONE]":
+        return ""
+    try:
+        chunk = json.loads(data)
+    except ValueError:
+        return ""
+    record_usage(call_stats, chunk)
+    try:
+        return chunk["choices"][0].get("delta", {}).get("content") or ""
+    except (KeyError, IndexError, TypeError, AttributeError):
+        return ""
+
+
+def parse_search_content(resp, call_stats=None):
+    """Join every output_text block from a Responses API message."""
     try:
         data = resp.json()
         output_items = data.get("output") or []
@@ -217,13 +959,16 @@ def call_grok_with_search(prompt_text, context=""):
                     if content_block.get("type") == "output_text":
                         text_parts.append(content_block.get("text") or "")
         content = "\n".join(text_parts)
-        if not content:
-            raise ValueError("No text output in response")
     except (KeyError, ValueError) as exc:
         logger.error("[ERR] Grok Responses API malformed response: %s", exc)
         raise GrokAPIError("Malformed response from Grok Responses API")
+    record_usage(call_stats, data)
 
-    logger.info(
-        "[OK] Grok Responses API call completed in %dms (with x_search)", duration_ms
-    )
+    # An empty answer is a known transient x_search failure — safe to retry
+    if not content:
+        logger.error("[ERR] Grok Responses API malformed response: No text output in response")
+        raise GrokAPIError(
+            "Malformed response from Grok Responses API (no text output)",
+            retryable=True,
+        )
     return content
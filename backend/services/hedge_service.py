@@ -0,0 +1,208 @@
+"""
+Hedged Grok requests — race a second copy of a slow call.
+
+With GROK_HEDGE_ENABLED on, a refinement or Amy Bot call that has not
+answered after the GROK_HEDGE_PERCENTILE latency of recent runs of the
+same step (PipelineRun.duration_ms) sends one identical backup request.
+Whichever answers first wins; the other is cancelled (asyncio) or left
+to finish and ignored (threads).
+
+Hedges are capped so they can never double xAI traffic:
+  - At most one hedge per attempt
+  - A per-process budget allows GROK_HEDGE_MAX_RATIO hedges per call,
+    with a small burst; calls over budget just keep waiting
+
+Both copies take their own slot from the shared xAI rate limiter.
+Counters are reported by get_hedge_stats() (admin Grok stats).
+"""
+import asyncio
+import logging
+import math
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from flask import current_app
+
+from models.pipeline_run import PipelineRun
+
+logger = logging.getLogger(__name__)
+
+# Recent-latency percentiles are cached per step to keep the query off
+# every call
+_PERCENTILE_TTL_SECONDS = 60
+
+_lock = threading.Lock()
+_stats = {"calls": 0, "hedges": 0, "hedge_wins": 0, "over_budget": 0}
+_budget = {"tokens": None}
+_percentiles = {}
+_pool = None
+_pool_pid = None
+
+
+def hedge_delay_ms(step_type):
+    """
+    Milliseconds to wait before hedging a step_type call, or None.
+
+    None when hedging is off or there are fewer than GROK_HEDGE_MIN_SAMPLES
+    completed (non-cached) runs of this step to learn from.
+    """
+    config = current_app.config
+    if not config.get("GROK_HEDGE_ENABLED"):
+        return None
+
+    now = time.monotonic()
+    with _lock:
+        cached = _percentiles.get(step_type)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    rows = (
+        PipelineRun.query.with_entities(PipelineRun.duration_ms)
+        .filter(
+            PipelineRun.step_type == step_type,
+            PipelineRun.status == "completed",
+            PipelineRun.duration_ms.isnot(None),
+            PipelineRun.cache_hit.isnot(True),
+        )
+        .order_by(PipelineRun.id.desc())
+        .limit(config.get("GROK_HEDGE_HISTORY") or 200)
+        .all()
+    )
+    durations = sorted(r[0] for r in rows)
+
+    delay = None
+    if durations and len(durations) >= (config.get("GROK_HEDGE_MIN_SAMPLES") or 1):
+        pct = config.get("GROK_HEDGE_PERCENTILE") or 95
+        index = max(0, math.ceil(pct / 100 * len(durations)) - 1)
+        delay = max(durations[index], config.get("GROK_HEDGE_MIN_DELAY_MS") or 0)
+
+    with _lock:
+        _percentiles[step_type] = (now + _PERCENTILE_TTL_SECONDS, delay)
+    return delay
+
+
+def _budget_params():
+    config = current_app.config
+    return (
+        float(config.get("GROK_HEDGE_MAX_RATIO") or 0),
+        float(config.get("GROK_HEDGE_BURST") or 1),
+    )
+
+
+def _record_call(max_ratio, burst):
+    with _lock:
+        _stats["calls"] += 1
+        tokens = burst if _budget["tokens"] is None else _budget["tokens"]
+        _budget["tokens"] = min(burst, tokens + max_ratio)
+
+
+def _try_spend():
+    with _lock:
+        if _budget["tokens"] >= 1:
+            _budget["tokens"] -= 1
+            _stats["hedges"] += 1
+            return True
+        _stats["over_budget"] += 1
+        return False
+
+
+def _record_win():
+    with _lock:
+        _stats["hedge_wins"] += 1
+
+
+def _get_pool():
+    """Threads for racing sync sends; rebuilt after a fork."""
+    global _pool, _pool_pid
+    with _lock:
+        if _pool is None or _pool_pid != os.getpid():
+            size = (current_app.config.get("GROK_POOL_MAXSIZE") or 32) * 2
+            _pool = ThreadPoolExecutor(max_workers=size, thread_name_prefix="grok-hedge")
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def run_hedged(send, hedge_after_ms, label, call_stats=None):
+    """
+    Call send(), racing a second send() if the first is slower than hedge_after_ms.
+
+    send must not need an app context — it runs on a worker thread.
+    Returns the first successful result; if both copies fail, the first
+    error is raised (so RetryPolicy can decide whether to retry).
+    """
+    if not hedge_after_ms:
+        return send()
+
+    _record_call(*_budget_params())
+    pool = _get_pool()
+    primary = pool.submit(send)
+    done, _ = wait([primary], timeout=hedge_after_ms / 1000)
+    if done or not _try_spend():
+        return primary.result()
+
+    logger.info("[--] %s slower than %dms; sending hedge request", label, hedge_after_ms)
+    if call_stats is not None:
+        call_stats["hedged"] = True
+    hedge = pool.submit(send)
+    return _first_success({primary, hedge}, hedge)
+
+
+def _first_success(pending, hedge):
+    first_error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for fut in done:
+            if fut.exception() is None:
+                if fut is hedge:
+                    _record_win()
+                return fut.result()
+            first_error = first_error or fut.exception()
+    raise first_error
+
+
+async def run_hedged_async(send, hedge_after_ms, label, call_stats=None):
+    """run_hedged() for the asyncio client — the losing request is cancelled."""
+    if not hedge_after_ms:
+        return await send()
+
+    _record_call(*_budget_params())
+    primary = asyncio.ensure_future(send())
+    done, _ = await asyncio.wait({primary}, timeout=hedge_after_ms / 1000)
+    if done or not _try_spend():
+        return await primary
+
+    logger.info("[--] %s slower than %dms; sending hedge request", label, hedge_after_ms)
+    if call_stats is not None:
+        call_stats["hedged"] = True
+    hedge = asyncio.ensure_future(send())
+    pending = {primary, hedge}
+    first_error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        _record_win()
+                    return task.result()
+                first_error = first_error or task.exception()
+        raise first_error
+    finally:
+        for task in (primary, hedge):
+            if not task.done():
+                task.cancel()
+
+
+def get_hedge_stats():
+    """Per-process hedge counters and the cached percentile delays."""
+    with _lock:
+        counters = dict(_stats)
+        delays = {step: value for step, (_, value) in _percentiles.items()}
+    counters.update({
+        "enabled": bool(current_app.config.get("GROK_HEDGE_ENABLED")),
+        "hedge_rate": round(counters["hedges"] / counters["calls"], 3) if counters["calls"] else None,
+        "delay_ms_by_step": delays,
+    })
+    return counters
@@ -0,0 +1,176 @@
+"""
+Idempotency keys and single-flight locks for pipeline launches.
+
+Idempotency keys: POST /source-list and /run accept an Idempotency-Key
+header (a client-chosen string, at most 255 characters). The first
+request's response is stored in the same transaction as the rows it
+created. A repeat of the key by the same user on the same endpoint,
+within IDEMPOTENCY_KEY_TTL_HOURS, gets that response back with an
+Idempotent-Replayed: true header and starts nothing. Reusing a key with
+a different body is a 422. When two first requests race, the unique
+index picks one winner; the other rolls back and replays the winner.
+
+Single-flight: before a launch looks for an identical run already in
+flight, it takes a lock on the request's fingerprint that is held until
+its transaction ends. Two simultaneous identical requests therefore
+cannot both miss each other. On Postgres this is an advisory lock, so it
+holds across processes. Other databases (SQLite in development and
+tests) get a process-local lock instead, which only serializes requests
+served by the same process.
+"""
+import hashlib
+import json
+import logging
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app, jsonify
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from models import db
+from models.idempotency_key import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+HEADER = "Idempotency-Key"
+
+_MAX_KEY_LENGTH = 255
+
+# Process-local single-flight locks (non-Postgres databases):
+# fingerprint -> [lock, sessions holding or waiting for it]
+_local_guard = threading.Lock()
+_local_locks = {}
+_HELD = "idempotency_locks"  # session.info key: fingerprints this transaction holds
+
+KeyedRequest = namedtuple("KeyedRequest", "key endpoint user request_hash")
+
+
+def fingerprint(*parts):
+    """SHA-256 hex digest identifying a request by its parts."""
+    return hashlib.sha256("\x1f".join(str(part) for part in parts).encode()).hexdigest()
+
+
+def _cutoff():
+    hours = current_app.config.get("IDEMPOTENCY_KEY_TTL_HOURS") or 24
+    return datetime.now(timezone.utc) - timedelta(hours=hours)
+
+
+def _find(keyed):
+    return IdempotencyKey.query.filter_by(
+        created_by=keyed.user, endpoint=keyed.endpoint, key=keyed.key
+    ).first()
+
+
+def begin(request, endpoint, user, body):
+    """
+    Check the request's Idempotency-Key.
+
+    Returns:
+        (keyed, response): keyed is a KeyedRequest to pass to remember(),
+        or None without a key. response is set when the request must
+        return it at once: a replay of the key's first response, or an
+        error.
+    """
+    key = (request.headers.get(HEADER) or "").strip()
+    if not key:
+        return None, None
+    if len(key) > _MAX_KEY_LENGTH:
+        return None, (jsonify({"error": f"{HEADER} must be at most {_MAX_KEY_LENGTH} characters"}), 400)
+
+    keyed = KeyedRequest(key, endpoint, user, fingerprint(json.dumps(body, sort_keys=True)))
+    entry = _find(keyed)
+    if entry is not None and _aware(entry.created_at) < _cutoff():
+        db.session.delete(entry)  # Expired: the key may be used afresh
+        db.session.flush()
+        entry = None
+    if entry is None:
+        return keyed, None
+    return keyed, replay(keyed, entry)
+
+
+def replay(keyed, entry=None):
+    """The stored response for keyed (422 if its body differs), or None."""
+    entry = entry or _find(keyed)
+    if entry is None:
+        return None
+    if entry.request_hash != keyed.request_hash:
+        return jsonify({"error": f"{HEADER} was already used with a different request"}), 422
+    resp = current_app.response_class(
+        entry.response_body, status=entry.response_status, mimetype="application/json"
+    )
+    resp.headers["Idempotent-Replayed"] = "true"
+    logger.info("[--] Replayed %s %s=%s", keyed.endpoint, HEADER, keyed.key)
+    return resp
+
+
+def remember(keyed, body, status, story_id=None):
+    """Store the response for keyed in the caller's transaction."""
+    db.session.add(IdempotencyKey(
+        key=keyed.key,
+        endpoint=keyed.endpoint,
+        created_by=keyed.user,
+        request_hash=keyed.request_hash,
+        story_id=story_id,
+        response_status=status,
+        response_body=json.dumps(body),
+    ))
+
+
+def lock(request_fingerprint):
+    """
+    Serialize identical launches until the transaction ends.
+
+    A Postgres advisory lock; on other databases a lock in this process,
+    released when the session's transaction commits or rolls back.
+    """
+    if db.engine.dialect.name == "postgresql":
+        # Advisory locks take a bigint: the digest's first 60 bits
+        db.session.execute(
+            text("SELECT pg_advisory_xact_lock(:key)"),
+            {"key": int(request_fingerprint[:15], 16)},
+        )
+        return
+
+    session = db.session()
+    session.connection()  # Begin the transaction whose end releases the lock
+    held = session.info.setdefault(_HELD, set())
+    if request_fingerprint in held:
+        return
+    with _local_guard:
+        entry = _local_locks.setdefault(request_fingerprint, [threading.Lock(), 0])
+        entry[1] += 1
+    entry[0].acquire()
+    held.add(request_fingerprint)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _release_local_locks(session, transaction):
+    if transaction.parent is not None:
+        return  # A savepoint; the lock lasts until the outer transaction ends
+    for request_fingerprint in session.info.pop(_HELD, ()):
+        with _local_guard:
+            entry = _local_locks[request_fingerprint]
+            entry[1] -= 1
+            if not entry[1]:
+                del _local_locks[request_fingerprint]
+        entry[0].release()
+
+
+def purge_expired():
+    """Delete keys older than IDEMPOTENCY_KEY_TTL_HOURS."""
+    deleted = IdempotencyKey.query.filter(IdempotencyKey.created_at < _cutoff()).delete(
+        synchronize_session=False
+    )
+    db.session.commit()
+    if deleted:
+        logger.info("[OK] Purged %d expired idempotency keys", deleted)
+    return deleted
+
+
+def _aware(value):
+    # SQLite hands back naive datetimes; everything here is UTC
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
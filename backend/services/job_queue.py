@@ -0,0 +1,662 @@
+"""
+Job queue — durable, database-backed background work for pipeline runs.
+
+With PIPELINE_EXECUTOR=queue, POST /source-list and /run insert a Job
+row in the same transaction as the Story/PipelineRun rows instead of
+starting a thread. A bounded JobWorkerPool (JOB_WORKERS threads per
+process) claims and runs jobs:
+
+  - Claim: SELECT ... FOR UPDATE SKIP LOCKED on Postgres, so concurrent
+    workers never block on or double-claim a row. SQLite has no row
+    locks; there a compare-and-swap UPDATE on (id, attempts) decides
+    the winner. Postgres uses the same guard as a second check.
+  - Visibility timeout: a claimed job is locked until now +
+    JOB_VISIBILITY_TIMEOUT_SECONDS. The pool heartbeats its running jobs.
+    If a worker is recycled mid-job the lock lapses, and the next claim
+    retries the job, up to max_attempts. After that, the job and its
+    story's still-running PipelineRuns are marked failed.
+  - Drain: on shutdown the pool stops claiming and waits up to
+    JOB_DRAIN_SECONDS for in-flight jobs (keep gunicorn's
+    graceful_timeout above it).
+
+Fair share: every job has a lane and an agency (its Source List
+prompt's). Claims take "interactive" jobs (single runs) before "bulk"
+jobs (batches, automatic resumes), and each pool keeps
+JOB_INTERACTIVE_RESERVED_WORKERS threads free of bulk work. Within a
+lane, the next job comes from the agency with the fewest running jobs
+per unit of weight (JOB_AGENCY_WEIGHTS), then the user with the fewest,
+then the oldest. Running jobs are counted across both lanes, so
+JOB_AGENCY_CONCURRENCY / JOB_USER_CONCURRENCY cap everything one agency
+or user holds, and a busy bulk batch counts against its agency's share.
+
+Handlers are registered by job type (routes/pipeline.py registers
+"source-list", "pipeline" and "pipeline-resume") and called as
+handler(app, **payload). Periodic tasks (the stale-run reaper) run on
+one extra thread in every pool.
+Jobs in a Batch run at most batches.max_concurrency at a time.
+get_queue_stats() reports depth, age and wait-time metrics.
+"""
+import atexit
+import json
+import logging
+import math
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from sqlalchemy import case, or_, select, update
+from sqlalchemy.orm import aliased
+
+from models import db
+from models.batch import Batch
+from models.job import Job
+from models.pipeline_run import PipelineRun
+from models.prompt import Prompt
+from models.story import Story
+from services.run_events import mark_changed
+
+logger = logging.getLogger(__name__)
+
+LANES = ("interactive", "bulk")
+
+_handlers = {}
+_periodic_tasks = []
+
+
+def register_job_handler(job_type, handler):
+    """Run handler(app, **payload) for jobs of job_type."""
+    _handlers[job_type] = handler
+
+
+def register_periodic_task(task, interval_key):
+    """Run task() in an app context every config[interval_key] seconds (0 = off) in each pool."""
+    _periodic_tasks.append((task, interval_key))
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def _aware(value):
+    # SQLite hands back naive datetimes; everything here is UTC
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def enqueue(job_type, payload, story_id=None, created_by=None, batch_id=None, commit=True,
+            agency=None, lane=None):
+    """
+    Add a job to the queue.
+
+    The job joins the caller's transaction, so enqueueing alongside the
+    Story/PipelineRun rows is atomic. With commit=True the transaction is
+    committed and this process's pool woken; otherwise call notify_pool()
+    after committing.
+
+    Args:
+        agency: Fair-share agency (default: the story's Source List
+            prompt's agency; "" for none without the lookup).
+        lane: "interactive" or "bulk" (default: "bulk" for batch jobs).
+
+    Returns:
+        The Job.
+    """
+    if job_type not in _handlers:
+        raise ValueError(f"No handler registered for job type {job_type!r}")
+    lane = lane or ("bulk" if batch_id else "interactive")
+    if lane not in LANES:
+        raise ValueError(f"Unknown lane {lane!r}")
+    if agency is None and story_id is not None:
+        agency = story_agencies([story_id]).get(story_id)
+
+    job = Job(
+        job_type=job_type,
+        payload=json.dumps(payload),
+        story_id=story_id,
+        created_by=created_by,
+        batch_id=batch_id,
+        agency=agency or None,
+        lane=lane,
+        max_attempts=current_app.config.get("JOB_MAX_ATTEMPTS") or 1,
+        run_after=_now(),
+    )
+    db.session.add(job)
+    if commit:
+        db.session.commit()
+        notify_pool()
+    return job
+
+
+def story_agencies(story_ids):
+    """{story_id: agency of its Source List prompt} for stories that have one."""
+    if not story_ids:
+        return {}
+    return dict(
+        db.session.query(Story.id, Prompt.agency)
+        .join(Prompt, Prompt.id == Story.source_list_prompt_id)
+        .filter(Story.id.in_(list(story_ids)), Prompt.agency.isnot(None))
+        .all()
+    )
+
+
+def notify_pool():
+    """Wake this process's job pool (if any) to look for new work."""
+    pool = get_job_pool()
+    if pool is not None:
+        pool.notify()
+
+
+def _visibility():
+    return timedelta(seconds=current_app.config.get("JOB_VISIBILITY_TIMEOUT_SECONDS") or 300)
+
+
+def _fair_share(query, now):
+    """Apply agency/user caps and fair-share ordering to a claim query."""
+    peer = aliased(Job)
+
+    def running_alike(column):
+        # Live jobs in any lane with the candidate's agency (or user)
+        return (
+            select(db.func.count(peer.id))
+            .where(
+                peer.status == "running",
+                peer.locked_until >= now,
+                db.func.coalesce(getattr(peer, column), "")
+                == db.func.coalesce(getattr(Job, column), ""),
+            )
+            .scalar_subquery()
+        )
+
+    config = current_app.config
+    agency_running = running_alike("agency")
+    user_running = running_alike("created_by")
+    if config.get("JOB_AGENCY_CONCURRENCY"):
+        query = query.filter(agency_running < config["JOB_AGENCY_CONCURRENCY"])
+    if config.get("JOB_USER_CONCURRENCY"):
+        query = query.filter(user_running < config["JOB_USER_CONCURRENCY"])
+
+    weights = config.get("JOB_AGENCY_WEIGHTS")
+    agency_share = (
+        agency_running / case(weights, value=Job.agency, else_=1.0) if weights else agency_running
+    )
+    return query.order_by(
+        case((Job.lane == "interactive", 0), else_=1),
+        agency_share,
+        user_running,
+        Job.id,
+    )
+
+
+def claim_job(worker_id, job_types=None, lanes=None):
+    """
+    Claim the next runnable job for worker_id, or return None.
+
+    Runnable: queued and due, or running with an expired lock (its
+    worker died). Expired jobs that have used all their attempts are
+    failed here instead. job_types / lanes limit the claim to those
+    types / lanes (an empty list claims nothing). Order and caps are
+    the fair-share rules in the module docstring.
+    """
+    if (job_types is not None and not job_types) or (lanes is not None and not lanes):
+        return None
+    now = _now()
+    query = Job.query.filter(or_(
+        (Job.status == "queued") & (Job.run_after <= now),
+        (Job.status == "running") & (Job.locked_until < now),
+    ))
+    if job_types is not None:
+        query = query.filter(Job.job_type.in_(list(job_types)))
+    if lanes is not None:
+        query = query.filter(Job.lane.in_(list(lanes)))
+
+    # Batches cap how many of their jobs run at once (across all workers;
+    # two simultaneous claims can briefly overshoot by one)
+    sibling = aliased(Job)
+    busy = (
+        select(db.func.count(sibling.id))
+        .where(
+            sibling.batch_id == Job.batch_id,
+            sibling.status == "running",
+            sibling.locked_until >= now,
+        )
+        .scalar_subquery()
+    )
+    cap = select(Batch.max_concurrency).where(Batch.id == Job.batch_id).scalar_subquery()
+    query = query.filter(or_(Job.batch_id.is_(None), cap.is_(None), busy < cap))
+    query = _fair_share(query, now).limit(1)
+    if db.engine.dialect.name == "postgresql":
+        query = query.with_for_update(skip_locked=True)
+
+    job = query.first()
+    if job is None:
+        db.session.rollback()
+        return None
+
+    if job.status == "running" and job.attempts >= job.max_attempts:
+        _give_up(job, "Worker stopped responding (visibility timeout) on the final attempt")
+        return claim_job(worker_id, job_types, lanes)
+
+    # run_after becomes when the job last turned claimable: a reclaimed
+    # job waited from its lapsed lock, not from its first enqueue
+    available_at = job.locked_until if job.status == "running" else job.run_after
+    claimed = db.session.execute(
+        update(Job)
+        .where(Job.id == job.id, Job.attempts == job.attempts)
+        .values(
+            status="running",
+            attempts=Job.attempts + 1,
+            locked_by=worker_id,
+            locked_until=now + _visibility(),
+            run_after=available_at,
+            started_at=now,
+        )
+    ).rowcount
+    db.session.commit()
+    if not claimed:
+        return None
+
+    db.session.refresh(job)
+    if job.attempts > 1:
+        logger.warning("[--] Reclaimed job %d (attempt %d/%d)", job.id, job.attempts, job.max_attempts)
+    return job
+
+
+def _give_up(job, message):
+    job.status = "failed"
+    job.last_error = message
+    job.finished_at = _now()
+    job.locked_by = None
+    job.locked_until = None
+    if job.story_id:
+        PipelineRun.query.filter_by(story_id=job.story_id, status="running").update(
+            {"status": "failed", "error_message": message, "completed_at": _now()},
+            synchronize_session=False,
+        )
+        mark_changed(db.session, [job.story_id])  # Bulk UPDATE skips the flush hook
+    db.session.commit()
+    logger.error("[ERR] Job %d failed: %s", job.id, message)
+
+
+def finish_job(job_id, worker_id, error=None):
+    """Mark a claimed job completed (or failed with error), if still ours and not cancelled."""
+    values = {
+        "status": "failed" if error else "completed",
+        "finished_at": _now(),
+        "locked_until": None,
+    }
+    if error:
+        values["last_error"] = error
+    db.session.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.locked_by == worker_id, Job.status == "running")
+        .values(**values)
+    )
+    db.session.commit()
+
+
+def cancel_jobs(story_ids):
+    """
+    Cancel the stories' queued and running jobs, in the caller's transaction.
+
+    Queued jobs are never claimed; a worker already running one stops at
+    its next cancellation check (services/run_control.py), and
+    finish_job() leaves the job cancelled.
+
+    Returns:
+        Number of jobs cancelled.
+    """
+    if not story_ids:
+        return 0
+    return db.session.execute(
+        update(Job)
+        .where(Job.story_id.in_(list(story_ids)), Job.status.in_(("queued", "running")))
+        .values(status="cancelled", finished_at=_now(), locked_until=None)
+    ).rowcount
+
+
+def heartbeat(job_ids, worker_id):
+    """Push the lock deadline forward for jobs this worker still holds."""
+    if not job_ids:
+        return
+    db.session.execute(
+        update(Job)
+        .where(Job.id.in_(job_ids), Job.locked_by == worker_id, Job.status == "running")
+        .values(locked_until=_now() + _visibility())
+    )
+    db.session.commit()
+
+
+def claim_next(app, worker_id, job_types=None, lanes=None):
+    """
+    Claim one job in its own app context.
+
+    Returns:
+        (job_id, job_type, payload, available_at), or None if nothing is
+        runnable. available_at is when the job last became claimable.
+    """
+    with app.app_context():
+        job = claim_job(worker_id, job_types, lanes)
+        if job is None:
+            return None
+        return job.id, job.job_type, job.payload_dict, job.run_after
+
+
+def execute_job(app, worker_id, claimed):
+    """
+    Run a claimed job's handler and record the result.
+
+    The handler gets its own app context. Handler exceptions fail the
+    job; they are not retried — handlers record their own step failures.
+    """
+    job_id, job_type, payload, available_at = claimed
+    wait_ms = int((_now() - _aware(available_at)).total_seconds() * 1000) if available_at else None
+    logger.info("[OK] Job %d (%s) claimed by %s after %sms", job_id, job_type, worker_id, wait_ms)
+
+    error = None
+    try:
+        handler = _handlers.get(job_type)
+        if handler is None:
+            raise ValueError(f"No handler registered for job type {job_type!r}")
+        handler(app, **payload)
+    except Exception as exc:
+        error = str(exc) or exc.__class__.__name__
+        logger.error("[ERR] Job %d (%s) raised: %s", job_id, job_type, error)
+
+    with app.app_context():
+        try:
+            finish_job(job_id, worker_id, error)
+        except Exception as exc:
+            db.session.rollback()
+            logger.error("[ERR] Could not record job %d result: %s", job_id, exc)
+    return job_id
+
+
+def run_next_job(app, worker_id, job_types=None, lanes=None):
+    """Claim and run one job. Returns the job id, or None if the queue was empty."""
+    claimed = claim_next(app, worker_id, job_types, lanes)
+    if claimed is None:
+        return None
+    return execute_job(app, worker_id, claimed)
+
+
+class JobWorkerPool:
+    """
+    Worker threads claiming jobs for one process.
+
+    Workers sleep on an Event between polls; enqueue() in the same
+    process sets it so new work starts at once. One extra thread
+    heartbeats every job the pool is running, another runs the
+    registered periodic tasks.
+
+    Args:
+        app: Flask app.
+        size: Worker threads (default JOB_WORKERS).
+        job_types: Only claim these types (default: every registered type).
+        type_limits: Max concurrent jobs per type (default
+            JOB_TYPE_CONCURRENCY; 0/missing = only bounded by size).
+        interactive_reserve: Workers only interactive jobs may use
+            (default JOB_INTERACTIVE_RESERVED_WORKERS, at most size - 1).
+    """
+
+    def __init__(self, app, size=None, job_types=None, type_limits=None, interactive_reserve=None):
+        self.app = app
+        self.size = size or app.config.get("JOB_WORKERS") or 4
+        if interactive_reserve is None:
+            interactive_reserve = app.config.get("JOB_INTERACTIVE_RESERVED_WORKERS") or 0
+        self.interactive_reserve = max(0, min(interactive_reserve, self.size - 1))
+        self.poll_interval = app.config.get("JOB_POLL_INTERVAL_SECONDS") or 2
+        self.job_types = list(job_types) if job_types else None
+        limits = app.config.get("JOB_TYPE_CONCURRENCY") if type_limits is None else type_limits
+        self.type_limits = {t: n for t, n in (limits or {}).items() if n}
+        self.worker_prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._claim_lock = threading.Lock()
+        self._running = {}  # job_id -> (worker_id, job_type)
+        self._threads = [
+            threading.Thread(target=self._work, args=(f"{self.worker_prefix}:{n}",),
+                             name=f"job-worker-{n}", daemon=True)
+            for n in range(self.size)
+        ]
+        self._heartbeat = threading.Thread(target=self._beat, name="job-heartbeat", daemon=True)
+        self._maintenance = threading.Thread(target=self._maintain, name="job-maintenance", daemon=True)
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+        self._heartbeat.start()
+        self._maintenance.start()
+        logger.info(
+            "[OK] Job worker pool started (%d workers, types=%s, limits=%s)",
+            self.size, ",".join(self.job_types) if self.job_types else "all", self.type_limits or "none",
+        )
+        return self
+
+    def notify(self):
+        self._wake.set()
+
+    def stats(self):
+        with self._lock:
+            busy_by_type = {}
+            for _, job_type in self._running.values():
+                busy_by_type[job_type] = busy_by_type.get(job_type, 0) + 1
+        return {
+            "workers": self.size,
+            "busy": sum(busy_by_type.values()),
+            "busy_by_type": busy_by_type,
+            "type_limits": dict(self.type_limits),
+            "interactive_reserve": self.interactive_reserve,
+            "job_types": self.job_types,
+            "draining": self._stopping.is_set(),
+        }
+
+    def _claimable_types(self):
+        """Types this pool may claim now, or None for any type."""
+        if not self.type_limits:
+            return self.job_types
+        with self._lock:
+            busy = {}
+            for _, job_type in self._running.values():
+                busy[job_type] = busy.get(job_type, 0) + 1
+        candidates = self.job_types or list(_handlers)
+        return [t for t in candidates
+                if t not in self.type_limits or busy.get(t, 0) < self.type_limits[t]]
+
+    def _claimable_lanes(self):
+        """Lanes this pool may claim now, or None for any lane."""
+        if not self.interactive_reserve:
+            return None
+        with self._lock:
+            busy = len(self._running)
+        # The last interactive_reserve idle workers wait for interactive jobs
+        return None if busy < self.size - self.interactive_reserve else ["interactive"]
+
+    def _work(self, worker_id):
+        while not self._stopping.is_set():
+            claimed = None
+            try:
+                # One claim at a time per pool so per-type limits hold
+                with self._claim_lock:
+                    claimed = claim_next(self.app, worker_id, self._claimable_types(),
+                                         self._claimable_lanes())
+                    if claimed is not None:
+                        self._track(claimed[0], worker_id, claimed[1])
+                if claimed is not None:
+                    execute_job(self.app, worker_id, claimed)
+            except Exception as exc:
+                logger.error("[ERR] Job worker %s: %s", worker_id, exc)
+            finally:
+                if claimed is not None:
+                    self._untrack(claimed[0])
+            if claimed is not None:
+                continue
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def _track(self, job_id, worker_id, job_type):
+        with self._lock:
+            self._running[job_id] = (worker_id, job_type)
+
+    def _untrack(self, job_id):
+        with self._lock:
+            self._running.pop(job_id, None)
+        # A freed per-type slot may unblock a sleeping worker
+        if self.type_limits:
+            self._wake.set()
+
+    def _beat(self):
+        interval = (self.app.config.get("JOB_VISIBILITY_TIMEOUT_SECONDS") or 300) / 3
+        while not self._stopping.wait(interval):
+            with self._lock:
+                held = {}
+                for job_id, (worker_id, _) in self._running.items():
+                    held.setdefault(worker_id, []).append(job_id)
+            with self.app.app_context():
+                for worker_id, job_ids in held.items():
+                    try:
+                        heartbeat(job_ids, worker_id)
+                    except Exception as exc:
+                        db.session.rollback()
+                        logger.warning("[--] Job heartbeat failed: %s", exc)
+
+    def _maintain(self):
+        due = {}
+        while not self._stopping.wait(1):
+            now = time.monotonic()
+            for task, interval_key in list(_periodic_tasks):
+                interval = self.app.config.get(interval_key) or 0
+                if interval <= 0 or now < due.get(task, 0):
+                    continue
+                due[task] = now + interval
+                with self.app.app_context():
+                    try:
+                        task()
+                    except Exception as exc:
+                        db.session.rollback()
+                        logger.warning("[--] Periodic task %s failed: %s", task.__name__, exc)
+
+    def drain(self, timeout=None):
+        """Stop claiming and wait for in-flight jobs (up to JOB_DRAIN_SECONDS)."""
+        if timeout is None:
+            timeout = self.app.config.get("JOB_DRAIN_SECONDS") or 25
+        self._stopping.set()
+        self._wake.set()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        left = self.stats()["busy"]
+        if left:
+            logger.warning("[--] Job pool drained with %d job(s) still running; "
+                           "they will be reclaimed after the visibility timeout", left)
+        else:
+            logger.info("[OK] Job worker pool drained")
+
+
+_pool_lock = threading.Lock()
+_pool = None
+_pool_pid = None
+
+
+def get_job_pool(app=None):
+    """
+    This process's JobWorkerPool, started on first use (None if JOB_WORKERS=0).
+
+    Rebuilt after a fork; drained at interpreter exit.
+    """
+    global _pool, _pool_pid
+
+    app = app or current_app._get_current_object()
+    if not app.config.get("JOB_WORKERS"):
+        return None
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = JobWorkerPool(app).start()
+            _pool_pid = os.getpid()
+            atexit.register(_pool.drain)
+        return _pool
+
+
+def get_queue_stats(window_minutes=60):
+    """
+    Queue depth and wait-time metrics.
+
+    Returns:
+        dict: counts by status, depth (runnable now), oldest queued age,
+        wait-time avg/p95 (claimable → claim, so a reclaimed job counts
+        only its wait after the lock lapsed) for jobs started in the last
+        window_minutes, the same per lane, queued/running per agency,
+        and this process's pool.
+    """
+    now = _now()
+    counts = dict(
+        db.session.query(Job.status, db.func.count(Job.id)).group_by(Job.status).all()
+    )
+    depth = Job.query.filter(or_(
+        (Job.status == "queued") & (Job.run_after <= now),
+        (Job.status == "running") & (Job.locked_until < now),
+    )).count()
+    queued_by_type = dict(
+        db.session.query(Job.job_type, db.func.count(Job.id))
+        .filter(Job.status == "queued").group_by(Job.job_type).all()
+    )
+    oldest = (
+        db.session.query(db.func.min(Job.enqueued_at)).filter(Job.status == "queued").scalar()
+    )
+
+    recent = (
+        db.session.query(Job.lane, Job.run_after, Job.started_at)
+        .filter(Job.started_at >= now - timedelta(minutes=window_minutes))
+        .all()
+    )
+    waits = {}
+    for lane, available, started in recent:
+        if available and started:
+            waits.setdefault(lane, []).append((_aware(started) - _aware(available)).total_seconds() * 1000)
+    by_lane = dict(
+        ((lane, status), count) for lane, status, count in
+        db.session.query(Job.lane, Job.status, db.func.count(Job.id))
+        .filter(Job.status.in_(("queued", "running"))).group_by(Job.lane, Job.status).all()
+    )
+    by_agency = {}
+    for agency, status, count in (
+        db.session.query(Job.agency, Job.status, db.func.count(Job.id))
+        .filter(Job.status.in_(("queued", "running"))).group_by(Job.agency, Job.status).all()
+    ):
+        by_agency.setdefault(agency or "", {"queued": 0, "running": 0})[status] = count
+
+    pool = _pool if _pool is not None and _pool_pid == os.getpid() else None
+    return {
+        "counts": {status: counts.get(status, 0)
+                   for status in ("queued", "running", "completed", "failed", "cancelled")},
+        "depth": depth,
+        "queued_by_type": queued_by_type,
+        "oldest_queued_age_ms": int((now - _aware(oldest)).total_seconds() * 1000) if oldest else None,
+        "wait_ms": _wait_summary([w for lane_waits in waits.values() for w in lane_waits],
+                                 window_minutes),
+        "lanes": {
+            lane: {
+                "queued": by_lane.get((lane, "queued"), 0),
+                "running": by_lane.get((lane, "running"), 0),
+                "wait_ms": _wait_summary(waits.get(lane, []), window_minutes),
+            }
+            for lane in LANES
+        },
+        "agencies": by_agency,
+        "pool": pool.stats() if pool else None,
+    }
+
+
+def _wait_summary(waits, window_minutes):
+    waits = sorted(waits)
+    p95 = waits[max(0, math.ceil(0.95 * len(waits)) - 1)] if waits else None
+    return {
+        "window_minutes": window_minutes,
+        "samples": len(waits),
+        "avg": round(sum(waits) / len(waits)) if waits else None,
+        "p95": round(p95) if p95 is not None else None,
+    }
@@ -0,0 +1,117 @@
+"""
+Model router — which Grok model each pipeline step uses, and what to fall
+back to when it is too slow.
+
+Model for a call, most specific first:
+  1. Prompt.model (set per prompt in the Prompt Library)
+  2. GROK_STEP_MODELS[step_type] (source-list / refinement / amy-bot)
+  3. GROK_MODEL
+
+GROK_STEP_FALLBACK_MODELS[step_type] lists faster models to try, in
+order, when the current one times out or fails after its retries. With a
+latency SLO (GROK_STEP_SLO_MS[step_type]), every model but the last is
+called once with the SLO as its timeout, so a slow primary gives way
+quickly instead of burning the full timeout and retries.
+
+With a stage deadline (services/stage_engine.py), every model's calls
+stop at it, and no fallback starts once it has passed.
+
+The model that actually answered is recorded in call_stats["model"]
+(and so on the PipelineRun); call_stats["fallback_from"] lists the
+models that were given up on.
+"""
+import logging
+
+from flask import current_app
+
+from services.grok_service import GrokAPIError
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_models(step_type, prompt=None):
+    """Return [primary, *fallbacks] for a step, without duplicates."""
+    config = current_app.config
+    primary = (
+        (prompt.model if prompt is not None else None)
+        or (config.get("GROK_STEP_MODELS") or {}).get(step_type)
+        or config.get("GROK_MODEL")
+        or "grok-3-fast"
+    )
+    chain = [primary]
+    for model in (config.get("GROK_STEP_FALLBACK_MODELS") or {}).get(step_type) or []:
+        if model and model not in chain:
+            chain.append(model)
+    return chain
+
+
+def step_slo_ms(step_type):
+    """Latency SLO for a step's non-final models, or None."""
+    return (current_app.config.get("GROK_STEP_SLO_MS") or {}).get(step_type) or None
+
+
+def _should_fall_back(exc):
+    # Timeouts (including the SLO cut-off) and transient server failures;
+    # a 400 or a missing key would fail the same way on any model
+    return exc.retryable
+
+
+def _expired(deadline):
+    return deadline is not None and deadline.remaining() <= 0
+
+
+def call_with_fallback(call_fn, models, slo_ms=None, call_stats=None, deadline=None):
+    """
+    Call call_fn(model=..., timeout=..., max_attempts=...) down the chain.
+
+    Args:
+        call_fn: Grok call accepting model, timeout, max_attempts and
+            deadline kwargs.
+        models: [primary, *fallbacks] from resolve_models().
+        slo_ms: Timeout for every model but the last (None = normal).
+        call_stats: Optional dict; gets fallback_from on a fallback.
+        deadline: Optional Deadline passed to every call.
+
+    Raises:
+        GrokAPIError: From the last model tried.
+    """
+    for index, model in enumerate(models):
+        last = index == len(models) - 1
+        kwargs = {"model": model}
+        if slo_ms and not last:
+            kwargs.update(timeout=slo_ms / 1000, max_attempts=1)
+        if deadline is not None:
+            kwargs["deadline"] = deadline
+        try:
+            return call_fn(**kwargs)
+        except GrokAPIError as exc:
+            if last or not _should_fall_back(exc) or _expired(deadline):
+                raise
+            logger.warning(
+                "[--] Grok model %s failed (%s); falling back to %s",
+                model, exc, models[index + 1],
+            )
+            if call_stats is not None:
+                call_stats.setdefault("fallback_from", []).append(model)
+
+
+async def call_with_fallback_async(call_fn, models, slo_ms=None, call_stats=None, deadline=None):
+    """call_with_fallback() for AsyncGrokClient coroutines."""
+    for index, model in enumerate(models):
+        last = index == len(models) - 1
+        kwargs = {"model": model}
+        if slo_ms and not last:
+            kwargs.update(timeout=slo_ms / 1000, max_attempts=1)
+        if deadline is not None:
+            kwargs["deadline"] = deadline
+        try:
+            return await call_fn(**kwargs)
+        except GrokAPIError as exc:
+            if last or not _should_fall_back(exc) or _expired(deadline):
+                raise
+            logger.warning(
+                "[--] Grok model %s failed (%s); falling back to %s",
+                model, exc, models[index + 1],
+            )
+            if call_stats is not None:
+                call_stats.setdefault("fallback_from", []).append(model)
@@ -11,40 +11,374 @@ Flow:
   7. Log all steps as PipelineRun records
 
 REJECT means the story is dead. Fixes in Amy Bot output are logged
-but never applied. No retry.
+but never applied. No retry of the decision — transient Grok failures
+are retried inside grok_service, and the attempt count and backoff are
+recorded on each PipelineRun.
+
+With GROK_CACHE_ENABLED, refinement and Amy Bot steps are first looked up
+in the Grok response cache (grok_cache_service); bypass_cache=True forces
+a fresh call.
+
+With GROK_PROMPT_ASSEMBLY="split", each step sends the prompt library
+text as the system message and only the story material as the user
+message. The stable prefix lets xAI serve it from its prompt cache;
+cached_tokens on each PipelineRun shows how much was reused.
+
+Each step's model comes from model_router (Prompt.model, then
+GROK_STEP_MODELS), with an optional faster fallback chain on timeouts or
+a blown latency SLO. The model that answered is stored on the run.
+
+With GROK_HEDGE_ENABLED, a non-streamed step that runs past its recent
+latency percentile sends one backup request (hedge_service).
+
+With GROK_STREAMING_ENABLED, refinement and Amy Bot use streamed chat
+completions: the text so far is written to the running PipelineRun's
+output_text every GROK_STREAM_FLUSH_MS, so status polls can show it
+before the step finishes.
+
+Completed steps are checkpoints: with resume=True (resume_pipeline(),
+retried pipeline jobs) a refinement or Amy Bot run that already
+completed for the same prompt and input is reused instead of calling
+Grok again, and a decision that was already applied is not re-pushed.
+
+The steps are Stages of two StageEngines (services/stage_engine.py):
+SOURCE_LIST_ENGINE (source-list → enrichment) and PIPELINE_ENGINE
+(refinement → amy-bot → decision → cms-push). Each stage declares its
+inputs, outputs, concurrency, retry attempts and timeout; with many
+stories in flight the stages overlap, so throughput is set by the
+slowest stage rather than the sum of all of them.
+
+Every launch runs under a RunControl (services/run_control.py): stages
+check for a cancel before they start, when Grok answers and at every
+streamed flush, and each stage's Grok calls stop at its deadline. A
+threaded step's Grok call is given a RequestCloser, so a cancel served
+by this process aborts it mid-request.
+
+run_pipeline() and run_source_list() are the threaded entry points.
+run_pipeline_async() and run_source_list_async() run the same stages on
+GrokAsyncExecutor's event loop. Both commit before every Grok call (and the CMS push) so no step
+holds uncommitted rows or an idle DB connection while waiting on the
+network: pool usage tracks DB work, not in-flight LLM calls, and every
+step's progress is visible to status polls as soon as it happens.
 """
+import functools
 import logging
 import time
 from datetime import datetime, timezone
 
+from flask import current_app
+
 from models import db
 from models.prompt import Prompt
 from models.story import Story
 from models.pipeline_run import PipelineRun
-from services.grok_service import call_grok, GrokAPIError
+from services.grok_service import (
+    RequestCloser,
+    call_grok,
+    call_grok_stream,
+    call_grok_with_search,
+    GrokAPIError,
+)
 from services.validation_service import parse_decision
-from services import cms_service
+from services.url_enrichment_service import enrich_urls
+from services import cms_service, grok_cache_service
+from services.hedge_service import hedge_delay_ms
+from services.model_router import (
+    call_with_fallback,
+    call_with_fallback_async,
+    resolve_models,
+    step_slo_ms,
+)
+from services.run_control import PipelineCancelled, RunControl
+from services.stage_engine import Stage, StageEngine, run_blocking
 
 logger = logging.getLogger(__name__)
 
 
-def run_pipeline(story_id, selected_story, refinement_prompt_id, user_email):
+def run_pipeline(story_id, selected_story, refinement_prompt_id, user_email,
+                 bypass_cache=False, amy_prompt_id=None, resume=False):
     """
-    Run the full pipeline: refinement → Amy Bot → CMS or kill.
+    Run the full pipeline: refinement → Amy Bot → decision → CMS push.
 
     Args:
         story_id: ID of the Story created during Source List run.
         selected_story: The user's selected story/source text.
         refinement_prompt_id: ID of the PAPA or PSST prompt to use.
         user_email: Email of the user running the pipeline.
+        bypass_cache: Skip Grok response cache reads for this run.
+        amy_prompt_id: Amy Bot prompt already looked up by a batch
+            (default: the active Amy Bot prompt).
+        resume: Start from the first step without a checkpoint.
 
     Returns:
         dict with story data and pipeline result.
 
     Raises:
         ValueError: If story or prompts not found.
+        GrokAPIError: If a Grok API call fails or its deadline passes.
+        PipelineCancelled: If the story is cancelled (nothing more is written).
+    """
+    with RunControl(story_id) as control:
+        state = _pipeline_state(story_id, selected_story, refinement_prompt_id,
+                                bypass_cache, amy_prompt_id, resume)
+        try:
+            PIPELINE_ENGINE.run_one(state, control)
+        except GrokAPIError as exc:
+            _fail_open_runs(story_id, exc)
+            raise
+        return _finish_pipeline(state)
+
+
+async def run_pipeline_async(client, story_id, selected_story, refinement_prompt_id, user_email,
+                             bypass_cache=False, amy_prompt_id=None, resume=False):
+    """
+    Async run_pipeline for GrokAsyncExecutor — same stages, same records.
+
+    Args:
+        client: AsyncGrokClient shared by every coroutine on the loop.
+        (other args as run_pipeline)
+
+    Returns:
+        dict with story data and pipeline result.
+
+    There is no wrapper around the coroutine, so an unexpected error is
+    handled here as _run_pipeline_background does on a thread: rolled
+    back, and runs still "running" marked failed before it is re-raised.
+    Every DB step runs through run_blocking(), off the event loop.
+    """
+    with RunControl(story_id) as control:
+        state = await run_blocking(_pipeline_state, story_id, selected_story,
+                                   refinement_prompt_id, bypass_cache, amy_prompt_id, resume)
+        try:
+            await PIPELINE_ENGINE.run_one_async(client, state, control)
+        except PipelineCancelled:
+            await run_blocking(db.session.rollback)
+            raise
+        except GrokAPIError as exc:
+            await run_blocking(_fail_open_runs, story_id, exc)
+            raise
+        except Exception as exc:
+            # As _run_pipeline_background: nothing is left "running" for the reaper
+            await run_blocking(_fail_open_runs, story_id, exc, rollback=True)
+            raise
+        return await run_blocking(_finish_pipeline, state)
+
+
+def _finish_pipeline(state):
+    """Commit the launch's last stage and return the story's data."""
+    db.session.commit()
+    return state["story"].to_dict()
+
+
+def _pipeline_state(story_id, selected_story, refinement_prompt_id, bypass_cache,
+                    amy_prompt_id, resume):
+    """PIPELINE_ENGINE launch state: the story, its prompts and checkpoints."""
+    story, refinement_prompt, amy_prompt = _prepare_pipeline(
+        story_id, selected_story, refinement_prompt_id, amy_prompt_id
+    )
+    refinement_run, amy_run = (
+        _checkpoints(story, selected_story, refinement_prompt, amy_prompt)
+        if resume else (None, None)
+    )
+    return {
+        "story": story,
+        "selected_story": selected_story,
+        "refinement_prompt": refinement_prompt,
+        "amy_prompt": amy_prompt,
+        "bypass_cache": bypass_cache,
+        "refinement_run": refinement_run,
+        "amy_run": amy_run,
+    }
+
+
+def resume_pipeline(story_id, user_email=None):
+    """
+    Re-run a story's pipeline from its first incomplete step.
+
+    Uses the selection and prompts stamped on the story by the original
+    run; completed steps are reused (see _checkpoints).
+
+    Raises:
+        ValueError: If the story is missing or never ran the pipeline.
         GrokAPIError: If a Grok API call fails.
     """
+    return run_pipeline(user_email=user_email, resume=True, **_resume_args(story_id))
+
+
+async def resume_pipeline_async(client, story_id, user_email=None):
+    """Async resume_pipeline for GrokAsyncExecutor."""
+    args = await run_blocking(_resume_args, story_id)
+    return await run_pipeline_async(client, user_email=user_email, resume=True, **args)
+
+
+def resume_step(story_id):
+    """
+    The step a resume of story_id would start at.
+
+    Returns:
+        "refinement", "amy-bot", "decision" (both steps done, decision
+        not applied), or None when there is nothing left to do.
+
+    Raises:
+        ValueError: If the story is missing or never ran the pipeline.
+    """
+    args = _resume_args(story_id)
+    story, refinement_prompt, amy_prompt = _prepare_pipeline(**args)
+    refinement_run, amy_run = _checkpoints(
+        story, args["selected_story"], refinement_prompt, amy_prompt
+    )
+    if refinement_run is None:
+        return "refinement"
+    if amy_run is None:
+        return "amy-bot"
+    if _decision_applied(story, amy_run.output_text):
+        return None
+    return "decision"
+
+
+def _resume_args(story_id):
+    """run_pipeline arguments stamped on the story by its last run."""
+    story = db.session.get(Story, story_id)
+    if not story:
+        raise ValueError(f"Story {story_id} not found")
+    if not story.selected_story or not story.refinement_prompt_id:
+        raise ValueError(f"Story {story_id} has no pipeline run to resume")
+    return {
+        "story_id": story_id,
+        "selected_story": story.selected_story,
+        "refinement_prompt_id": story.refinement_prompt_id,
+        "amy_prompt_id": story.amy_bot_prompt_id,
+    }
+
+
+def _checkpoints(story, selected_story, refinement_prompt, amy_prompt):
+    """
+    (refinement run, Amy Bot run) already completed for these inputs.
+
+    A step is checkpointed when the latest run of its type completed with
+    the same prompt and input. The Amy Bot run only counts if it came
+    after the checkpointed refinement (it reviewed that output). Either
+    may be None.
+    """
+    refinement_input = _join_prompt(
+        refinement_prompt, _build_refinement_material(story, selected_story)
+    )
+    refinement_run = _completed_run(story, refinement_prompt, "refinement", refinement_input)
+    if refinement_run is None:
+        return None, None
+    amy_input = _join_prompt(amy_prompt, _build_amy_material(refinement_run.output_text))
+    amy_run = _completed_run(story, amy_prompt, "amy-bot", amy_input)
+    if amy_run is not None and amy_run.id < refinement_run.id:
+        amy_run = None
+    return refinement_run, amy_run
+
+
+def _completed_run(story, prompt, step_type, input_text):
+    """The story's latest run of step_type if it completed for this prompt + input."""
+    run = (
+        PipelineRun.query.filter_by(story_id=story.id, step_type=step_type)
+        .order_by(PipelineRun.id.desc())
+        .first()
+    )
+    if (run is None or run.status != "completed" or run.prompt_id != prompt.id
+            or run.input_text != input_text):
+        return None
+    return run
+
+
+def _decision_applied(story, amy_output):
+    """True if this Amy Bot output's decision is already on the story (and pushed)."""
+    if story.amy_bot_output != amy_output or not story.validation_decision:
+        return False
+    return story.validation_decision == "REJECT" or bool(story.pushed_to_cms)
+
+
+def run_source_list(story_id, prompt_text, context_str, prompt_id):
+    """
+    Source List run: Grok x_search, then best-effort URL enrichment.
+
+    Nothing is held open across the network: the rows are read and the
+    transaction committed before Grok, and the results are written in
+    one short transaction after enrichment.
+
+    Raises:
+        GrokAPIError: If the search fails (the run is marked failed).
+        PipelineCancelled: If the story is cancelled (nothing is written).
+    """
+    with RunControl(story_id) as control:
+        state = _source_list_state(story_id, prompt_text, context_str, prompt_id)
+        try:
+            SOURCE_LIST_ENGINE.run_one(state, control)
+        except GrokAPIError as exc:
+            _fail_open_runs(story_id, exc)
+            raise
+        _save_source_list(state, control)
+
+
+async def run_source_list_async(client, story_id, prompt_text, context_str):
+    """
+    Async run_source_list for GrokAsyncExecutor.
+
+    Enrichment uses blocking requests, and every DB step a blocking
+    session; both run on the loop's default (bounded) thread pool through
+    run_blocking() rather than on the event loop itself.
+    """
+    with RunControl(story_id) as control:
+        state = await run_blocking(_source_list_state, story_id, prompt_text, context_str)
+        try:
+            await SOURCE_LIST_ENGINE.run_one_async(client, state, control)
+            await run_blocking(_save_source_list, state, control)
+        except PipelineCancelled:
+            await run_blocking(db.session.rollback)
+            logger.info("[--] Source List run cancelled (story_id=%d)", story_id)
+        except GrokAPIError as exc:
+            await run_blocking(_fail_open_runs, story_id, exc)
+            logger.error("[ERR] Source List run failed: %s", exc)
+        except Exception as exc:
+            await run_blocking(_fail_open_runs, story_id, exc, rollback=True)
+            logger.error("[ERR] Source List run unexpected error: %s", exc)
+
+
+def _fail_open_runs(story_id, exc, rollback=False):
+    """
+    Fail the story's runs still "running" after a launch failed outside a
+    Grok step (its deadline passed waiting for a stage slot, or an
+    unexpected error — rolled back first with rollback=True), so status
+    polls see the failure without waiting for the reaper.
+    """
+    if rollback:
+        db.session.rollback()
+    for run in PipelineRun.query.filter_by(story_id=story_id, status="running"):
+        _fail_run(run, exc, None)
+    db.session.commit()
+
+
+def _source_list_state(story_id, prompt_text, context_str, prompt_id=None):
+    """SOURCE_LIST_ENGINE launch state (the prompt defaults to the run's)."""
+    run = PipelineRun.query.filter_by(story_id=story_id, step_type="source-list").first()
+    return {
+        "run": run,
+        "prompt": db.session.get(Prompt, prompt_id) if prompt_id else run.prompt,
+        "prompt_text": prompt_text,
+        "context_str": context_str,
+    }
+
+
+def _save_source_list(state, control):
+    """Write a Source List run's results in one short transaction."""
+    run = state["run"]
+    control.check(run)
+    story = db.session.get(Story, run.story_id)
+    story.source_list_output = state["source_list_output"]
+    if state["url_enrichments"]:
+        story.url_enrichments = state["url_enrichments"]
+    _complete_run(run, state["source_list_output"], state["duration_ms"], state["call_stats"])
+    db.session.commit()
+    logger.info("[OK] Source List run completed (story_id=%d)", story.id)
+
+
+def _prepare_pipeline(story_id, selected_story, refinement_prompt_id, amy_prompt_id=None):
+    """Validate inputs and stamp the selection + prompt ids on the story."""
     story = db.session.get(Story, story_id)
     if not story:
         raise ValueError(f"Story {story_id} not found")
@@ -56,10 +390,11 @@ def run_pipeline(story_id, selected_story, refinement_prompt_id, user_email):
     if refinement_prompt.prompt_type != "papa":
         raise ValueError("Refinement prompt must be type 'papa' (PAPA or PSST)")
 
-    # Find active Amy Bot prompt
-    amy_prompt = Prompt.query.filter_by(
-        prompt_type="amy-bot", is_active=True
-    ).first()
+    # Find active Amy Bot prompt (batches look it up once for every story)
+    if amy_prompt_id:
+        amy_prompt = db.session.get(Prompt, amy_prompt_id)
+    else:
+        amy_prompt = find_amy_bot_prompt()
     if not amy_prompt:
         raise ValueError("No active Amy Bot prompt found")
 
@@ -68,50 +403,261 @@ def run_pipeline(story_id, selected_story, refinement_prompt_id, user_email):
     story.refinement_prompt_id = refinement_prompt.id
     story.amy_bot_prompt_id = amy_prompt.id
 
-    # ---- Step 1: Refinement (PAPA or PSST) ----
+    return story, refinement_prompt, amy_prompt
+
+
+def find_amy_bot_prompt():
+    """The active Amy Bot prompt, or None."""
+    return Prompt.query.filter_by(prompt_type="amy-bot", is_active=True).first()
+
+
+def _build_refinement_material(story, selected_story):
+    """Per-story part of the refinement input: selected story + routing."""
     refinement_context = _build_refinement_context(story)
-    refinement_input = f"{refinement_prompt.prompt_text}\n\n---\n\nSource material:\n{selected_story}\n\n{refinement_context}"
-
-    story.refinement_input = refinement_input
-    refinement_output = _run_grok_step(
-        story=story,
-        prompt=refinement_prompt,
-        step_type="refinement",
-        input_text=refinement_input,
+    return f"Source material:\n{selected_story}\n\n{refinement_context}"
+
+
+def _build_amy_material(refinement_output):
+    """Per-story part of the Amy Bot input: the refined pitch."""
+    return f"Pitch to review:\n{refinement_output}"
+
+
+def _join_prompt(prompt, material):
+    """Full single-message input: prompt library text, divider, material."""
+    return f"{prompt.prompt_text}\n\n---\n\n{material}"
+
+
+def _grok_messages(prompt, input_text, material):
+    """
+    Return (user_text, context) to send for a step.
+
+    "combined" assembly sends input_text as the user message. "split"
+    sends the prompt text as the system context and only the material
+    as the user message, keeping the cacheable prefix byte-identical.
+    """
+    if material is not None and current_app.config.get("GROK_PROMPT_ASSEMBLY") == "split":
+        return material, prompt.prompt_text
+    return input_text, ""
+
+
+# ---- Stages ----
+# Each function is one Stage's run (or run_async): it reads the stage's
+# inputs from the launch state and sets its outputs there. The async
+# twins await Grok on the event loop and do their DB work through
+# run_blocking().
+
+
+def _source_list_stage(state, ctx):
+    """Grok x_search for the Source List prompt."""
+    models = _prepare_search(state)
+    call = functools.partial(
+        call_grok_with_search, state["prompt_text"], context=state["context_str"],
+        call_stats=state["call_stats"], closer=_request_closer(ctx), **ctx.call_kwargs(),
     )
-    story.refinement_output = refinement_output
-
-    # ---- Step 2: Amy Bot Validation ----
-    amy_input = f"{amy_prompt.prompt_text}\n\n---\n\nPitch to review:\n{refinement_output}"
-    story.amy_bot_input = amy_input
-    amy_output = _run_grok_step(
-        story=story,
-        prompt=amy_prompt,
-        step_type="amy-bot",
-        input_text=amy_input,
+    start_ms = int(time.time() * 1000)
+    try:
+        output = call_with_fallback(call, models, step_slo_ms("source-list"),
+                                    state["call_stats"], ctx.deadline)
+    except GrokAPIError as exc:
+        _fail_source_list(state, ctx, exc, start_ms)
+        raise
+    state["source_list_output"] = output
+    state["duration_ms"] = int(time.time() * 1000) - start_ms
+
+
+async def _source_list_stage_async(client, state, ctx):
+    """Async _source_list_stage."""
+    models = await run_blocking(_prepare_search, state)
+    call = functools.partial(
+        client.call_grok_with_search, state["prompt_text"], context=state["context_str"],
+        call_stats=state["call_stats"], **ctx.call_kwargs(),
     )
+    start_ms = int(time.time() * 1000)
+    try:
+        output = await call_with_fallback_async(call, models, step_slo_ms("source-list"),
+                                                state["call_stats"], ctx.deadline)
+    except GrokAPIError as exc:
+        await run_blocking(_fail_source_list, state, ctx, exc, start_ms)
+        raise
+    state["source_list_output"] = output
+    state["duration_ms"] = int(time.time() * 1000) - start_ms
+
+
+def _prepare_search(state):
+    """The Source List models, committed before the search goes out."""
+    models = resolve_models("source-list", state["prompt"])
+    state["call_stats"] = {}
+    commit_before_io()
+    return models
+
+
+def _fail_source_list(state, ctx, exc, start_ms):
+    """Mark the Source List run failed (unless it was cancelled meanwhile)."""
+    ctx.control.check(state["run"])
+    _fail_run(state["run"], exc, int(time.time() * 1000) - start_ms, state["call_stats"])
+    db.session.commit()
+
+
+def _enrichment_stage(state, ctx):
+    """Best-effort URL enrichment of the Source List output (on a thread when async)."""
+    commit_before_io()  # Nothing is held open while pages are fetched
+    state["url_enrichments"] = _enrich(state["source_list_output"], ctx.deadline)
+
+
+def _enrich(output, deadline):
+    """enrich_urls(), with a failure logged and ignored."""
+    try:
+        return enrich_urls(output, deadline=deadline)
+    except Exception as enrich_exc:
+        logger.warning("[--] URL enrichment failed: %s", enrich_exc)
+        return None
+
+
+def _refinement_stage(state, ctx):
+    """Refinement (PAPA or PSST); a resume reuses its checkpoint."""
+    output, material, input_text = _refinement_input(state)
+    if output is None:
+        output = _run_grok_step(state["story"], state["refinement_prompt"], "refinement",
+                                input_text, ctx, state["bypass_cache"], material)
+    state["story"].refinement_output = state["refinement_output"] = output
+
+
+async def _refinement_stage_async(client, state, ctx):
+    """Async _refinement_stage."""
+    output, material, input_text = await run_blocking(_refinement_input, state)
+    if output is None:
+        output = await _run_grok_step_async(client, state["story"], state["refinement_prompt"],
+                                            "refinement", input_text, ctx,
+                                            state["bypass_cache"], material)
+    state["story"].refinement_output = state["refinement_output"] = output
+
+
+def _refinement_input(state):
+    """
+    Stamp the refinement input on the story.
+
+    Returns (checkpoint output or None, material, input_text).
+    """
+    story, prompt = state["story"], state["refinement_prompt"]
+    material = _build_refinement_material(story, state["selected_story"])
+    story.refinement_input = input_text = _join_prompt(prompt, material)
+    if state["refinement_run"]:
+        logger.info("[--] Reusing completed refinement (story_id=%d)", story.id)
+        return state["refinement_run"].output_text, material, input_text
+    return None, material, input_text
+
+
+def _amy_bot_stage(state, ctx):
+    """Amy Bot validation of the refined pitch; a resume reuses its checkpoint."""
+    output, material, input_text = _amy_bot_input(state)
+    if output is None:
+        output = _run_grok_step(state["story"], state["amy_prompt"], "amy-bot", input_text,
+                                ctx, state["bypass_cache"], material)
+    state["amy_output"] = output
+
+
+async def _amy_bot_stage_async(client, state, ctx):
+    """Async _amy_bot_stage."""
+    output, material, input_text = await run_blocking(_amy_bot_input, state)
+    if output is None:
+        output = await _run_grok_step_async(client, state["story"], state["amy_prompt"],
+                                            "amy-bot", input_text, ctx,
+                                            state["bypass_cache"], material)
+    state["amy_output"] = output
+
+
+def _amy_bot_input(state):
+    """
+    Stamp the Amy Bot input on the story.
+
+    Returns (checkpoint output or None, material, input_text).
+    """
+    story, prompt = state["story"], state["amy_prompt"]
+    material = _build_amy_material(state["refinement_output"])
+    story.amy_bot_input = input_text = _join_prompt(prompt, material)
+    if state["amy_run"]:
+        logger.info("[--] Reusing completed Amy Bot (story_id=%d)", story.id)
+        return state["amy_run"].output_text, material, input_text
+    return None, material, input_text
+
+
+def _decision_stage(state, ctx):
+    """Parse Amy Bot's decision: APPROVE → cms-push, REJECT → kill."""
+    story, amy_output = state["story"], state["amy_output"]
+    # A resume does not re-apply (or re-push) a decision already made
+    state["decided"] = state["amy_run"] is not None and _decision_applied(story, amy_output)
     story.amy_bot_output = amy_output
+    if state["decided"]:
+        state["is_valid"] = bool(story.is_valid)
+        return
 
-    # ---- Step 3: Parse Decision ----
     is_valid = parse_decision(amy_output)
     story.is_valid = is_valid
-
     if is_valid:
         story.validation_decision = "APPROVE"
-        cms_response = cms_service.push_to_cms(story)
-        story.pushed_to_cms = True
-        story.cms_push_date = datetime.now(timezone.utc)
-        story.cms_response = str(cms_response)
-        logger.info("[OK] Pipeline APPROVED: story_id=%d", story.id)
     else:
         # Kill it. Log. Do nothing else.
         story.validation_decision = "REJECT"
         story.is_valid = False
         logger.info("[--] Pipeline REJECTED: story_id=%d (story killed)", story.id)
+    state["is_valid"] = is_valid
 
-    db.session.commit()
 
-    return story.to_dict()
+def _cms_push_stage(state, ctx):
+    """Push an approved story to the CMS."""
+    story = state["story"]
+    state["cms_response"] = None
+    if state["decided"] or not state["is_valid"]:
+        return
+    # The decision is durable before the CMS call, which holds no connection
+    commit_before_io()
+    cms_response = cms_service.push_to_cms(story)
+    story.pushed_to_cms = True
+    story.cms_push_date = datetime.now(timezone.utc)
+    story.cms_response = str(cms_response)
+    state["cms_response"] = cms_response
+    logger.info("[OK] Pipeline APPROVED: story_id=%d", story.id)
+
+
+# Stage declarations. Stages without run_async (enrichment, decision,
+# cms-push) run on a thread under GrokAsyncExecutor. Concurrency 0 and
+# max_attempts None defer to
+# PIPELINE_STAGE_CONCURRENCY / _MAX_ATTEMPTS and GROK_RETRY_MAX_ATTEMPTS;
+# timeouts are the stages' PIPELINE_STEP_SHARES of the deadline.
+SOURCE_LIST_ENGINE = StageEngine(
+    "source-list",
+    [
+        Stage("source-list", _source_list_stage, run_async=_source_list_stage_async,
+              inputs=("run", "prompt", "prompt_text", "context_str"),
+              outputs=("source_list_output", "duration_ms", "call_stats")),
+        # Best-effort: one fetch per URL, skipped once the deadline passes
+        Stage("enrichment", _enrichment_stage,
+              inputs=("source_list_output",), outputs=("url_enrichments",), max_attempts=1),
+    ],
+    inputs=("run", "prompt", "prompt_text", "context_str"),
+)
+
+PIPELINE_ENGINE = StageEngine(
+    "pipeline",
+    [
+        Stage("refinement", _refinement_stage, run_async=_refinement_stage_async,
+              inputs=("story", "selected_story", "refinement_prompt", "refinement_run",
+                      "bypass_cache"),
+              outputs=("refinement_output",)),
+        Stage("amy-bot", _amy_bot_stage, run_async=_amy_bot_stage_async,
+              inputs=("story", "amy_prompt", "refinement_output", "amy_run", "bypass_cache"),
+              outputs=("amy_output",)),
+        Stage("decision", _decision_stage,
+              inputs=("story", "amy_output", "amy_run"), outputs=("is_valid", "decided"),
+              max_attempts=1),
+        # Not retried: a repeated push could publish the story twice
+        Stage("cms-push", _cms_push_stage,
+              inputs=("story", "is_valid", "decided"), outputs=("cms_response",),
+              max_attempts=1),
+    ],
+    inputs=("story", "selected_story", "refinement_prompt", "amy_prompt", "bypass_cache",
+            "refinement_run", "amy_run"),
+)
 
 
 def _build_refinement_context(story):
@@ -130,7 +676,8 @@ def _build_refinement_context(story):
     return "\n".join(parts)
 
 
-def _run_grok_step(story, prompt, step_type, input_text):
+def _run_grok_step(story, prompt, step_type, input_text, ctx, bypass_cache=False,
+                   material=None):
     """
     Call Grok and log the result as a PipelineRun.
 
@@ -139,13 +686,220 @@ def _run_grok_step(story, prompt, step_type, input_text):
         prompt: Prompt instance used for this step.
         step_type: 'refinement' or 'amy-bot'.
         input_text: The full input sent to Grok.
+        ctx: The stage's StageContext (RunControl, deadline, attempts).
+        bypass_cache: Skip the response cache read (result is still stored).
+        material: Per-story part of input_text; with split assembly it is
+                  sent alone, after the prompt text as system context.
 
     Returns:
         str: Grok response content.
 
     Raises:
         GrokAPIError: If the API call fails (logged and re-raised).
+        PipelineCancelled: If the story is cancelled during the call.
+    """
+    step = _GrokStep(story, prompt, step_type, input_text, bypass_cache, material)
+    if step.cached is not None:
+        return step.cached
+
+    if _streaming_enabled():
+        call = functools.partial(
+            call_grok_stream, step.user_text, context=step.context,
+            on_delta=_PartialOutputWriter(step.run, ctx.control), call_stats=step.call_stats,
+            closer=_request_closer(ctx), **ctx.call_kwargs(),
+        )
+    else:
+        call = functools.partial(
+            call_grok, step.user_text, context=step.context, call_stats=step.call_stats,
+            hedge_after_ms=step.hedge_after_ms, closer=_request_closer(ctx),
+            **ctx.call_kwargs(),
+        )
+    try:
+        output = call_with_fallback(call, step.models, step_slo_ms(step_type), step.call_stats,
+                                    ctx.deadline)
+    except GrokAPIError as exc:
+        step.fail(ctx, exc)
+        raise
+
+    step.complete(ctx, output)
+    return output
+
+
+async def _run_grok_step_async(client, story, prompt, step_type, input_text, ctx,
+                               bypass_cache=False, material=None):
+    """
+    Async _run_grok_step — the same records and commits, with the DB side
+    (_GrokStep) on a thread through run_blocking() and Grok on the loop.
+    """
+    step = await run_blocking(_GrokStep, story, prompt, step_type, input_text, bypass_cache,
+                              material)
+    if step.cached is not None:
+        return step.cached
+
+    if _streaming_enabled():
+        call = functools.partial(
+            client.call_grok_stream, step.user_text, context=step.context,
+            on_delta=_AsyncPartialOutputWriter(step.run, ctx.control),
+            call_stats=step.call_stats, **ctx.call_kwargs(),
+        )
+    else:
+        call = functools.partial(
+            client.call_grok, step.user_text, context=step.context, call_stats=step.call_stats,
+            hedge_after_ms=step.hedge_after_ms, **ctx.call_kwargs(),
+        )
+    try:
+        output = await call_with_fallback_async(call, step.models, step_slo_ms(step_type),
+                                                step.call_stats, ctx.deadline)
+    except GrokAPIError as exc:
+        await run_blocking(step.fail, ctx, exc)
+        raise
+
+    await run_blocking(step.complete, ctx, output)
+    return output
+
+
+class _GrokStep:
+    """
+    The DB side of one refinement or Amy Bot call: its PipelineRun,
+    messages, models, hedge delay and response-cache entry.
+
+    Creating one starts the run, looks the call up in the cache (a hit
+    completes the run; see cached) and commits, so the running run is
+    visible to status polls and no connection is held while Grok works.
     """
+
+    def __init__(self, story, prompt, step_type, input_text, bypass_cache, material):
+        self.prompt = prompt
+        self.step_type = step_type
+        self.run = _start_run(story, prompt, step_type, input_text)
+        self.user_text, self.context = _grok_messages(prompt, input_text, material)
+        self.models = resolve_models(step_type, prompt)
+        self.call_stats = {}
+        self.start_ms = int(time.time() * 1000)
+        self.cache_key, self.cached = _cache_lookup(
+            prompt, self.user_text, self.context, bypass_cache, self.models[0]
+        )
+        self.hedge_after_ms = None
+        if self.cached is not None:
+            self.run.cache_hit = True
+            _complete_run(self.run, self.cached, self._elapsed_ms())
+        else:
+            self.hedge_after_ms = hedge_delay_ms(step_type)  # Queries recent runs
+        commit_before_io()
+
+    def fail(self, ctx, exc):
+        """Commit the run failed (unless it was cancelled meanwhile)."""
+        ctx.control.check(self.run)
+        _fail_run(self.run, exc, self._elapsed_ms(), self.call_stats)
+        db.session.commit()
+
+    def complete(self, ctx, output):
+        """Commit the run completed — a checkpoint — and cache the primary model's output."""
+        ctx.control.check(self.run)  # Cancelled while waiting: discard the answer
+        _complete_run(self.run, output, self._elapsed_ms(), self.call_stats)
+        # Keyed by the primary model: never serve a fallback's answer as its
+        if not self.call_stats.get("fallback_from"):
+            _cache_store(self.cache_key, output, self.prompt, self.step_type, self.models[0])
+        db.session.commit()
+
+    def _elapsed_ms(self):
+        return int(time.time() * 1000) - self.start_ms
+
+
+def commit_before_io():
+    """
+    Commit and hand the DB connection back to the pool before network I/O.
+
+    Loaded objects are not expired, so the step can keep reading them
+    while it waits on xAI (or the CMS) without silently opening a new
+    transaction and holding a connection idle for the whole call.
+    """
+    session = db.session()
+    session.expire_on_commit = False
+    try:
+        session.commit()
+    finally:
+        session.expire_on_commit = True
+
+
+def _streaming_enabled():
+    """True when GROK_STREAMING_ENABLED is on."""
+    return bool(current_app.config.get("GROK_STREAMING_ENABLED"))
+
+
+def _request_closer(ctx):
+    """A RequestCloser that the launch's RunControl closes on interrupt()."""
+    closer = RequestCloser()
+    ctx.control.on_interrupt(closer.close)
+    return closer
+
+
+class _PartialOutputWriter:
+    """
+    on_delta callback for streamed steps.
+
+    Copies the text so far onto the running PipelineRun and commits, at
+    most once per GROK_STREAM_FLUSH_MS. The first delta is written at once.
+    Each write is its own short transaction.
+
+    With a RunControl, a cancel raises PipelineCancelled out of the
+    stream, closing its connection: a cancel in this process on the next
+    delta, one from any process at the next flush.
+    """
+
+    def __init__(self, run, control=None):
+        self.run = run
+        self.control = control
+        self.flush_ms = current_app.config.get("GROK_STREAM_FLUSH_MS") or 0
+        self._last_flush = None
+
+    def __call__(self, text):
+        if self._due():
+            self._flush(text)
+
+    def _due(self):
+        """True if a write is due (raises at once on a local cancel)."""
+        if self.control is not None:
+            self.control.check_local()
+        now = time.monotonic()
+        if self._last_flush is not None and (now - self._last_flush) * 1000 < self.flush_ms:
+            return False
+        self._last_flush = now
+        return True
+
+    def _flush(self, text):
+        if self.control is not None:
+            self.control.check(self.run)
+        self.run.output_text = text
+        commit_before_io()  # The stream is still open
+
+
+class _AsyncPartialOutputWriter(_PartialOutputWriter):
+    """_PartialOutputWriter for AsyncGrokClient: each write goes through run_blocking()."""
+
+    async def __call__(self, text):
+        if self._due():
+            await run_blocking(self._flush, text)
+
+
+def _cache_lookup(prompt, input_text, context, bypass_cache, model):
+    """Return (cache_key, cached_output) — both None when caching is off."""
+    if not grok_cache_service.is_enabled():
+        return None, None
+    cache_key = grok_cache_service.chat_cache_key(input_text, prompt, context=context, model=model)
+    return cache_key, grok_cache_service.lookup(cache_key, bypass=bypass_cache)
+
+
+def _cache_store(cache_key, output, prompt, step_type, model):
+    """Save a fresh Grok response when caching is on."""
+    if cache_key:
+        grok_cache_service.store(
+            cache_key, output, prompt=prompt, step_type=step_type, model=model
+        )
+
+
+def _start_run(story, prompt, step_type, input_text):
+    """Claim the route's placeholder run for this step, or create one."""
     # Reuse existing placeholder run if one exists (created by route for status tracking)
     run = PipelineRun.query.filter_by(
         story_id=story.id, step_type=step_type, status="running"
@@ -162,26 +916,35 @@ def _run_grok_step(story, prompt, step_type, input_text):
             input_text=input_text,
         )
         db.session.add(run)
-    db.session.flush()
+    return run
 
-    start_ms = int(time.time() * 1000)
-    try:
-        output = call_grok(input_text)
-        duration_ms = int(time.time() * 1000) - start_ms
-
-        run.output_text = output
-        run.status = "completed"
-        run.duration_ms = duration_ms
-        run.completed_at = datetime.now(timezone.utc)
-        db.session.flush()
-
-        return output
-
-    except GrokAPIError:
-        duration_ms = int(time.time() * 1000) - start_ms
-        run.status = "failed"
-        run.error_message = str(GrokAPIError)
-        run.duration_ms = duration_ms
-        run.completed_at = datetime.now(timezone.utc)
-        db.session.flush()
-        raise
+
+def _complete_run(run, output, duration_ms, call_stats=None):
+    """Mark a PipelineRun completed with its output, timing and retries."""
+    run.output_text = output
+    run.status = "completed"
+    run.duration_ms = duration_ms
+    run.completed_at = datetime.now(timezone.utc)
+    record_call_stats(run, call_stats)
+
+
+def _fail_run(run, exc, duration_ms, call_stats=None):
+    """Mark a PipelineRun failed with the error, timing and retries."""
+    run.status = "failed"
+    run.error_message = str(exc)
+    run.duration_ms = duration_ms
+    run.completed_at = datetime.now(timezone.utc)
+    record_call_stats(run, call_stats)
+
+
+def record_call_stats(run, call_stats):
+    """Copy grok_service call accounting (retries, model, tokens) onto the run."""
+    if call_stats:
+        run.attempts = call_stats.get("attempts")
+        run.backoff_ms = call_stats.get("backoff_ms")
+        run.model = call_stats.get("model")
+        run.prompt_tokens = call_stats.get("prompt_tokens")
+        run.completion_tokens = call_stats.get("completion_tokens")
+        run.cached_tokens = call_stats.get("cached_tokens")
+        run.reasoning_tokens = call_stats.get("reasoning_tokens")
+        run.hedged = bool(call_stats.get("hedged"))
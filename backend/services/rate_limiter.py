@@ -0,0 +1,288 @@
+"""
+xAI rate limiter — token bucket + adaptive concurrency shared by all workers.
+
+Every gunicorn worker and pipeline worker (worker.py) on the host
+coordinates through one small JSON state file guarded by an fcntl lock,
+so the limits apply to the whole container rather than to each worker
+separately. They do not reach other machines or containers: those would
+each keep their own file, and dead-lease checks use PIDs, which mean
+nothing across PID namespaces.
+
+Two gates must both pass before a Grok request is sent:
+  - Token bucket: at most `rate` requests/second on average, `burst` at once
+  - Concurrency: at most `limit` requests in flight across all workers
+
+The concurrency limit adapts AIMD-style: a 429 halves it (at most once per
+cooldown window, so one burst of 429s counts once), and each success (a
+200 response) grows it by 1/limit — roughly +1 per round of successful
+calls. Other failures (5xx, timeouts, transport errors) release their
+slot without moving the limit.
+
+Leases held by a dead process, or older than the lease TTL, are reclaimed
+so a crashed worker cannot shrink capacity forever.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover — non-POSIX dev machines
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Lease.release() outcomes for the AIMD loop
+SUCCESS = "success"      # 200 response: grow the limit
+THROTTLED = "throttled"  # 429: halve the limit
+NEUTRAL = "neutral"      # Any other failure: leave the limit alone
+
+
+class RateLimiterTimeout(Exception):
+    """Raised when a slot could not be acquired within the wait timeout."""
+
+
+class Lease:
+    """One granted request slot. Call release() exactly once."""
+
+    def __init__(self, limiter, lease_id):
+        self._limiter = limiter
+        self.lease_id = lease_id
+        self._released = False
+
+    def release(self, outcome=NEUTRAL):
+        """Return the slot, reporting SUCCESS, THROTTLED or NEUTRAL to the AIMD loop."""
+        if self._released:
+            return
+        self._released = True
+        self._limiter._release(self.lease_id, outcome)
+
+    async def release_async(self, outcome=NEUTRAL):
+        """release() for coroutines: the state-file update runs on a thread."""
+        if self._released:
+            return
+        await asyncio.to_thread(self.release, outcome)
+
+
+class XAIRateLimiter:
+    """Cross-process token bucket + AIMD concurrency limiter."""
+
+    def __init__(self, state_path, rate_per_second=5.0, burst=10,
+                 min_concurrency=1, max_concurrency=32, initial_concurrency=8,
+                 wait_timeout=120.0, lease_ttl=300.0, cooldown=2.0,
+                 poll_interval=0.05):
+        self.state_path = state_path
+        self.rate_per_second = float(rate_per_second)
+        self.burst = float(burst)
+        self.min_concurrency = float(min_concurrency)
+        self.max_concurrency = float(max_concurrency)
+        self.initial_concurrency = float(
+            min(max(initial_concurrency, min_concurrency), max_concurrency)
+        )
+        self.wait_timeout = wait_timeout
+        self.lease_ttl = lease_ttl
+        self.cooldown = cooldown
+        self.poll_interval = poll_interval
+        self._thread_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a limiter from GROK_RATE_LIMIT_* / GROK_CONCURRENCY_* settings."""
+        return cls(
+            state_path=config.get("GROK_RATE_LIMIT_STATE_PATH"),
+            rate_per_second=config.get("GROK_RATE_LIMIT_PER_SECOND") or 5,
+            burst=config.get("GROK_RATE_LIMIT_BURST") or 10,
+            min_concurrency=config.get("GROK_CONCURRENCY_MIN") or 1,
+            max_concurrency=config.get("GROK_CONCURRENCY_MAX") or 32,
+            initial_concurrency=config.get("GROK_CONCURRENCY_INITIAL") or 8,
+            wait_timeout=config.get("GROK_RATE_LIMIT_WAIT_SECONDS") or 120,
+            lease_ttl=(config.get("GROK_TIMEOUT_SECONDS") or 60) * 5,
+        )
+
+    # ---- Acquire / release ----
+
+    def acquire(self, timeout=None):
+        """Block until a slot is granted. Raises RateLimiterTimeout."""
+        deadline = time.monotonic() + (self.wait_timeout if timeout is None else timeout)
+        self._update_waiting(+1)
+        try:
+            while True:
+                lease = self.try_acquire()
+                if lease:
+                    return lease
+                if time.monotonic() >= deadline:
+                    raise RateLimiterTimeout("Timed out waiting for xAI rate limiter")
+                time.sleep(self.poll_interval)
+        finally:
+            self._update_waiting(-1)
+
+    async def acquire_async(self, timeout=None):
+        """
+        acquire() for the asyncio client — waits without blocking the loop.
+        The locked state-file reads and writes run on the loop's default
+        thread pool, so a slow flock never stalls other coroutines.
+        """
+        deadline = time.monotonic() + (self.wait_timeout if timeout is None else timeout)
+        await asyncio.to_thread(self._update_waiting, +1)
+        try:
+            while True:
+                lease = await asyncio.to_thread(self.try_acquire)
+                if lease:
+                    return lease
+                if time.monotonic() >= deadline:
+                    raise RateLimiterTimeout("Timed out waiting for xAI rate limiter")
+                await asyncio.sleep(self.poll_interval)
+        finally:
+            await asyncio.to_thread(self._update_waiting, -1)
+
+    def try_acquire(self):
+        """Grant a slot if both gates are open, else return None."""
+        with self._state() as state:
+            if len(state["leases"]) >= int(state["limit"]) or state["tokens"] < 1:
+                return None
+            lease_id = uuid.uuid4().hex
+            state["tokens"] -= 1
+            state["leases"][lease_id] = {"pid": os.getpid(), "at": time.time()}
+            state["granted_total"] += 1
+            return Lease(self, lease_id)
+
+    def _release(self, lease_id, outcome):
+        with self._state() as state:
+            state["leases"].pop(lease_id, None)
+            now = time.time()
+            if outcome == THROTTLED:
+                state["throttled_total"] += 1
+                if now - state["last_decrease"] >= self.cooldown:
+                    old = state["limit"]
+                    state["limit"] = max(self.min_concurrency, old / 2)
+                    state["last_decrease"] = now
+                    logger.warning(
+                        "[--] xAI 429 — concurrency limit %.1f -> %.1f",
+                        old, state["limit"],
+                    )
+            elif outcome == SUCCESS:
+                state["limit"] = min(
+                    self.max_concurrency, state["limit"] + 1 / max(state["limit"], 1)
+                )
+
+    def _update_waiting(self, delta):
+        with self._state() as state:
+            pid = str(os.getpid())
+            count = state["waiting"].get(pid, 0) + delta
+            if count > 0:
+                state["waiting"][pid] = count
+            else:
+                state["waiting"].pop(pid, None)
+
+    # ---- Admin visibility ----
+
+    def snapshot(self):
+        """Current shared limits, in-flight count and queue depth."""
+        with self._state() as state:
+            return {
+                "concurrency_limit": round(state["limit"], 2),
+                "concurrency_min": self.min_concurrency,
+                "concurrency_max": self.max_concurrency,
+                "in_flight": len(state["leases"]),
+                "queue_depth": sum(state["waiting"].values()),
+                "tokens": round(state["tokens"], 2),
+                "rate_per_second": self.rate_per_second,
+                "burst": self.burst,
+                "granted_total": state["granted_total"],
+                "throttled_total": state["throttled_total"],
+            }
+
+    # ---- Shared state file ----
+
+    def _initial_state(self):
+        return {
+            "tokens": self.burst,
+            "refilled_at": time.time(),
+            "limit": self.initial_concurrency,
+            "last_decrease": 0.0,
+            "leases": {},
+            "waiting": {},
+            "granted_total": 0,
+            "throttled_total": 0,
+        }
+
+    @contextmanager
+    def _state(self):
+        """Lock, load, refill and prune the shared state; write it back on exit."""
+        with self._thread_lock:
+            fd = os.open(self.state_path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if fcntl:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                with os.fdopen(os.dup(fd), "r+") as fh:
+                    raw = fh.read()
+                    try:
+                        state = json.loads(raw) if raw else self._initial_state()
+                    except ValueError:
+                        state = self._initial_state()
+                    self._refill(state)
+                    self._prune(state)
+                    yield state
+                    fh.seek(0)
+                    fh.truncate()
+                    json.dump(state, fh)
+            finally:
+                if fcntl:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+
+    def _refill(self, state):
+        now = time.time()
+        elapsed = max(0.0, now - state["refilled_at"])
+        state["tokens"] = min(self.burst, state["tokens"] + elapsed * self.rate_per_second)
+        state["refilled_at"] = now
+
+    def _prune(self, state):
+        now = time.time()
+        for lease_id, lease in list(state["leases"].items()):
+            if now - lease["at"] > self.lease_ttl or not _pid_alive(lease["pid"]):
+                del state["leases"][lease_id]
+        for pid in list(state["waiting"]):
+            if not _pid_alive(int(pid)):
+                del state["waiting"][pid]
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+_limiter_lock = threading.Lock()
+_limiter = None
+_limiter_key = None
+
+
+def get_rate_limiter(config):
+    """Return the process's limiter for this config, or None if disabled."""
+    global _limiter, _limiter_key
+
+    if not config.get("GROK_RATE_LIMIT_ENABLED"):
+        return None
+    key = (
+        config.get("GROK_RATE_LIMIT_STATE_PATH"),
+        config.get("GROK_RATE_LIMIT_PER_SECOND"),
+        config.get("GROK_RATE_LIMIT_BURST"),
+        config.get("GROK_CONCURRENCY_MIN"),
+        config.get("GROK_CONCURRENCY_MAX"),
+        config.get("GROK_CONCURRENCY_INITIAL"),
+    )
+    with _limiter_lock:
+        if _limiter is None or _limiter_key != key:
+            _limiter = XAIRateLimiter.from_config(config)
+            _limiter_key = key
+        return _limiter
@@ -0,0 +1,165 @@
+"""
+Cancellation of pipeline launches.
+
+Cancelling (DELETE /api/pipeline/run/<story_id>, DELETE
+/api/pipeline/batch/<batch_id>) is recorded in the database, so it
+reaches workers in every process:
+  - The story's queued and running Jobs become "cancelled"; queued work
+    never starts.
+  - Its running PipelineRuns become "cancelled" and Story.cancelled_at is
+    set (launching the story again clears it).
+  - Work in flight stops at its next checkpoint: before each stage, when a
+    Grok call returns, at each streamed-output flush and before the CMS
+    push. Nothing is written or pushed after a cancel.
+
+A launch running in the process that served the cancel is interrupted at
+once: a thread's Grok call has its sockets shut down by the RequestCloser
+it registered (see on_interrupt()), and an "async" executor coroutine is
+cancelled mid-request. A call in another process cannot be interrupted;
+it ends at its next checkpoint or by its stage's deadline
+(services/stage_engine.py), and its answer is discarded.
+"""
+import asyncio
+import logging
+import threading
+from datetime import datetime, timezone
+
+from models import db
+from models.pipeline_run import PipelineRun
+from models.story import Story
+from services.job_queue import cancel_jobs
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_active = {}  # story_id -> set of RunControls running in this process
+
+
+class PipelineCancelled(Exception):
+    """The launch's story was cancelled; stop without writing results."""
+
+
+class RunControl:
+    """
+    Cancellation checks for one launch of a story.
+
+    Use it as a context manager around the launch: while inside, a cancel
+    served by this process interrupts it (see interrupt_local()). Entered
+    from a coroutine, the coroutine's task is cancelled too.
+    """
+
+    def __init__(self, story_id):
+        self.story_id = story_id
+        self._interrupted = threading.Event()
+        self._task = None
+        self._loop = None
+        self._callbacks = []
+
+    def __enter__(self):
+        try:
+            self._task = asyncio.current_task()
+            self._loop = asyncio.get_running_loop()
+        except RuntimeError:
+            pass  # A worker thread, not the event loop
+        with _lock:
+            _active.setdefault(self.story_id, set()).add(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        with _lock:
+            controls = _active.get(self.story_id, set())
+            controls.discard(self)
+            if not controls:
+                _active.pop(self.story_id, None)
+        return False
+
+    def interrupt(self):
+        """Stop this launch as soon as possible."""
+        with _lock:
+            self._interrupted.set()
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            callback()
+        if self._task is not None:
+            self._loop.call_soon_threadsafe(self._task.cancel)
+
+    def on_interrupt(self, callback):
+        """Call callback() on interrupt() (at once if already interrupted)."""
+        with _lock:
+            interrupted = self._interrupted.is_set()
+            if not interrupted:
+                self._callbacks.append(callback)
+        if interrupted:
+            callback()
+
+    def check_local(self):
+        """Raise PipelineCancelled if interrupt() was called (no DB access)."""
+        if self._interrupted.is_set():
+            raise PipelineCancelled(f"Story {self.story_id} was cancelled")
+
+    def is_cancelled(self, run=None):
+        """True if the launch was interrupted, or its story (or run) cancelled in the DB."""
+        if self._interrupted.is_set():
+            return True
+        cancelled_at = (
+            db.session.query(Story.cancelled_at).filter(Story.id == self.story_id).scalar()
+        )
+        if cancelled_at is not None:
+            return True
+        if run is None or run.id is None:
+            return False
+        status = db.session.query(PipelineRun.status).filter(PipelineRun.id == run.id).scalar()
+        return status == "cancelled"
+
+    def check(self, run=None):
+        """Raise PipelineCancelled if is_cancelled(run)."""
+        if self.is_cancelled(run):
+            logger.info("[--] Stopping cancelled launch (story_id=%s)", self.story_id)
+            raise PipelineCancelled(f"Story {self.story_id} was cancelled")
+
+
+def cancel_stories(story_ids, cancelled_by):
+    """
+    Cancel the stories' queued and in-flight work, in the caller's transaction.
+
+    Call interrupt_local() after committing.
+
+    Returns:
+        dict: {"runs": PipelineRuns cancelled, "jobs": Jobs cancelled}
+    """
+    story_ids = list(story_ids)
+    if not story_ids:
+        return {"runs": 0, "jobs": 0}
+    now = datetime.now(timezone.utc)
+    jobs = cancel_jobs(story_ids)
+    runs = PipelineRun.query.filter(
+        PipelineRun.story_id.in_(story_ids), PipelineRun.status == "running"
+    ).all()
+    for run in runs:
+        run.status = "cancelled"
+        run.error_message = f"Cancelled by {cancelled_by}"
+        run.completed_at = now
+    for story in Story.query.filter(Story.id.in_(story_ids)).all():
+        story.cancelled_at = now
+    if runs or jobs:
+        logger.info("[OK] Cancelled %d run(s) and %d job(s) for %d story(ies)",
+                    len(runs), jobs, len(story_ids))
+    return {"runs": len(runs), "jobs": jobs}
+
+
+def cancel_batch(batch, cancelled_by):
+    """cancel_stories() for every story of a batch; stamps the batch too."""
+    story_ids = [sid for (sid,) in db.session.query(Story.id).filter(Story.batch_id == batch.id)]
+    cancelled = cancel_stories(story_ids, cancelled_by)
+    if cancelled["runs"] or cancelled["jobs"]:
+        batch.cancelled_at = datetime.now(timezone.utc)
+    return cancelled
+
+
+def interrupt_local(story_ids):
+    """Interrupt this process's launches of story_ids. Returns how many."""
+    with _lock:
+        controls = [c for sid in story_ids for c in _active.get(sid, ())]
+    for control in controls:
+        control.interrupt()
+    return len(controls)
@@ -0,0 +1,230 @@
+"""
+Pipeline change events — wake status streams when a story or run changes.
+
+Every flush that touches a Story or PipelineRun marks the story as
+changed and bumps stories.version (the status endpoint's ETag). After
+the transaction commits, the story ids are published to this process's
+ChangeHub, which wakes threads blocked in wait_for_change() (the SSE
+stream and long-poll status endpoints).
+
+Across processes (gunicorn workers, worker.py):
+  - PostgreSQL: the same flush issues pg_notify on CHANNEL, delivered
+    at commit. One listener thread per process holds a dedicated
+    LISTEN connection and republishes notifications to its hub, so a
+    step finishing in a worker process wakes streams in the web tier.
+  - Anything else (SQLite in dev/tests): no cross-process signal;
+    waiters fall back to re-checking the DB-change cursor every
+    PIPELINE_EVENTS_POLL_SECONDS.
+
+A waiting stream holds no DB connection and runs no queries until
+something it watches changes.
+"""
+import logging
+import os
+import select
+import threading
+import time
+from collections import OrderedDict
+from itertools import chain
+
+from sqlalchemy import event, text, update
+from sqlalchemy.orm import Session
+
+from models import db
+from models.pipeline_run import PipelineRun
+from models.story import Story
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "pipeline_events"
+
+# Story versions remembered per process; older ones are forgotten
+_MAX_TRACKED = 10000
+
+# Ids per NOTIFY payload (Postgres caps payloads at 8000 bytes)
+_IDS_PER_NOTIFY = 500
+
+_INFO_KEY = "changed_story_ids"
+
+
+class ChangeHub:
+    """Per-process change counter that blocked waiters can sleep on."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self.version = 0
+        self._story_versions = OrderedDict()
+
+    def publish(self, story_ids):
+        with self._cond:
+            self.version += 1
+            for story_id in story_ids:
+                self._story_versions[story_id] = self.version
+                self._story_versions.move_to_end(story_id)
+            while len(self._story_versions) > _MAX_TRACKED:
+                self._story_versions.popitem(last=False)
+            self._cond.notify_all()
+
+    def _changed_since(self, story_ids, seen):
+        if self.version <= seen:
+            return False
+        return any(self._story_versions.get(sid, 0) > seen for sid in story_ids)
+
+    def wait(self, story_ids, seen, timeout):
+        """True once one of story_ids changed after version seen; False on timeout."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while not self._changed_since(story_ids, seen):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+
+_hub = ChangeHub()
+
+
+def current_version():
+    """Hub version to pass to wait_for_change() after reading the DB."""
+    return _hub.version
+
+
+# ---- Publishing (session hooks) ----
+
+def mark_changed(session, story_ids):
+    """
+    Record story ids changed in this transaction and bump their version.
+
+    Called from the flush hook; call it directly after bulk UPDATEs,
+    which bypass flush.
+    """
+    story_ids = {sid for sid in story_ids if sid}
+    if not story_ids:
+        return
+    session.info.setdefault(_INFO_KEY, set()).update(story_ids)
+
+    ordered = sorted(story_ids)
+    connection = session.connection()
+    stories = Story.__table__
+    connection.execute(
+        update(stories)
+        .where(stories.c.id.in_(ordered))
+        # updated_at is kept as-is: it tracks the story row's own fields
+        .values(version=stories.c.version + 1, updated_at=stories.c.updated_at)
+    )
+    if connection.dialect.name != "postgresql":
+        return
+    for i in range(0, len(ordered), _IDS_PER_NOTIFY):
+        payload = ",".join(str(sid) for sid in ordered[i:i + _IDS_PER_NOTIFY])
+        connection.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": CHANNEL, "payload": payload},
+        )
+
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(session, _flush_context):
+    story_ids = set()
+    for obj in chain(session.new, session.dirty):
+        if isinstance(obj, PipelineRun):
+            story_ids.add(obj.story_id)
+        elif isinstance(obj, Story):
+            story_ids.add(obj.id)
+    mark_changed(session, story_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    story_ids = session.info.pop(_INFO_KEY, None)
+    if story_ids:
+        _hub.publish(story_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session):
+    session.info.pop(_INFO_KEY, None)
+
+
+# ---- Cross-process listener (PostgreSQL) ----
+
+_listener = None
+_listener_pid = None
+_listener_lock = threading.Lock()
+
+
+class _PgListener(threading.Thread):
+    """Holds a LISTEN connection and republishes notifications to the hub."""
+
+    def __init__(self, app):
+        super().__init__(daemon=True, name="pipeline-events")
+        self.app = app
+        self.connected = False
+
+    def run(self):
+        while True:
+            try:
+                self._listen()
+            except Exception as exc:
+                logger.warning("[--] Pipeline event listener disconnected: %s", exc)
+            self.connected = False
+            time.sleep(5)
+
+    def _listen(self):
+        import psycopg2.extensions
+
+        with self.app.app_context():
+            raw = db.engine.raw_connection()
+        raw.detach()  # Never returned to the pool
+        conn = raw.dbapi_connection
+        try:
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            conn.cursor().execute(f"LISTEN {CHANNEL}")
+            self.connected = True
+            logger.info("[OK] Listening for pipeline events (pid=%d)", os.getpid())
+            while True:
+                if not select.select([conn], [], [], 60)[0]:
+                    continue
+                conn.poll()
+                story_ids = set()
+                while conn.notifies:
+                    payload = conn.notifies.pop(0).payload
+                    story_ids.update(int(sid) for sid in payload.split(",") if sid)
+                if story_ids:
+                    _hub.publish(story_ids)
+        finally:
+            conn.close()
+
+
+def _ensure_listener(app):
+    """Start this process's listener on first use (again after a fork)."""
+    global _listener, _listener_pid
+    if _listener is not None and _listener_pid == os.getpid():
+        return _listener
+    with app.app_context():
+        if db.engine.dialect.name != "postgresql":
+            return None
+    with _listener_lock:
+        if _listener is None or _listener_pid != os.getpid():
+            _listener = _PgListener(app)
+            _listener_pid = os.getpid()
+            _listener.start()
+    return _listener
+
+
+def listening(app):
+    """True when changes made by other processes wake this one's waiters."""
+    listener = _ensure_listener(app)
+    return listener is not None and listener.connected
+
+
+def wait_for_change(app, story_ids, seen, timeout):
+    """
+    Block until one of story_ids changes after hub version seen.
+
+    Returns True on a change, False after timeout. Without a listener
+    only changes committed in this process are seen, so callers should
+    re-check the database after PIPELINE_EVENTS_POLL_SECONDS.
+    """
+    _ensure_listener(app)
+    return _hub.wait(set(story_ids), seen, timeout)
@@ -0,0 +1,134 @@
+"""
+Stale-run reaper — recovers PipelineRuns left "running" by a lost worker.
+
+A run is stale when it has been "running" with no write (updated_at) for
+PIPELINE_RUN_STALE_SECONDS and no queued or running Job owns its story
+(the job queue reclaims its own jobs; see services/job_queue.py). That
+happens when a "thread" or "async" executor's process dies mid-run, or
+a job ends without settling its runs.
+
+For each story with stale runs:
+  - Refinement / Amy Bot: enqueue a "pipeline-resume" job, which picks
+    up after the last completed step (pipeline_service.resume_pipeline),
+    at most PIPELINE_RESUME_MAX_ATTEMPTS times per story.
+  - Anything else (Source List, no recorded selection, out of resume
+    attempts): mark the runs failed.
+
+reap_stale_runs() runs every PIPELINE_REAPER_INTERVAL_SECONDS on each
+job pool's maintenance thread. On Postgres the candidate rows are
+locked with SKIP LOCKED and touched before commit, so pools in several
+processes never act on the same run twice.
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from sqlalchemy import func, select
+
+from models import db
+from models.job import Job
+from models.pipeline_run import PipelineRun
+from models.story import Story
+from services.job_queue import enqueue, notify_pool
+
+logger = logging.getLogger(__name__)
+
+RESUME_JOB_TYPE = "pipeline-resume"
+
+# Steps a resume can pick up from a checkpoint
+_RESUMABLE_STEPS = ("refinement", "amy-bot")
+
+# Stale runs handled per pass
+_REAP_LIMIT = 100
+
+
+def stale_cutoff():
+    """Runs with no write since this time (and still "running") are stale."""
+    seconds = current_app.config.get("PIPELINE_RUN_STALE_SECONDS") or 900
+    return datetime.now(timezone.utc) - timedelta(seconds=seconds)
+
+
+def is_stale(run):
+    """True if a running run has had no write since stale_cutoff()."""
+    last = run.updated_at or run.started_at
+    if last is not None and last.tzinfo is None:
+        last = last.replace(tzinfo=timezone.utc)  # SQLite returns naive UTC
+    return last is None or last < stale_cutoff()
+
+
+def story_owned_by_job(story_id):
+    """True while a queued or running Job is responsible for the story."""
+    return db.session.query(
+        select(Job.id)
+        .where(Job.story_id == story_id, Job.status.in_(("queued", "running")))
+        .exists()
+    ).scalar()
+
+
+def reap_stale_runs():
+    """
+    Resume or fail stale running PipelineRuns.
+
+    Returns:
+        dict: {"resumed": stories re-queued, "failed": runs failed}
+    """
+    now = datetime.now(timezone.utc)
+    owned = (
+        select(Job.id)
+        .where(Job.story_id == PipelineRun.story_id, Job.status.in_(("queued", "running")))
+        .exists()
+    )
+    query = (
+        PipelineRun.query
+        .filter(
+            PipelineRun.status == "running",
+            func.coalesce(PipelineRun.updated_at, PipelineRun.started_at) < stale_cutoff(),
+            ~owned,
+        )
+        .order_by(PipelineRun.id)
+        .limit(_REAP_LIMIT)
+    )
+    if db.engine.dialect.name == "postgresql":
+        query = query.with_for_update(skip_locked=True, of=PipelineRun)
+    runs = query.all()
+    if not runs:
+        db.session.rollback()
+        return {"resumed": 0, "failed": 0}
+
+    by_story = {}
+    for run in runs:
+        by_story.setdefault(run.story_id, []).append(run)
+
+    resumed = failed = 0
+    for story_id, story_runs in by_story.items():
+        if _can_resume(story_id, story_runs):
+            for run in story_runs:
+                run.updated_at = now  # Fresh again: the resume job claims it
+            # Recovery is background work: it must not delay interactive launches
+            enqueue(RESUME_JOB_TYPE, {"story_id": story_id}, story_id=story_id, commit=False,
+                    lane="bulk")
+            resumed += 1
+            logger.warning("[--] Resuming stalled pipeline (story_id=%s)", story_id)
+            continue
+        for run in story_runs:
+            run.status = "failed"
+            run.error_message = "Stalled: no progress before the deadline (worker lost)"
+            run.completed_at = now
+            failed += 1
+        logger.error("[ERR] Failed %d stalled run(s) (story_id=%s)", len(story_runs), story_id)
+
+    db.session.commit()
+    if resumed:
+        notify_pool()
+    return {"resumed": resumed, "failed": failed}
+
+
+def _can_resume(story_id, runs):
+    """True if the story's stale runs can be picked up by resume_pipeline."""
+    if story_id is None or any(run.step_type not in _RESUMABLE_STEPS for run in runs):
+        return False
+    story = db.session.get(Story, story_id)
+    if story is None or not story.selected_story or not story.refinement_prompt_id:
+        return False
+    resumes = Job.query.filter_by(story_id=story_id, job_type=RESUME_JOB_TYPE).count()
+    return resumes < (current_app.config.get("PIPELINE_RESUME_MAX_ATTEMPTS") or 0)
@@ -0,0 +1,386 @@
+"""
+Stage engine — a pipeline as a declared sequence of stages.
+
+Each Stage declares the story state it reads (inputs) and writes
+(outputs), how many stories may be in it at once (concurrency), the
+attempts its Grok calls get (max_attempts) and its time budget
+(timeout). StageEngine checks at import that every stage's inputs are
+provided by the launch or an earlier stage, then runs one story through
+the stages in order: run_one() on a thread, run_one_async() on
+GrokAsyncExecutor's loop.
+
+A stage's concurrency is a limit for the whole process, shared by every
+story running through it — batch threads, job workers and coroutines
+alike. A story that finds its next stage full waits for a slot holding
+only a thread (or a coroutine), no DB connection and no Grok slot, while
+the stories ahead of it keep every stage busy. With enough stories in
+flight (JOB_WORKERS, BATCH_MAX_CONCURRENCY), stages overlap and
+throughput is set by the slowest stage's capacity (concurrency over
+latency) instead of by the sum of every stage's latency. Concurrency 0
+means no limit beyond the workers running the stories.
+
+Budgets: a stage's timeout defaults to its PIPELINE_STEP_SHARES share of
+PIPELINE_DEADLINE_SECONDS, and a launch's budget is the sum of its
+stages' timeouts, counted from run_one(). A stage's clock starts when the
+story gets a slot, time a stage leaves unused carries over to the
+story's next stage, and no stage runs past the launch's deadline — so
+time spent waiting for a busy stage is charged to the launch, and a
+story whose launch deadline passes while it waits for a slot fails with
+a 504 GrokAPIError. Grok calls, retries and model fallbacks stop at the
+stage's Deadline.
+
+Before each stage the launch's RunControl is checked, so a cancelled
+story never starts another stage (services/run_control.py).
+
+On the event loop, blocking work — DB queries and commits, the
+cancel check, stages without run_async — runs through run_blocking()
+on the loop's default thread pool, so one slow database round trip
+does not stall every in-flight coroutine.
+
+get_stage_stats() reports each stage's occupancy, queue and latency for
+GET /api/admin/jobs/stats; the stage with waiting stories is the one to
+give more capacity.
+"""
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+
+from flask import current_app
+
+from services.grok_service import GrokAPIError
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_gates = {}  # (stage name, limit) -> threading.BoundedSemaphore
+_async_gates = weakref.WeakKeyDictionary()  # event loop -> {(stage name, limit): Semaphore}
+_stats = {}  # stage name -> counters
+
+
+class Deadline:
+    """The time (time.monotonic()) one stage must finish by."""
+
+    def __init__(self, expires_at, step_type):
+        self.expires_at = expires_at
+        self.step_type = step_type
+
+    def remaining(self):
+        """Seconds left; zero or less once the deadline has passed."""
+        return self.expires_at - time.monotonic()
+
+
+class Stage:
+    """
+    One declared step of a pipeline.
+
+    Args:
+        name: Step type — the PipelineRun step_type and the key for
+            models, SLOs, shares and the settings below.
+        run: run(state, ctx); reads its inputs from the state dict and
+            sets its outputs on it. Blocking: it may use the DB session.
+        inputs: State keys the stage reads.
+        outputs: State keys the stage sets.
+        run_async: Optional coroutine twin, run_async(client, state, ctx),
+            for GrokAsyncExecutor; it does its DB work through
+            run_blocking(). Without one, run_one_async() calls run on a
+            thread.
+        concurrency: Stories in the stage at once per process (0 = no
+            limit). PIPELINE_STAGE_CONCURRENCY[name] overrides.
+        max_attempts: Attempts per Grok call (None = GROK_RETRY_MAX_ATTEMPTS).
+            PIPELINE_STAGE_MAX_ATTEMPTS[name] overrides.
+        timeout: Seconds the stage may take (None = its share of
+            PIPELINE_DEADLINE_SECONDS; no deadline without a share).
+    """
+
+    def __init__(self, name, run, inputs=(), outputs=(), run_async=None,
+                 concurrency=0, max_attempts=None, timeout=None):
+        self.name = name
+        self.run = run
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.run_async = run_async
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+
+    def settings(self, config):
+        """(concurrency, max_attempts, timeout seconds or None) under config."""
+        concurrency = (config.get("PIPELINE_STAGE_CONCURRENCY") or {}).get(
+            self.name, self.concurrency
+        )
+        max_attempts = (config.get("PIPELINE_STAGE_MAX_ATTEMPTS") or {}).get(
+            self.name, self.max_attempts
+        )
+        timeout = self.timeout
+        if timeout is None:
+            share = (config.get("PIPELINE_STEP_SHARES") or {}).get(self.name)
+            total = config.get("PIPELINE_DEADLINE_SECONDS") or 0
+            timeout = total * share if share and total else None
+        return int(concurrency or 0), max_attempts, timeout
+
+    def __repr__(self):
+        return f"<Stage {self.name}>"
+
+
+class StageContext:
+    """What a stage gets besides the story state: its settings for this story."""
+
+    def __init__(self, stage, control, deadline, max_attempts):
+        self.stage = stage
+        self.control = control
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+
+    def call_kwargs(self):
+        """Extra kwargs for the stage's Grok call (its max_attempts, if set)."""
+        return {"max_attempts": self.max_attempts} if self.max_attempts else {}
+
+
+class StageEngine:
+    """
+    Runs stories through stages, in order.
+
+    Args:
+        name: Pipeline name for log lines.
+        stages: The Stages, in order.
+        inputs: State keys the launch provides.
+
+    Raises:
+        ValueError: If a stage reads a key nothing before it provides,
+            or two stages share a name.
+    """
+
+    def __init__(self, name, stages, inputs=()):
+        self.name = name
+        self.stages = tuple(stages)
+        self.inputs = tuple(inputs)
+        available = set(self.inputs)
+        names = set()
+        for stage in self.stages:
+            if stage.name in names:
+                raise ValueError(f"{name}: duplicate stage {stage.name}")
+            names.add(stage.name)
+            missing = [key for key in stage.inputs if key not in available]
+            if missing:
+                raise ValueError(f"{name}: stage {stage.name} reads {missing}, set by no earlier stage")
+            available.update(stage.outputs)
+
+    def run_one(self, state, control):
+        """
+        Run one story through every stage on this thread.
+
+        Args:
+            state: Dict with the engine's inputs; stages add their outputs.
+            control: The launch's RunControl.
+
+        Raises:
+            PipelineCancelled: If the story is cancelled.
+            GrokAPIError: 504 if the launch's deadline passes while the
+                story waits for a stage's slot.
+            Whatever a stage raises (later stages do not run).
+        """
+        self._check_inputs(state)
+        config = current_app.config
+        launch = self._launch_deadline(config)
+        carry = 0
+        for stage in self.stages:
+            concurrency, max_attempts, timeout = stage.settings(config)
+            with _stage_slot(stage.name, concurrency, launch):
+                control.check()
+                ctx = StageContext(stage, control, _deadline(stage, timeout, carry, launch),
+                                   max_attempts)
+                with _timed(stage.name):
+                    stage.run(state, ctx)
+            carry = _carry(ctx.deadline)
+        return state
+
+    async def run_one_async(self, client, state, control):
+        """
+        run_one() on the event loop. Cancel checks and stages without
+        run_async go through run_blocking(), so no DB round trip stalls
+        the loop's other coroutines.
+        """
+        self._check_inputs(state)
+        config = current_app.config
+        launch = self._launch_deadline(config)
+        carry = 0
+        for stage in self.stages:
+            concurrency, max_attempts, timeout = stage.settings(config)
+            async with _stage_slot_async(stage.name, concurrency, launch):
+                await run_blocking(control.check)
+                ctx = StageContext(stage, control, _deadline(stage, timeout, carry, launch),
+                                   max_attempts)
+                with _timed(stage.name):
+                    if stage.run_async is not None:
+                        await stage.run_async(client, state, ctx)
+                    else:
+                        await run_blocking(stage.run, state, ctx)
+            carry = _carry(ctx.deadline)
+        return state
+
+    def _launch_deadline(self, config):
+        """The launch's Deadline: the sum of its stages' timeouts from now (None if none)."""
+        budget = sum(stage.settings(config)[2] or 0 for stage in self.stages)
+        return Deadline(time.monotonic() + budget, self.name) if budget else None
+
+    def _check_inputs(self, state):
+        missing = [key for key in self.inputs if key not in state]
+        if missing:
+            raise ValueError(f"{self.name}: launch state is missing {missing}")
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """
+    Run blocking work (DB queries and commits, file I/O) for a coroutine on
+    the loop's default thread pool, in the coroutine's context — its app
+    context and so its DB session.
+
+    If the coroutine is cancelled meanwhile, the work is finished before
+    CancelledError is raised, so the coroutine's cleanup never uses the
+    session at the same time as the thread.
+    """
+    future = asyncio.ensure_future(asyncio.to_thread(fn, *args, **kwargs))
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        await asyncio.wait([future])
+        raise
+
+
+def _deadline(stage, timeout, carry, launch):
+    """
+    The stage's Deadline from now, with what earlier stages left unused,
+    never past the launch's deadline (a stage without a timeout gets the
+    launch's).
+    """
+    if timeout is None:
+        return None if launch is None else Deadline(launch.expires_at, stage.name)
+    expires_at = time.monotonic() + timeout + carry
+    if launch is not None:
+        expires_at = min(expires_at, launch.expires_at)
+    return Deadline(expires_at, stage.name)
+
+
+def _slot_wait(name, launch):
+    """Seconds a story may wait for the stage's slot (None = no limit)."""
+    if launch is None:
+        return None
+    remaining = launch.remaining()
+    if remaining <= 0:
+        raise _slot_expired(name)
+    return remaining
+
+
+def _slot_expired(name):
+    logger.error("[ERR] Deadline exceeded waiting for stage %s", name)
+    return GrokAPIError(f"Deadline exceeded waiting for stage {name}",
+                        status_code=504, retryable=False)
+
+
+def _carry(deadline):
+    """Unused time a finished stage passes on (0 without a deadline)."""
+    return max(deadline.remaining(), 0) if deadline is not None else 0
+
+
+def _stage_stats(name):
+    """Counters for a stage (call with _lock held)."""
+    return _stats.setdefault(name, {
+        "concurrency": 0, "active": 0, "waiting": 0,
+        "completed": 0, "failed": 0, "total_ms": 0,
+    })
+
+
+@contextmanager
+def _stage_slot(name, limit, launch=None):
+    """Hold one of the stage's slots in this process (no limit when 0), waiting
+    no longer than the launch's deadline."""
+    gate = None
+    if limit:
+        with _lock:
+            gate = _gates.get((name, limit))
+            if gate is None:
+                gate = _gates[(name, limit)] = threading.BoundedSemaphore(limit)
+            _stage_stats(name)["waiting"] += 1
+        try:
+            if not gate.acquire(timeout=_slot_wait(name, launch)):
+                raise _slot_expired(name)
+        finally:
+            with _lock:
+                _stage_stats(name)["waiting"] -= 1
+    with _lock:
+        stats = _stage_stats(name)
+        stats["concurrency"] = limit
+        stats["active"] += 1
+    try:
+        yield
+    finally:
+        with _lock:
+            _stage_stats(name)["active"] -= 1
+        if gate is not None:
+            gate.release()
+
+
+@asynccontextmanager
+async def _stage_slot_async(name, limit, launch=None):
+    """_stage_slot() for coroutines: an asyncio.Semaphore per event loop."""
+    gate = None
+    if limit:
+        loop = asyncio.get_running_loop()
+        with _lock:
+            gates = _async_gates.setdefault(loop, {})
+            gate = gates.get((name, limit))
+            if gate is None:
+                gate = gates[(name, limit)] = asyncio.Semaphore(limit)
+            _stage_stats(name)["waiting"] += 1
+        try:
+            await asyncio.wait_for(gate.acquire(), _slot_wait(name, launch))
+        except asyncio.TimeoutError:
+            raise _slot_expired(name) from None
+        finally:
+            with _lock:
+                _stage_stats(name)["waiting"] -= 1
+    with _lock:
+        stats = _stage_stats(name)
+        stats["concurrency"] = limit
+        stats["active"] += 1
+    try:
+        yield
+    finally:
+        with _lock:
+            _stage_stats(name)["active"] -= 1
+        if gate is not None:
+            gate.release()
+
+
+@contextmanager
+def _timed(name):
+    """Count a stage run as completed or failed, with its duration."""
+    start = time.monotonic()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        with _lock:
+            stats = _stage_stats(name)
+            stats["completed" if ok else "failed"] += 1
+            stats["total_ms"] += int((time.monotonic() - start) * 1000)
+
+
+def get_stage_stats():
+    """
+    Per-stage counters for this process.
+
+    Returns:
+        {stage: {concurrency, active, waiting, completed, failed, avg_ms}}
+        — active stories hold a slot, waiting ones wait for one.
+    """
+    with _lock:
+        snapshot = {name: dict(stats) for name, stats in _stats.items()}
+    for stats in snapshot.values():
+        finished = stats["completed"] + stats["failed"]
+        stats["avg_ms"] = stats.pop("total_ms") // finished if finished else None
+    return snapshot
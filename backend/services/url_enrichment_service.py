@@ -5,7 +5,9 @@ For Twitter/X URLs: calls public oEmbed API to get author + tweet text.
 For other URLs: fetches page HTML, extracts <title> + first 500 chars visible text.
 
 Each URL has a 10-second timeout and its own try/except so one failure
-never blocks the rest.
+never blocks the rest. With a deadline (services/stage_engine.py), fetches
+are also cut off at it and the remaining URLs are skipped. Fetches go through the HTTP cassette when one is
+active (services/cassette_service.py).
 """
 import json
 import logging
@@ -14,6 +16,8 @@ import re
 import requests
 from bs4 import BeautifulSoup
 
+from services.cassette_service import get_cassette_session
+
 logger = logging.getLogger(__name__)
 
 URL_TIMEOUT = 10  # seconds per URL fetch
@@ -26,6 +30,14 @@ _USER_AGENT = (
 )
 
 
+def _http_get(url, **kwargs):
+    """requests.get, routed through the HTTP cassette when recording/replaying."""
+    session = get_cassette_session()
+    if session is not None:
+        return session.get(url, **kwargs)
+    return requests.get(url, **kwargs)
+
+
 def extract_urls(text):
     """Extract unique HTTP/HTTPS URLs from text.
 
@@ -64,7 +76,7 @@ def _parse_twitter_id_and_user(url):
     return None, None
 
 
-def enrich_twitter_url(url):
+def enrich_twitter_url(url, timeout=URL_TIMEOUT):
     """Fetch tweet context. Tries FxTwitter first (has date), falls back to oEmbed.
 
     Returns dict with author_name, text, created_at, and url,
@@ -75,7 +87,7 @@ def enrich_twitter_url(url):
     if username and status_id:
         try:
             fx_url = f"https://api.fxtwitter.com/{username}/status/{status_id}"
-            resp = requests.get(fx_url, timeout=URL_TIMEOUT)
+            resp = _http_get(fx_url, timeout=timeout)
             if resp.status_code == 200:
                 data = resp.json()
                 tweet = data.get("tweet") or {}
@@ -95,10 +107,10 @@ def enrich_twitter_url(url):
     # --- Attempt 2: Twitter oEmbed (no date, fallback) ---
     oembed_url = "https://publish.twitter.com/oembed"
     try:
-        resp = requests.get(
+        resp = _http_get(
             oembed_url,
             params={"url": url, "omit_script": "true"},
-            timeout=URL_TIMEOUT,
+            timeout=timeout,
         )
         if resp.status_code == 200:
             data = resp.json()
@@ -120,16 +132,16 @@ def enrich_twitter_url(url):
     return None
 
 
-def enrich_website_url(url):
+def enrich_website_url(url, timeout=URL_TIMEOUT):
     """Fetch page title + first 500 chars of visible body text.
 
     Strips scripts, styles, nav, header, and footer elements before
     extracting text.
     """
     try:
-        resp = requests.get(
+        resp = _http_get(
             url,
-            timeout=URL_TIMEOUT,
+            timeout=timeout,
             headers={"User-Agent": _USER_AGENT},
         )
         if resp.status_code != 200:
@@ -162,9 +174,13 @@ def enrich_website_url(url):
         return None
 
 
-def enrich_urls(text):
+def enrich_urls(text, deadline=None):
     """Extract URLs from text, enrich each, return JSON string keyed by URL.
 
+    With a deadline (anything with remaining() seconds), each fetch's
+    timeout is capped at the time left and URLs reached after it are
+    skipped.
+
     Returns None if no URLs found or all enrichments failed.
     """
     urls = extract_urls(text)
@@ -172,12 +188,19 @@ def enrich_urls(text):
         return None
 
     results = {}
-    for url in urls:
+    for index, url in enumerate(urls):
+        timeout = URL_TIMEOUT
+        if deadline is not None:
+            timeout = min(timeout, deadline.remaining())
+            if timeout <= 0:
+                logger.warning("[--] Enrichment deadline reached; skipped %d URL(s)",
+                               len(urls) - index)
+                break
         try:
             if is_twitter_url(url):
-                enrichment = enrich_twitter_url(url)
+                enrichment = enrich_twitter_url(url, timeout)
             else:
-                enrichment = enrich_website_url(url)
+                enrichment = enrich_website_url(url, timeout)
 
             if enrichment:
                 results[url] = enrichment
@@ -0,0 +1,154 @@
+"""
+Usage service — token, latency and cost rollups over PipelineRun records.
+
+Each completed Grok call stores its model and token usage on its
+PipelineRun. get_usage_report() groups those runs by one dimension:
+
+  - step_type:   source-list / refinement / amy-bot
+  - prompt:      the Prompt used (id + name)
+  - opportunity: the story's opportunity
+  - day:         the UTC date the run started
+
+and returns counts, token totals, output tokens/sec and estimated cost.
+
+Cost uses GROK_PRICING (USD per million tokens, by model). Cached prompt
+tokens bill at the cached_input rate; reasoning tokens at the output rate.
+Runs with no usage block (cache hits, failures) are left out.
+"""
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+
+from models import db
+from models.pipeline_run import PipelineRun
+from models.prompt import Prompt
+from models.story import Story
+
+GROUP_BY_OPTIONS = ("step_type", "prompt", "opportunity", "day")
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens, cached_tokens, reasoning_tokens):
+    """
+    Estimated USD cost of one call (or a sum of calls) on one model.
+
+    Returns None when the model has no GROK_PRICING entry.
+    """
+    prices = (current_app.config.get("GROK_PRICING") or {}).get(model)
+    if not prices:
+        return None
+    cached = min(cached_tokens or 0, prompt_tokens or 0)
+    uncached = (prompt_tokens or 0) - cached
+    output = (completion_tokens or 0) + (reasoning_tokens or 0)
+    return (
+        uncached * prices.get("input", 0)
+        + cached * prices.get("cached_input", prices.get("input", 0))
+        + output * prices.get("output", 0)
+    ) / 1_000_000
+
+
+def get_usage_report(group_by="step_type", days=7):
+    """
+    Aggregate token usage, throughput and cost.
+
+    Args:
+        group_by: One of GROUP_BY_OPTIONS.
+        days: Look-back window in days.
+
+    Returns:
+        dict with the window and one row per group, most expensive first.
+
+    Raises:
+        ValueError: If group_by is not supported.
+    """
+    if group_by not in GROUP_BY_OPTIONS:
+        raise ValueError(f"group_by must be one of: {', '.join(GROUP_BY_OPTIONS)}")
+
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    if group_by == "step_type":
+        key_cols = [PipelineRun.step_type]
+    elif group_by == "prompt":
+        key_cols = [PipelineRun.prompt_id, Prompt.name]
+    elif group_by == "opportunity":
+        key_cols = [Story.opportunity]
+    else:
+        key_cols = [db.func.date(PipelineRun.started_at)]
+
+    query = (
+        db.session.query(
+            *key_cols,
+            PipelineRun.model,
+            db.func.count(PipelineRun.id),
+            db.func.coalesce(db.func.sum(PipelineRun.prompt_tokens), 0),
+            db.func.coalesce(db.func.sum(PipelineRun.completion_tokens), 0),
+            db.func.coalesce(db.func.sum(PipelineRun.cached_tokens), 0),
+            db.func.coalesce(db.func.sum(PipelineRun.reasoning_tokens), 0),
+            db.func.coalesce(db.func.sum(PipelineRun.duration_ms), 0),
+        )
+        .outerjoin(Prompt, Prompt.id == PipelineRun.prompt_id)
+        .outerjoin(Story, Story.id == PipelineRun.story_id)
+        .filter(
+            PipelineRun.started_at >= since,
+            PipelineRun.completion_tokens.isnot(None),
+        )
+        .group_by(*key_cols, PipelineRun.model)
+    )
+
+    groups = {}
+    for row in query.all():
+        keys = row[:len(key_cols)]
+        model, runs, prompt_t, completion_t, cached_t, reasoning_t, duration_ms = row[len(key_cols):]
+        group_key = tuple(str(k) if k is not None else None for k in keys)
+
+        group = groups.get(group_key)
+        if group is None:
+            group = groups[group_key] = _empty_group(group_by, keys)
+        group["runs"] += runs
+        group["prompt_tokens"] += int(prompt_t)
+        group["completion_tokens"] += int(completion_t)
+        group["cached_tokens"] += int(cached_t)
+        group["reasoning_tokens"] += int(reasoning_t)
+        group["duration_ms"] += int(duration_ms)
+        group["models"].append(model)
+
+        cost = estimate_cost(model, prompt_t, completion_t, cached_t, reasoning_t)
+        if cost is None:
+            group["unpriced_runs"] += runs
+        else:
+            group["cost_usd"] += cost
+
+    rows = [_finish_group(g) for g in groups.values()]
+    rows.sort(key=lambda g: g["cost_usd"], reverse=True)
+    return {
+        "group_by": group_by,
+        "days": days,
+        "since": since.isoformat(),
+        "rows": rows,
+    }
+
+
+def _empty_group(group_by, keys):
+    if group_by == "prompt":
+        label = {"prompt_id": keys[0], "prompt_name": keys[1]}
+    elif group_by == "day":
+        # Postgres returns a date, SQLite a string
+        label = {"day": str(keys[0]) if keys[0] is not None else None}
+    else:
+        label = {group_by: keys[0]}
+    return dict(
+        label, runs=0, prompt_tokens=0, completion_tokens=0, cached_tokens=0,
+        reasoning_tokens=0, duration_ms=0, cost_usd=0.0, unpriced_runs=0, models=[],
+    )
+
+
+def _finish_group(group):
+    """Add derived rates; output tokens/sec is over Grok wall time."""
+    output_tokens = group["completion_tokens"] + group["reasoning_tokens"]
+    seconds = group["duration_ms"] / 1000
+    group["tokens_per_second"] = round(output_tokens / seconds, 1) if seconds else None
+    group["avg_duration_ms"] = round(group["duration_ms"] / group["runs"]) if group["runs"] else None
+    group["cached_ratio"] = (
+        round(group["cached_tokens"] / group["prompt_tokens"], 3) if group["prompt_tokens"] else None
+    )
+    group["cost_usd"] = round(group["cost_usd"], 6)
+    group["models"] = sorted({m for m in group["models"] if m})
+    return group
@@ -0,0 +1,6 @@
+"""
+Tools package — developer utilities that are not part of the app.
+
+  - mock_xai_server: Local stand-in for the xAI chat completions and
+    Responses APIs, for offline load and latency testing
+"""
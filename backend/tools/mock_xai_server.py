@@ -0,0 +1,324 @@
+"""
+Mock xAI server — local stand-in for api.x.ai for load and latency tests.
+
+Speaks the two shapes grok_service parses:
+  POST /v1/chat/completions  — chat completions, incl. stream=true SSE
+  POST /v1/responses         — Responses API (Source List x_search)
+  GET  /stats                — request / injected-failure counters
+  HEAD /                     — connection warm-up
+
+Behaviour knobs (command line or MockXAIServer kwargs):
+  - latency: fixed:MS | uniform:MIN:MAX | normal:MEAN:SD |
+             lognormal:MEDIAN:SIGMA (milliseconds)
+  - rate_429 / rate_5xx: fraction of requests that fail (429s carry
+    a Retry-After header)
+  - approve_rate: share of Amy Bot reviews answered DECISION: APPROVE
+    (the rest get DECISION: REJECT)
+  - chat_template: output for non-Amy chat calls; {model}, {n} and
+    {excerpt} (start of the last user message) are filled in
+
+Amy Bot calls are recognised by "Pitch to review" in the messages.
+
+Run it and point the backend at it:
+
+    cd backend && python -m tools.mock_xai_server --port 8099 \\
+        --latency lognormal:1500:0.6 --rate-429 0.02
+
+    GROK_API_URL=http://localhost:8099/v1/chat/completions
+    GROK_RESPONSES_API_URL=http://localhost:8099/v1/responses
+    GROK_API_KEY=anything
+
+Standard library only, so it runs anywhere the backend does.
+"""
+import argparse
+import itertools
+import json
+import logging
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHAT_TEMPLATE = (
+    "HEADLINE: Mock story {n} from {model}\n\n"
+    "Refined pitch based on: {excerpt}\n\n"
+    "This is canned output from the local mock xAI server."
+)
+
+DEFAULT_SEARCH_TEXT = (
+    "1. Mock post about {excerpt} — https://x.com/mock/status/{n}\n"
+    "2. Follow-up coverage — https://example.com/mock-article-{n}"
+)
+
+
+def parse_latency(spec):
+    """
+    Turn a latency spec into a zero-arg sampler returning seconds.
+
+    Raises:
+        ValueError: On an unknown distribution or bad numbers.
+    """
+    kind, _, rest = (spec or "fixed:0").partition(":")
+    args = [float(a) for a in rest.split(":") if a]
+
+    if kind == "fixed" and len(args) == 1:
+        return lambda: args[0] / 1000
+    if kind == "uniform" and len(args) == 2:
+        return lambda: random.uniform(args[0], args[1]) / 1000
+    if kind == "normal" and len(args) == 2:
+        return lambda: max(0.0, random.gauss(args[0], args[1])) / 1000
+    if kind == "lognormal" and len(args) == 2:
+        # MEDIAN in ms, SIGMA of the underlying normal
+        mu = math.log(max(args[0], 1e-9))
+        return lambda: random.lognormvariate(mu, args[1]) / 1000
+    raise ValueError(f"Bad latency spec: {spec!r}")
+
+
+def _approx_tokens(text):
+    return max(1, len(text or "") // 4)
+
+
+class MockXAIServer:
+    """Threaded mock server; start() in tests, serve_forever() from the CLI."""
+
+    def __init__(self, host="127.0.0.1", port=0, latency="fixed:0", rate_429=0.0,
+                 rate_5xx=0.0, approve_rate=1.0, chat_template=DEFAULT_CHAT_TEMPLATE,
+                 stream_chunk_chars=12, seed=None):
+        self.sample_latency = parse_latency(latency)
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.approve_rate = approve_rate
+        self.chat_template = chat_template
+        self.stream_chunk_chars = max(1, stream_chunk_chars)
+        self.random = random.Random(seed)
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "chat": 0, "responses": 0, "streamed": 0,
+                      "injected_429": 0, "injected_5xx": 0}
+
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Serve on a background thread; returns self."""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _bump(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    # ---- Content ----
+
+    def chat_text(self, payload):
+        messages = payload.get("messages") or []
+        joined = "\n".join(str(m.get("content") or "") for m in messages)
+        if "Pitch to review" in joined:
+            if self.random.random() < self.approve_rate:
+                return "DECISION: APPROVE\n\nThe pitch is accurate and well sourced."
+            return "DECISION: REJECT\n\nREASON: Mock rejection for load testing."
+        user = next((m for m in reversed(messages) if m.get("role") == "user"), {})
+        return self.chat_template.format(
+            model=payload.get("model"), n=next(self._counter),
+            excerpt=str(user.get("content") or "")[:80].replace("\n", " "),
+        )
+
+    def search_text(self, payload):
+        first = (payload.get("input") or [{}])[0]
+        return DEFAULT_SEARCH_TEXT.format(
+            n=next(self._counter),
+            excerpt=str(first.get("content") or "")[:60].replace("\n", " "),
+        )
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, fmt, *args):
+                logger.debug("mock-xai: " + fmt, *args)
+
+            def do_HEAD(self):
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_GET(self):
+                if self.path == "/stats":
+                    with server._lock:
+                        self._json(200, dict(server.stats))
+                else:
+                    self._json(404, {"error": "not found"})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    self._json(400, {"error": "invalid JSON"})
+                    return
+                server._bump("requests")
+
+                if self.path.endswith("/chat/completions"):
+                    server._bump("chat")
+                elif self.path.endswith("/responses"):
+                    server._bump("responses")
+                else:
+                    self._json(404, {"error": "not found"})
+                    return
+
+                roll = server.random.random()
+                if roll < server.rate_429:
+                    server._bump("injected_429")
+                    self._json(429, {"error": "rate limited (mock)"}, {"Retry-After": "1"})
+                    return
+                if roll < server.rate_429 + server.rate_5xx:
+                    server._bump("injected_5xx")
+                    time.sleep(server.sample_latency() / 4)
+                    self._json(503, {"error": "service unavailable (mock)"})
+                    return
+
+                if self.path.endswith("/responses"):
+                    self._responses(payload)
+                elif payload.get("stream"):
+                    self._chat_stream(payload)
+                else:
+                    self._chat(payload)
+
+            # ---- Response writers ----
+
+            def _json(self, status, body, headers=None):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _usage(self, payload, text):
+                prompt = json.dumps(payload.get("messages") or payload.get("input") or "")
+                return _approx_tokens(prompt), _approx_tokens(text)
+
+            def _chat(self, payload):
+                time.sleep(server.sample_latency())
+                text = server.chat_text(payload)
+                prompt_tokens, completion_tokens = self._usage(payload, text)
+                self._json(200, {
+                    "id": f"mock-{time.time_ns()}",
+                    "object": "chat.completion",
+                    "model": payload.get("model"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": text}}],
+                    "usage": {"prompt_tokens": prompt_tokens,
+                              "completion_tokens": completion_tokens,
+                              "total_tokens": prompt_tokens + completion_tokens,
+                              "prompt_tokens_details": {"cached_tokens": 0}},
+                })
+
+            def _chat_stream(self, payload):
+                server._bump("streamed")
+                total = server.sample_latency()
+                text = server.chat_text(payload)
+                size = server.stream_chunk_chars
+                chunks = [text[i:i + size] for i in range(0, len(text), size)]
+                # A tenth of the latency before the first token, the rest spread out
+                first_wait = total * 0.1
+                gap = (total - first_wait) / max(len(chunks), 1)
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+
+                time.sleep(first_wait)
+                self._event({"model": payload.get("model"),
+                             "choices": [{"index": 0, "delta": {"role": "assistant"}}]})
+                for chunk in chunks:
+                    self._event({"choices": [{"index": 0, "delta": {"content": chunk}}]})
+                    time.sleep(gap)
+                if (payload.get("stream_options") or {}).get("include_usage"):
+                    prompt_tokens, completion_tokens = self._usage(payload, text)
+                    self._event({"choices": [], "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "prompt_tokens_details": {"cached_tokens": 0},
+                    }})
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+            def _event(self, body):
+                self.wfile.write(b"data: " + json.dumps(body).encode("utf-8") + b"\n\n")
+                self.wfile.flush()
+
+            def _responses(self, payload):
+                time.sleep(server.sample_latency())
+                text = server.search_text(payload)
+                input_tokens, output_tokens = self._usage(payload, text)
+                self._json(200, {
+                    "id": f"mock-{time.time_ns()}",
+                    "model": payload.get("model"),
+                    "output": [
+                        {"type": "x_search_call", "status": "completed"},
+                        {"type": "message", "content": [{"type": "output_text", "text": text}]},
+                    ],
+                    "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                              "input_tokens_details": {"cached_tokens": 0}},
+                })
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local mock of the xAI API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", default="lognormal:1500:0.5",
+                        help="fixed:MS | uniform:MIN:MAX | normal:MEAN:SD | lognormal:MEDIAN:SIGMA")
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-5xx", type=float, default=0.0)
+    parser.add_argument("--approve-rate", type=float, default=0.7)
+    parser.add_argument("--chat-template-file", help="File with the chat output template")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    template = DEFAULT_CHAT_TEMPLATE
+    if args.chat_template_file:
+        with open(args.chat_template_file, encoding="utf-8") as fh:
+            template = fh.read()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    server = MockXAIServer(
+        host=args.host, port=args.port, latency=args.latency, rate_429=args.rate_429,
+        rate_5xx=args.rate_5xx, approve_rate=args.approve_rate,
+        chat_template=template, seed=args.seed,
+    )
+    logger.info("[OK] Mock xAI server listening on %s", server.base_url)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
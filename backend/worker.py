@@ -0,0 +1,81 @@
+"""
+Pipeline worker — runs queued jobs outside the gunicorn web tier.
+
+Claims Source List (search + URL enrichment) and pipeline (refinement →
+Amy Bot → CMS/kill) jobs from the jobs table (services/job_queue.py).
+Start as many as you like against the same DATABASE_URL (SKIP LOCKED
+claims keep them from colliding), but only on the web tier's host, in
+the same container or VM. The xAI rate limiter (services/rate_limiter.py)
+keeps its token bucket and concurrency limit in a host-local file
+(GROK_RATE_LIMIT_STATE_PATH) and reclaims dead leases by PID. A worker on
+another machine or in another container would get a budget of its own,
+and total xAI traffic would grow with every one added.
+
+    cd backend && python -m worker --concurrency 8
+    python -m worker --types source-list --concurrency 4
+    python -m worker --pipeline-concurrency 6 --source-list-concurrency 2
+
+Set JOB_WORKERS=0 on the web service so it only enqueues and reports.
+
+SIGTERM / SIGINT stop claiming and wait up to JOB_DRAIN_SECONDS for
+in-flight jobs; anything still running is reclaimed by another worker
+after the visibility timeout.
+"""
+import argparse
+import signal
+import threading
+
+from app import create_app
+from services.job_queue import JobWorkerPool
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run queued pipeline jobs")
+    parser.add_argument("--concurrency", type=int,
+                        help="Worker threads (default: JOB_WORKERS, or 4)")
+    parser.add_argument("--types",
+                        help="Comma-separated job types to claim (default: all)")
+    parser.add_argument("--source-list-concurrency", type=int,
+                        help="Max concurrent source-list jobs (default: JOB_CONCURRENCY_SOURCE_LIST)")
+    parser.add_argument("--pipeline-concurrency", type=int,
+                        help="Max concurrent pipeline jobs (default: JOB_CONCURRENCY_PIPELINE)")
+    return parser.parse_args(argv)
+
+
+def build_pool(app, args):
+    """JobWorkerPool from command-line overrides on top of the app config."""
+    limits = dict(app.config.get("JOB_TYPE_CONCURRENCY") or {})
+    if args.source_list_concurrency is not None:
+        limits["source-list"] = args.source_list_concurrency
+    if args.pipeline_concurrency is not None:
+        limits["pipeline"] = args.pipeline_concurrency
+    job_types = [t.strip() for t in (args.types or "").split(",") if t.strip()] or None
+    return JobWorkerPool(
+        app,
+        size=args.concurrency or app.config.get("JOB_WORKERS") or 4,
+        job_types=job_types,
+        type_limits=limits,
+    )
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    app = create_app(start_job_pool=False)
+    pool = build_pool(app, args).start()
+
+    stop = threading.Event()
+
+    def _shutdown(signum, _frame):
+        app.logger.info("[--] Worker received signal %d; draining", signum)
+        stop.set()
+
+    signal.signal(signal.SIGTERM, _shutdown)
+    signal.signal(signal.SIGINT, _shutdown)
+
+    app.logger.info("[OK] Pipeline worker running (%s)", pool.worker_prefix)
+    stop.wait()
+    pool.drain()
+
+
+if __name__ == "__main__":
+    main()
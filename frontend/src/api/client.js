@@ -44,3 +44,27 @@ export async function apiClient(path, options = {}) {
 
   return data
 }
+
+/**
+ * Start a pipeline run (POST) safely under retries.
+ *
+ * One Idempotency-Key per launch: if the request or its response is lost
+ * it is re-sent with the same key, so the server replays its first answer
+ * instead of starting a second run.
+ */
+export async function apiLaunch(path, body, retries = 2) {
+  const key = crypto.randomUUID()
+  for (let attempt = 0; ; attempt++) {
+    try {
+      return await apiClient(path, {
+        method: 'POST',
+        headers: { 'Idempotency-Key': key },
+        body: JSON.stringify(body),
+      })
+    } catch (err) {
+      // HTTP errors carry a status and are final; network failures retry
+      if (err.status || attempt >= retries) throw err
+      await new Promise((resolve) => setTimeout(resolve, 500 * (attempt + 1)))
+    }
+  }
+}
@@ -0,0 +1,187 @@
+/**
+ * Pushed pipeline status.
+ *
+ * watchPipeline() reads GET /pipeline/events (Server-Sent Events) through
+ * fetch, so the JWT travels in the Authorization header like every other
+ * call. When streaming is unavailable or the stream drops, it falls back
+ * to long polls of GET /pipeline/status?since=...&wait=25.
+ *
+ * Every event is { cursor, stories } where each story lists only what
+ * changed; mergeStories() folds events into full status objects shaped
+ * like GET /pipeline/status/<id>.
+ */
+
+import { apiClient } from './client'
+
+const API_BASE = import.meta.env.VITE_API_URL || '/api'
+
+function authHeaders() {
+  const token = localStorage.getItem('mimic_token')
+  return token ? { Authorization: `Bearer ${token}` } : {}
+}
+
+function parseFrames(buffer, onFrame) {
+  // Returns the unparsed remainder
+  const frames = buffer.split('\n\n')
+  const rest = frames.pop()
+  frames.forEach((frame) => {
+    let event = 'message'
+    let data = ''
+    frame.split('\n').forEach((line) => {
+      if (line.startsWith('event: ')) event = line.slice(7)
+      else if (line.startsWith('data: ')) data += line.slice(6)
+    })
+    if (data) onFrame(event, JSON.parse(data))
+  })
+  return rest
+}
+
+/**
+ * Watch stories ({ ids: [..] } or { batchId }) until all are finished.
+ *
+ * onEvent({ cursor, stories }) runs for each change; onDone() once every
+ * watched story has finished; onError(err) if the server refuses.
+ * Returns a function that stops watching.
+ */
+export function watchPipeline({ ids, batchId }, { onEvent, onDone, onError }) {
+  const query = batchId ? `batch_id=${batchId}` : `ids=${ids.join(',')}`
+  const controller = new AbortController()
+  let cursor = null
+  let stopped = false
+  const statuses = {}
+
+  function handle(event, data) {
+    cursor = data.cursor
+    if (event === 'status') {
+      data.stories.forEach((s) => { statuses[s.story_id] = s.status })
+      onEvent && onEvent(data)
+    }
+    if (event === 'done') {
+      stopped = true
+      onDone && onDone()
+    }
+  }
+
+  async function stream() {
+    const headers = authHeaders()
+    if (cursor) headers['Last-Event-ID'] = cursor
+    const resp = await fetch(`${API_BASE}/pipeline/events?${query}`, {
+      headers,
+      signal: controller.signal,
+    })
+    if (!resp.ok) {
+      const err = new Error(`HTTP ${resp.status}`)
+      err.status = resp.status
+      throw err
+    }
+    if (!resp.body || !resp.body.getReader) throw new Error('Streaming unsupported')
+    const reader = resp.body.getReader()
+    const decoder = new TextDecoder()
+    let buffer = ''
+    for (;;) {
+      const { value, done } = await reader.read()
+      if (done) return
+      buffer = parseFrames(buffer + decoder.decode(value, { stream: true }), handle)
+    }
+  }
+
+  async function longPoll() {
+    const since = cursor ? `&since=${cursor}&wait=25` : ''
+    const resp = await fetch(`${API_BASE}/pipeline/status?${query}${since}`, {
+      headers: authHeaders(),
+      signal: controller.signal,
+    })
+    if (!resp.ok) {
+      const err = new Error(`HTTP ${resp.status}`)
+      err.status = resp.status
+      throw err
+    }
+    const data = await resp.json()
+    if (data.stories.length || !cursor) handle('status', data)
+    const known = Object.values(statuses)
+    if (known.length && known.every((status) => status !== 'running')) {
+      handle('done', { cursor: data.cursor })
+    }
+  }
+
+  async function run() {
+    let useStream = true
+    while (!stopped) {
+      try {
+        if (useStream) {
+          // Ends cleanly after PIPELINE_EVENTS_MAX_SECONDS; reconnect from cursor
+          await stream()
+        } else {
+          await longPoll()
+        }
+      } catch (err) {
+        if (stopped || err.name === 'AbortError') return
+        if (err.status && err.status < 500) {
+          stopped = true
+          onError && onError(err)
+          return
+        }
+        // Stream dropped or unsupported: long-poll from the last cursor
+        useStream = false
+        await new Promise((resolve) => setTimeout(resolve, 1000))
+      }
+    }
+  }
+
+  run()
+  return () => {
+    stopped = true
+    controller.abort()
+  }
+}
+
+/**
+ * Fold one event into { [storyId]: status } (full objects, runs by id).
+ */
+export function mergeStories(prev, event) {
+  const next = { ...prev }
+  event.stories.forEach((change) => {
+    const current = next[change.story_id] || { runs: [] }
+    const runs = [...current.runs]
+    change.runs.forEach((run) => {
+      const index = runs.findIndex((r) => r.id === run.id)
+      if (index === -1) runs.push(run)
+      else runs[index] = run
+    })
+    runs.sort((a, b) => a.id - b.id)
+    next[change.story_id] = { ...current, ...change, runs }
+  })
+  return next
+}
+
+/**
+ * Watch a server-side batch: onBatch(GET /pipeline/batch/<id>) runs after
+ * every pushed change (refreshes are coalesced) and once more when done.
+ * Returns a function that stops watching.
+ */
+export function watchBatch(batchId, { onBatch, onError }) {
+  let inFlight = false
+  let again = false
+
+  async function refresh() {
+    if (inFlight) {
+      again = true
+      return
+    }
+    inFlight = true
+    try {
+      do {
+        again = false
+        onBatch(await apiClient(`/pipeline/batch/${batchId}`))
+      } while (again)
+    } catch (err) {
+      stop()
+      onError && onError(err)
+    } finally {
+      inFlight = false
+    }
+  }
+
+  const stop = watchPipeline({ batchId }, { onEvent: refresh, onDone: refresh, onError })
+  return stop
+}
@@ -1,11 +1,14 @@
 import { useState, useEffect, useRef } from 'react'
 import { Link } from 'react-router-dom'
 import { apiClient } from '../api/client'
+import { watchBatch } from '../api/events'
 
 function BatchResultsPage() {
   const [items, setItems] = useState([])
   const [initialized, setInitialized] = useState(false)
-  const pollRefs = useRef({})
+  const [batchId, setBatchId] = useState(null)
+  const pollRef = useRef(null)
+  const fetchedRef = useRef(new Set())
 
   useEffect(() => {
     // Read queued items from sessionStorage
@@ -40,82 +43,102 @@ function BatchResultsPage() {
     setItems(initial)
     setInitialized(true)
 
-    // Fire all pipelines in parallel
-    initial.forEach((item) => {
-      firePipeline(item)
-    })
+    // One request starts every pipeline server-side
+    startBatch(initial)
 
     return () => {
-      // Cleanup all polling intervals
-      Object.values(pollRefs.current).forEach(clearInterval)
+      if (pollRef.current) pollRef.current()
     }
   }, [])
 
-  async function firePipeline(item) {
+  async function startBatch(initial) {
     try {
-      const data = await apiClient('/pipeline/run', {
+      const data = await apiClient('/pipeline/batch/run', {
         method: 'POST',
         body: JSON.stringify({
-          story_id: parseInt(item.storyId, 10),
-          selected_story: item.sourceBody,
-          refinement_prompt_id: item.refinementPromptId,
+          items: initial.map((item) => ({
+            story_id: parseInt(item.storyId, 10),
+            selected_story: item.sourceBody,
+            refinement_prompt_id: item.refinementPromptId,
+          })),
         }),
       })
 
+      // Batch items come back in request order
+      const storyIds = data.items.map((it) => it.story_id)
       setItems((prev) =>
-        prev.map((it) =>
-          it.id === item.id
-            ? { ...it, pipelineStoryId: data.story_id, status: 'running' }
-            : it
-        )
+        prev.map((it, i) => ({ ...it, pipelineStoryId: storyIds[i], status: 'running' }))
       )
-
-      // Start polling
-      pollRefs.current[item.id] = setInterval(async () => {
-        try {
-          const status = await apiClient(`/pipeline/status/${data.story_id}`)
-          if (status.status === 'completed') {
-            clearInterval(pollRefs.current[item.id])
-            setItems((prev) =>
-              prev.map((it) =>
-                it.id === item.id
-                  ? { ...it, status: 'completed', result: status }
-                  : it
-              )
-            )
-          } else if (status.status === 'failed') {
-            clearInterval(pollRefs.current[item.id])
-            const failedRun = (status.runs || []).find((r) => r.status === 'failed')
-            setItems((prev) =>
-              prev.map((it) =>
-                it.id === item.id
-                  ? { ...it, status: 'failed', error: failedRun ? failedRun.error_message : 'Pipeline failed', result: status }
-                  : it
-              )
-            )
-          }
-        } catch (err) {
-          clearInterval(pollRefs.current[item.id])
-          setItems((prev) =>
-            prev.map((it) =>
-              it.id === item.id
-                ? { ...it, status: 'failed', error: err.message }
-                : it
-            )
-          )
-        }
-      }, 2000)
+      setBatchId(data.batch_id)
+      pollBatchStatus(data.batch_id, storyIds)
     } catch (err) {
+      setItems((prev) =>
+        prev.map((it) => ({ ...it, status: 'failed', error: err.message }))
+      )
+    }
+  }
+
+  async function fetchResults(storyIds) {
+    // Full outputs once per finished item; the batch poll carries status only
+    try {
+      const data = await apiClient(`/pipeline/status?ids=${storyIds.join(',')}`)
+      const byStory = Object.fromEntries(data.stories.map((s) => [s.story_id, s]))
       setItems((prev) =>
         prev.map((it) =>
-          it.id === item.id
-            ? { ...it, status: 'failed', error: err.message }
-            : it
+          byStory[it.pipelineStoryId] ? { ...it, result: byStory[it.pipelineStoryId] } : it
         )
       )
+    } catch {
+      // Keep the batch summary; the stories are still in the Stories log
     }
   }
 
+  // Items still queued or running stop; finished ones are kept
+  async function handleCancel() {
+    try {
+      await apiClient(`/pipeline/batch/${batchId}`, { method: 'DELETE' })
+    } catch {
+      // 409: everything had already finished
+    }
+  }
+
+  function pollBatchStatus(batchId, storyIds) {
+    // Server pushes each change; refetch the batch summary when it does
+    pollRef.current = watchBatch(batchId, {
+      onBatch: (batch) => {
+        const byStory = Object.fromEntries(batch.items.map((it) => [it.story_id, it]))
+        setItems((prev) =>
+          prev.map((it, i) => {
+            const status = byStory[storyIds[i]]
+            if (!status || ['completed', 'failed', 'cancelled'].includes(it.status)) return it
+            return {
+              ...it,
+              status: status.status === 'queued' ? 'running' : status.status,
+              error: status.status === 'failed' ? (status.error_message || 'Pipeline failed') : null,
+              result: status,
+            }
+          })
+        )
+        const finished = storyIds.filter(
+          (storyId) => byStory[storyId]?.status === 'completed' && !fetchedRef.current.has(storyId)
+        )
+        if (finished.length) {
+          finished.forEach((storyId) => fetchedRef.current.add(storyId))
+          fetchResults(finished)
+        }
+      },
+      onError: (err) => {
+        setItems((prev) =>
+          prev.map((it) =>
+            it.status === 'running' || it.status === 'starting'
+              ? { ...it, status: 'failed', error: err.message }
+              : it
+          )
+        )
+      },
+    })
+  }
+
   if (!initialized) return <p>Loading...</p>
 
   if (items.length === 0) {
@@ -130,13 +153,20 @@ function BatchResultsPage() {
   const completed = items.filter((it) => it.status === 'completed')
   const running = items.filter((it) => it.status === 'running' || it.status === 'starting')
   const failed = items.filter((it) => it.status === 'failed')
+  const cancelled = items.filter((it) => it.status === 'cancelled')
 
   return (
     <div>
       <h1>Batch Pipeline Results</h1>
       <p style={{ color: '#666', marginBottom: '1rem' }}>
         {completed.length} completed, {running.length} running, {failed.length} failed
+        {cancelled.length > 0 && `, ${cancelled.length} cancelled`}
         {' '}&mdash; {items.length} total
+        {batchId && running.length > 0 && (
+          <button onClick={handleCancel} style={{ marginLeft: '1rem', padding: '0.25rem 0.75rem' }}>
+            Cancel batch
+          </button>
+        )}
       </p>
 
       <div style={{ display: 'grid', gap: '0.75rem' }}>
@@ -188,6 +218,7 @@ function BatchResultsPage() {
                     </span>
                   )}
                   {item.status === 'failed' && <span style={{ color: '#721c24', fontSize: '0.85rem' }}>Failed</span>}
+                  {item.status === 'cancelled' && <span style={{ color: '#666', fontSize: '0.85rem' }}>Cancelled</span>}
                 </div>
                 <p style={{ margin: '0.25rem 0', fontSize: '0.85rem', color: '#555', maxHeight: '3em', overflow: 'hidden' }}>
                   {item.sourceBody.substring(0, 200)}{item.sourceBody.length > 200 ? '...' : ''}
@@ -1,6 +1,7 @@
 import { useState, useEffect, useRef } from 'react'
 import { useSearchParams } from 'react-router-dom'
-import { apiClient } from '../api/client'
+import { apiClient, apiLaunch } from '../api/client'
+import { mergeStories, watchPipeline } from '../api/events'
 
 function PipelinePage() {
   const [searchParams] = useSearchParams()
@@ -14,9 +15,12 @@ function PipelinePage() {
   const [loading, setLoading] = useState(false)
   const [error, setError] = useState(null)
   const [statusMsg, setStatusMsg] = useState(null)
+  const [partialOutput, setPartialOutput] = useState(null)
   const [sourceListOutput, setSourceListOutput] = useState(null)
   const [autoStarted, setAutoStarted] = useState(false)
+  const [canResume, setCanResume] = useState(false)
   const pollRef = useRef(null)
+  const runStoryRef = useRef(storyId) // Differs from storyId after a coalesced launch
 
   useEffect(() => {
     apiClient('/prompts?type=papa')
@@ -32,14 +36,14 @@ function PipelinePage() {
 
     // Fetch the full source list output for this story
     if (storyId) {
-      apiClient(`/pipeline/status/${storyId}`)
+      apiClient(`/pipeline/status/${storyId}?fields=source_list_output`)
         .then((data) => {
           if (data.source_list_output) setSourceListOutput(data.source_list_output)
         })
         .catch(() => {}) // Non-critical, selectedStory from URL is the fallback
     }
 
-    return () => { if (pollRef.current) clearInterval(pollRef.current) }
+    return () => { if (pollRef.current) pollRef.current() }
   }, [])
 
   // Auto-start pipeline when refinement_prompt_id is provided via URL
@@ -54,40 +58,36 @@ function PipelinePage() {
     if (!selectedPromptId || !storyId || !selectedStory) return
     setLoading(true)
     setError(null)
+    setCanResume(false)
     setStatusMsg('Sending request...')
     try {
-      await apiClient('/pipeline/run', {
-        method: 'POST',
-        body: JSON.stringify({
-          story_id: parseInt(storyId, 10),
-          selected_story: selectedStory,
-          refinement_prompt_id: selectedPromptId,
-        }),
+      const data = await apiLaunch('/pipeline/run', {
+        story_id: parseInt(storyId, 10),
+        selected_story: selectedStory,
+        refinement_prompt_id: selectedPromptId,
       })
-      setStatusMsg('Running pipeline (this may take a few minutes)...')
-      // Start polling for result
-      pollRef.current = setInterval(async () => {
-        try {
-          const status = await apiClient(`/pipeline/status/${storyId}`)
-          if (status.status === 'completed') {
-            clearInterval(pollRef.current)
-            setResult(status)
-            setStatusMsg(null)
-            setLoading(false)
-          } else if (status.status === 'failed') {
-            clearInterval(pollRef.current)
-            const failedRun = status.runs.find(r => r.status === 'failed')
-            setError(failedRun ? failedRun.error_message : 'Pipeline failed')
-            setStatusMsg(null)
-            setLoading(false)
-          }
-        } catch (err) {
-          clearInterval(pollRef.current)
-          setError(err.message)
-          setStatusMsg(null)
-          setLoading(false)
-        }
-      }, 2000)
+      // A coalesced launch reports the story already running this selection
+      setStatusMsg(data.coalesced
+        ? 'Joined a pipeline already running for this selection...'
+        : 'Running pipeline (this may take a few minutes)...')
+      watchRun(String(data.story_id))
+    } catch (err) {
+      setError(err.message)
+      setStatusMsg(null)
+      setLoading(false)
+    }
+  }
+
+  // Pick up a failed or stalled run after its last completed step
+  async function handleResume() {
+    setLoading(true)
+    setError(null)
+    setCanResume(false)
+    setStatusMsg('Resuming pipeline...')
+    try {
+      const resp = await apiClient(`/pipeline/resume/${runStoryRef.current}`, { method: 'POST' })
+      setStatusMsg(resp.step ? `Resuming at ${resp.step}...` : null)
+      watchRun(runStoryRef.current)
     } catch (err) {
       setError(err.message)
       setStatusMsg(null)
@@ -95,6 +95,60 @@ function PipelinePage() {
     }
   }
 
+  // Stop the run; the watcher then sees it as cancelled
+  async function handleCancel() {
+    setStatusMsg('Cancelling...')
+    try {
+      await apiClient(`/pipeline/run/${runStoryRef.current}`, { method: 'DELETE' })
+    } catch (err) {
+      setError(err.message)
+    }
+  }
+
+  function watchRun(runStoryId) {
+    // Server pushes each step's progress until the pipeline finishes
+    runStoryRef.current = runStoryId
+    let stories = {}
+    pollRef.current = watchPipeline({ ids: [runStoryId] }, {
+      onEvent: (event) => {
+        stories = mergeStories(stories, event)
+        const status = stories[runStoryId]
+        if (!status) return
+        if (status.status === 'running') {
+          // Streamed text so far for the step in progress (if streaming is on)
+          const runningRun = status.runs.find(r => r.status === 'running' && r.partial_output)
+          setPartialOutput(runningRun ? runningRun.partial_output : null)
+        } else if (status.status === 'completed') {
+          pollRef.current()
+          setPartialOutput(null)
+          setResult(status)
+          setStatusMsg(null)
+          setLoading(false)
+        } else if (status.status === 'failed') {
+          pollRef.current()
+          setPartialOutput(null)
+          const failedRun = status.runs.filter(r => r.status === 'failed').pop()
+          setError(failedRun ? failedRun.error_message : 'Pipeline failed')
+          setCanResume(true)
+          setStatusMsg(null)
+          setLoading(false)
+        } else if (status.status === 'cancelled') {
+          pollRef.current()
+          setPartialOutput(null)
+          setError('Pipeline cancelled')
+          setCanResume(true)
+          setStatusMsg(null)
+          setLoading(false)
+        }
+      },
+      onError: (err) => {
+        setError(err.message)
+        setStatusMsg(null)
+        setLoading(false)
+      },
+    })
+  }
+
   if (!storyId) {
     return <p>No story selected. Go to <a href="/prompts">Prompt Library</a> and run a Source List first.</p>
   }
@@ -156,11 +210,30 @@ function PipelinePage() {
           >
             {loading ? 'Running...' : 'Run Pipeline'}
           </button>
+          {loading && (
+            <button onClick={handleCancel} style={{ marginLeft: '0.5rem', padding: '0.75rem 1.5rem', fontSize: '1rem' }}>
+              Cancel
+            </button>
+          )}
           {statusMsg && <p style={{ color: '#007bff', marginTop: '0.5rem' }}>{statusMsg}</p>}
+          {partialOutput && (
+            <pre style={{ whiteSpace: 'pre-wrap', overflow: 'auto', fontSize: '0.85rem', lineHeight: '1.5', padding: '1rem', background: '#f9f9f9', border: '1px solid #ddd', borderRadius: '6px' }}>
+              {partialOutput}
+            </pre>
+          )}
         </>
       )}
 
-      {error && <p style={{ color: 'red', marginTop: '1rem' }}>Error: {error}</p>}
+      {error && (
+        <p style={{ color: 'red', marginTop: '1rem' }}>
+          Error: {error}
+          {canResume && !loading && (
+            <button onClick={handleResume} style={{ marginLeft: '1rem', padding: '0.25rem 0.75rem' }}>
+              Resume
+            </button>
+          )}
+        </p>
+      )}
 
       {result && (
         <div style={{ marginTop: '1rem' }}>
@@ -2,6 +2,7 @@ import { useState, useEffect } from 'react'
 import { Link } from 'react-router-dom'
 import { useAuth } from '../context/AuthContext'
 import { apiClient } from '../api/client'
+import { watchBatch } from '../api/events'
 
 function PromptLibraryPage() {
   const { user } = useAuth()
@@ -94,60 +95,58 @@ function PromptLibraryPage() {
     if (selectedPrompts.size === 0) return
     const ids = Array.from(selectedPrompts)
 
-    // Fire all source list runs in parallel
+    // One server-side batch for every selected source list
     const newRunning = {}
     ids.forEach((id) => { newRunning[id] = { storyId: null, status: 'starting', error: null } })
     setBatchRunning((prev) => ({ ...prev, ...newRunning }))
 
-    await Promise.allSettled(ids.map(async (promptId) => {
-      try {
-        const data = await apiClient('/pipeline/source-list', {
-          method: 'POST',
-          body: JSON.stringify({ prompt_id: promptId }),
-        })
-        setBatchRunning((prev) => ({
-          ...prev,
-          [promptId]: { storyId: data.story_id, status: 'running', error: null },
-        }))
-        // Start polling for this prompt's story
-        pollBatchStatus(promptId, data.story_id)
-      } catch (err) {
-        setBatchRunning((prev) => ({
-          ...prev,
-          [promptId]: { storyId: null, status: 'failed', error: err.message },
-        }))
-      }
-    }))
+    try {
+      const data = await apiClient('/pipeline/batch/source-list', {
+        method: 'POST',
+        body: JSON.stringify({ prompt_ids: ids }),
+      })
+      const started = {}
+      data.items.forEach((item) => {
+        started[item.prompt_id] = { storyId: item.story_id, status: 'running', error: null }
+      })
+      setBatchRunning((prev) => ({ ...prev, ...started }))
+      // One pushed-status watcher for the whole batch
+      pollBatchStatus(data.batch_id)
+    } catch (err) {
+      const failed = {}
+      ids.forEach((id) => { failed[id] = { storyId: null, status: 'failed', error: err.message } })
+      setBatchRunning((prev) => ({ ...prev, ...failed }))
+    }
 
     setSelectedPrompts(new Set())
   }
 
-  function pollBatchStatus(promptId, storyId) {
-    const interval = setInterval(async () => {
-      try {
-        const status = await apiClient(`/pipeline/status/${storyId}`)
-        if (status.status === 'completed') {
-          clearInterval(interval)
-          setBatchRunning((prev) => ({
-            ...prev,
-            [promptId]: { storyId, status: 'completed', error: null },
-          }))
-        } else if (status.status === 'failed') {
-          clearInterval(interval)
-          const failedRun = (status.runs || []).find((r) => r.status === 'failed')
-          setBatchRunning((prev) => ({
-            ...prev,
-            [promptId]: { storyId, status: 'failed', error: failedRun ? failedRun.error_message : 'Failed' },
-          }))
-        }
-      } catch (err) {
-        clearInterval(interval)
-        setBatchRunning((prev) => ({
-          ...prev,
-          [promptId]: { storyId, status: 'failed', error: err.message },
-        }))
-      }
-    }, 2000)
+  function pollBatchStatus(batchId) {
+    // Server pushes a change; refetch the batch summary for the prompt cards
+    watchBatch(batchId, {
+      onBatch: (batch) => {
+        const updates = {}
+        batch.items.forEach((item) => {
+          // Queued items show as running in the prompt cards
+          const status = item.status === 'queued' ? 'running' : item.status
+          updates[item.prompt_id] = {
+            storyId: item.story_id,
+            status,
+            error: status === 'failed' ? (item.error_message || 'Failed') : null,
+          }
+        })
+        setBatchRunning((prev) => ({ ...prev, ...updates }))
+      },
+      onError: (err) => {
+        setBatchRunning((prev) => {
+          const next = { ...prev }
+          Object.keys(next).forEach((id) => {
+            if (next[id].status === 'running') next[id] = { ...next[id], status: 'failed', error: err.message }
+          })
+          return next
+        })
+      },
+    })
   }
 
   // Derive distinct agencies from loaded prompts for filter dropdown
@@ -1,6 +1,7 @@
 import { useState, useEffect, useRef } from 'react'
 import { useSearchParams, useNavigate } from 'react-router-dom'
-import { apiClient } from '../api/client'
+import { apiClient, apiLaunch } from '../api/client'
+import { mergeStories, watchPipeline } from '../api/events'
 
 // Parse Grok source list output into individual sources.
 // Handles: List A/B with URLs, topic headers with numbered posts, fallback blocks.
@@ -155,7 +156,7 @@ function SourceListRunPage() {
     apiClient('/prompts?type=papa')
       .then(setRefinementPrompts)
       .catch(() => {}) // Non-critical
-    return () => { if (pollRef.current) clearInterval(pollRef.current) }
+    return () => { if (pollRef.current) pollRef.current() }
   }, [promptId])
 
   async function handleRun() {
@@ -163,10 +164,7 @@ function SourceListRunPage() {
     setError(null)
     setStatusMsg('Sending request...')
     try {
-      const data = await apiClient('/pipeline/source-list', {
-        method: 'POST',
-        body: JSON.stringify({ prompt_id: parseInt(promptId, 10) }),
-      })
+      const data = await apiLaunch('/pipeline/source-list', { prompt_id: parseInt(promptId, 10) })
 
       if (!data || !data.story_id) {
         throw new Error('Server did not return a story_id')
@@ -175,12 +173,15 @@ function SourceListRunPage() {
       setStoryId(data.story_id)
       setStatusMsg('Waiting for Grok API response (this may take up to 60 seconds)...')
 
-      // Start polling
-      pollRef.current = setInterval(async () => {
-        try {
-          const status = await apiClient(`/pipeline/status/${data.story_id}`)
+      // Server pushes the result when the Source List run finishes
+      let stories = {}
+      pollRef.current = watchPipeline({ ids: [data.story_id] }, {
+        onEvent: (event) => {
+          stories = mergeStories(stories, event)
+          const status = stories[data.story_id]
+          if (!status) return
           if (status.status === 'completed') {
-            clearInterval(pollRef.current)
+            pollRef.current()
             setOutput(status.source_list_output)
             if (status.url_enrichments) {
               try {
@@ -190,19 +191,19 @@ function SourceListRunPage() {
             setStatusMsg(null)
             setLoading(false)
           } else if (status.status === 'failed') {
-            clearInterval(pollRef.current)
+            pollRef.current()
             const failedRun = status.runs.find(r => r.status === 'failed')
             setError(failedRun ? failedRun.error_message : 'Pipeline failed')
             setStatusMsg(null)
             setLoading(false)
           }
-        } catch (err) {
-          clearInterval(pollRef.current)
+        },
+        onError: (err) => {
           setError(err.message)
           setStatusMsg(null)
           setLoading(false)
-        }
-      }, 2000)
+        },
+      })
     } catch (err) {
       setError(err.message)
       setStatusMsg(null)
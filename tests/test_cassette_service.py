@@ -0,0 +1,152 @@
+"""
+Tests for services/cassette_service.py.
+
+Records against the local mock xAI server, then replays with it stopped.
+Covers: Grok record/replay, async client replay, enrichment replay,
+fallback matching, misses, replay timing.
+"""
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from services.cassette_service import Cassette, get_cassette_stats, init_cassette
+from services.grok_async_service import AsyncGrokClient
+from services.grok_service import GrokAPIError, call_grok, call_grok_stream
+from services.url_enrichment_service import enrich_website_url
+from tools.mock_xai_server import MockXAIServer
+
+
+def _use_cassette(mode, path, speed=0):
+    return init_cassette(SimpleNamespace(config={
+        "HTTP_CASSETTE_MODE": mode, "HTTP_CASSETTE_PATH": str(path), "HTTP_CASSETTE_SPEED": speed,
+    }))
+
+
+@pytest.fixture
+def xai(app):
+    """Mock xAI server with GROK_API_URL pointed at it; cassette off afterwards."""
+    server = MockXAIServer(port=0, chat_template="Story for {excerpt}").start()
+    saved = app.config["GROK_API_URL"]
+    app.config["GROK_API_URL"] = f"{server.base_url}/v1/chat/completions"
+    yield server
+    app.config["GROK_API_URL"] = saved
+    server.stop()
+    _use_cassette("off", "")
+
+
+class TestRecordReplay:
+    """Exchanges recorded once are served back without the network."""
+
+    def test_grok_round_trip(self, app, xai, tmp_path):
+        """A recorded call replays identically after the server is gone."""
+        path = tmp_path / "grok.jsonl.gz"
+        _use_cassette("record", path)
+        with app.app_context():
+            recorded = call_grok("pitch one")
+            call_grok_stream("pitch two")
+        assert get_cassette_stats()["recorded"] == 2
+        xai.stop()
+
+        _use_cassette("replay", path)
+        with app.app_context():
+            assert call_grok("pitch one") == recorded
+            assert call_grok_stream("pitch two") == "Story for pitch two"
+        assert get_cassette_stats()["exact_hits"] == 2
+
+    def test_cassette_omits_secrets_and_bodies(self, app, xai, tmp_path):
+        """Neither the API key nor the prompt text is written."""
+        path = tmp_path / "grok.jsonl"
+        _use_cassette("record", path)
+        with app.app_context():
+            call_grok("secret pitch text")
+        _use_cassette("off", "")
+
+        raw = path.read_text()
+        entry = json.loads(raw)
+        assert "test-grok-key" not in raw
+        assert "secret pitch text" not in entry["url"] + json.dumps(entry["headers"])
+        assert entry["status"] == 200 and len(entry["body_sha"]) == 64
+
+    def test_fallback_to_same_url(self, app, xai, tmp_path):
+        """A new prompt replays a recording of the same endpoint."""
+        path = tmp_path / "grok.jsonl"
+        _use_cassette("record", path)
+        with app.app_context():
+            call_grok("original pitch")
+        xai.stop()
+
+        _use_cassette("replay", path)
+        with app.app_context():
+            assert call_grok("a different pitch") == "Story for original pitch"
+        assert get_cassette_stats()["fallback_hits"] == 1
+
+    def test_miss_fails_like_connection_error(self, app, xai, tmp_path):
+        """An endpoint never recorded surfaces as a retryable Grok error."""
+        path = tmp_path / "empty.jsonl"
+        path.write_text("")
+        _use_cassette("replay", path)
+        with app.app_context():
+            with pytest.raises(GrokAPIError) as exc_info:
+                call_grok("anything")
+        assert exc_info.value.status_code == 503
+        assert get_cassette_stats()["misses"] == app.config["GROK_RETRY_MAX_ATTEMPTS"]
+
+    def test_async_client_replay(self, app, xai, tmp_path):
+        """AsyncGrokClient records and replays through its transport."""
+        path = tmp_path / "async.jsonl"
+
+        async def go():
+            async with AsyncGrokClient(app.config) as client:
+                return await client.call_grok("async pitch")
+
+        _use_cassette("record", path)
+        recorded = asyncio.run(go())
+        xai.stop()
+
+        _use_cassette("replay", path)
+        assert asyncio.run(go()) == recorded == "Story for async pitch"
+
+    def test_enrichment_replay(self, tmp_path):
+        """URL enrichment fetches are served from the cassette."""
+        path = tmp_path / "enrich.jsonl"
+        path.write_text(json.dumps({
+            "method": "GET", "url": "https://example.com/story", "body_sha": "x",
+            "status": 200, "headers": {"content-type": "text/html"},
+            "body": "<html><title>Recorded</title><body>Hello</body></html>", "elapsed_ms": 5,
+        }) + "\n")
+        _use_cassette("replay", path)
+        try:
+            result = enrich_website_url("https://example.com/story")
+        finally:
+            _use_cassette("off", "")
+        assert result["title"] == "Recorded"
+        assert "Hello" in result["text"]
+
+
+class TestCassette:
+    """Cassette matching and timing."""
+
+    def test_replay_delay_scales_with_speed(self, tmp_path):
+        path = tmp_path / "c.jsonl"
+        path.write_text("")
+        entry = {"elapsed_ms": 2000}
+        assert Cassette(str(path), "replay", speed=1).replay_delay(entry) == 2.0
+        assert Cassette(str(path), "replay", speed=4).replay_delay(entry) == 0.5
+        assert Cassette(str(path), "replay", speed=0).replay_delay(entry) == 0.0
+
+    def test_repeated_requests_replay_in_order(self, tmp_path):
+        path = tmp_path / "c.jsonl"
+        cassette = Cassette(str(path), "record")
+        for body in ("first", "second"):
+            cassette.record("POST", "https://x/api", b"same", 200, {}, body, 1)
+        cassette.close()
+
+        replay = Cassette(str(path), "replay")
+        bodies = [replay.lookup("POST", "https://x/api", b"same")["body"] for _ in range(3)]
+        assert bodies == ["first", "second", "first"]
+
+    def test_bad_mode(self):
+        with pytest.raises(ValueError):
+            _use_cassette("rewind", "x")
@@ -0,0 +1,295 @@
+"""
+Tests for services/grok_async_service.py and the async pipeline runners.
+
+All HTTP goes through httpx.MockTransport — no real API calls are made.
+Covers: chat + x_search parsing, error mapping, semaphore bound,
+executor round-trip (a cancelled job is not an error), run_pipeline_async
+APPROVE flow, DB work kept off the event loop, and unexpected errors in the async runners failing their
+runs instead of leaving them "running".
+"""
+import asyncio
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from models.prompt import Prompt
+from models.story import Story
+from models.pipeline_run import PipelineRun
+from services.grok_async_service import AsyncGrokClient, GrokAsyncExecutor
+from services.grok_service import GrokAPIError
+from services.run_control import PipelineCancelled
+
+
+def _chat_json(content):
+    return {"choices": [{"message": {"content": content}}]}
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+class TestAsyncGrokClient:
+    """Tests for AsyncGrokClient."""
+
+    def test_call_grok_success(self, app):
+        """Chat completion returns assistant content."""
+        def handler(request):
+            return httpx.Response(200, json=_chat_json("async result"))
+
+        async def go():
+            async with AsyncGrokClient(app.config, transport=httpx.MockTransport(handler)) as client:
+                return await client.call_grok("prompt")
+
+        assert _run(go()) == "async result"
+
+    def test_call_grok_with_search_success(self, app):
+        """Responses API output_text blocks are joined."""
+        def handler(request):
+            assert request.url.path == "/v1/responses"
+            return httpx.Response(200, json={"output": [
+                {"type": "message", "content": [{"type": "output_text", "text": "Post 1"}]},
+            ]})
+
+        async def go():
+            async with AsyncGrokClient(app.config, transport=httpx.MockTransport(handler)) as client:
+                return await client.call_grok_with_search("find posts")
+
+        assert _run(go()) == "Post 1"
+
+    def test_rate_limit_raises(self, app):
+        """429 maps to GrokAPIError with status 429."""
+        def handler(request):
+            return httpx.Response(429, text="slow down")
+
+        async def go():
+            async with AsyncGrokClient(app.config, transport=httpx.MockTransport(handler)) as client:
+                await client.call_grok("prompt")
+
+        with pytest.raises(GrokAPIError, match="rate limit"):
+            _run(go())
+
+    def test_timeout_raises(self, app):
+        """Transport timeout maps to GrokAPIError 408."""
+        def handler(request):
+            raise httpx.ReadTimeout("timed out", request=request)
+
+        async def go():
+            async with AsyncGrokClient(app.config, transport=httpx.MockTransport(handler)) as client:
+                await client.call_grok("prompt")
+
+        with pytest.raises(GrokAPIError, match="timed out"):
+            _run(go())
+
+    def test_semaphore_caps_in_flight(self, app):
+        """No more than max_concurrency requests are in flight at once."""
+        peak = {"now": 0, "max": 0}
+
+        async def handler(request):
+            peak["now"] += 1
+            peak["max"] = max(peak["max"], peak["now"])
+            await asyncio.sleep(0.01)
+            peak["now"] -= 1
+            return httpx.Response(200, json=_chat_json("ok"))
+
+        async def go():
+            async with AsyncGrokClient(
+                app.config, max_concurrency=3, transport=httpx.MockTransport(handler)
+            ) as client:
+                return await asyncio.gather(*[client.call_grok(f"p{i}") for i in range(12)])
+
+        results = _run(go())
+        assert len(results) == 12
+        assert peak["max"] <= 3
+
+
+class TestGrokAsyncExecutor:
+    """Tests for the background event loop executor."""
+
+    def test_submit_runs_in_app_context(self, app):
+        """Submitted coroutines get the client and an app context."""
+        executor = GrokAsyncExecutor(app, transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, json=_chat_json("from loop"))
+        ))
+        try:
+            async def job(client, suffix):
+                from flask import current_app
+                text = await client.call_grok("x")
+                return f"{text}{suffix}:{current_app.name}"
+
+            result = executor.submit(job, "!").result(timeout=5)
+            assert result.startswith("from loop!:")
+        finally:
+            executor.shutdown()
+
+    def test_cancelled_job_is_not_an_error(self, app, caplog):
+        """A PipelineCancelled job ends quietly instead of logging [ERR]."""
+        executor = GrokAsyncExecutor(app, transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, json=_chat_json("unused"))
+        ))
+        try:
+            async def job(client):
+                raise PipelineCancelled()
+
+            assert executor.submit(job).result(timeout=5) is None
+            assert "[ERR]" not in caplog.text
+        finally:
+            executor.shutdown()
+
+
+class TestRunPipelineAsync:
+    """Tests for run_pipeline_async()."""
+
+    def test_pipeline_approve(self, app, db_session):
+        """Async pipeline runs refinement then Amy Bot and approves."""
+        from services.pipeline_service import run_pipeline_async
+
+        ref = Prompt(prompt_type="papa", name="PAPA", prompt_text="Refine", is_active=True)
+        amy = Prompt(prompt_type="amy-bot", name="Amy", prompt_text="Review", is_active=True)
+        story = Story(source_list_output="Topic")
+        db_session.add_all([ref, amy, story])
+        db_session.commit()
+        story_id, ref_id = story.id, ref.id
+
+        replies = iter(["Refined pitch", "DECISION: APPROVE"])
+
+        def handler(request):
+            return httpx.Response(200, json=_chat_json(next(replies)))
+
+        async def go():
+            async with AsyncGrokClient(app.config, transport=httpx.MockTransport(handler)) as client:
+                return await run_pipeline_async(client, story_id, "Selected", ref_id, "u@plmediaagency.com")
+
+        result = _run(go())
+        assert result["validation_decision"] == "APPROVE"
+        assert result["refinement_output"] == "Refined pitch"
+
+        runs = PipelineRun.query.filter_by(story_id=story_id).order_by(PipelineRun.id).all()
+        assert [r.step_type for r in runs] == ["refinement", "amy-bot"]
+        assert all(r.status == "completed" for r in runs)
+
+    def test_db_work_runs_off_the_loop(self, app, db_session):
+        """Commits, cancel checks and hedge delays run on threads, never on the event loop's."""
+        import threading
+        from services import pipeline_service
+        from services.pipeline_service import run_pipeline_async
+        from services.run_control import RunControl
+
+        ref = Prompt(prompt_type="papa", name="PAPA", prompt_text="Refine", is_active=True)
+        amy = Prompt(prompt_type="amy-bot", name="Amy", prompt_text="Review", is_active=True)
+        story = Story(source_list_output="Topic")
+        db_session.add_all([ref, amy, story])
+        db_session.commit()
+        story_id, ref_id = story.id, ref.id
+        replies = iter(["Refined pitch", "DECISION: REJECT"])
+        threads = []
+
+        def record(fn):
+            def wrapper(*args, **kwargs):
+                threads.append(threading.get_ident())
+                return fn(*args, **kwargs)
+            return wrapper
+
+        async def go():
+            loop_thread = threading.get_ident()
+            async with AsyncGrokClient(app.config, transport=httpx.MockTransport(
+                lambda request: httpx.Response(200, json=_chat_json(next(replies)))
+            )) as client:
+                await run_pipeline_async(client, story_id, "Selected", ref_id,
+                                         "u@plmediaagency.com")
+            return loop_thread
+
+        app.config["GROK_HEDGE_ENABLED"] = True
+        try:
+            with patch.object(pipeline_service, "commit_before_io",
+                              record(pipeline_service.commit_before_io)), \
+                    patch.object(RunControl, "check", record(RunControl.check)), \
+                    patch.object(pipeline_service, "hedge_delay_ms",
+                                 record(pipeline_service.hedge_delay_ms)):
+                loop_thread = _run(go())
+        finally:
+            app.config["GROK_HEDGE_ENABLED"] = False
+        assert threads and loop_thread not in threads
+
+    @patch("services.pipeline_service.resolve_models", side_effect=RuntimeError("boom"))
+    def test_unexpected_error_fails_running_runs(self, mock_models, app, db_session):
+        """An unexpected error leaves no run "running" for the reaper."""
+        from services.pipeline_service import run_pipeline_async
+
+        ref = Prompt(prompt_type="papa", name="PAPA", prompt_text="Refine", is_active=True)
+        amy = Prompt(prompt_type="amy-bot", name="Amy", prompt_text="Review", is_active=True)
+        story = Story(source_list_output="Topic")
+        db_session.add_all([ref, amy, story])
+        db_session.commit()
+        # The route's placeholder run
+        db_session.add(PipelineRun(story_id=story.id, prompt_id=ref.id, step_type="refinement",
+                                   status="running", input_text="(pipeline starting...)"))
+        db_session.commit()
+        story_id, ref_id = story.id, ref.id
+
+        async def go():
+            async with AsyncGrokClient(app.config, transport=httpx.MockTransport(
+                lambda request: httpx.Response(200, json=_chat_json("unused"))
+            )) as client:
+                return await run_pipeline_async(client, story_id, "Selected", ref_id,
+                                                "u@plmediaagency.com")
+
+        with pytest.raises(RuntimeError):
+            _run(go())
+        run = PipelineRun.query.filter_by(story_id=story_id).one()
+        assert (run.status, run.error_message) == ("failed", "boom")
+
+    @patch("services.pipeline_service._build_amy_material", side_effect=RuntimeError("boom"))
+    def test_completed_step_survives_later_failure(self, mock_material, app, db_session):
+        """A completed refinement is committed, so a later error cannot undo the checkpoint."""
+        from services.pipeline_service import run_pipeline_async
+
+        ref = Prompt(prompt_type="papa", name="PAPA", prompt_text="Refine", is_active=True)
+        amy = Prompt(prompt_type="amy-bot", name="Amy", prompt_text="Review", is_active=True)
+        story = Story(source_list_output="Topic")
+        db_session.add_all([ref, amy, story])
+        db_session.commit()
+        story_id, ref_id = story.id, ref.id
+
+        async def go():
+            async with AsyncGrokClient(app.config, transport=httpx.MockTransport(
+                lambda request: httpx.Response(200, json=_chat_json("Refined pitch"))
+            )) as client:
+                return await run_pipeline_async(client, story_id, "Selected", ref_id,
+                                                "u@plmediaagency.com")
+
+        with pytest.raises(RuntimeError):
+            _run(go())
+        db_session.expire_all()
+        run = PipelineRun.query.filter_by(story_id=story_id).one()
+        assert (run.step_type, run.status, run.output_text) == (
+            "refinement", "completed", "Refined pitch"
+        )
+
+
+class TestRunSourceListAsync:
+    """Tests for run_source_list_async()."""
+
+    @patch("services.pipeline_service.resolve_models", side_effect=RuntimeError("boom"))
+    def test_unexpected_error_fails_run(self, mock_models, app, db_session):
+        """As the thread path, an unexpected error marks the run failed."""
+        from services.pipeline_service import run_source_list_async
+
+        prompt = Prompt(prompt_type="source-list", name="SL", prompt_text="Find", created_by="t")
+        story = Story()
+        db_session.add_all([prompt, story])
+        db_session.commit()
+        db_session.add(PipelineRun(story_id=story.id, prompt_id=prompt.id,
+                                   step_type="source-list", status="running", input_text="Find"))
+        db_session.commit()
+        story_id = story.id
+
+        async def go():
+            async with AsyncGrokClient(app.config, transport=httpx.MockTransport(
+                lambda request: httpx.Response(200, json=_chat_json("unused"))
+            )) as client:
+                await run_source_list_async(client, story_id, "Find", "")
+
+        _run(go())
+        run = PipelineRun.query.filter_by(story_id=story_id).one()
+        assert (run.status, run.error_message) == ("failed", "boom")
@@ -0,0 +1,189 @@
+"""
+Tests for services/grok_cache_service.py and its use in run_pipeline.
+
+Covers: key derivation, hit/miss, TTL expiry, LRU size eviction,
+bypass flag, repeat pipeline run served from cache, fallback answers
+not cached under the primary model.
+"""
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+
+from models.grok_cache_entry import GrokCacheEntry
+from models.pipeline_run import PipelineRun
+from models.prompt import Prompt
+from models.story import Story
+from services import grok_cache_service
+from services.grok_service import GrokAPIError
+
+
+@pytest.fixture()
+def cache_on(app):
+    """Enable the cache for one test."""
+    app.config["GROK_CACHE_ENABLED"] = True
+    yield
+    app.config["GROK_CACHE_ENABLED"] = False
+
+
+def _prompt(db_session, prompt_type="papa", name="PAPA", text="Refine"):
+    prompt = Prompt(prompt_type=prompt_type, name=name, prompt_text=text, is_active=True)
+    db_session.add(prompt)
+    db_session.flush()
+    return prompt
+
+
+class TestCacheKey:
+    """Tests for chat_cache_key()."""
+
+    def test_same_request_same_key(self, db_session):
+        prompt = _prompt(db_session)
+        assert grok_cache_service.chat_cache_key("x", prompt) == grok_cache_service.chat_cache_key("x", prompt)
+
+    def test_prompt_edit_changes_key(self, db_session):
+        """Bumping updated_at invalidates old entries."""
+        prompt = _prompt(db_session)
+        before = grok_cache_service.chat_cache_key("x", prompt)
+        prompt.updated_at = datetime.now(timezone.utc) + timedelta(seconds=5)
+        assert grok_cache_service.chat_cache_key("x", prompt) != before
+
+    def test_model_changes_key(self, db_session):
+        prompt = _prompt(db_session)
+        assert grok_cache_service.chat_cache_key("x", prompt, model="a") != \
+            grok_cache_service.chat_cache_key("x", prompt, model="b")
+
+
+class TestLookupAndStore:
+    """Tests for lookup(), store() and evict()."""
+
+    def test_miss_then_hit(self, db_session):
+        prompt = _prompt(db_session)
+        key = grok_cache_service.chat_cache_key("x", prompt)
+        assert grok_cache_service.lookup(key) is None
+        grok_cache_service.store(key, "answer", prompt=prompt, step_type="refinement")
+        assert grok_cache_service.lookup(key) == "answer"
+        assert GrokCacheEntry.query.filter_by(cache_key=key).one().hit_count == 1
+
+    def test_bypass_skips_read(self, db_session):
+        prompt = _prompt(db_session)
+        key = grok_cache_service.chat_cache_key("x", prompt)
+        grok_cache_service.store(key, "answer", prompt=prompt)
+        assert grok_cache_service.lookup(key, bypass=True) is None
+
+    def test_store_refreshes_existing(self, db_session):
+        prompt = _prompt(db_session)
+        key = grok_cache_service.chat_cache_key("x", prompt)
+        grok_cache_service.store(key, "old", prompt=prompt)
+        grok_cache_service.store(key, "new", prompt=prompt)
+        assert GrokCacheEntry.query.count() == 1
+        assert grok_cache_service.lookup(key) == "new"
+
+    def test_expired_entry_is_miss_and_evicted(self, db_session):
+        prompt = _prompt(db_session)
+        key = grok_cache_service.chat_cache_key("x", prompt)
+        grok_cache_service.store(key, "answer", prompt=prompt)
+        entry = GrokCacheEntry.query.filter_by(cache_key=key).one()
+        entry.expires_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+        db_session.flush()
+        assert grok_cache_service.lookup(key) is None
+        grok_cache_service.evict()
+        assert GrokCacheEntry.query.count() == 0
+
+    def test_size_cap_evicts_least_recently_used(self, app, db_session):
+        prompt = _prompt(db_session)
+        app.config["GROK_CACHE_MAX_BYTES"] = 10
+        try:
+            grok_cache_service.store("a" * 64, "123456", prompt=prompt)
+            older = GrokCacheEntry.query.filter_by(cache_key="a" * 64).one()
+            older.last_used_at = datetime.now(timezone.utc) - timedelta(hours=1)
+            db_session.flush()
+            grok_cache_service.store("b" * 64, "789012", prompt=prompt)
+            keys = [e.cache_key for e in GrokCacheEntry.query.all()]
+            assert keys == ["b" * 64]
+        finally:
+            app.config["GROK_CACHE_MAX_BYTES"] = 50 * 1024 * 1024
+
+    def test_stats_shape(self, db_session):
+        stats = grok_cache_service.get_cache_stats()
+        for key in ("hits", "misses", "bypasses", "entries", "total_bytes", "enabled"):
+            assert key in stats
+
+
+class TestPipelineCache:
+    """Repeat pipeline runs are served from the cache."""
+
+    def _setup(self, db_session):
+        ref = _prompt(db_session, "papa", "PAPA", "Refine this")
+        _prompt(db_session, "amy-bot", "Amy", "Review this")
+        first = Story(source_list_output="t")
+        second = Story(source_list_output="t")
+        db_session.add_all([first, second])
+        db_session.commit()
+        return ref, first, second
+
+    @patch("services.pipeline_service.call_grok")
+    def test_repeat_run_hits_cache(self, mock_grok, db_session, cache_on):
+        from services.pipeline_service import run_pipeline
+
+        ref, first, second = self._setup(db_session)
+        mock_grok.side_effect = ["Refined", "DECISION: APPROVE"]
+
+        run_pipeline(first.id, "Same story", ref.id, "a@plmediaagency.com")
+        result = run_pipeline(second.id, "Same story", ref.id, "a@plmediaagency.com")
+
+        assert mock_grok.call_count == 2
+        assert result["validation_decision"] == "APPROVE"
+        runs = PipelineRun.query.filter_by(story_id=second.id).all()
+        assert all(r.cache_hit for r in runs)
+
+    @patch("services.pipeline_service.call_grok")
+    def test_bypass_forces_fresh_call(self, mock_grok, db_session, cache_on):
+        from services.pipeline_service import run_pipeline
+
+        ref, first, second = self._setup(db_session)
+        mock_grok.side_effect = ["Refined", "DECISION: APPROVE", "Refined 2", "DECISION: REJECT"]
+
+        run_pipeline(first.id, "Same story", ref.id, "a@plmediaagency.com")
+        result = run_pipeline(second.id, "Same story", ref.id, "a@plmediaagency.com", bypass_cache=True)
+
+        assert mock_grok.call_count == 4
+        assert result["validation_decision"] == "REJECT"
+
+    @patch("services.pipeline_service.call_grok")
+    def test_fallback_answer_not_cached(self, mock_grok, app, db_session, cache_on):
+        from services.pipeline_service import run_pipeline
+
+        ref, first, second = self._setup(db_session)
+
+        def primary_times_out(*args, model=None, **kwargs):
+            if model == "grok-primary":
+                raise GrokAPIError("Grok API request timed out", status_code=408)
+            return "Refined by fallback" if model == "grok-fast" else "DECISION: APPROVE"
+
+        mock_grok.side_effect = primary_times_out
+        saved = {k: app.config[k] for k in ("GROK_STEP_MODELS", "GROK_STEP_FALLBACK_MODELS")}
+        app.config.update(GROK_STEP_MODELS={"refinement": "grok-primary"},
+                          GROK_STEP_FALLBACK_MODELS={"refinement": ["grok-fast"]})
+        try:
+            run_pipeline(first.id, "Same story", ref.id, "a@plmediaagency.com")
+            run_pipeline(second.id, "Same story", ref.id, "a@plmediaagency.com")
+        finally:
+            app.config.update(saved)
+
+        # Refinement asked the primary again; only Amy Bot's answer was cached
+        models = [call.kwargs["model"] for call in mock_grok.call_args_list]
+        assert models.count("grok-primary") == 2
+        assert [e.step_type for e in GrokCacheEntry.query.all()] == ["amy-bot"]
+
+    @patch("services.pipeline_service.call_grok")
+    def test_disabled_by_default(self, mock_grok, db_session):
+        from services.pipeline_service import run_pipeline
+
+        ref, first, second = self._setup(db_session)
+        mock_grok.side_effect = ["Refined", "DECISION: APPROVE"] * 2
+
+        run_pipeline(first.id, "Same story", ref.id, "a@plmediaagency.com")
+        run_pipeline(second.id, "Same story", ref.id, "a@plmediaagency.com")
+
+        assert mock_grok.call_count == 4
+        assert GrokCacheEntry.query.count() == 0
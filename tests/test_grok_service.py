@@ -1,7 +1,7 @@
 """
 Tests for services/grok_service.py.
 
-All tests mock the requests.post call — no real API calls are made.
+All tests mock the pooled session's post call — no real API calls are made.
 Covers: success, timeout, rate limit, missing key, malformed response.
 """
 from unittest.mock import patch, MagicMock
@@ -23,7 +23,7 @@ def _mock_response(status_code=200, json_data=None, text=""):
 class TestCallGrok:
     """Tests for call_grok function."""
 
-    @patch("services.grok_service.requests.post")
+    @patch("services.grok_service.requests.Session.post")
     def test_success(self, mock_post, app):
         """Valid API call returns assistant content."""
         mock_post.return_value = _mock_response(200, {
@@ -34,7 +34,7 @@ class TestCallGrok:
             assert result == "Here are the results..."
             mock_post.assert_called_once()
 
-    @patch("services.grok_service.requests.post")
+    @patch("services.grok_service.requests.Session.post")
     def test_with_context(self, mock_post, app):
         """System context is included in messages when provided."""
         mock_post.return_value = _mock_response(200, {
@@ -46,7 +46,7 @@ class TestCallGrok:
             assert len(payload["messages"]) == 2
             assert payload["messages"][0]["role"] == "system"
 
-    @patch("services.grok_service.requests.post")
+    @patch("services.grok_service.requests.Session.post")
     def test_timeout(self, mock_post, app):
         """Timeout raises GrokAPIError with 408 status."""
         import requests as req
@@ -55,7 +55,7 @@ class TestCallGrok:
             with pytest.raises(GrokAPIError, match="timed out"):
                 call_grok("prompt")
 
-    @patch("services.grok_service.requests.post")
+    @patch("services.grok_service.requests.Session.post")
     def test_rate_limit(self, mock_post, app):
         """429 response raises GrokAPIError."""
         mock_post.return_value = _mock_response(429, text="rate limited")
@@ -63,7 +63,7 @@ class TestCallGrok:
             with pytest.raises(GrokAPIError, match="rate limit"):
                 call_grok("prompt")
 
-    @patch("services.grok_service.requests.post")
+    @patch("services.grok_service.requests.Session.post")
     def test_server_error(self, mock_post, app):
         """500 response raises GrokAPIError."""
         mock_post.return_value = _mock_response(500, text="internal error")
@@ -79,10 +79,206 @@ class TestCallGrok:
                 call_grok("prompt")
             app.config["GROK_API_KEY"] = "test-grok-key"
 
-    @patch("services.grok_service.requests.post")
+    @patch("services.grok_service.requests.Session.post")
     def test_malformed_response(self, mock_post, app):
         """Response missing choices key raises GrokAPIError."""
         mock_post.return_value = _mock_response(200, {"bad": "data"})
         with app.app_context():
             with pytest.raises(GrokAPIError, match="Malformed"):
                 call_grok("prompt")
+
+
+class TestPooledSession:
+    """Tests for the shared keep-alive session."""
+
+    def test_session_is_reused(self, app):
+        """Every call in the same process gets the same session object."""
+        from services.grok_service import get_grok_session
+        with app.app_context():
+            assert get_grok_session() is get_grok_session()
+
+    def test_pool_sized_from_config(self, app):
+        """Adapter pool size follows GROK_POOL_MAXSIZE."""
+        from services.grok_service import get_grok_session
+        with app.app_context():
+            app.config["GROK_POOL_MAXSIZE"] = 7
+            try:
+                adapter = get_grok_session().get_adapter("https://api.x.ai/")
+                assert adapter._pool_maxsize == 7
+            finally:
+                app.config["GROK_POOL_MAXSIZE"] = 32
+
+    def test_pool_stats_shape(self, app):
+        """Pool stats report hits as requests minus new connections."""
+        from services.grok_service import get_pool_stats
+        stats = get_pool_stats()
+        assert stats["hits"] == stats["requests"] - stats["misses"]
+        assert "hit_rate" in stats
+
+    def test_admin_stats_endpoint(self, client, auth_headers):
+        """Admins can read the pool counters; users cannot."""
+        resp = client.get("/api/admin/grok/stats", headers=auth_headers("u@plmediaagency.com", "user"))
+        assert resp.status_code == 403
+        resp = client.get("/api/admin/grok/stats", headers=auth_headers("a@plmediaagency.com", "admin"))
+        assert resp.status_code == 200
+        assert "misses" in resp.get_json()["pool"]
+
+
+class TestRetryPolicy:
+    """Tests for RetryPolicy and retries inside call_grok / call_grok_with_search."""
+
+    @patch("services.grok_service.requests.Session.post")
+    def test_retries_transient_then_succeeds(self, mock_post, app):
+        """A 503 followed by a 200 succeeds on attempt 2."""
+        mock_post.side_effect = [
+            _mock_response(503, text="busy"),
+            _mock_response(200, {"choices": [{"message": {"content": "ok"}}]}),
+        ]
+        with app.app_context():
+            stats = {}
+            assert call_grok("prompt", call_stats=stats) == "ok"
+            assert stats["attempts"] == 2
+            assert mock_post.call_count == 2
+
+    @patch("services.grok_service.requests.Session.post")
+    def test_non_retryable_fails_once(self, mock_post, app):
+        """A 400 is not retried."""
+        mock_post.return_value = _mock_response(400, text="bad request")
+        with app.app_context():
+            stats = {}
+            with pytest.raises(GrokAPIError, match="HTTP 400"):
+                call_grok("prompt", call_stats=stats)
+            assert mock_post.call_count == 1
+            assert stats["attempts"] == 1
+
+    @patch("services.grok_service.requests.Session.post")
+    def test_gives_up_after_max_attempts(self, mock_post, app):
+        """Persistent 429s stop after GROK_RETRY_MAX_ATTEMPTS."""
+        mock_post.return_value = _mock_response(429, text="rate limited")
+        with app.app_context():
+            with pytest.raises(GrokAPIError, match="rate limit"):
+                call_grok("prompt")
+            assert mock_post.call_count == app.config["GROK_RETRY_MAX_ATTEMPTS"]
+
+    @patch("services.grok_service.requests.Session.post")
+    def test_empty_search_output_is_retried(self, mock_post, app):
+        """'No text output' from the Responses API is retried."""
+        from services.grok_service import call_grok_with_search
+        mock_post.side_effect = [
+            _mock_response(200, {"output": []}),
+            _mock_response(200, {"output": [
+                {"type": "message", "content": [{"type": "output_text", "text": "found"}]}
+            ]}),
+        ]
+        with app.app_context():
+            assert call_grok_with_search("find") == "found"
+
+    def test_retry_after_overrides_jitter(self):
+        """Retry-After is used as the delay, capped at max_delay."""
+        from services.grok_service import RetryPolicy
+        policy = RetryPolicy(max_attempts=3, base_delay=1.0, max_delay=10.0)
+        assert policy.delay_for(1, retry_after=4) == 4
+        assert policy.delay_for(1, retry_after=60) == 10.0
+
+    def test_jitter_bounded_by_exponential_cap(self):
+        """Jittered delay stays within base * 2**(attempt-1)."""
+        from services.grok_service import RetryPolicy
+        policy = RetryPolicy(max_attempts=5, base_delay=0.5, max_delay=30.0)
+        for attempt in (1, 2, 3):
+            for _ in range(20):
+                assert 0 <= policy.delay_for(attempt) <= 0.5 * 2 ** (attempt - 1)
+
+    def test_parse_retry_after(self):
+        """Numeric Retry-After headers are parsed; others ignored."""
+        from services.grok_service import parse_retry_after
+        resp = MagicMock()
+        resp.headers = {"Retry-After": "7"}
+        assert parse_retry_after(resp) == 7.0
+        resp.headers = {"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}
+        assert parse_retry_after(resp) is None
+        resp.headers = {}
+        assert parse_retry_after(resp) is None
+
+
+def _stream_response(deltas, status_code=200):
+    """Mock a stream=true response yielding SSE lines for each delta."""
+    import json
+    lines = [": keep-alive", 'data: {"choices": [{"delta": {"role": "assistant"}}]}']
+    for delta in deltas:
+        lines.append("data: " + json.dumps({"choices": [{"delta": {"content": delta}}]}))
+        lines.append("")
+    lines.append("data: [DONE]")
+    mock = _mock_response(status_code)
+    mock.iter_lines.return_value = iter(lines)
+    return mock
+
+
+class TestCallGrokStream:
+    """Tests for call_grok_stream() and parse_stream_line()."""
+
+    @patch("services.grok_service.requests.Session.post")
+    def test_deltas_joined_and_reported(self, mock_post, app):
+        """Each delta reaches on_delta as the text so far."""
+        from services.grok_service import call_grok_stream
+
+        mock_post.return_value = _stream_response(["Hel", "lo", " world"])
+        seen = []
+        with app.app_context():
+            result = call_grok_stream("prompt", on_delta=seen.append)
+        assert result == "Hello world"
+        assert seen == ["Hel", "Hello", "Hello world"]
+        assert mock_post.call_args[1]["json"]["stream"] is True
+        assert mock_post.call_args[1]["stream"] is True
+
+    @patch("services.grok_service.requests.Session.post")
+    def test_empty_stream_is_retried(self, mock_post, app):
+        """A stream with no content is retried like a malformed response."""
+        from services.grok_service import call_grok_stream
+
+        mock_post.side_effect = [_stream_response([]), _stream_response(["ok"])]
+        stats = {}
+        with app.app_context():
+            assert call_grok_stream("prompt", call_stats=stats) == "ok"
+        assert stats["attempts"] == 2
+
+    @patch("services.grok_service.requests.Session.post")
+    def test_http_error_raises(self, mock_post, app):
+        """Non-200 streaming responses raise GrokAPIError."""
+        from services.grok_service import call_grok_stream
+
+        mock_post.return_value = _stream_response([], status_code=400)
+        with app.app_context():
+            with pytest.raises(GrokAPIError, match="HTTP 400"):
+                call_grok_stream("prompt")
+
+    def test_parse_stream_line_ignores_noise(self):
+        from services.grok_service import parse_stream_line
+
+        assert parse_stream_line("") == ""
+        assert parse_stream_line(": ping") == ""
+        assert parse_stream_line("data: [DONE]") == ""
+        assert parse_stream_line("data: not json") == ""
+        assert parse_stream_line('data: {"choices": [{"delta": {"content": "x"}}]}') == "x"
+
+
+class TestUsage:
+    """Tests for record_usage() via call_grok's call_stats."""
+
+    @patch("services.grok_service.requests.Session.post")
+    def test_cached_tokens_recorded(self, mock_post, app):
+        mock_post.return_value = _mock_response(200, {
+            "choices": [{"message": {"content": "ok"}}],
+            "usage": {"prompt_tokens": 100, "prompt_tokens_details": {"cached_tokens": 64}},
+        })
+        stats = {}
+        with app.app_context():
+            call_grok("prompt", call_stats=stats)
+        assert stats["cached_tokens"] == 64
+
+    def test_stream_usage_chunk(self):
+        from services.grok_service import parse_stream_line
+
+        stats = {}
+        line = 'data: {"choices": [], "usage": {"prompt_tokens_details": {"cached_tokens": 12}}}'
+        assert parse_stream_line(line, stats) == ""
+        assert stats["cached_tokens"] == 12
@@ -0,0 +1,159 @@
+"""
+Tests for services/hedge_service.py — hedged Grok requests.
+
+Covers: no hedge when fast, hedge wins when primary is slow, budget cap,
+both copies failing, percentile delay from PipelineRun history, async
+loser cancellation, call_grok integration.
+"""
+import asyncio
+import threading
+import time
+from unittest.mock import patch, MagicMock
+
+import pytest
+
+from models.pipeline_run import PipelineRun
+from services import hedge_service
+from services.grok_service import GrokAPIError
+
+
+@pytest.fixture(autouse=True)
+def hedge_state(app):
+    """Fresh counters, budget and percentile cache for every test."""
+    app.config.update(GROK_HEDGE_ENABLED=True, GROK_HEDGE_MIN_SAMPLES=3)
+    hedge_service._stats.update(calls=0, hedges=0, hedge_wins=0, over_budget=0)
+    hedge_service._budget["tokens"] = None
+    hedge_service._percentiles.clear()
+    yield
+    app.config.update(GROK_HEDGE_ENABLED=False, GROK_HEDGE_MIN_SAMPLES=20)
+    hedge_service._percentiles.clear()
+
+
+def _slow_then_fast():
+    """send() whose first call is slow and later calls are fast."""
+    calls = {"n": 0}
+    lock = threading.Lock()
+
+    def send():
+        with lock:
+            calls["n"] += 1
+            n = calls["n"]
+        if n == 1:
+            time.sleep(0.3)
+            return "primary"
+        return "hedge"
+
+    return send, calls
+
+
+class TestRunHedged:
+    """Tests for run_hedged()."""
+
+    def test_fast_call_not_hedged(self):
+        stats = {}
+        assert hedge_service.run_hedged(lambda: "ok", 200, "Grok API", stats) == "ok"
+        assert "hedged" not in stats
+        assert hedge_service._stats["hedges"] == 0
+
+    def test_slow_primary_hedge_wins(self):
+        send, calls = _slow_then_fast()
+        stats = {}
+        assert hedge_service.run_hedged(send, 20, "Grok API", stats) == "hedge"
+        assert stats["hedged"] is True
+        assert calls["n"] == 2
+        assert hedge_service._stats["hedge_wins"] == 1
+
+    def test_budget_caps_hedges(self, app):
+        app.config.update(GROK_HEDGE_MAX_RATIO=0, GROK_HEDGE_BURST=1)
+        try:
+            results = [hedge_service.run_hedged(_slow_then_fast()[0], 20, "Grok API") for _ in range(2)]
+            assert results == ["hedge", "primary"]
+            assert hedge_service._stats["over_budget"] == 1
+        finally:
+            app.config.update(GROK_HEDGE_MAX_RATIO=0.1, GROK_HEDGE_BURST=3)
+
+    def test_both_fail_raises_first_error(self):
+        def send():
+            time.sleep(0.05)
+            raise GrokAPIError("boom", status_code=503)
+
+        with pytest.raises(GrokAPIError, match="boom"):
+            hedge_service.run_hedged(send, 10, "Grok API")
+
+
+class TestHedgeDelay:
+    """Tests for hedge_delay_ms()."""
+
+    def test_percentile_of_recent_runs(self, db_session):
+        for ms in (100, 200, 300, 400, 5000):
+            db_session.add(PipelineRun(step_type="refinement", status="completed", duration_ms=ms))
+        db_session.add(PipelineRun(step_type="refinement", status="completed", duration_ms=1, cache_hit=True))
+        db_session.commit()
+        from flask import current_app
+        current_app.config.update(GROK_HEDGE_PERCENTILE=80, GROK_HEDGE_MIN_DELAY_MS=0)
+        try:
+            assert hedge_service.hedge_delay_ms("refinement") == 400
+        finally:
+            current_app.config.update(GROK_HEDGE_PERCENTILE=95, GROK_HEDGE_MIN_DELAY_MS=2000)
+
+    def test_too_few_samples(self, db_session):
+        db_session.add(PipelineRun(step_type="amy-bot", status="completed", duration_ms=100))
+        db_session.commit()
+        assert hedge_service.hedge_delay_ms("amy-bot") is None
+
+    def test_disabled(self, app, db_session):
+        app.config["GROK_HEDGE_ENABLED"] = False
+        assert hedge_service.hedge_delay_ms("refinement") is None
+
+
+class TestRunHedgedAsync:
+    """Tests for run_hedged_async()."""
+
+    def test_loser_cancelled(self):
+        cancelled = []
+        calls = {"n": 0}
+
+        async def send():
+            calls["n"] += 1
+            n = calls["n"]
+            try:
+                await asyncio.sleep(1 if n == 1 else 0.01)
+            except asyncio.CancelledError:
+                cancelled.append(n)
+                raise
+            return n
+
+        async def go():
+            return await hedge_service.run_hedged_async(send, 20, "Grok API")
+
+        assert asyncio.run(go()) == 2
+        assert cancelled == [1]
+
+
+class TestCallGrokHedging:
+    """call_grok races a backup request through the pooled session."""
+
+    @patch("services.grok_service.requests.Session.post")
+    def test_call_grok_hedges(self, mock_post, app):
+        from services.grok_service import call_grok
+
+        def reply(content, delay):
+            def _post(*args, **kwargs):
+                time.sleep(delay)
+                resp = MagicMock()
+                resp.status_code = 200
+                resp.json.return_value = {
+                    "choices": [{"message": {"content": content}}],
+                    "usage": {"prompt_tokens": 10, "completion_tokens": len(content)},
+                }
+                return resp
+            return _post
+
+        slow, fast = reply("slow", 0.3), reply("fast!", 0)
+        mock_post.side_effect = lambda *a, **k: (slow if mock_post.call_count == 1 else fast)(*a, **k)
+
+        stats = {}
+        assert call_grok("prompt", call_stats=stats, hedge_after_ms=20) == "fast!"
+        assert stats["hedged"] is True
+        assert stats["completion_tokens"] == 5
+        assert stats["attempts"] == 1
@@ -0,0 +1,184 @@
+"""
+Tests for services/idempotency.py and launch coalescing in routes/pipeline.py.
+
+Covers: Idempotency-Key replay, key reuse with a different body, the
+same-key race (unique index), single-flight joins for POST /source-list
+and /run, the process-local single-flight lock, and purging expired keys.
+"""
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from models import db
+from models.idempotency_key import IdempotencyKey
+from models.job import Job
+from models.pipeline_run import PipelineRun
+from models.prompt import Prompt
+from models.story import Story
+from services import idempotency
+
+
+def _source_prompt(db_session, text="Find stories..."):
+    prompt = Prompt(prompt_type="source-list", name="SL", prompt_text=text,
+                    opportunity="IL News", created_by="t")
+    db_session.add(prompt)
+    db_session.commit()
+    return prompt
+
+
+def _post_source_list(client, headers, prompt, key=None):
+    if key:
+        headers = {**headers, "Idempotency-Key": key}
+    return client.post("/api/pipeline/source-list", json={"prompt_id": prompt.id}, headers=headers)
+
+
+class TestIdempotencyKey:
+    """Idempotency-Key on POST /api/pipeline/source-list."""
+
+    def test_repeat_replays_first_response(self, client, db_session, auth_headers):
+        prompt = _source_prompt(db_session)
+        headers = auth_headers("idem@plmediaagency.com", "user")
+
+        first = _post_source_list(client, headers, prompt, key="k1")
+        # The first run finished, so only the key can stop a second launch
+        PipelineRun.query.update({"status": "completed"})
+        db_session.commit()
+        second = _post_source_list(client, headers, prompt, key="k1")
+
+        assert second.status_code == 202
+        assert second.get_json() == first.get_json()
+        assert second.headers["Idempotent-Replayed"] == "true"
+        assert Story.query.count() == 1
+        assert Job.query.count() == 1
+
+    def test_different_body_is_422(self, client, db_session, auth_headers):
+        prompt = _source_prompt(db_session)
+        other = _source_prompt(db_session, text="Other")
+        headers = auth_headers("idem@plmediaagency.com", "user")
+
+        _post_source_list(client, headers, prompt, key="k1")
+        resp = _post_source_list(client, headers, other, key="k1")
+        assert resp.status_code == 422
+
+    def test_concurrent_first_requests_replay_winner(self, client, db_session, auth_headers):
+        prompt = _source_prompt(db_session)
+        winner = Story()
+        db_session.add(winner)
+        db_session.flush()
+        body = {"story_id": winner.id, "status": "running", "coalesced": False}
+        db_session.add(IdempotencyKey(
+            key="k1", endpoint="source-list", created_by="idem@plmediaagency.com",
+            request_hash=idempotency.fingerprint(json.dumps({"prompt_id": prompt.id})),
+            story_id=winner.id, response_status=202, response_body=json.dumps(body),
+        ))
+        db_session.commit()
+        real_find = idempotency._find
+        calls = []
+
+        def find_after_race(keyed):
+            # The winner commits just after this request's first lookup
+            calls.append(keyed)
+            return None if len(calls) == 1 else real_find(keyed)
+
+        with patch("services.idempotency._find", side_effect=find_after_race):
+            resp = _post_source_list(client, auth_headers("idem@plmediaagency.com", "user"),
+                                     prompt, key="k1")
+
+        assert resp.get_json() == body
+        assert Story.query.count() == 1
+        assert Job.query.count() == 0
+
+    def test_key_too_long(self, client, db_session, auth_headers):
+        prompt = _source_prompt(db_session)
+        resp = _post_source_list(client, auth_headers("idem@plmediaagency.com", "user"),
+                                 prompt, key="k" * 300)
+        assert resp.status_code == 400
+
+    def test_purge_expired(self, db_session):
+        db_session.add_all([
+            IdempotencyKey(key=key, endpoint="run", created_by="u", request_hash="h",
+                           response_status=202, response_body="{}", created_at=created_at)
+            for key, created_at in (
+                ("old", datetime.now(timezone.utc) - timedelta(days=2)),
+                ("new", datetime.now(timezone.utc)),
+            )
+        ])
+        db_session.commit()
+
+        assert idempotency.purge_expired() == 1
+        assert [k.key for k in IdempotencyKey.query.all()] == ["new"]
+
+
+class TestSingleFlight:
+    """Identical launches join the run already in flight."""
+
+    def test_local_lock_held_until_transaction_ends(self, app, db_session):
+        key = idempotency.fingerprint("source-list", 1)
+        idempotency.lock(key)
+        idempotency.lock(key)  # Already held by this transaction
+        locked = threading.Event()
+
+        def identical_request():
+            with app.app_context():
+                idempotency.lock(key)
+                locked.set()
+                db.session.rollback()
+
+        thread = threading.Thread(target=identical_request)
+        thread.start()
+        assert not locked.wait(0.2)
+        db_session.commit()
+        assert locked.wait(2)
+        thread.join()
+        assert idempotency._local_locks == {}
+
+    def test_source_list_joins_running_story(self, client, db_session, auth_headers):
+        prompt = _source_prompt(db_session)
+        first = _post_source_list(client, auth_headers("a@plmediaagency.com", "user"), prompt)
+        second = _post_source_list(client, auth_headers("b@plmediaagency.com", "user"), prompt)
+
+        assert second.status_code == 202
+        assert second.get_json() == {**first.get_json(), "coalesced": True}
+        assert Job.query.count() == 1
+
+    def test_finished_or_edited_prompt_starts_new_run(self, client, db_session, auth_headers):
+        prompt = _source_prompt(db_session)
+        headers = auth_headers("a@plmediaagency.com", "user")
+        _post_source_list(client, headers, prompt)
+
+        prompt.prompt_text = "Find different stories..."
+        db_session.commit()
+        edited = _post_source_list(client, headers, prompt)
+        PipelineRun.query.update({"status": "completed"})
+        db_session.commit()
+        finished = _post_source_list(client, headers, prompt)
+
+        assert edited.get_json()["coalesced"] is False
+        assert finished.get_json()["coalesced"] is False
+        assert Story.query.count() == 3
+
+    def test_run_joins_same_selection_from_same_source(self, client, db_session, auth_headers):
+        prompt = _source_prompt(db_session)
+        papa = Prompt(prompt_type="papa", name="PAPA", prompt_text="Refine", created_by="t")
+        other_papa = Prompt(prompt_type="papa", name="PSST", prompt_text="Refine 2", created_by="t")
+        stories = [Story(source_list_prompt_id=prompt.id, opportunity="IL News") for _ in range(2)]
+        db_session.add_all([papa, other_papa, *stories])
+        db_session.commit()
+        headers = auth_headers("a@plmediaagency.com", "user")
+
+        def run(story, refinement):
+            return client.post("/api/pipeline/run", headers=headers, json={
+                "story_id": story.id, "selected_story": "Budget bill",
+                "refinement_prompt_id": refinement.id,
+            }).get_json()
+
+        first = run(stories[0], papa)
+        joined = run(stories[1], papa)
+        different_prompt = run(stories[1], other_papa)
+
+        assert first["coalesced"] is False
+        assert joined == {"story_id": stories[0].id, "status": "running", "coalesced": True}
+        assert different_prompt == {"story_id": stories[1].id, "status": "running",
+                                    "coalesced": False}
+        assert Job.query.count() == 2
@@ -0,0 +1,382 @@
+"""
+Tests for services/job_queue.py and the queue-backed pipeline routes.
+
+Jobs run synchronously through run_next_job (TestConfig has JOB_WORKERS=0)
+except in the pool test. Covers: enqueue/claim/finish, locked jobs skipped,
+visibility-timeout reclaim and give-up, handler errors, stale workers,
+heartbeats, fair share (lanes, agency/user ordering and caps), queue
+metrics (reclaimed jobs wait from their lapsed lock), route integration,
+pool drain.
+"""
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+
+from models.job import Job
+from models.pipeline_run import PipelineRun
+from models.prompt import Prompt
+from models.story import Story
+from services import job_queue
+from services.job_queue import (
+    JobWorkerPool, claim_job, enqueue, finish_job, get_queue_stats, heartbeat,
+    register_job_handler, run_next_job,
+)
+
+CALLS = []
+
+
+def _record_handler(app, **payload):
+    CALLS.append(payload)
+
+
+def _failing_handler(app, **payload):
+    raise RuntimeError("handler blew up")
+
+
+register_job_handler("test-record", _record_handler)
+register_job_handler("test-fail", _failing_handler)
+
+
+@pytest.fixture(autouse=True)
+def _clear_calls():
+    CALLS.clear()
+
+
+def _expire_lock(job_id, db_session):
+    job = db_session.get(Job, job_id)
+    job.locked_until = datetime.now(timezone.utc) - timedelta(seconds=1)
+    db_session.commit()
+
+
+class TestClaim:
+    """Claiming, finishing and reclaiming jobs."""
+
+    def test_enqueue_claim_finish(self, app, db_session):
+        """A queued job is claimed once and run with its payload."""
+        job = enqueue("test-record", {"story_id": 7, "note": "hi"})
+        assert job.status == "queued"
+
+        assert run_next_job(app, "w1") == job.id
+        assert CALLS == [{"story_id": 7, "note": "hi"}]
+
+        db_session.expire_all()
+        job = db_session.get(Job, job.id)
+        assert job.status == "completed"
+        assert job.attempts == 1
+        assert job.finished_at is not None
+        assert run_next_job(app, "w1") is None
+
+    def test_unknown_job_type_rejected(self, app):
+        with pytest.raises(ValueError):
+            enqueue("no-such-type", {})
+
+    def test_locked_job_not_claimed_twice(self, app, db_session):
+        """A running job with a live lock is invisible to other workers."""
+        enqueue("test-record", {})
+        assert claim_job("w1") is not None
+        assert claim_job("w2") is None
+
+    def test_expired_lock_is_reclaimed(self, app, db_session):
+        """A job whose worker stopped heartbeating is retried."""
+        job = enqueue("test-record", {})  # JOB_MAX_ATTEMPTS defaults to 2
+        first = claim_job("dead-worker")
+        _expire_lock(first.id, db_session)
+
+        again = claim_job("w2")
+        assert again.id == job.id
+        assert again.attempts == 2
+        assert again.locked_by == "w2"
+
+    def test_gives_up_after_max_attempts(self, app, db_session):
+        """An expired final attempt fails the job and its running steps."""
+        story = Story(created_by="t")
+        db_session.add(story)
+        db_session.flush()
+        db_session.add(PipelineRun(story_id=story.id, step_type="source-list", status="running"))
+        db_session.commit()
+
+        app.config["JOB_MAX_ATTEMPTS"] = 1
+        try:
+            job = enqueue("test-record", {}, story_id=story.id)
+        finally:
+            app.config["JOB_MAX_ATTEMPTS"] = 2
+        claim_job("dead-worker")
+        _expire_lock(job.id, db_session)
+
+        assert claim_job("w2") is None
+        db_session.expire_all()
+        assert db_session.get(Job, job.id).status == "failed"
+        run = PipelineRun.query.filter_by(story_id=story.id).one()
+        assert run.status == "failed"
+        assert "visibility timeout" in run.error_message
+
+    def test_handler_error_fails_job(self, app, db_session):
+        job = enqueue("test-fail", {})
+        run_next_job(app, "w1")
+        db_session.expire_all()
+        job = db_session.get(Job, job.id)
+        assert job.status == "failed"
+        assert job.last_error == "handler blew up"
+
+    def test_stale_worker_cannot_finish(self, app, db_session):
+        """Once reclaimed, the old worker's result is ignored."""
+        job = enqueue("test-record", {})
+        claim_job("old")
+        _expire_lock(job.id, db_session)
+        claim_job("new")
+
+        finish_job(job.id, "old", error="late")
+        db_session.expire_all()
+        job = db_session.get(Job, job.id)
+        assert job.status == "running"
+        assert job.locked_by == "new"
+
+    def test_claim_filters_job_types(self, app, db_session):
+        """Workers restricted to some types skip the others."""
+        enqueue("test-fail", {})
+        job = enqueue("test-record", {})
+        assert claim_job("w1", job_types=["test-record"]).id == job.id
+        assert claim_job("w1", job_types=[]) is None
+
+    def test_heartbeat_extends_own_lock(self, app, db_session):
+        job = enqueue("test-record", {})
+        claim_job("w1")
+        _expire_lock(job.id, db_session)
+
+        heartbeat([job.id], "w1")
+        db_session.expire_all()
+        assert claim_job("w2") is None
+
+
+def _running(agency=None, created_by=None, lane="interactive"):
+    """A job some worker holds a live lock on."""
+    job = enqueue("test-record", {}, agency=agency, created_by=created_by, lane=lane)
+    job.status = "running"
+    job.locked_until = datetime.now(timezone.utc) + timedelta(minutes=5)
+    return job
+
+
+class TestFairShare:
+    """Lanes, fair-share ordering and per-agency / per-user caps."""
+
+    def test_interactive_lane_first(self, app, db_session):
+        bulk = enqueue("test-record", {}, lane="bulk")
+        interactive = enqueue("test-record", {})
+        assert interactive.lane == "interactive"
+
+        assert claim_job("w1").id == interactive.id
+        assert claim_job("w1", lanes=["interactive"]) is None
+        assert claim_job("w1").id == bulk.id
+
+    def test_least_busy_agency_then_user_first(self, app, db_session):
+        _running(agency="Busy", created_by="c@x.com")
+        _running(agency="Busy", created_by="c@x.com")
+        _running(agency="Quiet", created_by="a@x.com")
+        busy = enqueue("test-record", {}, agency="Busy", created_by="b@x.com")
+        quiet_busy_user = enqueue("test-record", {}, agency="Quiet", created_by="a@x.com")
+        quiet_idle_user = enqueue("test-record", {}, agency="Quiet", created_by="b@x.com")
+        db_session.commit()
+
+        claimed = [claim_job("w1").id for _ in range(3)]
+        # Quiet's idle user first; then both agencies run 2 and the tie goes by user, then age
+        assert claimed == [quiet_idle_user.id, busy.id, quiet_busy_user.id]
+
+    def test_agency_weights(self, app, db_session):
+        for _ in range(2):
+            _running(agency="Big")
+        _running(agency="Small")
+        big = enqueue("test-record", {}, agency="Big")
+        small = enqueue("test-record", {}, agency="Small")
+        db_session.commit()
+
+        app.config["JOB_AGENCY_WEIGHTS"] = {"Big": 4.0}
+        try:
+            assert claim_job("w1").id == big.id  # 2 running / 4 beats 1 / 1
+        finally:
+            app.config["JOB_AGENCY_WEIGHTS"] = {}
+        assert small.status == "queued"
+
+    def test_agency_and_user_caps(self, app, db_session):
+        _running(agency="A", created_by="a@x.com")
+        enqueue("test-record", {}, agency="A", created_by="b@x.com")
+        enqueue("test-record", {}, agency="B", created_by="a@x.com")
+        enqueue("test-record", {}, agency="A", created_by="c@x.com", lane="bulk")
+        other = enqueue("test-record", {}, agency="B", created_by="c@x.com")
+        db_session.commit()
+
+        app.config.update(JOB_AGENCY_CONCURRENCY=1, JOB_USER_CONCURRENCY=1)
+        try:
+            # Only B/c@x.com is under both caps (a bulk job counts too)
+            assert claim_job("w1").id == other.id
+            assert claim_job("w1") is None
+        finally:
+            app.config.update(JOB_AGENCY_CONCURRENCY=0, JOB_USER_CONCURRENCY=0)
+
+    def test_caps_count_across_lanes(self, app, db_session):
+        _running(agency="A", created_by="a@x.com")
+        _running(agency="A", created_by="b@x.com", lane="bulk")
+        enqueue("test-record", {}, agency="A", created_by="c@x.com")
+        enqueue("test-record", {}, agency="A", created_by="c@x.com", lane="bulk")
+        other = enqueue("test-record", {}, agency="B", created_by="c@x.com", lane="bulk")
+        db_session.commit()
+
+        app.config["JOB_AGENCY_CONCURRENCY"] = 2
+        try:
+            # A holds its 2 in one interactive and one bulk job
+            assert claim_job("w1").id == other.id
+            assert claim_job("w1") is None
+        finally:
+            app.config["JOB_AGENCY_CONCURRENCY"] = 0
+
+    def test_agency_from_source_list_prompt(self, app, db_session):
+        prompt = Prompt(prompt_type="source-list", name="SL", prompt_text="Find",
+                        agency="Agency A", created_by="t")
+        db_session.add(prompt)
+        db_session.flush()
+        story = Story(source_list_prompt_id=prompt.id)
+        db_session.add(story)
+        db_session.commit()
+
+        assert enqueue("test-record", {}, story_id=story.id).agency == "Agency A"
+
+    def test_pool_reserves_workers_for_interactive(self, app):
+        pool = JobWorkerPool(app, size=3, interactive_reserve=1)
+        pool._track(1, "w1", "test-record")
+        assert pool._claimable_lanes() is None
+        pool._track(2, "w2", "test-record")
+        assert pool._claimable_lanes() == ["interactive"]
+        assert JobWorkerPool(app, size=1, interactive_reserve=1).interactive_reserve == 0
+
+
+class TestQueueStats:
+    """get_queue_stats metrics."""
+
+    def test_depth_and_waits(self, app, db_session):
+        enqueue("test-record", {})
+        enqueue("test-record", {})
+        run_next_job(app, "w1")
+
+        stats = get_queue_stats()
+        assert stats["counts"]["queued"] == 1
+        assert stats["counts"]["completed"] == 1
+        assert stats["depth"] == 1
+        assert stats["oldest_queued_age_ms"] >= 0
+        assert stats["wait_ms"]["samples"] == 1
+        assert stats["pool"] is None
+
+    def test_reclaimed_wait_counts_from_lapsed_lock(self, app, db_session):
+        job = enqueue("test-record", {})
+        job.enqueued_at = job.run_after = datetime.now(timezone.utc) - timedelta(minutes=30)
+        db_session.commit()
+        claim_job("dead-worker")
+        _expire_lock(job.id, db_session)
+        claim_job("w2")
+
+        wait = get_queue_stats()["wait_ms"]
+        assert wait["samples"] == 1
+        assert wait["p95"] < 10_000  # Since the lock lapsed, not the 30-minute-old enqueue
+
+    def test_lanes_and_agencies(self, app, db_session):
+        enqueue("test-record", {}, agency="A")
+        enqueue("test-record", {}, agency="A", lane="bulk")
+        run_next_job(app, "w1")
+
+        stats = get_queue_stats()
+        assert stats["lanes"]["interactive"]["wait_ms"]["samples"] == 1
+        assert stats["lanes"]["bulk"] == {
+            "queued": 1, "running": 0,
+            "wait_ms": {"window_minutes": 60, "samples": 0, "avg": None, "p95": None},
+        }
+        assert stats["agencies"] == {"A": {"queued": 1, "running": 0}}
+
+    def test_admin_endpoint(self, client, auth_headers):
+        headers = auth_headers(role="admin")
+        resp = client.get("/api/admin/jobs/stats", headers=headers)
+        assert resp.status_code == 200
+        assert "depth" in resp.get_json()
+
+
+class TestQueueRoutes:
+    """Pipeline routes enqueue jobs instead of starting threads."""
+
+    @patch("routes.pipeline.threading.Thread")
+    def test_source_list_enqueues_job(self, mock_thread, client, auth_headers, db_session):
+        headers = auth_headers(role="admin")
+        prompt = Prompt(prompt_type="source-list", name="SL", prompt_text="Find", created_by="t")
+        db_session.add(prompt)
+        db_session.commit()
+
+        resp = client.post("/api/pipeline/source-list", json={"prompt_id": prompt.id},
+                           headers=headers)
+        assert resp.status_code == 202
+        mock_thread.assert_not_called()
+
+        job = Job.query.one()
+        assert job.job_type == "source-list"
+        assert job.story_id == resp.get_json()["story_id"]
+        assert json.loads(job.payload)["prompt_id"] == prompt.id
+
+    @patch("routes.pipeline.threading.Thread")
+    def test_thread_executor_still_available(self, mock_thread, app, client, auth_headers,
+                                             db_session):
+        headers = auth_headers(role="admin")
+        story = Story(created_by="t")
+        db_session.add(story)
+        db_session.commit()
+
+        app.config["PIPELINE_EXECUTOR"] = "thread"
+        try:
+            resp = client.post("/api/pipeline/run", headers=headers, json={
+                "story_id": story.id, "selected_story": "x", "refinement_prompt_id": 1,
+            })
+        finally:
+            app.config["PIPELINE_EXECUTOR"] = "queue"
+        assert resp.status_code == 202
+        mock_thread.return_value.start.assert_called_once()
+        assert Job.query.count() == 0
+
+
+class TestWorkerPool:
+    """JobWorkerPool threads and the standalone worker entry point."""
+
+    def test_type_limit_blocks_full_types(self, app):
+        pool = JobWorkerPool(app, size=4, type_limits={"test-record": 1, "test-fail": 0})
+        assert "test-record" in pool._claimable_types()
+        pool._track(1, "w1", "test-record")
+        types = pool._claimable_types()
+        assert "test-record" not in types
+        assert "test-fail" in types  # 0 = no per-type limit
+
+    def test_worker_cli_overrides(self, app):
+        from worker import build_pool, parse_args
+
+        args = parse_args(["--concurrency", "3", "--types", "source-list,pipeline",
+                           "--pipeline-concurrency", "2"])
+        pool = build_pool(app, args)
+        assert pool.size == 3
+        assert pool.job_types == ["source-list", "pipeline"]
+        assert pool.type_limits == {"pipeline": 2}
+
+    def test_pool_runs_and_drains(self, app, db_session):
+        app.config["JOB_POLL_INTERVAL_SECONDS"] = 0.05
+        try:
+            job = enqueue("test-record", {"n": 1})
+            pool = JobWorkerPool(app, size=2).start()
+            pool.notify()
+            for _ in range(100):
+                if CALLS:
+                    break
+                time.sleep(0.02)
+            pool.drain(timeout=5)
+        finally:
+            app.config["JOB_POLL_INTERVAL_SECONDS"] = 2
+
+        assert CALLS == [{"n": 1}]
+        assert pool.stats()["busy"] == 0
+        assert pool.stats()["draining"] is True
+        db_session.expire_all()
+        assert db_session.get(Job, job.id).status == "completed"
+        assert job_queue.get_job_pool(app) is None  # JOB_WORKERS=0 in tests
@@ -0,0 +1,106 @@
+"""
+Tests for tools/mock_xai_server.py.
+
+Runs the real Grok clients against the mock on an ephemeral port.
+Covers: chat, streaming usage, Responses API search, Amy Bot decisions,
+429 injection with retry, latency spec parsing.
+"""
+import pytest
+import requests
+
+from services.grok_service import (
+    GrokAPIError, call_grok, call_grok_stream, call_grok_with_search,
+)
+from tools.mock_xai_server import MockXAIServer, parse_latency
+
+
+@pytest.fixture
+def mock_xai(app):
+    """Start a mock server and point both Grok URLs at it."""
+    servers = []
+
+    def _start(**kwargs):
+        server = MockXAIServer(port=0, **kwargs).start()
+        servers.append(server)
+        app.config["GROK_API_URL"] = f"{server.base_url}/v1/chat/completions"
+        app.config["GROK_RESPONSES_API_URL"] = f"{server.base_url}/v1/responses"
+        return server
+
+    saved = (app.config["GROK_API_URL"], app.config["GROK_RESPONSES_API_URL"])
+    yield _start
+    app.config["GROK_API_URL"], app.config["GROK_RESPONSES_API_URL"] = saved
+    for server in servers:
+        server.stop()
+
+
+class TestMockXAIServer:
+    """The Grok clients parse everything the mock returns."""
+
+    def test_chat_completion(self, app, mock_xai):
+        """Chat calls get templated output and a usage block."""
+        mock_xai(chat_template="Story for {excerpt}")
+        stats = {}
+        with app.app_context():
+            result = call_grok("Refine this pitch", call_stats=stats)
+        assert result == "Story for Refine this pitch"
+        assert stats["completion_tokens"] >= 1
+
+    def test_stream_includes_usage(self, app, mock_xai):
+        """Streamed chat is reassembled and the usage chunk recorded."""
+        mock_xai(chat_template="A fairly long streamed answer for {excerpt}")
+        deltas = []
+        stats = {}
+        with app.app_context():
+            result = call_grok_stream("the pitch", on_delta=deltas.append, call_stats=stats)
+        assert result == "A fairly long streamed answer for the pitch"
+        assert len(deltas) > 1
+        assert stats["prompt_tokens"] >= 1
+
+    def test_search_uses_configured_responses_url(self, app, mock_xai):
+        """Source List search goes to GROK_RESPONSES_API_URL."""
+        server = mock_xai()
+        with app.app_context():
+            result = call_grok_with_search("latest on tariffs")
+        assert "https://x.com/mock/status/" in result
+        assert server.stats["responses"] == 1
+
+    @pytest.mark.parametrize("approve_rate, decision", [(1.0, "APPROVE"), (0.0, "REJECT")])
+    def test_amy_bot_decision(self, app, mock_xai, approve_rate, decision):
+        """Amy Bot reviews get a DECISION line per approve_rate."""
+        mock_xai(approve_rate=approve_rate)
+        with app.app_context():
+            result = call_grok("Pitch to review:\nSomething happened")
+        assert result.startswith(f"DECISION: {decision}")
+
+    def test_injected_429_is_retried(self, app, mock_xai):
+        """Every request rate-limited: the client retries, then gives up."""
+        server = mock_xai(rate_429=1.0)
+        with app.app_context():
+            with pytest.raises(GrokAPIError) as exc_info:
+                call_grok("anything")
+        assert exc_info.value.status_code == 429
+        assert server.stats["injected_429"] == app.config["GROK_RETRY_MAX_ATTEMPTS"]
+
+    def test_stats_endpoint(self, mock_xai):
+        """GET /stats reports counters."""
+        server = mock_xai()
+        resp = requests.get(f"{server.base_url}/stats", timeout=5)
+        assert resp.json()["requests"] == 0
+
+
+class TestParseLatency:
+    """Latency specs."""
+
+    def test_fixed(self):
+        assert parse_latency("fixed:250")() == 0.25
+
+    def test_uniform_in_range(self):
+        sample = parse_latency("uniform:10:20")
+        assert all(0.01 <= sample() <= 0.02 for _ in range(50))
+
+    def test_lognormal_positive(self):
+        assert parse_latency("lognormal:100:0.5")() > 0
+
+    def test_bad_spec(self):
+        with pytest.raises(ValueError):
+            parse_latency("poisson:3")
@@ -0,0 +1,123 @@
+"""
+Tests for services/model_router.py — per-step models and fallback chain.
+
+Covers: model precedence (prompt > step > global), fallback on timeout
+with SLO-capped attempts, no fallback on non-transient errors, model
+actually used stored on the PipelineRun, prompt model via the API.
+"""
+from unittest.mock import patch
+
+import pytest
+
+from models.pipeline_run import PipelineRun
+from models.prompt import Prompt
+from models.story import Story
+from services.grok_service import GrokAPIError
+from services.model_router import call_with_fallback, resolve_models
+
+
+@pytest.fixture()
+def routing(app):
+    """Step models with a refinement fallback chain and SLO."""
+    saved = {k: app.config[k] for k in ("GROK_STEP_MODELS", "GROK_STEP_FALLBACK_MODELS", "GROK_STEP_SLO_MS")}
+    app.config.update(
+        GROK_STEP_MODELS={"refinement": "big", "amy-bot": "small"},
+        GROK_STEP_FALLBACK_MODELS={"refinement": ["fast", "big"]},
+        GROK_STEP_SLO_MS={"refinement": 5000},
+    )
+    yield
+    app.config.update(saved)
+
+
+class TestResolveModels:
+    """Tests for resolve_models()."""
+
+    def test_step_model_and_chain(self, routing):
+        assert resolve_models("refinement") == ["big", "fast"]
+        assert resolve_models("amy-bot") == ["small"]
+
+    def test_prompt_model_wins(self, routing):
+        prompt = Prompt(prompt_type="papa", name="P", prompt_text="x", model="custom")
+        assert resolve_models("refinement", prompt) == ["custom", "fast", "big"]
+
+    def test_global_default(self, app):
+        assert resolve_models("unknown-step") == [app.config["GROK_MODEL"]]
+
+
+class TestCallWithFallback:
+    """Tests for call_with_fallback()."""
+
+    def test_timeout_falls_back_with_slo(self):
+        calls = []
+
+        def call(**kwargs):
+            calls.append(kwargs)
+            if kwargs["model"] == "big":
+                raise GrokAPIError("Grok API request timed out", status_code=408)
+            return "fast answer"
+
+        stats = {}
+        assert call_with_fallback(call, ["big", "fast"], slo_ms=1500, call_stats=stats) == "fast answer"
+        assert calls[0] == {"model": "big", "timeout": 1.5, "max_attempts": 1}
+        # The last model gets the normal timeout and retries
+        assert calls[1] == {"model": "fast"}
+        assert stats["fallback_from"] == ["big"]
+
+    def test_non_transient_error_not_retried_elsewhere(self):
+        def call(**kwargs):
+            raise GrokAPIError("Grok API returned HTTP 400", status_code=400)
+
+        with pytest.raises(GrokAPIError, match="400"):
+            call_with_fallback(call, ["big", "fast"])
+
+    def test_last_model_error_raised(self):
+        def call(**kwargs):
+            raise GrokAPIError("timed out", status_code=408)
+
+        with pytest.raises(GrokAPIError):
+            call_with_fallback(call, ["big", "fast"])
+
+
+class TestPipelineRouting:
+    """run_pipeline uses per-step models and records the one that answered."""
+
+    @patch("services.pipeline_service.call_grok")
+    def test_models_per_step(self, mock_grok, db_session, routing):
+        from services.pipeline_service import run_pipeline
+
+        ref = Prompt(prompt_type="papa", name="PAPA", prompt_text="Refine", is_active=True)
+        amy = Prompt(prompt_type="amy-bot", name="Amy", prompt_text="Review", is_active=True)
+        story = Story(source_list_output="t")
+        db_session.add_all([ref, amy, story])
+        db_session.commit()
+
+        def fake_call(prompt_text, context="", call_stats=None, model=None, **kwargs):
+            call_stats["model"] = model
+            if model == "big":
+                raise GrokAPIError("Grok API request timed out", status_code=408)
+            return "DECISION: APPROVE" if model == "small" else "Refined"
+
+        mock_grok.side_effect = fake_call
+        result = run_pipeline(story.id, "Story", ref.id, "route@plmediaagency.com")
+
+        assert result["validation_decision"] == "APPROVE"
+        runs = {r.step_type: r for r in PipelineRun.query.filter_by(story_id=story.id)}
+        assert runs["refinement"].model == "fast"
+        assert runs["amy-bot"].model == "small"
+
+
+class TestPromptModelField:
+    """Prompt.model is editable through the prompts API."""
+
+    def test_update_model(self, client, auth_headers, db_session):
+        prompt = Prompt(prompt_type="amy-bot", name="Amy", prompt_text="Review", is_active=True)
+        db_session.add(prompt)
+        db_session.commit()
+        headers = auth_headers("admin@plmediaagency.com", "admin")
+
+        resp = client.put(f"/api/prompts/{prompt.id}", json={"model": "grok-3-mini"}, headers=headers)
+        assert resp.status_code == 200
+        assert resp.get_json()["model"] == "grok-3-mini"
+
+        resp = client.put(f"/api/prompts/{prompt.id}", json={"model": ""}, headers=headers)
+        assert resp.get_json()["model"] is None
@@ -7,8 +7,12 @@ All Grok API calls are mocked. Covers:
   - Full pipeline service: APPROVE flow, REJECT flow, refinement failure
   - Pipeline route: returns 202 (async)
   - Status endpoint: polling, not-found, auth
+  - Status ETag (304 while unchanged) and fields= projection
+  - Short transactions: nothing held open across Grok / enrichment / CMS
+  - Multi-story status: constant queries, since cursor, batch_id
 """
 import json
+from datetime import datetime, timedelta, timezone
 from unittest.mock import patch
 
 import pytest
@@ -17,26 +21,15 @@ from models import db
 from models.prompt import Prompt
 from models.story import Story
 from models.pipeline_run import PipelineRun
-
-
-class _SyncThread:
-    """Drop-in replacement for threading.Thread that runs synchronously."""
-    def __init__(self, target=None, args=(), kwargs=None):
-        self.target = target
-        self.args = args
-        self.kwargs = kwargs or {}
-
-    def start(self):
-        self.target(*self.args, **self.kwargs)
+from services.job_queue import run_next_job
 
 
 class TestSourceListRoute:
     """Tests for POST /api/pipeline/source-list."""
 
-    @patch("routes.pipeline.threading.Thread", _SyncThread)
-    @patch("routes.pipeline.call_grok_with_search")
-    def test_source_list_success(self, mock_grok, client, db_session, auth_headers):
-        """Valid source-list prompt returns 202, background processes, status shows result."""
+    @patch("services.pipeline_service.call_grok_with_search")
+    def test_source_list_success(self, mock_grok, app, client, db_session, auth_headers):
+        """Valid source-list prompt returns 202, queued job processes, status shows result."""
         mock_grok.return_value = "Topic 1: Illinois budget...\nTopic 2: Chicago transit..."
 
         prompt = Prompt(
@@ -59,10 +52,13 @@ class TestSourceListRoute:
         assert "story_id" in data
         assert data["status"] == "running"
 
+        # Run the queued job the way a pool worker would
+        assert run_next_job(app, "test-worker") is not None
+
         # Expire stale objects so status endpoint reads fresh from DB
         db_session.expire_all()
 
-        # Poll status endpoint (sync thread already completed)
+        # Poll status endpoint (job already completed)
         status_resp = client.get(
             f"/api/pipeline/status/{data['story_id']}",
             headers=headers,
@@ -287,3 +283,343 @@ class TestStatusEndpoint:
         """Status endpoint requires authentication."""
         resp = client.get("/api/pipeline/status/1")
         assert resp.status_code == 401
+
+
+class TestStatusConditionalGet:
+    """ETag / If-None-Match and fields= on GET /api/pipeline/status/<id>."""
+
+    def _story(self, db_session):
+        story = Story(source_list_output="Long output " * 100, validation_decision=None)
+        db_session.add(story)
+        db_session.flush()
+        run = PipelineRun(story_id=story.id, step_type="refinement", status="running")
+        db_session.add(run)
+        db_session.commit()
+        return story, run
+
+    def test_unchanged_story_returns_304(self, client, db_session, auth_headers):
+        story, _ = self._story(db_session)
+        headers = auth_headers("poll@plmediaagency.com", "user")
+        first = client.get(f"/api/pipeline/status/{story.id}", headers=headers)
+        etag = first.headers["ETag"]
+        assert first.status_code == 200
+
+        again = client.get(f"/api/pipeline/status/{story.id}",
+                           headers={**headers, "If-None-Match": etag})
+        assert again.status_code == 304
+        assert again.get_data() == b""
+
+    def test_run_change_bumps_version(self, client, db_session, auth_headers):
+        story, run = self._story(db_session)
+        headers = auth_headers("poll@plmediaagency.com", "user")
+        first = client.get(f"/api/pipeline/status/{story.id}", headers=headers)
+
+        run.status = "completed"
+        db_session.commit()
+        again = client.get(f"/api/pipeline/status/{story.id}",
+                           headers={**headers, "If-None-Match": first.headers["ETag"]})
+        assert again.status_code == 200
+        assert again.get_json()["status"] == "completed"
+        assert again.get_json()["version"] > first.get_json()["version"]
+
+    def test_fields_projection(self, client, db_session, auth_headers):
+        story, _ = self._story(db_session)
+        headers = auth_headers("poll@plmediaagency.com", "user")
+        resp = client.get(f"/api/pipeline/status/{story.id}?fields=status,validation_decision",
+                          headers=headers)
+        assert resp.get_json() == {"story_id": story.id, "status": "running",
+                                   "validation_decision": None}
+        full = client.get(f"/api/pipeline/status/{story.id}", headers=headers)
+        assert resp.headers["ETag"] != full.headers["ETag"]
+
+    def test_unknown_field(self, client, db_session, auth_headers):
+        story, _ = self._story(db_session)
+        resp = client.get(f"/api/pipeline/status/{story.id}?fields=status,amy_bot_input",
+                          headers=auth_headers("poll@plmediaagency.com", "user"))
+        assert resp.status_code == 400
+
+
+class TestMultiStatusEndpoint:
+    """Tests for GET /api/pipeline/status?ids=...&since=..."""
+
+    def _stories(self, db_session, n, updated_at=None):
+        stories = [Story(source_list_output=f"Output {i}", updated_at=updated_at)
+                   for i in range(n)]
+        db_session.add_all(stories)
+        db_session.flush()
+        runs = [PipelineRun(story_id=s.id, step_type="source-list", status="running",
+                            updated_at=updated_at) for s in stories]
+        db_session.add_all(runs)
+        db_session.commit()
+        return stories, runs
+
+    def _count_queries(self, app, fn):
+        from sqlalchemy import event
+        statements = []
+        listener = lambda *args: statements.append(args[2])  # noqa: E731
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            fn()
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+        return len(statements)
+
+    def test_many_stories(self, client, db_session, auth_headers):
+        stories, runs = self._stories(db_session, 3)
+        headers = auth_headers("poll@plmediaagency.com", "user")
+        ids = ",".join(str(s.id) for s in stories)
+        data = client.get(f"/api/pipeline/status?ids={ids}", headers=headers).get_json()
+        assert [entry["story_id"] for entry in data["stories"]] == [s.id for s in stories]
+        assert data["stories"][0]["status"] == "running"
+        assert data["stories"][0]["source_list_output"] == "Output 0"
+        assert data["stories"][0]["runs"][0]["id"] == runs[0].id
+        assert data["cursor"].isdigit()
+
+    def test_constant_query_count(self, app, client, db_session, auth_headers):
+        headers = auth_headers("poll@plmediaagency.com", "user")
+        few, _ = self._stories(db_session, 2)
+        many, _ = self._stories(db_session, 12)
+
+        def poll(stories):
+            ids = ",".join(str(s.id) for s in stories)
+            return lambda: client.get(f"/api/pipeline/status?ids={ids}", headers=headers)
+
+        poll(few)()  # Warm the auth lookup
+        assert self._count_queries(app, poll(few)) == self._count_queries(app, poll(many))
+
+    def test_since_returns_only_changes(self, client, db_session, auth_headers):
+        old = datetime.now(timezone.utc) - timedelta(hours=1)
+        stories, runs = self._stories(db_session, 2, updated_at=old)
+        headers = auth_headers("poll@plmediaagency.com", "user")
+        ids = ",".join(str(s.id) for s in stories)
+
+        cursor = client.get(f"/api/pipeline/status?ids={ids}",
+                            headers=headers).get_json()["cursor"]
+        data = client.get(f"/api/pipeline/status?ids={ids}&since={cursor}",
+                          headers=headers).get_json()
+        assert data["stories"] == []
+
+        runs[1].status = "completed"
+        db_session.commit()
+        data = client.get(f"/api/pipeline/status?ids={ids}&since={cursor}",
+                          headers=headers).get_json()
+        assert len(data["stories"]) == 1
+        entry = data["stories"][0]
+        assert entry["story_id"] == stories[1].id
+        assert entry["status"] == "completed"
+        assert "source_list_output" not in entry  # story row unchanged
+        assert [run["id"] for run in entry["runs"]] == [runs[1].id]
+
+    def test_batch_id_and_validation(self, client, db_session, auth_headers):
+        from models.batch import Batch
+        batch = Batch(batch_type="source-list", total=1)
+        db_session.add(batch)
+        db_session.flush()
+        stories, _ = self._stories(db_session, 2)
+        stories[0].batch_id = batch.id
+        db_session.commit()
+        headers = auth_headers("poll@plmediaagency.com", "user")
+
+        data = client.get(f"/api/pipeline/status?batch_id={batch.id}", headers=headers).get_json()
+        assert [entry["story_id"] for entry in data["stories"]] == [stories[0].id]
+
+        assert client.get("/api/pipeline/status", headers=headers).status_code == 400
+        assert client.get("/api/pipeline/status?ids=a,b", headers=headers).status_code == 400
+        assert client.get(f"/api/pipeline/status?ids={stories[0].id}&since=x",
+                          headers=headers).status_code == 400
+
+
+class TestShortTransactions:
+    """No transaction (or pooled connection) is held across network calls."""
+
+    @patch("services.pipeline_service.cms_service.push_to_cms")
+    @patch("services.pipeline_service.call_grok")
+    def test_pipeline_commits_before_each_call(self, mock_grok, mock_cms, db_session):
+        story, ref_prompt, _ = TestPipelineService()._setup_prompts_and_story(db_session)
+        seen = []
+
+        def fake_grok(text, **kwargs):
+            seen.append(db.session().in_transaction())
+            return "DECISION: APPROVE" if "Pitch to review" in text else "Headline: refined"
+
+        def fake_cms(story):
+            seen.append(db.session().in_transaction())
+            return {"status": "stub"}
+
+        mock_grok.side_effect = fake_grok
+        mock_cms.side_effect = fake_cms
+
+        from services.pipeline_service import run_pipeline
+        result = run_pipeline(story.id, "Selected", ref_prompt.id, "u@plmediaagency.com")
+
+        assert result["validation_decision"] == "APPROVE"
+        assert seen == [False, False, False]
+
+    @patch("services.pipeline_service.enrich_urls")
+    @patch("services.pipeline_service.call_grok_with_search")
+    def test_source_list_commits_before_calls(self, mock_grok, mock_enrich, app, db_session):
+        from routes.pipeline import _run_source_list_background
+        prompt = Prompt(prompt_type="source-list", name="SL", prompt_text="Find", created_by="t")
+        story = Story()
+        db_session.add_all([prompt, story])
+        db_session.flush()
+        db_session.add(PipelineRun(story_id=story.id, prompt_id=prompt.id,
+                                   step_type="source-list", status="running"))
+        db_session.commit()
+        seen = []
+
+        def fake_grok(*args, **kwargs):
+            seen.append(db.session().in_transaction())
+            return "1. https://example.com/a"
+
+        def fake_enrich(output, deadline=None):
+            seen.append(db.session().in_transaction())
+            return None
+
+        mock_grok.side_effect = fake_grok
+        mock_enrich.side_effect = fake_enrich
+        _run_source_list_background(app, story.id, "Find", "", prompt.id)
+
+        assert seen == [False, False]
+        db_session.expire_all()
+        assert db_session.get(Story, story.id).source_list_output == "1. https://example.com/a"
+
+
+class TestRetryAccounting:
+    """Attempts and backoff from grok_service land on the PipelineRun."""
+
+    @patch("services.pipeline_service.call_grok")
+    def test_attempts_recorded(self, mock_grok, client, db_session, auth_headers):
+        """call_stats reported by call_grok are stored on each run."""
+        story, ref_prompt, _ = TestPipelineService()._setup_prompts_and_story(db_session)
+
+        def fake_call(prompt_text, context="", call_stats=None, **kwargs):
+            call_stats.update({"attempts": 2, "backoff_ms": 1500})
+            return "DECISION: APPROVE"
+
+        mock_grok.side_effect = fake_call
+
+        from services.pipeline_service import run_pipeline
+        run_pipeline(
+            story_id=story.id,
+            selected_story="Story text",
+            refinement_prompt_id=ref_prompt.id,
+            user_email="retry@plmediaagency.com",
+        )
+
+        runs = PipelineRun.query.filter_by(story_id=story.id).all()
+        assert len(runs) == 2
+        assert all(r.attempts == 2 and r.backoff_ms == 1500 for r in runs)
+
+
+class TestStreaming:
+    """GROK_STREAMING_ENABLED writes partial output to the running run."""
+
+    @pytest.fixture()
+    def streaming_on(self, app):
+        app.config["GROK_STREAMING_ENABLED"] = True
+        yield
+        app.config["GROK_STREAMING_ENABLED"] = False
+
+    @patch("services.pipeline_service.call_grok_stream")
+    def test_partial_output_persisted(self, mock_stream, client, db_session, auth_headers, streaming_on):
+        """Deltas are committed to output_text while the step runs."""
+        story, ref_prompt, _ = TestPipelineService()._setup_prompts_and_story(db_session)
+        headers = auth_headers("stream@plmediaagency.com", "user")
+        seen = []
+
+        def fake_stream(prompt_text, context="", on_delta=None, call_stats=None, **kwargs):
+            on_delta("Partial pit")
+            # Another request (a status poll) sees the committed partial text
+            data = client.get(f"/api/pipeline/status/{story.id}", headers=headers).get_json()
+            seen.append([r["partial_output"] for r in data["runs"]])
+            return "Partial pitch. DECISION: APPROVE"
+
+        mock_stream.side_effect = fake_stream
+
+        from services.pipeline_service import run_pipeline
+        result = run_pipeline(
+            story_id=story.id,
+            selected_story="Story text",
+            refinement_prompt_id=ref_prompt.id,
+            user_email="stream@plmediaagency.com",
+        )
+
+        assert result["validation_decision"] == "APPROVE"
+        assert seen[0] == ["Partial pit"]
+        runs = PipelineRun.query.filter_by(story_id=story.id).all()
+        assert all(r.output_text == "Partial pitch. DECISION: APPROVE" for r in runs)
+
+    def test_flush_throttled(self, app, db_session, streaming_on):
+        """Only the first delta inside one flush interval is written."""
+        from services.pipeline_service import _PartialOutputWriter
+
+        app.config["GROK_STREAM_FLUSH_MS"] = 60_000
+        try:
+            run = PipelineRun(step_type="refinement", status="running")
+            db_session.add(run)
+            db_session.commit()
+            writer = _PartialOutputWriter(run)
+            writer("a")
+            writer("ab")
+            assert run.output_text == "a"
+        finally:
+            app.config["GROK_STREAM_FLUSH_MS"] = 1000
+
+
+class TestPromptAssembly:
+    """GROK_PROMPT_ASSEMBLY="split" sends the prompt text as a stable prefix."""
+
+    @pytest.fixture()
+    def split_on(self, app):
+        app.config["GROK_PROMPT_ASSEMBLY"] = "split"
+        yield
+        app.config["GROK_PROMPT_ASSEMBLY"] = "combined"
+
+    @patch("services.grok_service.requests.Session.post")
+    def test_split_messages_and_cached_tokens(self, mock_post, app, db_session, split_on):
+        """Prompt text goes in the system message; cached_tokens is stored."""
+        from unittest.mock import MagicMock
+        from services.pipeline_service import run_pipeline
+
+        story, ref_prompt, amy_prompt = TestPipelineService()._setup_prompts_and_story(db_session)
+
+        def reply(content):
+            resp = MagicMock()
+            resp.status_code = 200
+            resp.json.return_value = {
+                "choices": [{"message": {"content": content}}],
+                "usage": {"prompt_tokens": 900, "prompt_tokens_details": {"cached_tokens": 768}},
+            }
+            return resp
+
+        mock_post.side_effect = [reply("Refined"), reply("DECISION: APPROVE")]
+
+        run_pipeline(story.id, "Story text", ref_prompt.id, "split@plmediaagency.com")
+
+        ref_messages = mock_post.call_args_list[0][1]["json"]["messages"]
+        assert ref_messages[0] == {"role": "system", "content": ref_prompt.prompt_text}
+        assert ref_messages[1]["content"].startswith("Source material:\nStory text")
+        amy_messages = mock_post.call_args_list[1][1]["json"]["messages"]
+        assert amy_messages[0]["content"] == amy_prompt.prompt_text
+
+        runs = PipelineRun.query.filter_by(story_id=story.id).all()
+        assert all(r.cached_tokens == 768 for r in runs)
+        # The stored input is still the full text for auditing
+        assert runs[0].input_text.startswith(ref_prompt.prompt_text)
+
+    @patch("services.pipeline_service.call_grok")
+    def test_combined_is_default(self, mock_grok, db_session):
+        """By default the whole input is one user message, no context."""
+        from services.pipeline_service import run_pipeline
+
+        story, ref_prompt, _ = TestPipelineService()._setup_prompts_and_story(db_session)
+        mock_grok.side_effect = ["Refined", "DECISION: APPROVE"]
+
+        run_pipeline(story.id, "Story text", ref_prompt.id, "split@plmediaagency.com")
+
+        text = mock_grok.call_args_list[0][0][0]
+        assert text.startswith(ref_prompt.prompt_text)
+        assert mock_grok.call_args_list[0][1]["context"] == ""
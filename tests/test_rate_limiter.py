@@ -0,0 +1,191 @@
+"""
+Tests for services/rate_limiter.py — shared token bucket + AIMD limiter.
+
+Each test uses its own state file under tmp_path.
+Covers: concurrency gate, token bucket, AIMD decrease/increase,
+dead-lease reclaim, wait timeout, 429 feedback from call_grok, and
+5xx failures leaving the limit alone.
+"""
+from unittest.mock import patch, MagicMock
+
+import pytest
+
+from services.rate_limiter import (
+    NEUTRAL,
+    SUCCESS,
+    THROTTLED,
+    RateLimiterTimeout,
+    XAIRateLimiter,
+)
+
+
+def _limiter(tmp_path, **kwargs):
+    defaults = dict(
+        rate_per_second=1000, burst=1000, min_concurrency=1,
+        max_concurrency=8, initial_concurrency=2, wait_timeout=0.2,
+        poll_interval=0.01,
+    )
+    defaults.update(kwargs)
+    return XAIRateLimiter(str(tmp_path / "limiter.json"), **defaults)
+
+
+class TestConcurrencyGate:
+    """Tests for the in-flight limit."""
+
+    def test_blocks_past_limit(self, tmp_path):
+        """Only `limit` leases are granted at once."""
+        limiter = _limiter(tmp_path, initial_concurrency=2)
+        a = limiter.try_acquire()
+        b = limiter.try_acquire()
+        assert a and b
+        assert limiter.try_acquire() is None
+        a.release()
+        assert limiter.try_acquire() is not None
+
+    def test_shared_between_instances(self, tmp_path):
+        """Two limiters on one state file (two workers) share the limit."""
+        first = _limiter(tmp_path, initial_concurrency=1)
+        second = _limiter(tmp_path, initial_concurrency=1)
+        lease = first.try_acquire()
+        assert lease is not None
+        assert second.try_acquire() is None
+        lease.release()
+        assert second.try_acquire() is not None
+
+    def test_acquire_times_out(self, tmp_path):
+        """acquire() raises once the wait timeout passes."""
+        limiter = _limiter(tmp_path, initial_concurrency=1)
+        limiter.try_acquire()
+        with pytest.raises(RateLimiterTimeout):
+            limiter.acquire(timeout=0.05)
+        assert limiter.snapshot()["queue_depth"] == 0
+
+    def test_dead_process_lease_reclaimed(self, tmp_path):
+        """Leases owned by a dead pid do not count against the limit."""
+        limiter = _limiter(tmp_path, initial_concurrency=1)
+        limiter.try_acquire()
+        with patch("services.rate_limiter._pid_alive", return_value=False):
+            assert limiter.try_acquire() is not None
+
+
+class TestTokenBucket:
+    """Tests for the request-rate gate."""
+
+    def test_burst_then_empty(self, tmp_path):
+        """Burst tokens are spent, then requests wait for refill."""
+        limiter = _limiter(tmp_path, rate_per_second=0.001, burst=2, initial_concurrency=8)
+        assert limiter.try_acquire()
+        assert limiter.try_acquire()
+        assert limiter.try_acquire() is None
+
+
+class TestAIMD:
+    """Tests for adaptive concurrency."""
+
+    def test_throttle_halves_limit_once_per_cooldown(self, tmp_path):
+        """A burst of 429s halves the limit only once."""
+        limiter = _limiter(tmp_path, initial_concurrency=8, max_concurrency=8)
+        leases = [limiter.try_acquire() for _ in range(3)]
+        for lease in leases:
+            lease.release(THROTTLED)
+        snap = limiter.snapshot()
+        assert snap["concurrency_limit"] == 4
+        assert snap["throttled_total"] == 3
+
+    def test_success_grows_limit(self, tmp_path):
+        """Successful calls add roughly 1/limit each."""
+        limiter = _limiter(tmp_path, initial_concurrency=2, max_concurrency=8)
+        for _ in range(4):
+            limiter.try_acquire().release(SUCCESS)
+        assert limiter.snapshot()["concurrency_limit"] > 3
+
+    def test_neutral_leaves_limit(self, tmp_path):
+        """Failures other than 429 neither grow nor cut the limit."""
+        limiter = _limiter(tmp_path, initial_concurrency=2, max_concurrency=8)
+        for _ in range(4):
+            limiter.try_acquire().release(NEUTRAL)
+        snap = limiter.snapshot()
+        assert snap["concurrency_limit"] == 2
+        assert snap["in_flight"] == 0
+
+    def test_limit_never_below_min(self, tmp_path):
+        """Decrease stops at min_concurrency."""
+        limiter = _limiter(tmp_path, initial_concurrency=2, min_concurrency=2)
+        limiter.cooldown = 0
+        for _ in range(3):
+            limiter.try_acquire().release(THROTTLED)
+        assert limiter.snapshot()["concurrency_limit"] == 2
+
+
+class TestGrokIntegration:
+    """call_grok reports 429s to the limiter."""
+
+    @patch("services.grok_service.requests.Session.post")
+    def test_429_cuts_shared_limit(self, mock_post, app, tmp_path):
+        """A rate-limited call halves the shared concurrency limit."""
+        from services.grok_service import call_grok, GrokAPIError
+
+        resp = MagicMock()
+        resp.status_code = 429
+        resp.text = "slow down"
+        mock_post.return_value = resp
+
+        app.config.update(
+            GROK_RATE_LIMIT_ENABLED=True,
+            GROK_RATE_LIMIT_STATE_PATH=str(tmp_path / "shared.json"),
+            GROK_RETRY_MAX_ATTEMPTS=1,
+        )
+        try:
+            with app.app_context():
+                with pytest.raises(GrokAPIError):
+                    call_grok("prompt")
+                from services.rate_limiter import get_rate_limiter
+                snap = get_rate_limiter(app.config).snapshot()
+                assert snap["throttled_total"] == 1
+                assert snap["concurrency_limit"] == app.config["GROK_CONCURRENCY_INITIAL"] / 2
+                assert snap["in_flight"] == 0
+        finally:
+            app.config.update(GROK_RATE_LIMIT_ENABLED=False, GROK_RETRY_MAX_ATTEMPTS=3)
+
+    @patch("services.grok_service.requests.Session.post")
+    def test_5xx_does_not_grow_limit(self, mock_post, app, tmp_path):
+        """A run of 503s releases its slots without raising the limit."""
+        from services.grok_service import call_grok, GrokAPIError
+
+        resp = MagicMock()
+        resp.status_code = 503
+        resp.text = "unavailable"
+        mock_post.return_value = resp
+
+        app.config.update(
+            GROK_RATE_LIMIT_ENABLED=True,
+            GROK_RATE_LIMIT_STATE_PATH=str(tmp_path / "unavailable.json"),
+            GROK_RETRY_MAX_ATTEMPTS=1,
+        )
+        try:
+            with app.app_context():
+                for _ in range(5):
+                    with pytest.raises(GrokAPIError):
+                        call_grok("prompt")
+                from services.rate_limiter import get_rate_limiter
+                snap = get_rate_limiter(app.config).snapshot()
+                assert snap["concurrency_limit"] == app.config["GROK_CONCURRENCY_INITIAL"]
+                assert snap["throttled_total"] == 0
+                assert snap["in_flight"] == 0
+        finally:
+            app.config.update(GROK_RATE_LIMIT_ENABLED=False, GROK_RETRY_MAX_ATTEMPTS=3)
+
+    def test_admin_stats_include_limiter(self, client, auth_headers, app, tmp_path):
+        """Admin stats expose the shared limiter when enabled."""
+        app.config.update(
+            GROK_RATE_LIMIT_ENABLED=True,
+            GROK_RATE_LIMIT_STATE_PATH=str(tmp_path / "admin.json"),
+        )
+        try:
+            resp = client.get("/api/admin/grok/stats", headers=auth_headers("a@plmediaagency.com", "admin"))
+            data = resp.get_json()["rate_limiter"]
+            assert data["in_flight"] == 0
+            assert "queue_depth" in data
+            assert "concurrency_limit" in data
+        finally:
+            app.config["GROK_RATE_LIMIT_ENABLED"] = False
@@ -0,0 +1,233 @@
+"""
+Tests for the batch pipeline routes in routes/pipeline.py.
+
+Grok calls are mocked; queued jobs run through run_next_job.
+Covers: batch creation in one request, validation, per-batch
+concurrency cap in the queue, aggregate progress, thread fallback.
+"""
+from unittest.mock import patch
+
+from models.batch import Batch
+from models.job import Job
+from models.pipeline_run import PipelineRun
+from models.prompt import Prompt
+from models.story import Story
+from services.job_queue import claim_job, run_next_job
+
+
+def _source_lists(db_session, n):
+    prompts = [
+        Prompt(prompt_type="source-list", name=f"SL {i}", prompt_text=f"Find {i}",
+               opportunity=f"Opp {i}", created_by="t")
+        for i in range(n)
+    ]
+    db_session.add_all(prompts)
+    db_session.commit()
+    return [p.id for p in prompts]
+
+
+class TestBatchSourceList:
+    """POST /api/pipeline/batch/source-list."""
+
+    def test_creates_everything_in_one_request(self, client, auth_headers, db_session):
+        headers = auth_headers(role="admin")
+        ids = _source_lists(db_session, 3)
+
+        resp = client.post("/api/pipeline/batch/source-list",
+                           json={"prompt_ids": ids + [ids[0]]}, headers=headers)
+        assert resp.status_code == 202
+        data = resp.get_json()
+        assert data["total"] == 3  # duplicates dropped
+        assert [item["prompt_id"] for item in data["items"]] == ids
+
+        batch = db_session.get(Batch, data["batch_id"])
+        assert batch.max_concurrency == 8
+        stories = Story.query.filter_by(batch_id=batch.id).all()
+        assert len(stories) == 3
+        assert {s.opportunity for s in stories} == {"Opp 0", "Opp 1", "Opp 2"}
+        assert PipelineRun.query.filter_by(step_type="source-list", status="running").count() == 3
+        assert Job.query.filter_by(batch_id=batch.id, status="queued").count() == 3
+
+    def test_validation(self, client, auth_headers, db_session):
+        headers = auth_headers(role="admin")
+        ids = _source_lists(db_session, 1)
+        papa = Prompt(prompt_type="papa", name="P", prompt_text="p", created_by="t")
+        db_session.add(papa)
+        db_session.commit()
+
+        url = "/api/pipeline/batch/source-list"
+        assert client.post(url, json={}, headers=headers).status_code == 400
+        assert client.post(url, json={"prompt_ids": ["1"]}, headers=headers).status_code == 400
+
+        resp = client.post(url, json={"prompt_ids": ids + [9999]}, headers=headers)
+        assert resp.status_code == 404
+        assert resp.get_json()["prompt_ids"] == [9999]
+
+        resp = client.post(url, json={"prompt_ids": ids + [papa.id]}, headers=headers)
+        assert resp.status_code == 400
+        assert Batch.query.count() == 0
+
+    def test_batch_size_cap(self, app, client, auth_headers, db_session):
+        headers = auth_headers(role="admin")
+        app.config["BATCH_MAX_SIZE"] = 2
+        try:
+            resp = client.post("/api/pipeline/batch/source-list",
+                               json={"prompt_ids": [1, 2, 3]}, headers=headers)
+        finally:
+            app.config["BATCH_MAX_SIZE"] = 200
+        assert resp.status_code == 400
+
+    def test_queue_caps_batch_concurrency(self, app, client, auth_headers, db_session):
+        """Only max_concurrency jobs of one batch are claimable at a time."""
+        headers = auth_headers(role="admin")
+        ids = _source_lists(db_session, 3)
+        app.config["BATCH_MAX_CONCURRENCY"] = 2
+        try:
+            client.post("/api/pipeline/batch/source-list", json={"prompt_ids": ids},
+                        headers=headers)
+        finally:
+            app.config["BATCH_MAX_CONCURRENCY"] = 8
+
+        assert claim_job("w1") is not None
+        assert claim_job("w2") is not None
+        assert claim_job("w3") is None
+
+    @patch("services.pipeline_service.call_grok_with_search")
+    def test_progress(self, mock_grok, app, client, auth_headers, db_session):
+        mock_grok.return_value = "Topic 1: something"
+        headers = auth_headers(role="admin")
+        ids = _source_lists(db_session, 2)
+        batch_id = client.post("/api/pipeline/batch/source-list", json={"prompt_ids": ids},
+                               headers=headers).get_json()["batch_id"]
+
+        data = client.get(f"/api/pipeline/batch/{batch_id}", headers=headers).get_json()
+        assert data["status"] == "running"
+        assert data["counts"]["queued"] == 2
+
+        run_next_job(app, "w1")
+        db_session.expire_all()
+        data = client.get(f"/api/pipeline/batch/{batch_id}", headers=headers).get_json()
+        assert data["counts"] == {"queued": 1, "running": 0, "completed": 1, "failed": 0,
+                                  "cancelled": 0}
+
+        run_next_job(app, "w1")
+        db_session.expire_all()
+        data = client.get(f"/api/pipeline/batch/{batch_id}", headers=headers).get_json()
+        assert data["status"] == "completed"
+        assert [item["status"] for item in data["items"]] == ["completed", "completed"]
+
+    def test_progress_not_found(self, client, auth_headers):
+        resp = client.get("/api/pipeline/batch/9999", headers=auth_headers(role="admin"))
+        assert resp.status_code == 404
+
+    @patch("routes.pipeline.threading.Thread")
+    def test_thread_executor_uses_one_coordinator(self, mock_thread, app, client,
+                                                  auth_headers, db_session):
+        headers = auth_headers(role="admin")
+        ids = _source_lists(db_session, 3)
+        app.config["PIPELINE_EXECUTOR"] = "thread"
+        try:
+            resp = client.post("/api/pipeline/batch/source-list", json={"prompt_ids": ids},
+                               headers=headers)
+        finally:
+            app.config["PIPELINE_EXECUTOR"] = "queue"
+        assert resp.status_code == 202
+        assert mock_thread.call_count == 1
+        assert len(mock_thread.call_args.kwargs["args"][2]) == 3
+        assert Job.query.count() == 0
+
+
+def _pipeline_setup(db_session, amy_active=True):
+    papa = Prompt(prompt_type="papa", name="PAPA", prompt_text="Refine", created_by="t")
+    amy = Prompt(prompt_type="amy-bot", name="Amy", prompt_text="Review",
+                 is_active=amy_active, created_by="t")
+    source = Story(source_list_output="Topic 1\nTopic 2", opportunity="IL News",
+                   state="Illinois")
+    db_session.add_all([papa, amy, source])
+    db_session.commit()
+    return source, papa, amy
+
+
+def _fake_grok(text, **kwargs):
+    if "Pitch to review" in text:
+        return "DECISION: REJECT\nREASON: thin" if "Topic 2" in text else "DECISION: APPROVE"
+    return f"Headline: {text.split('Source material:')[-1].strip()[:20]}"
+
+
+class TestBatchPipeline:
+    """POST /api/pipeline/batch/run."""
+
+    def _items(self, source, papa):
+        return [
+            {"story_id": source.id, "selected_story": "Topic 1", "refinement_prompt_id": papa.id},
+            {"story_id": source.id, "selected_story": "Topic 2", "refinement_prompt_id": papa.id},
+        ]
+
+    def test_creates_one_story_per_item(self, client, auth_headers, db_session):
+        headers = auth_headers(role="admin")
+        source, papa, amy = _pipeline_setup(db_session)
+
+        resp = client.post("/api/pipeline/batch/run",
+                           json={"items": self._items(source, papa)}, headers=headers)
+        assert resp.status_code == 202
+        data = resp.get_json()
+        assert data["total"] == 2
+        assert [item["source_story_id"] for item in data["items"]] == [source.id, source.id]
+
+        stories = Story.query.filter_by(batch_id=data["batch_id"]).all()
+        assert len(stories) == 2
+        assert {s.opportunity for s in stories} == {"IL News"}
+        assert PipelineRun.query.filter_by(step_type="refinement", status="running").count() == 2
+        jobs = Job.query.filter_by(batch_id=data["batch_id"], job_type="pipeline").all()
+        assert [job.payload_dict["amy_prompt_id"] for job in jobs] == [amy.id, amy.id]
+
+    def test_validation(self, client, auth_headers, db_session):
+        headers = auth_headers(role="admin")
+        source, papa, amy = _pipeline_setup(db_session)
+        url = "/api/pipeline/batch/run"
+
+        assert client.post(url, json={}, headers=headers).status_code == 400
+        assert client.post(url, json={"items": [{"story_id": source.id}]},
+                           headers=headers).status_code == 400
+
+        item = {"story_id": 9999, "selected_story": "x", "refinement_prompt_id": papa.id}
+        resp = client.post(url, json={"items": [item]}, headers=headers)
+        assert resp.status_code == 404
+        assert resp.get_json()["story_ids"] == [9999]
+
+        item = {"story_id": source.id, "selected_story": "x", "refinement_prompt_id": amy.id}
+        resp = client.post(url, json={"items": [item]}, headers=headers)
+        assert resp.status_code == 400
+        assert resp.get_json()["prompt_ids"] == [amy.id]
+        assert Batch.query.count() == 0
+
+    def test_requires_active_amy_bot(self, client, auth_headers, db_session):
+        source, papa, _ = _pipeline_setup(db_session, amy_active=False)
+        resp = client.post("/api/pipeline/batch/run",
+                           json={"items": self._items(source, papa)},
+                           headers=auth_headers(role="admin"))
+        assert resp.status_code == 400
+        assert Batch.query.count() == 0
+
+    @patch("services.pipeline_service.call_grok", side_effect=_fake_grok)
+    def test_progress_and_results(self, mock_grok, app, client, auth_headers, db_session):
+        headers = auth_headers(role="admin")
+        source, papa, _ = _pipeline_setup(db_session)
+        batch_id = client.post("/api/pipeline/batch/run",
+                               json={"items": self._items(source, papa)},
+                               headers=headers).get_json()["batch_id"]
+
+        data = client.get(f"/api/pipeline/batch/{batch_id}", headers=headers).get_json()
+        assert data["batch_type"] == "pipeline"
+        assert data["counts"]["queued"] == 2
+
+        assert run_next_job(app, "w1")
+        assert run_next_job(app, "w1")
+        db_session.expire_all()
+        data = client.get(f"/api/pipeline/batch/{batch_id}", headers=headers).get_json()
+        assert data["status"] == "completed"
+        assert [item["validation_decision"] for item in data["items"]] == ["APPROVE", "REJECT"]
+        assert [item["current_step"] for item in data["items"]] == ["amy-bot", "amy-bot"]
+        assert all(item["prompt_id"] == papa.id for item in data["items"])
+        # The Source List story itself is left untouched
+        assert db_session.get(Story, source.id).refinement_output is None
@@ -2,15 +2,20 @@
 Tests for routes/pipeline.py — Source List, Pipeline Run, and Status endpoints.
 
 Covers: async background execution, placeholder run creation, status polling,
-input validation, error handling in background threads, URL enrichment.
+input validation, error handling in background threads, URL enrichment,
+and every executor resuming from checkpoints.
 """
+import asyncio
 import json
-from unittest.mock import patch, MagicMock
+from unittest.mock import AsyncMock, patch, MagicMock
+
+import pytest
 
 from models import db
 from models.prompt import Prompt
 from models.story import Story
 from models.pipeline_run import PipelineRun
+from services.job_queue import run_next_job
 
 
 class TestSourceListRoute:
@@ -161,6 +166,41 @@ class TestPipelineRunRoute:
         assert placeholder is not None
         assert placeholder.input_text == "(pipeline starting...)"
 
+    @pytest.mark.parametrize("executor", ["queue", "thread", "async"])
+    def test_every_executor_resumes_from_checkpoints(self, executor, app, client, auth_headers,
+                                                     db_session):
+        """Each PIPELINE_EXECUTOR runs the launch with resume=True."""
+        headers = auth_headers(role="admin")
+        prompt = Prompt(prompt_type="papa", name="PAPA", prompt_text="t", created_by="t")
+        story = Story(created_by="test")
+        db_session.add_all([prompt, story])
+        db_session.commit()
+        body = {"story_id": story.id, "selected_story": "Tweet",
+                "refinement_prompt_id": prompt.id}
+
+        app.config["PIPELINE_EXECUTOR"] = executor
+        try:
+            with patch("routes.pipeline.run_pipeline") as mock_run, \
+                    patch("routes.pipeline.run_pipeline_async", new_callable=AsyncMock) as mock_async, \
+                    patch("routes.pipeline.threading.Thread") as mock_thread, \
+                    patch("routes.pipeline.get_async_executor") as mock_executor:
+                assert client.post("/api/pipeline/run", json=body,
+                                   headers=headers).status_code == 202
+                if executor == "queue":
+                    run_next_job(app, "w1")
+                    kwargs = mock_run.call_args.kwargs
+                elif executor == "thread":
+                    thread_kwargs = mock_thread.call_args.kwargs
+                    thread_kwargs["target"](app, **thread_kwargs["kwargs"])
+                    kwargs = mock_run.call_args.kwargs
+                else:
+                    coro_fn, *args = mock_executor.return_value.submit.call_args.args
+                    asyncio.run(coro_fn(MagicMock(), *args))
+                    kwargs = mock_async.call_args.kwargs
+        finally:
+            app.config["PIPELINE_EXECUTOR"] = "queue"
+        assert kwargs["resume"] is True
+
     def test_requires_auth(self, client):
         """POST without auth returns 401."""
         resp = client.post(
@@ -288,8 +328,8 @@ class TestStatusEndpoint:
 class TestSourceListEnrichment:
     """Tests for URL enrichment in the source list background thread."""
 
-    @patch("routes.pipeline.enrich_urls")
-    @patch("routes.pipeline.call_grok_with_search")
+    @patch("services.pipeline_service.enrich_urls")
+    @patch("services.pipeline_service.call_grok_with_search")
     def test_enrichment_stored_on_story(self, mock_grok, mock_enrich, app, db_session):
         """Enrichment result is saved to story.url_enrichments."""
         from routes.pipeline import _run_source_list_background
@@ -318,8 +358,8 @@ class TestSourceListEnrichment:
         assert updated_story.source_list_output == grok_output
         assert updated_story.url_enrichments == enrichment_json
 
-    @patch("routes.pipeline.enrich_urls")
-    @patch("routes.pipeline.call_grok_with_search")
+    @patch("services.pipeline_service.enrich_urls")
+    @patch("services.pipeline_service.call_grok_with_search")
     def test_enrichment_failure_does_not_block(self, mock_grok, mock_enrich, app, db_session):
         """Enrichment exception does not prevent source list from completing."""
         from routes.pipeline import _run_source_list_background
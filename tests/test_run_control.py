@@ -0,0 +1,220 @@
+"""
+Tests for services/run_control.py — cancellation and stage deadlines.
+
+Grok, URL fetches and the CMS are mocked; queued jobs run through
+run_next_job. Covers: DELETE /api/pipeline/run/<id> and
+/batch/<id>, cancelled jobs never starting, a cancel while Grok is
+answering (nothing written or pushed), interrupting a stream or a
+blocked non-streamed call, and
+retries, fallbacks and enrichment stopping at a stage's deadline.
+"""
+import socket
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from models.job import Job
+from models.pipeline_run import PipelineRun
+from models.prompt import Prompt
+from models.story import Story
+from services.grok_service import (
+    GrokAPIError,
+    RequestCloser,
+    RetryPolicy,
+    attempt_timeout,
+    call_grok,
+)
+from services.job_queue import run_next_job
+from services.model_router import call_with_fallback
+from services.pipeline_service import _PartialOutputWriter, run_pipeline
+from services.run_control import PipelineCancelled, RunControl, cancel_stories, interrupt_local
+from services.stage_engine import Deadline
+from services.url_enrichment_service import enrich_urls
+
+REFINED = "Headline: Illinois budget signed"
+
+
+def _setup(db_session):
+    refinement = Prompt(prompt_type="papa", name="PAPA", prompt_text="Refine...", is_active=True)
+    amy = Prompt(prompt_type="amy-bot", name="Amy", prompt_text="Review...", is_active=True)
+    story = Story(source_list_output="Topics", opportunity="IL News")
+    db_session.add_all([refinement, amy, story])
+    db_session.commit()
+    return story, refinement
+
+
+def _in(seconds):
+    return Deadline(time.monotonic() + seconds, "refinement")
+
+
+class TestCancelRoute:
+    """DELETE /api/pipeline/run/<story_id>."""
+
+    @patch("services.pipeline_service.call_grok")
+    def test_queued_launch_never_runs(self, mock_grok, client, auth_headers, db_session):
+        headers = auth_headers(role="admin")
+        story, refinement = _setup(db_session)
+        body = {"story_id": story.id, "selected_story": "Budget bill",
+                "refinement_prompt_id": refinement.id}
+        assert client.post("/api/pipeline/run", json=body, headers=headers).status_code == 202
+
+        resp = client.delete(f"/api/pipeline/run/{story.id}", headers=headers)
+        assert resp.status_code == 200
+        assert resp.get_json() == {"story_id": story.id, "status": "cancelled", "runs": 1, "jobs": 1}
+        assert Job.query.filter_by(story_id=story.id).one().status == "cancelled"
+        assert run_next_job(client.application, "w1") is None
+        mock_grok.assert_not_called()
+
+        status = client.get(f"/api/pipeline/status/{story.id}", headers=headers).get_json()
+        assert status["status"] == "cancelled"
+
+        # Launching again clears the cancel
+        client.post("/api/pipeline/run", json=body, headers=headers)
+        db_session.expire_all()
+        assert db_session.get(Story, story.id).cancelled_at is None
+
+    def test_nothing_to_cancel(self, client, auth_headers, db_session):
+        headers = auth_headers(role="admin")
+        story, _ = _setup(db_session)
+        assert client.delete(f"/api/pipeline/run/{story.id}", headers=headers).status_code == 409
+        assert client.delete("/api/pipeline/run/9999", headers=headers).status_code == 404
+
+
+class TestCancelInFlight:
+    """A cancel lands while a step is waiting on Grok."""
+
+    @patch("services.pipeline_service.cms_service.push_to_cms")
+    @patch("services.pipeline_service.call_grok")
+    def test_answer_discarded_and_not_pushed(self, mock_grok, mock_cms, db_session):
+        story, refinement = _setup(db_session)
+
+        def cancel_then_answer(*args, **kwargs):
+            if mock_grok.call_count == 1:
+                return REFINED
+            cancel_stories([story.id], "editor@plmediaagency.com")
+            db_session.commit()
+            return "DECISION: APPROVE"
+
+        mock_grok.side_effect = cancel_then_answer
+        with pytest.raises(PipelineCancelled):
+            run_pipeline(story.id, "Budget bill", refinement.id, "u@plmediaagency.com")
+
+        db_session.expire_all()
+        mock_cms.assert_not_called()
+        assert db_session.get(Story, story.id).validation_decision is None
+        steps = [(r.step_type, r.status, r.output_text) for r in
+                 PipelineRun.query.filter_by(story_id=story.id).order_by(PipelineRun.id)]
+        assert steps == [("refinement", "completed", REFINED), ("amy-bot", "cancelled", None)]
+
+    def test_interrupt_stops_stream(self, app, db_session):
+        run = PipelineRun(step_type="refinement", status="running")
+        db_session.add(run)
+        db_session.commit()
+
+        with RunControl(42) as control:
+            writer = _PartialOutputWriter(run, control)
+            writer("Partial")
+            assert interrupt_local([42]) == 1
+            with pytest.raises(PipelineCancelled):
+                writer("Partial pitch")
+        assert interrupt_local([42]) == 0
+        assert run.output_text == "Partial"
+
+    def test_interrupt_aborts_blocked_call(self, app):
+        # Accepts the connection but never answers
+        server = socket.socket()
+        server.bind(("127.0.0.1", 0))
+        server.listen()
+        api_url = app.config["GROK_API_URL"]
+        app.config["GROK_API_URL"] = f"http://127.0.0.1:{server.getsockname()[1]}/chat"
+        try:
+            with RunControl(43) as control:
+                closer = RequestCloser()
+                control.on_interrupt(closer.close)
+                threading.Timer(0.2, interrupt_local, [[43]]).start()
+                start = time.monotonic()
+                with pytest.raises(GrokAPIError) as exc_info:
+                    call_grok("Refine", timeout=10, max_attempts=3, closer=closer)
+                elapsed = time.monotonic() - start
+                # Later calls are refused without a request
+                with pytest.raises(GrokAPIError):
+                    call_grok("Refine", timeout=10, closer=closer)
+        finally:
+            server.close()
+            app.config["GROK_API_URL"] = api_url
+        assert exc_info.value.status_code == 499
+        assert not exc_info.value.retryable
+        assert elapsed < 2
+
+    def test_on_interrupt_after_interrupt(self):
+        callback = MagicMock()
+        control = RunControl(44)
+        control.interrupt()
+        control.on_interrupt(callback)
+        callback.assert_called_once_with()
+
+
+class TestCancelBatch:
+    """DELETE /api/pipeline/batch/<batch_id>."""
+
+    def test_cancels_unfinished_items(self, client, auth_headers, db_session):
+        headers = auth_headers(role="admin")
+        prompts = [Prompt(prompt_type="source-list", name=f"SL {i}", prompt_text="Find",
+                          created_by="t") for i in range(2)]
+        db_session.add_all(prompts)
+        db_session.commit()
+        batch_id = client.post("/api/pipeline/batch/source-list",
+                               json={"prompt_ids": [p.id for p in prompts]},
+                               headers=headers).get_json()["batch_id"]
+
+        resp = client.delete(f"/api/pipeline/batch/{batch_id}", headers=headers)
+        assert resp.get_json() == {"batch_id": batch_id, "status": "cancelled", "runs": 2, "jobs": 2}
+
+        data = client.get(f"/api/pipeline/batch/{batch_id}", headers=headers).get_json()
+        assert data["status"] == "cancelled"
+        assert data["counts"]["cancelled"] == 2
+        assert client.delete(f"/api/pipeline/batch/{batch_id}", headers=headers).status_code == 409
+
+
+class TestDeadlines:
+    """A stage's Deadline enforced per call."""
+
+    def test_attempt_timeout(self):
+        assert attempt_timeout(60, None, "Grok") == 60
+        assert 9 < attempt_timeout(60, _in(10), "Grok") <= 10
+        assert attempt_timeout(5, _in(10), "Grok") == 5
+        with pytest.raises(GrokAPIError) as exc_info:
+            attempt_timeout(60, _in(-1), "Grok")
+        assert exc_info.value.status_code == 504
+        assert not exc_info.value.retryable
+
+    @patch("services.grok_service.time.sleep")
+    def test_retry_not_started_past_deadline(self, mock_sleep):
+        policy = RetryPolicy(max_attempts=3, base_delay=1.0, max_delay=10.0)
+        send = MagicMock(side_effect=GrokAPIError("busy", status_code=429, retry_after=5))
+        call_stats = {}
+        with pytest.raises(GrokAPIError):
+            policy.run(send, "Grok", call_stats, _in(1))
+        assert send.call_count == 1
+        assert call_stats["attempts"] == 1
+        mock_sleep.assert_not_called()
+
+    def test_no_fallback_past_deadline(self, app):
+        call_fn = MagicMock(side_effect=GrokAPIError("timed out", status_code=504))
+        deadline = _in(-1)
+        with pytest.raises(GrokAPIError):
+            call_with_fallback(call_fn, ["grok-4", "grok-3-fast"], deadline=deadline)
+        call_fn.assert_called_once_with(model="grok-4", deadline=deadline)
+
+    @patch("services.url_enrichment_service.enrich_website_url")
+    def test_enrichment_stops_at_deadline(self, mock_fetch):
+        mock_fetch.return_value = {"type": "website", "title": "T", "text": "x", "url": "u"}
+        text = "See https://example.com/a and https://example.com/b"
+
+        assert enrich_urls(text, deadline=_in(-1)) is None
+        mock_fetch.assert_not_called()
+
+        enrich_urls(text, deadline=_in(2))
+        assert all(0 < call.args[1] <= 2 for call in mock_fetch.call_args_list)
@@ -0,0 +1,179 @@
+"""
+Tests for services/run_events.py and the pushed status endpoints.
+
+Covers: ChangeHub wake-ups, publish-on-commit session hooks, the
+long-poll status endpoint and the Server-Sent Events stream (which is not
+done while a story still has a queued Job). SQLite has
+no LISTEN/NOTIFY, so these exercise the in-process hub and the
+DB-polling fallback.
+"""
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from models import db
+from models.job import Job
+from models.pipeline_run import PipelineRun
+from models.story import Story
+from services import run_events
+from services.job_queue import enqueue
+from services.run_events import ChangeHub
+
+
+@pytest.fixture()
+def fast_poll(app):
+    app.config["PIPELINE_EVENTS_POLL_SECONDS"] = 0.05
+    app.config["PIPELINE_EVENTS_HEARTBEAT_SECONDS"] = 0.05
+    yield
+    app.config["PIPELINE_EVENTS_POLL_SECONDS"] = 2
+    app.config["PIPELINE_EVENTS_HEARTBEAT_SECONDS"] = 15
+
+
+def _hour_ago():
+    return datetime.now(timezone.utc) - timedelta(hours=1)
+
+
+def _story_with_run(db_session, status="running", updated_at=None):
+    story = Story(source_list_output="Output", updated_at=updated_at)
+    db_session.add(story)
+    db_session.flush()
+    run = PipelineRun(story_id=story.id, step_type="source-list", status=status,
+                      updated_at=updated_at)
+    db_session.add(run)
+    db_session.commit()
+    return story, run
+
+
+class TestChangeHub:
+    """Per-process wake-ups."""
+
+    def test_wait_times_out_without_change(self):
+        hub = ChangeHub()
+        assert hub.wait({1}, hub.version, 0.01) is False
+
+    def test_only_watched_stories_wake(self):
+        hub = ChangeHub()
+        seen = hub.version
+        hub.publish({2})
+        assert hub.wait({1}, seen, 0.01) is False
+        hub.publish({1})
+        assert hub.wait({1}, seen, 0.01) is True
+
+    def test_wakes_blocked_waiter(self):
+        hub = ChangeHub()
+        seen = hub.version
+        threading.Timer(0.05, hub.publish, args=({7},)).start()
+        start = time.monotonic()
+        assert hub.wait({7}, seen, 5) is True
+        assert time.monotonic() - start < 2
+
+
+class TestSessionHooks:
+    """Story/run writes publish after commit, never after rollback."""
+
+    def test_commit_publishes_story_id(self, db_session):
+        seen = run_events.current_version()
+        story, _ = _story_with_run(db_session)
+        assert run_events._hub.wait({story.id}, seen, 0) is True
+
+    def test_rollback_publishes_nothing(self, db_session):
+        story, run = _story_with_run(db_session)
+        seen = run_events.current_version()
+        run.status = "failed"
+        db_session.flush()
+        db_session.rollback()
+        assert run_events._hub.wait({story.id}, seen, 0) is False
+
+
+class TestLongPoll:
+    """GET /api/pipeline/status?since=...&wait=..."""
+
+    def test_returns_when_run_changes(self, app, client, db_session, auth_headers, fast_poll):
+        story, run = _story_with_run(db_session, updated_at=_hour_ago())
+        headers = auth_headers("poll@plmediaagency.com", "user")
+        cursor = client.get(f"/api/pipeline/status?ids={story.id}",
+                            headers=headers).get_json()["cursor"]
+
+        def finish():
+            with app.app_context():
+                db.session.get(PipelineRun, run.id).status = "completed"
+                db.session.commit()
+
+        threading.Timer(0.1, finish).start()
+        start = time.monotonic()
+        data = client.get(f"/api/pipeline/status?ids={story.id}&since={cursor}&wait=5",
+                          headers=headers).get_json()
+        assert time.monotonic() - start < 4
+        assert data["stories"][0]["status"] == "completed"
+
+    def test_wait_expires_empty(self, client, db_session, auth_headers, fast_poll):
+        story, _ = _story_with_run(db_session, updated_at=_hour_ago())
+        headers = auth_headers("poll@plmediaagency.com", "user")
+        cursor = client.get(f"/api/pipeline/status?ids={story.id}",
+                            headers=headers).get_json()["cursor"]
+        data = client.get(f"/api/pipeline/status?ids={story.id}&since={cursor}&wait=0.2",
+                          headers=headers).get_json()
+        assert data["stories"] == []
+
+
+class TestEventStream:
+    """GET /api/pipeline/events."""
+
+    def test_finished_story_streams_status_then_done(self, client, db_session, auth_headers):
+        story, _ = _story_with_run(db_session, status="completed")
+        resp = client.get(f"/api/pipeline/events?ids={story.id}",
+                          headers=auth_headers("poll@plmediaagency.com", "user"))
+        assert resp.status_code == 200
+        assert resp.mimetype == "text/event-stream"
+        body = resp.get_data(as_text=True)
+        assert body.index("event: status") < body.index("event: done")
+        assert f'"story_id": {story.id}' in body
+
+    def test_streams_change_then_done(self, app, client, db_session, auth_headers, fast_poll):
+        story, run = _story_with_run(db_session)
+
+        def finish():
+            with app.app_context():
+                db.session.get(PipelineRun, run.id).status = "failed"
+                db.session.commit()
+
+        threading.Timer(0.1, finish).start()
+        resp = client.get(f"/api/pipeline/events?ids={story.id}",
+                          headers=auth_headers("poll@plmediaagency.com", "user"))
+        body = resp.get_data(as_text=True)
+        assert body.count("event: status") >= 2
+        assert '"status": "failed"' in body
+        assert body.rstrip().splitlines()[-1].startswith("data:")
+        assert "event: done" in body
+
+    def test_queued_job_is_not_done(self, app, client, db_session, auth_headers, fast_poll):
+        story, _ = _story_with_run(db_session, status="failed")
+        job_id = enqueue("pipeline-resume", {"story_id": story.id}, story_id=story.id, agency="").id
+        headers = auth_headers("poll@plmediaagency.com", "user")
+        db_session.commit()
+
+        app.config["PIPELINE_EVENTS_MAX_SECONDS"] = 0.2
+        try:
+            body = client.get(f"/api/pipeline/events?ids={story.id}", headers=headers).get_data(as_text=True)
+        finally:
+            app.config["PIPELINE_EVENTS_MAX_SECONDS"] = 300
+        assert "event: status" in body
+        assert "event: done" not in body
+
+        db_session.get(Job, job_id).status = "completed"
+        db_session.commit()
+        body = client.get(f"/api/pipeline/events?ids={story.id}", headers=headers).get_data(as_text=True)
+        assert "event: done" in body
+
+    def test_requires_ids(self, client, auth_headers):
+        resp = client.get("/api/pipeline/events", headers=auth_headers("poll@plmediaagency.com", "user"))
+        assert resp.status_code == 400
+
+    def test_bad_last_event_id(self, client, db_session, auth_headers):
+        story, _ = _story_with_run(db_session)
+        resp = client.get(f"/api/pipeline/events?ids={story.id}",
+                          headers={**auth_headers("poll@plmediaagency.com", "user"),
+                                   "Last-Event-ID": "nope"})
+        assert resp.status_code == 400
@@ -0,0 +1,246 @@
+"""
+Tests for pipeline checkpoints / resume and services/run_reaper.py.
+
+Grok and the CMS are mocked. Covers: resuming after a completed step,
+not re-pushing an applied decision, POST /api/pipeline/resume/<id>, the
+stale-run reaper (resume, fail, skip job-owned stories, attempt cap)
+and overall status ignoring superseded runs.
+"""
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from models.job import Job
+from models.pipeline_run import PipelineRun
+from models.prompt import Prompt
+from models.story import Story
+from services.job_queue import run_next_job
+from services.pipeline_service import resume_pipeline, run_pipeline
+from services.run_reaper import reap_stale_runs
+
+REFINED = "Headline: Illinois budget signed"
+APPROVE = "DECISION: APPROVE"
+
+
+def _hour_ago():
+    return datetime.now(timezone.utc) - timedelta(hours=1)
+
+
+def _setup(db_session):
+    refinement = Prompt(prompt_type="papa", name="PAPA", prompt_text="Refine...", is_active=True)
+    amy = Prompt(prompt_type="amy-bot", name="Amy", prompt_text="Review...", is_active=True)
+    story = Story(source_list_output="Topics", opportunity="IL News")
+    db_session.add_all([refinement, amy, story])
+    db_session.commit()
+    return story, refinement
+
+
+def _run_refinement_only(story, refinement):
+    """Complete refinement, then lose the 'worker' during Amy Bot."""
+    with patch("services.pipeline_service.call_grok") as mock_grok:
+        mock_grok.side_effect = [REFINED, KeyboardInterrupt]
+        try:
+            run_pipeline(story.id, "Budget bill", refinement.id, "u@plmediaagency.com")
+        except KeyboardInterrupt:
+            pass
+
+
+def _age_running(db_session, story_id):
+    """Make the runs a lost worker left "running" an hour old."""
+    runs = PipelineRun.query.filter_by(story_id=story_id, status="running").all()
+    for run in runs:
+        run.updated_at = _hour_ago()
+    db_session.commit()
+    return runs
+
+
+def _stall(db_session, story_id, step_type="amy-bot"):
+    """A run left "running" an hour ago, as a dead worker leaves it."""
+    run = PipelineRun(story_id=story_id, step_type=step_type, status="running",
+                      input_text="(lost)", updated_at=_hour_ago())
+    db_session.add(run)
+    db_session.commit()
+    return run
+
+
+class TestResume:
+    """Checkpointed steps are reused by resume_pipeline."""
+
+    @patch("services.pipeline_service.cms_service.push_to_cms", return_value={"ok": True})
+    @patch("services.pipeline_service.call_grok")
+    def test_resumes_after_refinement(self, mock_grok, mock_cms, db_session):
+        story, refinement = _setup(db_session)
+        _run_refinement_only(story, refinement)
+        db_session.rollback()
+
+        mock_grok.side_effect = [APPROVE]
+        result = resume_pipeline(story.id)
+
+        assert mock_grok.call_count == 1
+        assert "Pitch to review" in mock_grok.call_args[0][0]
+        assert result["validation_decision"] == "APPROVE"
+        assert result["refinement_output"] == REFINED
+        steps = [(r.step_type, r.status) for r in
+                 PipelineRun.query.filter_by(story_id=story.id).order_by(PipelineRun.id)]
+        assert steps == [("refinement", "completed"), ("amy-bot", "completed")]
+
+    @patch("services.pipeline_service.cms_service.push_to_cms", return_value={"ok": True})
+    @patch("services.pipeline_service.call_grok")
+    def test_applied_decision_not_repushed(self, mock_grok, mock_cms, db_session):
+        story, refinement = _setup(db_session)
+        mock_grok.side_effect = [REFINED, APPROVE]
+        run_pipeline(story.id, "Budget bill", refinement.id, "u@plmediaagency.com")
+
+        result = resume_pipeline(story.id)
+
+        assert mock_grok.call_count == 2
+        assert mock_cms.call_count == 1
+        assert result["pushed_to_cms"] is True
+
+    @patch("services.pipeline_service.cms_service.push_to_cms")
+    @patch("services.pipeline_service.call_grok")
+    def test_failed_cms_push_is_retried(self, mock_grok, mock_cms, db_session):
+        story, refinement = _setup(db_session)
+        mock_grok.side_effect = [REFINED, APPROVE]
+        mock_cms.side_effect = [RuntimeError("CMS down"), {"ok": True}]
+        try:
+            run_pipeline(story.id, "Budget bill", refinement.id, "u@plmediaagency.com")
+        except RuntimeError:
+            db_session.rollback()
+
+        result = resume_pipeline(story.id)
+
+        assert mock_grok.call_count == 2
+        assert result["pushed_to_cms"] is True
+
+    @patch("services.pipeline_service.call_grok")
+    def test_new_selection_is_not_a_checkpoint(self, mock_grok, db_session):
+        story, refinement = _setup(db_session)
+        mock_grok.side_effect = [REFINED, APPROVE, "Headline: other", "DECISION: REJECT"]
+        with patch("services.pipeline_service.cms_service.push_to_cms"):
+            run_pipeline(story.id, "Budget bill", refinement.id, "u@plmediaagency.com")
+        result = run_pipeline(story.id, "Transit story", refinement.id,
+                              "u@plmediaagency.com", resume=True)
+
+        assert mock_grok.call_count == 4
+        assert result["validation_decision"] == "REJECT"
+
+
+class TestResumeRoute:
+    """POST /api/pipeline/resume/<story_id>."""
+
+    @patch("services.pipeline_service.cms_service.push_to_cms", return_value={"ok": True})
+    @patch("services.pipeline_service.call_grok")
+    def test_resumes_stalled_step(self, mock_grok, mock_cms, app, client, db_session, auth_headers):
+        story, refinement = _setup(db_session)
+        _run_refinement_only(story, refinement)
+        db_session.rollback()
+        [stalled] = _age_running(db_session, story.id)
+
+        resp = client.post(f"/api/pipeline/resume/{story.id}",
+                           headers=auth_headers("resume@plmediaagency.com", "user"))
+        assert resp.status_code == 202
+        assert resp.get_json()["step"] == "amy-bot"
+
+        mock_grok.side_effect = [APPROVE]
+        assert run_next_job(app, "w1") is not None
+        db_session.expire_all()
+        assert mock_grok.call_count == 1
+        assert db_session.get(PipelineRun, stalled.id).status == "completed"
+        assert db_session.get(Story, story.id).validation_decision == "APPROVE"
+
+    def test_conflict_while_running(self, client, db_session, auth_headers):
+        story, refinement = _setup(db_session)
+        story.selected_story = "Budget bill"
+        story.refinement_prompt_id = refinement.id
+        db_session.add(PipelineRun(story_id=story.id, step_type="refinement", status="running"))
+        db_session.commit()
+
+        resp = client.post(f"/api/pipeline/resume/{story.id}",
+                           headers=auth_headers("resume@plmediaagency.com", "user"))
+        assert resp.status_code == 409
+
+    def test_never_ran(self, client, db_session, auth_headers):
+        story, _ = _setup(db_session)
+        resp = client.post(f"/api/pipeline/resume/{story.id}",
+                           headers=auth_headers("resume@plmediaagency.com", "user"))
+        assert resp.status_code == 400
+
+
+class TestReaper:
+    """reap_stale_runs()."""
+
+    @patch("services.pipeline_service.cms_service.push_to_cms", return_value={"ok": True})
+    @patch("services.pipeline_service.call_grok")
+    def test_resumes_stalled_pipeline(self, mock_grok, mock_cms, app, db_session):
+        story, refinement = _setup(db_session)
+        _run_refinement_only(story, refinement)
+        db_session.rollback()
+        _age_running(db_session, story.id)
+
+        assert reap_stale_runs() == {"resumed": 1, "failed": 0}
+        # The queued resume job owns the story now
+        assert reap_stale_runs() == {"resumed": 0, "failed": 0}
+
+        mock_grok.side_effect = [APPROVE]
+        assert run_next_job(app, "w1") is not None
+        db_session.expire_all()
+        assert mock_grok.call_count == 1
+        assert db_session.get(Story, story.id).validation_decision == "APPROVE"
+
+    def test_fails_stalled_source_list(self, db_session):
+        story = Story()
+        db_session.add(story)
+        db_session.commit()
+        run = _stall(db_session, story.id, step_type="source-list")
+
+        assert reap_stale_runs() == {"resumed": 0, "failed": 1}
+        db_session.expire_all()
+        assert run.status == "failed"
+        assert "Stalled" in run.error_message
+
+    def test_ignores_fresh_and_job_owned_runs(self, db_session):
+        story, refinement = _setup(db_session)
+        owned = Story()
+        db_session.add(owned)
+        db_session.commit()
+        db_session.add_all([
+            PipelineRun(story_id=story.id, step_type="refinement", status="running"),
+            PipelineRun(story_id=owned.id, step_type="source-list", status="running",
+                        updated_at=_hour_ago()),
+            Job(job_type="source-list", story_id=owned.id, status="running"),
+        ])
+        db_session.commit()
+
+        assert reap_stale_runs() == {"resumed": 0, "failed": 0}
+
+    def test_fails_after_max_resumes(self, app, db_session):
+        story, refinement = _setup(db_session)
+        story.selected_story = "Budget bill"
+        story.refinement_prompt_id = refinement.id
+        db_session.add_all([
+            Job(job_type="pipeline-resume", story_id=story.id, status="failed")
+            for _ in range(app.config["PIPELINE_RESUME_MAX_ATTEMPTS"])
+        ])
+        db_session.commit()
+        _stall(db_session, story.id, step_type="refinement")
+
+        assert reap_stale_runs() == {"resumed": 0, "failed": 1}
+
+
+class TestOverallStatus:
+    """A superseded failed run does not pin the story's status."""
+
+    def test_latest_run_per_step_counts(self, client, db_session, auth_headers):
+        story = Story()
+        db_session.add(story)
+        db_session.commit()
+        db_session.add_all([
+            PipelineRun(story_id=story.id, step_type="refinement", status="failed"),
+            PipelineRun(story_id=story.id, step_type="refinement", status="completed"),
+            PipelineRun(story_id=story.id, step_type="amy-bot", status="completed"),
+        ])
+        db_session.commit()
+
+        resp = client.get(f"/api/pipeline/status/{story.id}?fields=status",
+                          headers=auth_headers("status@plmediaagency.com", "user"))
+        assert resp.get_json()["status"] == "completed"
@@ -0,0 +1,217 @@
+"""
+Tests for services/stage_engine.py — declared stages and their gates.
+
+Covers: declaration checks (inputs nothing provides, duplicate names,
+missing launch state), a stage's concurrency limit holding stories
+while other stages keep running, deadlines from shares with unused time
+carried over but capped at the launch's deadline (which also bounds the
+wait for a slot), config overrides, cancel checks between stages, stats,
+and the pipeline passing a stage's max_attempts to Grok.
+"""
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from models.prompt import Prompt
+from models.story import Story
+from services.grok_service import GrokAPIError
+from services.pipeline_service import PIPELINE_ENGINE, run_pipeline
+from services.run_control import PipelineCancelled
+from services.stage_engine import Stage, StageEngine, _stage_slot, get_stage_stats
+
+
+def _control():
+    control = MagicMock()
+    control.check.return_value = None
+    return control
+
+
+def _set(key, value):
+    def run(state, ctx):
+        state[key] = value
+    return run
+
+
+class TestDeclaration:
+    """StageEngine checks the stage graph when it is built."""
+
+    def test_input_nothing_provides(self):
+        with pytest.raises(ValueError, match="reads \\['b'\\]"):
+            StageEngine("t", [Stage("one", _set("a", 1), inputs=("b",), outputs=("a",))])
+
+    def test_duplicate_stage(self):
+        with pytest.raises(ValueError, match="duplicate"):
+            StageEngine("t", [Stage("one", _set("a", 1)), Stage("one", _set("a", 2))])
+
+    def test_launch_state_checked(self, app):
+        engine = StageEngine("t", [Stage("one", _set("b", 1), inputs=("a",), outputs=("b",))],
+                             inputs=("a",))
+        with pytest.raises(ValueError, match="missing"):
+            engine.run_one({}, _control())
+        assert engine.run_one({"a": 0}, _control()) == {"a": 0, "b": 1}
+
+    def test_pipeline_declared_in_order(self):
+        assert [s.name for s in PIPELINE_ENGINE.stages] == [
+            "refinement", "amy-bot", "decision", "cms-push",
+        ]
+
+
+class TestConcurrency:
+    """A stage's limit holds stories back without stalling the other stages."""
+
+    def test_limit_one_overlaps_stages(self, app):
+        app.config["PIPELINE_STAGE_CONCURRENCY"] = {"t-slow": 1}
+        peak = {"slow": 0, "fast": 0}
+        active = {"slow": 0, "fast": 0}
+        lock = threading.Lock()
+
+        def work(name, seconds):
+            def run(state, ctx):
+                with lock:
+                    active[name] += 1
+                    peak[name] = max(peak[name], active[name])
+                time.sleep(seconds)
+                with lock:
+                    active[name] -= 1
+            return run
+
+        engine = StageEngine("t", [Stage("t-fast", work("fast", 0.05)),
+                                   Stage("t-slow", work("slow", 0.05))])
+
+        def one():
+            with app.app_context():
+                engine.run_one({}, _control())
+
+        try:
+            threads = [threading.Thread(target=one) for _ in range(4)]
+            start = time.monotonic()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.monotonic() - start
+        finally:
+            app.config["PIPELINE_STAGE_CONCURRENCY"] = {}
+
+        assert peak["slow"] == 1
+        assert peak["fast"] > 1
+        # Set by the slow stage (4 × 0.05s), not 4 × (0.05s + 0.05s)
+        assert elapsed < 0.4
+        stats = get_stage_stats()["t-slow"]
+        assert stats["concurrency"] == 1
+        assert stats["completed"] >= 4
+        assert stats["active"] == stats["waiting"] == 0
+
+    def test_failed_stage_stops_story(self, app):
+        later = MagicMock()
+
+        def boom(state, ctx):
+            raise RuntimeError("boom")
+
+        engine = StageEngine("t", [Stage("t-boom", boom), Stage("t-later", later)])
+        with pytest.raises(RuntimeError):
+            engine.run_one({}, _control())
+        later.assert_not_called()
+        assert get_stage_stats()["t-boom"]["failed"] >= 1
+
+    def test_cancel_checked_before_each_stage(self, app):
+        control = _control()
+        control.check.side_effect = [None, PipelineCancelled()]
+        second = MagicMock()
+        engine = StageEngine("t", [Stage("t-first", _set("a", 1)), Stage("t-second", second)])
+        with pytest.raises(PipelineCancelled):
+            engine.run_one({}, control)
+        second.assert_not_called()
+
+
+class TestSettings:
+    """Timeouts from PIPELINE_STEP_SHARES, overrides from config."""
+
+    def test_unused_time_carries_over(self, app):
+        deadlines = {}
+
+        def record(state, ctx):
+            deadlines[ctx.stage.name] = ctx.deadline.remaining()
+
+        engine = StageEngine("t", [Stage("refinement", record), Stage("amy-bot", record),
+                                   Stage("t-unshared", lambda state, ctx: None)])
+        app.config["PIPELINE_DEADLINE_SECONDS"] = 100
+        try:
+            engine.run_one({}, _control())
+        finally:
+            app.config["PIPELINE_DEADLINE_SECONDS"] = 600
+        # refinement 0.3 of 100s, amy-bot its 0.2 on top of whatever is left
+        assert 29 < deadlines["refinement"] <= 30
+        assert 49 < deadlines["amy-bot"] <= 50
+
+    def test_launch_times_out_waiting_for_slot(self, app):
+        run = MagicMock()
+        engine = StageEngine("t", [Stage("t-held", run, concurrency=1, timeout=0.2)])
+        start = time.monotonic()
+        # Another story holds the only slot
+        with _stage_slot("t-held", 1), pytest.raises(GrokAPIError) as exc_info:
+            engine.run_one({}, _control())
+        assert exc_info.value.status_code == 504
+        assert time.monotonic() - start < 1
+        run.assert_not_called()
+        assert get_stage_stats()["t-held"]["waiting"] == 0
+
+    def test_slot_wait_charged_to_launch(self, app):
+        deadlines = {}
+        held = threading.Event()
+
+        def record(state, ctx):
+            deadlines[ctx.stage.name] = ctx.deadline.remaining()
+
+        def hold_slot():
+            with _stage_slot("t-second", 1):
+                held.set()
+                time.sleep(0.2)
+
+        engine = StageEngine("t", [Stage("t-first", record, timeout=0.3),
+                                   Stage("t-second", record, concurrency=1, timeout=10)])
+        holder = threading.Thread(target=hold_slot)
+        holder.start()
+        held.wait()
+        engine.run_one({}, _control())
+        holder.join()
+        # 10.3s for the launch, 0.2s of it spent waiting for the slot
+        # (uncapped, t-second would get its 10s plus t-first's unused 0.3s)
+        assert 9.9 < deadlines["t-second"] <= 10.15
+
+    def test_overrides(self):
+        stage = Stage("refinement", _set("a", 1), concurrency=2, max_attempts=3, timeout=5)
+        assert stage.settings({}) == (2, 3, 5)
+        config = {"PIPELINE_STAGE_CONCURRENCY": {"refinement": 8},
+                  "PIPELINE_STAGE_MAX_ATTEMPTS": {"refinement": 1},
+                  "PIPELINE_DEADLINE_SECONDS": 100,
+                  "PIPELINE_STEP_SHARES": {"refinement": 0.5}}
+        assert stage.settings(config) == (8, 1, 5)
+        assert Stage("refinement", _set("a", 1)).settings(config) == (8, 1, 50)
+        assert Stage("t-none", _set("a", 1)).settings(config) == (0, None, None)
+
+    @patch("services.pipeline_service.cms_service.push_to_cms")
+    @patch("services.pipeline_service.call_grok")
+    def test_max_attempts_reaches_grok(self, mock_grok, mock_cms, app, db_session):
+        refinement = Prompt(prompt_type="papa", name="PAPA", prompt_text="Refine...",
+                            is_active=True)
+        amy = Prompt(prompt_type="amy-bot", name="Amy", prompt_text="Review...", is_active=True)
+        story = Story(source_list_output="Topics")
+        db_session.add_all([refinement, amy, story])
+        db_session.commit()
+        mock_grok.side_effect = ["Headline: Budget", "DECISION: APPROVE"]
+        mock_cms.return_value = {"id": 1}
+
+        app.config["PIPELINE_STAGE_MAX_ATTEMPTS"] = {"amy-bot": 1}
+        try:
+            result = run_pipeline(story.id, "Budget bill", refinement.id, "u@plmediaagency.com")
+        finally:
+            app.config["PIPELINE_STAGE_MAX_ATTEMPTS"] = {}
+
+        assert result["validation_decision"] == "APPROVE"
+        refinement_call, amy_call = mock_grok.call_args_list
+        assert "max_attempts" not in refinement_call.kwargs
+        assert amy_call.kwargs["max_attempts"] == 1
+        mock_cms.assert_called_once()
@@ -0,0 +1,136 @@
+"""
+Tests for services/usage_service.py and GET /api/admin/grok/usage.
+
+Covers: usage recorded on PipelineRun, cost with cached + reasoning
+tokens, grouping by step type / prompt / opportunity / day, bad params.
+"""
+from unittest.mock import patch, MagicMock
+
+import pytest
+
+from models.pipeline_run import PipelineRun
+from models.prompt import Prompt
+from models.story import Story
+from services.usage_service import estimate_cost, get_usage_report
+
+
+def _seed(db_session):
+    """Two refinement runs and one amy-bot run with usage."""
+    prompt = Prompt(prompt_type="papa", name="PAPA", prompt_text="Refine", is_active=True)
+    db_session.add(prompt)
+    db_session.flush()
+    story = Story(source_list_output="t", opportunity="IL News")
+    db_session.add(story)
+    db_session.flush()
+    for step, completion, duration in (("refinement", 400, 2000), ("refinement", 600, 3000),
+                                       ("amy-bot", 100, 1000)):
+        db_session.add(PipelineRun(
+            story_id=story.id, prompt_id=prompt.id, step_type=step, status="completed",
+            model="grok-3-fast", prompt_tokens=1000, completion_tokens=completion,
+            cached_tokens=500, reasoning_tokens=0, duration_ms=duration,
+        ))
+    # Cache hit — no usage, left out of the report
+    db_session.add(PipelineRun(story_id=story.id, step_type="amy-bot", status="completed",
+                               cache_hit=True, duration_ms=3))
+    db_session.commit()
+    return prompt, story
+
+
+class TestEstimateCost:
+    """Tests for estimate_cost()."""
+
+    def test_cached_and_reasoning_rates(self, app):
+        with app.app_context():
+            app.config["GROK_PRICING"] = {"m": {"input": 2, "cached_input": 1, "output": 10}}
+            try:
+                # 500 uncached*2 + 500 cached*1 + (100+100) output*10 = 3500 per 1M
+                assert estimate_cost("m", 1000, 100, 500, 100) == pytest.approx(0.0035)
+                assert estimate_cost("unknown", 1, 1, 0, 0) is None
+            finally:
+                from config import TestConfig
+                app.config["GROK_PRICING"] = TestConfig.GROK_PRICING
+
+
+class TestUsageReport:
+    """Tests for get_usage_report()."""
+
+    def test_by_step_type(self, db_session):
+        _seed(db_session)
+        report = get_usage_report("step_type")
+        rows = {r["step_type"]: r for r in report["rows"]}
+        assert set(rows) == {"refinement", "amy-bot"}
+        ref = rows["refinement"]
+        assert ref["runs"] == 2
+        assert ref["completion_tokens"] == 1000
+        assert ref["tokens_per_second"] == 200.0
+        assert ref["cached_ratio"] == 0.5
+        assert ref["cost_usd"] > rows["amy-bot"]["cost_usd"]
+
+    def test_other_groupings(self, db_session):
+        prompt, _ = _seed(db_session)
+        by_prompt = get_usage_report("prompt")["rows"]
+        assert by_prompt[0]["prompt_id"] == prompt.id
+        assert by_prompt[0]["prompt_name"] == "PAPA"
+        assert get_usage_report("opportunity")["rows"][0]["opportunity"] == "IL News"
+        assert get_usage_report("day")["rows"][0]["runs"] == 3
+
+    def test_invalid_group(self, db_session):
+        with pytest.raises(ValueError):
+            get_usage_report("user")
+
+
+class TestUsageRecording:
+    """call_grok's usage block lands on the PipelineRun."""
+
+    @patch("services.grok_service.requests.Session.post")
+    def test_tokens_and_model_stored(self, mock_post, db_session):
+        from services.pipeline_service import run_pipeline
+
+        ref = Prompt(prompt_type="papa", name="PAPA", prompt_text="Refine", is_active=True)
+        amy = Prompt(prompt_type="amy-bot", name="Amy", prompt_text="Review", is_active=True)
+        story = Story(source_list_output="t")
+        db_session.add_all([ref, amy, story])
+        db_session.commit()
+
+        def reply(content):
+            resp = MagicMock()
+            resp.status_code = 200
+            resp.json.return_value = {
+                "model": "grok-3-fast-served",
+                "choices": [{"message": {"content": content}}],
+                "usage": {
+                    "prompt_tokens": 120, "completion_tokens": 30,
+                    "completion_tokens_details": {"reasoning_tokens": 7},
+                },
+            }
+            return resp
+
+        mock_post.side_effect = [reply("Refined"), reply("DECISION: APPROVE")]
+        run_pipeline(story.id, "Story", ref.id, "usage@plmediaagency.com")
+
+        run = PipelineRun.query.filter_by(story_id=story.id, step_type="refinement").one()
+        assert run.model == "grok-3-fast-served"
+        assert (run.prompt_tokens, run.completion_tokens, run.reasoning_tokens) == (120, 30, 7)
+        assert run.cached_tokens == 0
+
+
+class TestUsageEndpoint:
+    """Tests for GET /api/admin/grok/usage."""
+
+    def test_requires_admin(self, client, auth_headers):
+        resp = client.get("/api/admin/grok/usage", headers=auth_headers("u@plmediaagency.com", "user"))
+        assert resp.status_code == 403
+
+    def test_grouped_report(self, client, auth_headers, db_session):
+        _seed(db_session)
+        headers = auth_headers("a@plmediaagency.com", "admin")
+        resp = client.get("/api/admin/grok/usage?by=opportunity&days=30", headers=headers)
+        assert resp.status_code == 200
+        data = resp.get_json()
+        assert data["group_by"] == "opportunity"
+        assert data["rows"][0]["runs"] == 3
+
+    def test_bad_params(self, client, auth_headers):
+        headers = auth_headers("a@plmediaagency.com", "admin")
+        assert client.get("/api/admin/grok/usage?by=nope", headers=headers).status_code == 400
+        assert client.get("/api/admin/grok/usage?days=x", headers=headers).status_code == 400